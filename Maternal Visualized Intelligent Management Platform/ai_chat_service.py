@@ -3,12 +3,9 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 import json
 import time
 import threading
-import requests
 import hashlib
 import os
 from datetime import datetime
-import os
-from openai import OpenAI
 
 # 启用火山方舟大模型依赖
 builtin_available = True
@@ -23,14 +20,9 @@ class AIChatService:
         # AI助手API配置
         self.api_key = os.environ.get('ARK_API_KEY', 'ceadb27c-39e4-4527-924d-a8bb5e81758e')  # 从环境变量获取或使用提供的密钥
         
-        # 初始化火山方舟OpenAI兼容客户端
-        self.client = OpenAI(
-            # 火山方舟API地址
-            base_url="https://ark.cn-beijing.volces.com/api/v3",
-            # 使用API密钥
-            api_key=self.api_key,
-        )
-        print("已初始化火山方舟大模型客户端")
+        # 火山方舟OpenAI兼容客户端在首次调用时创建（openai 库导入耗时较长，不拖慢应用启动）
+        self._client = None
+        self._client_lock = threading.Lock()
         
         # AI助手模型配置
         self.ai_model = "ep-20250514110428-r589j"  # 使用用户提供的火山方舟推理接入点ID
@@ -38,6 +30,22 @@ class AIChatService:
         # 注册WebSocket事件处理器
         self.register_handlers()
     
+    @property
+    def client(self):
+        """首次使用时导入 openai 并初始化火山方舟OpenAI兼容客户端"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(
+                        # 火山方舟API地址
+                        base_url="https://ark.cn-beijing.volces.com/api/v3",
+                        # 使用API密钥
+                        api_key=self.api_key,
+                    )
+                    print("已初始化火山方舟大模型客户端")
+        return self._client
+    
     def register_handlers(self):
         """注册WebSocket事件处理器"""
         
@@ -132,11 +140,11 @@ class AIChatService:
         """调用OpenAI API生成自然语言响应"""
         try:
             # 导入预测器，用于专业医疗数据的处理
-            from maternal_risk_predictor import MaternalRiskPredictor
+            from maternal_risk_predictor import get_predictor
             import re
             
-            # 初始化预测器
-            predictor = MaternalRiskPredictor()
+            # 获取进程级共享的预测器
+            predictor = get_predictor()
             
             # 检查是否包含医疗风险评估相关的关键词
             medical_keywords = ['子痫前期', '子痫', '高血压', '早产', '提前分娩', 'BMI', '血压', '年龄']
@@ -1,39 +1,32 @@
 from flask import Blueprint, request, jsonify, send_file
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.utils import PlotlyJSONEncoder
 import json
 import os
-from io import BytesIO
-import base64
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import tempfile
-import uuid
-from jinja2 import Template
-import pdfkit
+import math
+import time
+import hashlib
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.data_access import get_db, database_path
+from utils.db_pool import release_thread_connections
 from data_management_api import get_statistics
+import dashboard_materializer
+import metric_rollups
+import distribution_stats
+from report_engine import ReportEngine
+from forecasting import ForecastEngine, ForecastService, COUNT_METRIC, DEFAULT_LEVEL
 
 # 创建分析模块蓝图
 analysis_bp = Blueprint('analysis', __name__)
 
 # SQLite数据库路径
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'medical_system.db')
+DB_PATH = database_path('system')
 
 def get_db_connection():
     """获取数据库连接"""
     try:
-        connection = sqlite3.connect(DB_PATH)
-        connection.row_factory = sqlite3.Row
+        connection = get_db('system')
         return connection
     except Exception as e:
         print(f"数据库连接失败: {e}")
@@ -42,11 +35,25 @@ def get_db_connection():
 @analysis_bp.route('/api/dashboard/medical', methods=['GET'])
 def get_dashboard_medical():
     """获取医疗数据"""
+    payload = build_dashboard_medical()
+    return jsonify(payload), payload['code']
+
+def build_dashboard_medical():
+    """医疗数据部分的响应内容（读取失败时为模拟数据）"""
     try:
         conn = get_db_connection()
         if not conn:
             raise Exception("数据库连接失败")
         
+        # 优先使用触发器维护的实时计数
+        snapshot = dashboard_materializer.build_medical_snapshot(conn)
+        if snapshot is not None:
+            return {
+                'code': 200,
+                'message': '获取医疗数据成功',
+                'data': snapshot
+            }
+        
         cursor = conn.cursor()
         # 从dashboard_medical表获取最新的医疗数据
         cursor.execute("SELECT * FROM dashboard_medical ORDER BY updated_at DESC LIMIT 1")
@@ -65,7 +72,7 @@ def get_dashboard_medical():
         if not disease_distribution:
             disease_distribution = []
         
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取医疗数据成功',
             'data': {
@@ -76,11 +83,11 @@ def get_dashboard_medical():
                 'monthly_trend': monthly_trend,
                 'department_details': department_details
             }
-        })
+        }
     except Exception as e:
         print(f"获取医疗数据失败: {e}")
         # 返回模拟数据作为备选方案
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取医疗数据成功（模拟数据）',
             'data': {
@@ -94,50 +101,69 @@ def get_dashboard_medical():
                     '其他': 350
                 }
             }
-        })
+        }
 
 @analysis_bp.route('/api/dashboard/maternal', methods=['GET'])
 def get_dashboard_maternal():
     """获取孕产妇数据"""
+    payload = build_dashboard_maternal()
+    return jsonify(payload), payload['code']
+
+def build_dashboard_maternal():
+    """孕产妇数据部分的响应内容（读取失败时为模拟数据）"""
     try:
         conn = get_db_connection()
         if not conn:
             raise Exception("数据库连接失败")
         
         cursor = conn.cursor()
-        # 从dashboard_maternal表获取最新的孕产妇数据
-        cursor.execute("SELECT * FROM dashboard_maternal ORDER BY updated_at DESC LIMIT 1")
-        maternal_data = cursor.fetchone()
+        # 计数部分优先使用触发器维护的实时计数，明细和提醒仍来自dashboard_maternal表
+        snapshot = dashboard_materializer.build_maternal_snapshot(conn)
+        maternal_data = None
+        try:
+            cursor.execute("SELECT * FROM dashboard_maternal ORDER BY updated_at DESC LIMIT 1")
+            maternal_data = cursor.fetchone()
+        except sqlite3.OperationalError:
+            if snapshot is None:
+                raise
         
-        if not maternal_data:
+        if not maternal_data and snapshot is None:
             raise Exception("未找到孕产妇数据")
         
         # 解析JSON数据
-        pregnancy_distribution = json.loads(maternal_data['pregnancy_distribution_json']) if maternal_data['pregnancy_distribution_json'] else None
-        risk_distribution = json.loads(maternal_data['risk_distribution_json']) if maternal_data['risk_distribution_json'] else None
-        maternal_details = json.loads(maternal_data['maternal_details_json']) if maternal_data['maternal_details_json'] else None
-        reminders = json.loads(maternal_data['reminders_json']) if maternal_data['reminders_json'] else None
+        pregnancy_distribution = json.loads(maternal_data['pregnancy_distribution_json']) if maternal_data and maternal_data['pregnancy_distribution_json'] else None
+        risk_distribution = json.loads(maternal_data['risk_distribution_json']) if maternal_data and maternal_data['risk_distribution_json'] else None
+        maternal_details = json.loads(maternal_data['maternal_details_json']) if maternal_data and maternal_data['maternal_details_json'] else None
+        reminders = json.loads(maternal_data['reminders_json']) if maternal_data and maternal_data['reminders_json'] else None
+        
+        if snapshot is not None:
+            total, today = snapshot['total'], snapshot['today']
+            pregnancy_distribution = snapshot['pregnancy_distribution']
+            if snapshot['risk_distribution'] is not None:
+                risk_distribution = snapshot['risk_distribution']
+        else:
+            total, today = maternal_data['total'], maternal_data['today']
         
         # 确保pregnancy_distribution是数组格式
         if not pregnancy_distribution:
             pregnancy_distribution = []
         
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取孕产妇数据成功',
             'data': {
-                'total': maternal_data['total'],
-                'today': maternal_data['today'],
+                'total': total,
+                'today': today,
                 'pregnancy_distribution': pregnancy_distribution,
                 'risk_distribution': risk_distribution,
                 'maternal_details': maternal_details,
                 'reminders': reminders
             }
-        })
+        }
     except Exception as e:
         print(f"获取孕产妇数据失败: {e}")
         # 返回模拟数据作为备选方案
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取孕产妇数据成功（模拟数据）',
             'data': {
@@ -149,11 +175,16 @@ def get_dashboard_maternal():
                     '孕晚期': 210
                 }
             }
-        })
+        }
 
 @analysis_bp.route('/api/dashboard/comparison', methods=['GET'])
 def get_dashboard_comparison():
     """获取对比分析数据"""
+    payload = build_dashboard_comparison()
+    return jsonify(payload), payload['code']
+
+def build_dashboard_comparison():
+    """对比分析部分的响应内容（读取失败时为模拟数据）"""
     try:
         conn = get_db_connection()
         if not conn:
@@ -188,7 +219,7 @@ def get_dashboard_comparison():
                 details = json.loads(data['details_json']) if data['details_json'] else []
                 comparisonDetails.extend(details)
         
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取对比分析数据成功',
             'data': {
@@ -196,11 +227,11 @@ def get_dashboard_comparison():
                 'monthOverMonth': monthOverMonth,
                 'comparisonDetails': comparisonDetails
             }
-        })
+        }
     except Exception as e:
         print(f"获取对比分析数据失败: {e}")
         # 返回模拟数据作为备选方案
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取对比分析数据成功（模拟数据）',
             'data': {
@@ -235,7 +266,7 @@ def get_dashboard_comparison():
                     }
                 ]
             }
-        })
+        }
 
 @analysis_bp.route('/api/dashboard/comparison/run', methods=['POST'])
 def run_dashboard_comparison():
@@ -324,23 +355,35 @@ def run_dashboard_comparison():
 @analysis_bp.route('/api/dashboard/overview', methods=['GET'])
 def get_dashboard_overview():
     """获取仪表盘概览数据"""
+    payload = build_dashboard_overview()
+    return jsonify(payload), payload['code']
+
+def build_dashboard_overview():
+    """概览部分的响应内容（读取失败时 code 为 500）"""
     try:
         conn = get_db_connection()
         if not conn:
             raise Exception("数据库连接失败")
         
-        cursor = conn.cursor()
-        # 从dashboard_overview表获取最新的概览数据
-        cursor.execute("SELECT * FROM dashboard_overview ORDER BY updated_at DESC LIMIT 1")
-        overview_data = cursor.fetchone()
-        
-        if not overview_data:
-            raise Exception("未找到概览数据")
-        
-        # 解析JSON数据
-        trends = json.loads(overview_data['trends_json']) if overview_data['trends_json'] else None
-        statistics = json.loads(overview_data['statistics_json']) if overview_data['statistics_json'] else None
-        recent_alerts = json.loads(overview_data['recent_alerts_json']) if overview_data['recent_alerts_json'] else None
+        # 优先使用触发器维护的实时计数
+        overview_data = dashboard_materializer.build_overview_snapshot(conn)
+        if overview_data is not None:
+            trends = overview_data['trends']
+            statistics = overview_data['statistics']
+            recent_alerts = overview_data['recent_alerts']
+        else:
+            cursor = conn.cursor()
+            # 从dashboard_overview表获取最新的概览数据
+            cursor.execute("SELECT * FROM dashboard_overview ORDER BY updated_at DESC LIMIT 1")
+            overview_data = cursor.fetchone()
+            
+            if not overview_data:
+                raise Exception("未找到概览数据")
+            
+            # 解析JSON数据
+            trends = json.loads(overview_data['trends_json']) if overview_data['trends_json'] else None
+            statistics = json.loads(overview_data['statistics_json']) if overview_data['statistics_json'] else None
+            recent_alerts = json.loads(overview_data['recent_alerts_json']) if overview_data['recent_alerts_json'] else None
         
         # 构建响应数据
         response_data = {
@@ -371,15 +414,15 @@ def get_dashboard_overview():
         }
         
         conn.close()
-        return jsonify({
+        return {
             'code': 200,
             'message': '获取仪表盘概览数据成功',
             'data': response_data
-        })
+        }
     except Exception as e:
         if 'conn' in locals() and conn:
             conn.close()
-        return jsonify({
+        return {
             'code': 500,
             'message': f'获取仪表盘概览数据失败: {str(e)}',
             'data': {
@@ -403,22 +446,140 @@ def get_dashboard_overview():
                 },
                 'recent_alerts': []
             }
-        })
+        }
+
+# 大屏各部分 -> 响应内容构造函数（各部分相互独立，并发读取）
+SCREEN_SECTIONS = {
+    'overview': build_dashboard_overview,
+    'medical': build_dashboard_medical,
+    'maternal': build_dashboard_maternal,
+    'comparison': build_dashboard_comparison
+}
+
+_screen_executor = None
+_screen_executor_lock = threading.Lock()
+
+
+def get_screen_executor():
+    """大屏查询线程池（首次使用时创建，每个部分一个线程）"""
+    global _screen_executor
+    with _screen_executor_lock:
+        if _screen_executor is None:
+            _screen_executor = ThreadPoolExecutor(max_workers=len(SCREEN_SECTIONS),
+                                                  thread_name_prefix='dashboard-screen')
+        return _screen_executor
+
+
+def run_screen_section(build):
+    """在工作线程中构造一个部分，返回 (响应内容, 耗时毫秒)"""
+    start = time.perf_counter()
+    try:
+        return build(), round((time.perf_counter() - start) * 1000, 2)
+    finally:
+        # 工作线程没有请求结束时的 teardown，归还本线程从连接池借出的连接
+        release_thread_connections()
+
+
+@analysis_bp.route('/api/dashboard/screen', methods=['GET'])
+def get_dashboard_screen():
+    """
+    大屏聚合数据：概览、医疗、孕产妇、对比各部分在线程池中并发读取（各自使用连接池中的 WAL 读连接），
+    合并为一个响应并附带各部分耗时。ETag 由各部分数据计算，If-None-Match 匹配时返回 304。
+
+    sections 参数可以只请求部分内容（逗号分隔），默认全部
+    """
+    names = [name for name in request.args.get('sections', ','.join(SCREEN_SECTIONS)).split(',') if name]
+    unknown = [name for name in names if name not in SCREEN_SECTIONS]
+    if unknown or not names:
+        return jsonify({
+            'code': 400,
+            'message': f"不支持的大屏部分: {', '.join(unknown)}" if unknown else '未指定大屏部分',
+            'data': None
+        }), 400
+    
+    start = time.perf_counter()
+    executor = get_screen_executor()
+    futures = {name: executor.submit(run_screen_section, SCREEN_SECTIONS[name]) for name in names}
+    data, sections, timings = {}, {}, {}
+    for name, future in futures.items():
+        payload, elapsed = future.result()
+        data[name] = payload['data']
+        sections[name] = {'code': payload['code'], 'message': payload['message']}
+        timings[name] = elapsed
+    timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+    
+    # 耗时不参与 ETag（弱校验：数据相同即视为未变化）
+    content = json.dumps([data, sections], sort_keys=True, ensure_ascii=False, default=str)
+    response = jsonify({
+        'code': 200,
+        'message': '获取大屏数据成功',
+        'data': data,
+        'sections': sections,
+        'timings': timings
+    })
+    response.set_etag(hashlib.sha1(content.encode('utf-8')).hexdigest(), weak=True)
+    response.headers['Server-Timing'] = ', '.join(f'{name};dur={elapsed}' for name, elapsed in timings.items())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 def get_db_connection():
     """获取数据库连接"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db('system')
         return conn
     except Exception as e:
         print(f"数据库连接失败: {e}")
         return None
 
+# 分析接口的数据类型 -> 源表（原查询中的 maternal_data 表不存在，孕产妇数据在 maternal_info）
+ANALYSIS_SOURCES = {'medical': 'medical_data', 'maternal': 'maternal_info'}
+
+# 趋势数据字段 -> 汇总指标（表中没有的指标为空，输出为 0）
+TREND_FIELDS = {
+    'medical': {
+        'avg_age': 'age',
+        'avg_systolic': 'systolic_pressure',
+        'avg_diastolic': 'diastolic_pressure',
+        'avg_heart_rate': 'heart_rate',
+        'avg_blood_sugar': 'blood_sugar'
+    },
+    'maternal': {
+        'avg_age': 'age',
+        'avg_gestational_weeks': 'gestational_weeks',
+        'avg_fetal_heart_rate': 'fetal_heart_rate',
+        'avg_systolic': 'systolic_pressure',
+        'avg_diastolic': 'diastolic_pressure'
+    }
+}
+
+
+def bucket_label(bucket, grain):
+    """汇总桶的显示文本（小时桶补上分钟）"""
+    return f'{bucket}:00' if grain == 'hour' else bucket
+
+
+def rollup_frame(conn, data_type, grain, modifiers, before=None):
+    """
+    从指标汇总表读取时间序列，列与原 GROUP BY DATE(created_at) 查询一致：date、count、avg_*
+    """
+    import pandas as pd
+
+    metric_rollups.ensure_installed(conn)
+    fields = TREND_FIELDS[data_type]
+    series = metric_rollups.read_series(conn, ANALYSIS_SOURCES[data_type], grain, modifiers, before)
+    records = [
+        dict({'date': entry['bucket'], 'count': entry['count']},
+             **{field: metric_rollups.metric_avg(entry, metric) for field, metric in fields.items()})
+        for entry in series
+    ]
+    return pd.DataFrame(records, columns=['date', 'count'] + list(fields)).astype({field: float for field in fields})
+
 # 趋势分析API
 @analysis_bp.route('/api/analysis/trend', methods=['GET'])
 def get_trend_analysis():
     """获取趋势分析数据"""
+    import pandas as pd
+    
     try:
         data_type = request.args.get('data_type', 'medical')
         time_range = request.args.get('time_range', 'month')
@@ -470,40 +631,36 @@ def get_trend_analysis():
                 'data': None
             }), 500
         
-        # 根据数据类型构建查询
-        if data_type == 'medical':
-            query = """
-            SELECT 
-                DATE(created_at) as date,
-                AVG(age) as avg_age,
-                AVG(systolic_pressure) as avg_systolic,
-                AVG(diastolic_pressure) as avg_diastolic,
-                AVG(heart_rate) as avg_heart_rate,
-                AVG(blood_sugar) as avg_blood_sugar,
-                COUNT(*) as count
-            FROM medical_data
-            WHERE created_at >= date('now', '-30 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-            """
-        else:  # maternal
-            query = """
-            SELECT 
-                DATE(created_at) as date,
-                AVG(age) as avg_age,
-                AVG(gestational_weeks) as avg_gestational_weeks,
-                AVG(fetal_heart_rate) as avg_fetal_heart_rate,
-                AVG(systolic_pressure) as avg_systolic,
-                AVG(diastolic_pressure) as avg_diastolic,
-                COUNT(*) as count
-            FROM maternal_data
-            WHERE created_at >= date('now', '-30 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-            """
+        data_type = 'medical' if data_type == 'medical' else 'maternal'
+        try:
+            grain, modifiers = metric_rollups.parse_time_range(time_range)
+        except ValueError as e:
+            conn.close()
+            return jsonify({
+                'code': 400,
+                'message': str(e),
+                'data': None
+            }), 400
         
+        # 分布的分界点可由请求指定（逗号分隔），例如 age_bins=20,25,30,35,40
         try:
-            df = pd.read_sql_query(query, conn)
+            bins = distribution_stats.resolve_bins({
+                name: distribution_stats.parse_edges(request.args[f'{name}_bins'])
+                for name in ('age', 'pressure') if request.args.get(f'{name}_bins')
+            })
+        except ValueError as e:
+            conn.close()
+            return jsonify({
+                'code': 400,
+                'message': str(e),
+                'data': None
+            }), 400
+        
+        # 趋势序列读取对应粒度的汇总行；分布和对比按原始记录统计（结果按数据版本缓存）
+        try:
+            df = rollup_frame(conn, data_type, grain, modifiers)
+            stats = distribution_stats.scan(conn, ANALYSIS_SOURCES[data_type], grain, modifiers,
+                                            df['date'].tolist(), bins)
             conn.close()
         except Exception as e:
             print(f"查询执行错误: {e}")
@@ -528,8 +685,9 @@ def get_trend_analysis():
             })
         
         # 趋势数据
+        labels = [bucket_label(bucket, grain) for bucket in df['date']]
         trend_data = {
-            'dates': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d').tolist(),
+            'dates': labels,
             'avg_age': df['avg_age'].fillna(0).round(2).tolist(),
             'avg_systolic': df['avg_systolic'].fillna(0).round(2).tolist(),
             'avg_diastolic': df['avg_diastolic'].fillna(0).round(2).tolist(),
@@ -545,15 +703,15 @@ def get_trend_analysis():
         
         # 分布数据
         distribution_data = {
-            'age_distribution': create_age_distribution(df, data_type),
-            'pressure_distribution': create_pressure_distribution(df),
-            'time_distribution': create_time_distribution(df)
+            'age_distribution': create_age_distribution(stats),
+            'pressure_distribution': create_pressure_distribution(stats),
+            'time_distribution': create_time_distribution(stats)
         }
         
         # 对比数据
         comparison_data = {
-            'metrics_comparison': create_metrics_comparison(df, data_type),
-            'period_comparison': create_period_comparison(df, data_type)
+            'metrics_comparison': create_metrics_comparison(stats),
+            'period_comparison': create_period_comparison(stats)
         }
         
         # 预测数据
@@ -563,11 +721,12 @@ def get_trend_analysis():
         statistics = {
             'total_records': len(df),
             'date_range': {
-                'start': pd.to_datetime(df['date']).min().strftime('%Y-%m-%d'),
-                'end': pd.to_datetime(df['date']).max().strftime('%Y-%m-%d')
+                'start': labels[0],
+                'end': labels[-1]
             },
+            'granularity': grain,
             'avg_daily_records': round(df['count'].mean(), 2),
-            'peak_day': pd.to_datetime(df.loc[df['count'].idxmax(), 'date']).strftime('%Y-%m-%d'),
+            'peak_day': labels[int(df['count'].idxmax())],
             'peak_records': int(df['count'].max())
         }
         
@@ -594,6 +753,8 @@ def get_trend_analysis():
 @analysis_bp.route('/api/analysis/comparison', methods=['GET'])
 def get_comparison_analysis():
     """获取对比分析数据"""
+    import pandas as pd
+    
     try:
         comparison_type = request.args.get('comparison_type', 'period')
         data_type = request.args.get('data_type', 'medical')
@@ -608,31 +769,10 @@ def get_comparison_analysis():
             }), 500
         
         if comparison_type == 'period':
-            # 时间段对比
-            query1 = """
-            SELECT 
-                DATE(created_at) as date,
-                AVG(age) as avg_age,
-                COUNT(*) as count
-            FROM medical_data
-            WHERE created_at >= date('now', '-7 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-            """
-            
-            query2 = """
-            SELECT 
-                DATE(created_at) as date,
-                AVG(age) as avg_age,
-                COUNT(*) as count
-            FROM medical_data
-            WHERE created_at >= date('now', '-14 days') AND created_at < date('now', '-7 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-            """
-            
-            df1 = pd.read_sql_query(query1, conn)
-            df2 = pd.read_sql_query(query2, conn)
+            # 时间段对比：最近 7 天与之前 7 天的按天汇总
+            data_type = 'medical' if data_type == 'medical' else 'maternal'
+            df1 = rollup_frame(conn, data_type, 'day', ('-7 days',))
+            df2 = rollup_frame(conn, data_type, 'day', ('-14 days',), before=('-7 days',))
             conn.close()
             
             comparison_data = {
@@ -687,69 +827,32 @@ def get_statistics_analysis():
                 'data': None
             }), 500
         
-        if data_type == 'medical':
-            query = """
-            SELECT 
-                COUNT(*) as total_count,
-                AVG(age) as avg_age,
-                MIN(age) as min_age,
-                MAX(age) as max_age,
-                AVG(systolic_pressure) as avg_systolic,
-                AVG(diastolic_pressure) as avg_diastolic,
-                AVG(heart_rate) as avg_heart_rate,
-                AVG(blood_sugar) as avg_blood_sugar
-            FROM medical_data
-            """
-        else:
-            query = """
-            SELECT 
-                COUNT(*) as total_count,
-                AVG(age) as avg_age,
-                MIN(age) as min_age,
-                MAX(age) as max_age,
-                AVG(gestational_weeks) as avg_gestational_weeks,
-                AVG(fetal_heart_rate) as avg_fetal_heart_rate,
-                AVG(systolic_pressure) as avg_systolic,
-                AVG(diastolic_pressure) as avg_diastolic
-            FROM maternal_data
-            """
+        data_type = 'medical' if data_type == 'medical' else 'maternal'
+        table = ANALYSIS_SOURCES[data_type]
         
-        cursor = conn.cursor()
-        cursor.execute(query)
-        stats = cursor.fetchone()
+        # 总数和平均值来自全部时间的汇总行，最小、最大年龄使用 age 索引
+        metric_rollups.ensure_installed(conn)
+        totals = metric_rollups.read_totals(conn, table)
+        age_range = conn.execute(f"SELECT MIN(age), MAX(age) FROM {table}").fetchone()
         conn.close()
         
-        if stats:
-            statistics_data = {
-                'total_count': stats['total_count'] or 0,
-                'age_stats': {
-                    'avg': round(stats['avg_age'] or 0, 2),
-                    'min': stats['min_age'] or 0,
-                    'max': stats['max_age'] or 0
-                },
-                'vital_signs': {}
-            }
-            
-            if data_type == 'medical':
-                statistics_data['vital_signs'] = {
-                    'avg_systolic': round(stats['avg_systolic'] or 0, 2),
-                    'avg_diastolic': round(stats['avg_diastolic'] or 0, 2),
-                    'avg_heart_rate': round(stats['avg_heart_rate'] or 0, 2),
-                    'avg_blood_sugar': round(stats['avg_blood_sugar'] or 0, 2)
-                }
-            else:
-                statistics_data['vital_signs'] = {
-                    'avg_gestational_weeks': round(stats['avg_gestational_weeks'] or 0, 2),
-                    'avg_fetal_heart_rate': round(stats['avg_fetal_heart_rate'] or 0, 2),
-                    'avg_systolic': round(stats['avg_systolic'] or 0, 2),
-                    'avg_diastolic': round(stats['avg_diastolic'] or 0, 2)
-                }
-        else:
-            statistics_data = {
-                'total_count': 0,
-                'age_stats': {'avg': 0, 'min': 0, 'max': 0},
-                'vital_signs': {}
+        def average(metric):
+            value = metric_rollups.metric_avg(totals, metric)
+            return round(value, 2) if value is not None else 0
+        
+        age = totals.get('age') or {}
+        statistics_data = {
+            'total_count': totals['count'],
+            'age_stats': {
+                'avg': average('age'),
+                'min': age_range[0] or 0,
+                'max': age_range[1] or 0,
+                'std': round(age['std'], 2) if age.get('std') is not None else 0
+            },
+            'vital_signs': {
+                field: average(metric) for field, metric in TREND_FIELDS[data_type].items() if field != 'avg_age'
             }
+        }
         
         return jsonify({
             'code': 200,
@@ -767,10 +870,9 @@ def get_statistics_analysis():
 # 预测分析API
 @analysis_bp.route('/api/analysis/prediction', methods=['GET'])
 def get_prediction_analysis():
-    """获取预测分析数据"""
+    """获取预测分析数据（读取后台拟合并保存的指数平滑模型状态）"""
     try:
-        data_type = request.args.get('data_type', 'medical')
-        prediction_days = int(request.args.get('days', 7))
+        data_type = 'medical' if request.args.get('data_type', 'medical') == 'medical' else 'maternal'
         
         conn = get_db_connection()
         if not conn:
@@ -780,36 +882,22 @@ def get_prediction_analysis():
                 'data': None
             }), 500
         
-        # 获取历史数据
-        if data_type == 'medical':
-            query = """
-            SELECT 
-                DATE(created_at) as date,
-                COUNT(*) as count,
-                AVG(age) as avg_age,
-                AVG(systolic_pressure) as avg_systolic
-            FROM medical_data
-            WHERE created_at >= date('now', '-30 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-            """
-        else:
-            query = """
-            SELECT 
-                DATE(created_at) as date,
-                COUNT(*) as count,
-                AVG(age) as avg_age,
-                AVG(gestational_weeks) as avg_gestational_weeks
-            FROM maternal_data
-            WHERE created_at >= date('now', '-30 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-            """
-        
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        try:
+            prediction_days = int(request.args.get('days', 7))
+            confidence = float(request.args.get('confidence', DEFAULT_LEVEL))
+            count_forecast = forecast_engine.forecast(conn, data_type, COUNT_METRIC,
+                                                      prediction_days, confidence)
+            age_forecast = forecast_engine.forecast(conn, data_type, 'age', prediction_days, confidence)
+        except ValueError as e:
+            return jsonify({
+                'code': 400,
+                'message': str(e),
+                'data': None
+            }), 400
+        finally:
+            conn.close()
         
-        if df.empty:
+        if count_forecast is None:
             return jsonify({
                 'code': 200,
                 'message': '暂无历史数据，无法进行预测',
@@ -820,48 +908,33 @@ def get_prediction_analysis():
                 }
             })
         
-        # 简单的线性预测（实际应用中可以使用更复杂的模型）
-        from sklearn.linear_model import LinearRegression
-        import numpy as np
-        
-        # 准备数据
-        X = np.arange(len(df)).reshape(-1, 1)
-        y_count = df['count'].values
-        y_age = df['avg_age'].fillna(df['avg_age'].mean()).values
-        
-        # 训练模型
-        model_count = LinearRegression().fit(X, y_count)
-        model_age = LinearRegression().fit(X, y_age)
-        
-        # 预测未来数据
-        future_X = np.arange(len(df), len(df) + prediction_days).reshape(-1, 1)
-        predicted_count = model_count.predict(future_X)
-        predicted_age = model_age.predict(future_X)
-        
-        # 生成日期
-        last_date = pd.to_datetime(df['date']).max()
-        future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=prediction_days, freq='D')
-        
+        ages = age_forecast['mean'] if age_forecast else [None] * prediction_days
         prediction_data = {
             'predicted_data': [
                 {
-                    'date': date.strftime('%Y-%m-%d'),
+                    'date': day,
                     'predicted_count': max(0, int(round(count))),
-                    'predicted_age': round(age, 2)
+                    'predicted_age': round(age, 2) if age is not None else None
                 }
-                for date, count, age in zip(future_dates, predicted_count, predicted_age)
+                for day, count, age in zip(count_forecast['dates'], count_forecast['mean'], ages)
             ],
             'confidence_intervals': [
                 {
-                    'date': date.strftime('%Y-%m-%d'),
-                    'lower_bound': max(0, int(round(count * 0.8))),
-                    'upper_bound': int(round(count * 1.2))
+                    'date': day,
+                    'lower_bound': max(0, int(math.floor(lower))),
+                    'upper_bound': max(0, int(math.ceil(upper)))
                 }
-                for date, count in zip(future_dates, predicted_count)
+                for day, lower, upper in zip(count_forecast['dates'], count_forecast['lower'],
+                                             count_forecast['upper'])
             ],
+            'confidence_level': confidence,
             'model_accuracy': {
-                'count_model': round(model_count.score(X, y_count), 3),
-                'age_model': round(model_age.score(X, y_age), 3)
+                'count_model': round(count_forecast['r2'], 3),
+                'age_model': round(age_forecast['r2'], 3) if age_forecast else 0
+            },
+            'models': {
+                name: {key: result[key] for key in ('model', 'sigma', 'last_date', 'fitted_at')}
+                for name, result in (('count', count_forecast), ('age', age_forecast)) if result
             }
         }
         
@@ -878,15 +951,36 @@ def get_prediction_analysis():
             'data': None
         }), 500
 
+# 预测引擎（模型由后台服务定时拟合，请求只读取保存的状态，状态过时时唤醒后台服务）
+forecast_engine = ForecastEngine(ANALYSIS_SOURCES, TREND_FIELDS)
+forecast_service = ForecastService(forecast_engine)
+
+# 报告引擎（参数化查询，结果按数据版本缓存，过去日期范围的报告持久保存）
+report_engine = ReportEngine(ANALYSIS_SOURCES, TREND_FIELDS)
+
+
+def precompute_reports():
+    """预先生成最近各完整自然月的分析报告（由 app.start_background_services 在后台线程中调用）"""
+    conn = get_db_connection()
+    if not conn:
+        return 0
+    try:
+        return report_engine.precompute(conn)
+    except Exception as e:
+        print(f"预先生成分析报告失败: {e}")
+        return 0
+    finally:
+        conn.close()
+
 # 报告生成API
 @analysis_bp.route('/api/analysis/report', methods=['POST'])
 def generate_analysis_report():
     """生成分析报告"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         report_type = data.get('report_type', 'summary')
-        data_type = data.get('data_type', 'medical')
-        date_range = data.get('date_range', {})
+        data_type = 'medical' if data.get('data_type', 'medical') == 'medical' else 'maternal'
+        date_range = data.get('date_range') or {}
         
         conn = get_db_connection()
         if not conn:
@@ -896,75 +990,17 @@ def generate_analysis_report():
                 'data': None
             }), 500
         
-        # 生成报告数据
-        report_data = {
-            'report_type': report_type,
-            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'data_type': data_type,
-            'date_range': date_range,
-            'summary': {},
-            'charts': [],
-            'recommendations': []
-        }
-        
-        # 获取基础统计数据
-        if data_type == 'medical':
-            query = """
-            SELECT 
-                COUNT(*) as total_records,
-                AVG(age) as avg_age,
-                AVG(systolic_pressure) as avg_systolic,
-                AVG(diastolic_pressure) as avg_diastolic,
-                AVG(heart_rate) as avg_heart_rate,
-                AVG(blood_sugar) as avg_blood_sugar
-            FROM medical_data
-            WHERE 1=1
-            """
-        else:
-            query = """
-            SELECT 
-                COUNT(*) as total_records,
-                AVG(age) as avg_age,
-                AVG(gestational_weeks) as avg_gestational_weeks,
-                AVG(fetal_heart_rate) as avg_fetal_heart_rate,
-                AVG(systolic_pressure) as avg_systolic,
-                AVG(diastolic_pressure) as avg_diastolic
-            FROM maternal_data
-            WHERE 1=1
-            """
-        
-        # 添加日期范围条件
-        if date_range.get('start'):
-            query += f" AND DATE(created_at) >= '{date_range['start']}'"
-        if date_range.get('end'):
-            query += f" AND DATE(created_at) <= '{date_range['end']}'"
-        
-        cursor = conn.cursor()
-        cursor.execute(query)
-        stats = cursor.fetchone()
-        
-        if stats:
-            report_data['summary'] = {
-                'total_records': stats['total_records'] or 0,
-                'avg_age': round(stats['avg_age'] or 0, 2)
-            }
-            
-            if data_type == 'medical':
-                report_data['summary'].update({
-                    'avg_systolic': round(stats['avg_systolic'] or 0, 2),
-                    'avg_diastolic': round(stats['avg_diastolic'] or 0, 2),
-                    'avg_heart_rate': round(stats['avg_heart_rate'] or 0, 2),
-                    'avg_blood_sugar': round(stats['avg_blood_sugar'] or 0, 2)
-                })
-            else:
-                report_data['summary'].update({
-                    'avg_gestational_weeks': round(stats['avg_gestational_weeks'] or 0, 2),
-                    'avg_fetal_heart_rate': round(stats['avg_fetal_heart_rate'] or 0, 2),
-                    'avg_systolic': round(stats['avg_systolic'] or 0, 2),
-                    'avg_diastolic': round(stats['avg_diastolic'] or 0, 2)
-                })
-        
-        conn.close()
+        try:
+            report_data = report_engine.generate(conn, report_type, data_type,
+                                                 date_range.get('start'), date_range.get('end'))
+        except ValueError as e:
+            return jsonify({
+                'code': 400,
+                'message': str(e),
+                'data': None
+            }), 400
+        finally:
+            conn.close()
         
         # 生成建议
         report_data['recommendations'] = generate_recommendations(report_data['summary'], data_type)
@@ -983,93 +1019,73 @@ def generate_analysis_report():
         }), 500
 
 # 辅助函数
-def create_age_distribution(df, data_type):
-    """创建年龄分布"""
+def create_age_distribution(stats):
+    """创建年龄分布（按每条记录的年龄分组）"""
     try:
-        if 'avg_age' in df.columns:
-            age_data = df['avg_age'].dropna()
-            if not age_data.empty:
-                bins = [0, 25, 30, 35, 40, 100]
-                labels = ['<25', '25-30', '30-35', '35-40', '>40']
-                age_groups = pd.cut(age_data, bins=bins, labels=labels, right=False)
-                distribution = age_groups.value_counts().to_dict()
-                return distribution
-        return {}
+        return stats['distributions'].get('age', {})
     except Exception as e:
         print(f"创建年龄分布失败: {e}")
         return {}
 
-def create_pressure_distribution(df):
-    """创建血压分布"""
+def create_pressure_distribution(stats):
+    """创建血压分布（按每条记录的收缩压分组）"""
     try:
-        if 'avg_systolic' in df.columns:
-            systolic_data = df['avg_systolic'].dropna()
-            if not systolic_data.empty:
-                distribution = {}
-                for pressure in systolic_data:
-                    if pressure < 120:
-                        category = '正常'
-                    elif pressure < 140:
-                        category = '偏高'
-                    else:
-                        category = '高血压'
-                    distribution[category] = distribution.get(category, 0) + 1
-                return distribution
-        return {}
+        return stats['distributions'].get('pressure', {})
     except Exception as e:
         print(f"创建血压分布失败: {e}")
         return {}
 
-def create_time_distribution(df):
-    """创建时间分布"""
+def create_time_distribution(stats):
+    """创建时间分布（按每条记录创建时间的时段分组）"""
     try:
-        # 简化实现，返回模拟数据
-        return {'上午': 30, '下午': 35, '晚上': 5}
+        return stats['distributions'].get('time', {})
     except Exception as e:
         print(f"创建时间分布失败: {e}")
         return {}
 
-def create_metrics_comparison(df, data_type):
-    """创建指标对比"""
+def create_metrics_comparison(stats):
+    """创建指标对比：前后两半时间桶的记录数和平均年龄（按记录加权）"""
     try:
-        if len(df) >= 2:
-            first_half = df[:len(df)//2]
-            second_half = df[len(df)//2:]
-            
-            comparison = {
-                'first_half': {
-                    'avg_age': round(first_half['avg_age'].mean(), 2) if 'avg_age' in first_half.columns else 0,
-                    'count': int(first_half['count'].sum()) if 'count' in first_half.columns else 0
-                },
-                'second_half': {
-                    'avg_age': round(second_half['avg_age'].mean(), 2) if 'avg_age' in second_half.columns else 0,
-                    'count': int(second_half['count'].sum()) if 'count' in second_half.columns else 0
+        counts = stats['bucket_count']
+        if len(counts) >= 2:
+            middle = len(counts) // 2
+            n = stats['bucket_n'].get('age')
+            total = stats['bucket_total'].get('age')
+
+            def half(part):
+                ages = int(n[part].sum()) if n is not None else 0
+                return {
+                    'avg_age': round(float(total[part].sum()) / ages, 2) if ages else 0,
+                    'count': int(counts[part].sum())
                 }
+
+            return {
+                'first_half': half(slice(None, middle)),
+                'second_half': half(slice(middle, None))
             }
-            return comparison
         return {}
     except Exception as e:
         print(f"创建指标对比失败: {e}")
         return {}
 
-def create_period_comparison(df, data_type):
-    """创建周期对比"""
+def create_period_comparison(stats):
+    """创建周期对比：最近 7 个时间桶与之前 7 个时间桶"""
     try:
-        if len(df) >= 7:
-            recent_week = df.tail(7)
-            previous_week = df.iloc[-14:-7] if len(df) >= 14 else df.head(len(df)-7)
-            
-            comparison = {
-                'recent_week': {
-                    'total_records': int(recent_week['count'].sum()) if 'count' in recent_week.columns else 0,
-                    'avg_daily': round(recent_week['count'].mean(), 2) if 'count' in recent_week.columns else 0
-                },
-                'previous_week': {
-                    'total_records': int(previous_week['count'].sum()) if 'count' in previous_week.columns else 0,
-                    'avg_daily': round(previous_week['count'].mean(), 2) if 'count' in previous_week.columns else 0
+        counts = stats['bucket_count']
+        if len(counts) >= 7:
+            recent_week = counts[-7:]
+            previous_week = counts[-14:-7] if len(counts) >= 14 else counts[:-7]
+
+            def period(part):
+                return {
+                    'total_records': int(part.sum()),
+                    'avg_daily': round(float(part.mean()), 2) if len(part) else 0
                 }
+
+            return {
+                'recent_week': period(recent_week),
+                'previous_week': period(previous_week)
             }
-            return comparison
         return {}
     except Exception as e:
         print(f"创建周期对比失败: {e}")
@@ -2,13 +2,17 @@ from flask import Flask,request,jsonify,render_template,send_from_directory,redi
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from utils.getAllData import *
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 
 app = Flask(__name__)
 app.secret_key = 'medical_data_analysis_secret_key_2024'  # 设置密钥
 CORS(app)  # 启用CORS支持
 
+# 数据库连接池：请求结束时回收未关闭的连接
+from utils import db_pool
+db_pool.init_app(app)
+
 # 初始化SocketIO
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', 
                    ping_timeout=60, ping_interval=25, 
@@ -62,6 +66,9 @@ app.register_blueprint(analysis_bp)
 # 注册孕产妇专项功能API蓝图
 app.register_blueprint(maternal_risk_bp, name='unique_maternal_risk_bp')
 
+# 注册孕产妇预测记录API蓝图（/api/maternal）
+app.register_blueprint(maternal_bp)
+
 # 注册用户管理API蓝图
 app.register_blueprint(user_bp)
 
@@ -90,6 +97,46 @@ app.register_blueprint(nutrition_bp)
 from ai_chat_service import init_ai_chat_service
 ai_chat_service = init_ai_chat_service(socketio)
 
+# 初始化后台导入任务队列（通过socketio推送导入进度；遗留任务在 start_background_services 中恢复）
+from job_queue import init_job_queue
+import_job_queue = init_job_queue(socketio)
+
+# 后台服务（风险评分、导入任务恢复、分析报告预生成、预测模型定时拟合等）在每个进程第一次处理请求时启动一次，
+# 使 gunicorn / flask run 的工作进程同样运行；导入本模块（flask shell、测试、脚本）不启动任何线程。
+# 设置环境变量 BACKGROUND_SERVICES=0 或 app.testing 时不自动启动。
+import os
+import threading
+app.config.setdefault('BACKGROUND_SERVICES', os.environ.get('BACKGROUND_SERVICES', '1') != '0')
+_background_lock = threading.Lock()
+_background_started = False
+
+
+def start_background_services():
+    """启动本进程的后台服务（重复调用不会重复启动），返回本次是否启动"""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return False
+        _background_started = True
+    from risk_scoring_service import risk_scoring_service
+    risk_scoring_service.start()
+    # 处理遗留的导入任务：心跳超时的执行中任务标记为失败，排队任务重新提交
+    try:
+        import_job_queue.recover()
+    except Exception as e:
+        print(f"恢复导入任务失败: {e}")
+    # 后台预先生成过去各月的分析报告，定时重新拟合预测模型
+    import analysis_api
+    threading.Thread(target=analysis_api.precompute_reports, name='precompute-reports', daemon=True).start()
+    analysis_api.forecast_service.start()
+    return True
+
+
+@app.before_request
+def ensure_background_services():
+    if not _background_started and app.config['BACKGROUND_SERVICES'] and not app.testing:
+        start_background_services()
+
 # 初始化机器学习预测器（从maternal_risk_api导入现有实例）
 from maternal_risk_api import predictor
 # 验证预测器状态
@@ -100,17 +147,44 @@ else:
 
 # SQLite数据库配置
 import sqlite3
+from utils.data_access import get_db, database_path
 import os
+import dashboard_materializer
+import metric_rollups
 
 # 数据库文件路径
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_system.db')
+DB_PATH = database_path('system')
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # 使结果可以按列名访问
+    conn = get_db('system')  # 连接池中的连接，结果可以按列名访问
     return conn
 
+# 首页查询使用的索引 {表名: [列名]}
+HOME_INDEXES = {
+    'maternal_info': ['created_at', 'risk_level', 'age'],
+    'medical_data': ['created_at', 'age']
+}
+
+# 首页最新记录表格的列（旧版本表结构中不存在的列返回空值）
+HOME_CASE_COLUMNS = ['id', 'name', 'age', 'gestational_weeks', 'risk_level', 'pregnancy_type', 'weight',
+                     'height', 'blood_pressure', 'heart_rate', 'blood_sugar', 'last_menstrual_date', 'due_date',
+                     'created_at']
+
+
+def table_columns(cursor, table):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+
+def ensure_home_indexes(cursor):
+    """创建首页统计使用的索引（只为存在的列创建，兼容不同版本的表结构）"""
+    for table, columns in HOME_INDEXES.items():
+        existing = table_columns(cursor, table)
+        for column in columns:
+            if column in existing:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+
+
 def init_database():
     """初始化数据库"""
     conn = get_db_connection()
@@ -243,7 +317,12 @@ def init_database():
     )
     ''')
     
+    ensure_home_indexes(cursor)
+    
     conn.commit()
+    # 仪表盘计数触发器与分析指标汇总触发器（定义未变化时不做修改）
+    dashboard_materializer.install(conn)
+    metric_rollups.install(conn)
     conn.close()
     print("数据库初始化完成")
 
@@ -267,29 +346,40 @@ def index():
     """系统主页面 - 重定向到医院管理页面"""
     return redirect('/hospital_management')
 
+def day_range(day=None):
+    """
+    某一天的 [开始, 结束) 文本区间
+    created_at >= 开始 AND created_at < 结束 与 DATE(created_at) = 当天 等价，但可以使用 created_at 索引
+    """
+    day = day or datetime.now().date()
+    return day.strftime('%Y-%m-%d'), (day + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
 @app.route('/getHomeData',methods=['GET','POST'])
 def getHomeData():
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        today_start, tomorrow_start = day_range()
         
         # 检查表是否存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='maternal_info'")
-        table_exists = cursor.fetchone()
+        maternal_columns = table_columns(cursor, 'maternal_info')
         
-        if not table_exists:
+        if not maternal_columns:
             # 如果表不存在，使用medical_data表作为备选
-            cursor.execute("SELECT COUNT(*) as count FROM medical_data")
-            total_patients = cursor.fetchone()['count']
-            
-            today = datetime.now().strftime('%Y-%m-%d')
-            cursor.execute("SELECT COUNT(*) as count FROM medical_data WHERE DATE(created_at) = ?", (today,))
-            new_patients = cursor.fetchone()['count']
-            
-            cursor.execute("SELECT MAX(age) as max_age, MIN(age) as min_age FROM medical_data WHERE age IS NOT NULL")
-            age_stats = cursor.fetchone()
-            max_age = age_stats['max_age'] if age_stats['max_age'] else 0
-            min_age = age_stats['min_age'] if age_stats['min_age'] else 0
+            # 总数、今日新增和年龄极值合并为一次查询
+            cursor.execute("""
+                SELECT COUNT(*) as count,
+                       (SELECT COUNT(*) FROM medical_data WHERE created_at >= ? AND created_at < ?) as today_count,
+                       (SELECT MAX(age) FROM medical_data) as max_age,
+                       (SELECT MIN(age) FROM medical_data WHERE age IS NOT NULL) as min_age
+                FROM medical_data
+            """, (today_start, tomorrow_start))
+            stats = cursor.fetchone()
+            total_patients = stats['count']
+            new_patients = stats['today_count']
+            max_age = stats['max_age'] if stats['max_age'] else 0
+            min_age = stats['min_age'] if stats['min_age'] else 0
             
             cursor.execute("""
                 SELECT name, age, 'N/A' as gestational_weeks, '未知' as risk_level, height, weight, 
@@ -328,92 +418,66 @@ def getHomeData():
             })
         
         # 使用maternal_info表获取数据
-        # 获取总孕产妇数
-        cursor.execute("SELECT COUNT(*) as count FROM maternal_info")
-        total_patients = cursor.fetchone()[0]
+        def column(name):
+            return name if name in maternal_columns else "NULL"
         
-        # 获取今日新增孕产妇数
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) as count FROM maternal_info WHERE DATE(created_at) = ?", (today,))
-        new_patients = cursor.fetchone()[0]
-        
-        # 获取年龄统计
-        cursor.execute("SELECT MAX(age) as max_age, MIN(age) as min_age FROM maternal_info WHERE age IS NOT NULL")
-        age_stats = cursor.fetchone()
-        max_age = age_stats[0] if age_stats[0] else 0
-        min_age = age_stats[1] if age_stats[1] else 0
-        
-        # 获取风险等级分布
-        cursor.execute("""
-            SELECT risk_level as name, COUNT(*) as value 
+        # 查询一：按风险等级分组计数（走 risk_level 索引），总数为各组之和；
+        # 今日新增（created_at 区间，走索引）和年龄极值（走 age 索引）作为不相关子查询只计算一次
+        risk_column = column('risk_level')
+        cursor.execute(f"""
+            SELECT {risk_column} as name, COUNT(*) as value,
+                   (SELECT COUNT(*) FROM maternal_info WHERE created_at >= ? AND created_at < ?) as today_count,
+                   (SELECT MAX(age) FROM maternal_info) as max_age,
+                   (SELECT MIN(age) FROM maternal_info WHERE age IS NOT NULL) as min_age
             FROM maternal_info 
-            WHERE risk_level IS NOT NULL AND risk_level != ''
-            GROUP BY risk_level
-        """)
-        risk_distribution = [dict(row) for row in cursor.fetchall()]
+            GROUP BY {risk_column}
+            ORDER BY {risk_column}
+        """, (today_start, tomorrow_start))
+        risk_rows = cursor.fetchall()
+        total_patients = sum(row['value'] for row in risk_rows)
+        new_patients = risk_rows[0]['today_count'] if risk_rows else 0
+        max_age = risk_rows[0]['max_age'] if risk_rows and risk_rows[0]['max_age'] else 0
+        min_age = risk_rows[0]['min_age'] if risk_rows and risk_rows[0]['min_age'] else 0
         
-        # 获取年龄分布
-        cursor.execute("""
-            SELECT 
-                CASE 
-                    WHEN age < 20 THEN '20岁以下'
-                    WHEN age < 30 THEN '20-29岁'
-                    WHEN age < 35 THEN '30-34岁'
-                    WHEN age < 40 THEN '35-39岁'
-                    ELSE '40岁以上'
-                END as age_group,
-                COUNT(*) as value
-            FROM maternal_info 
-            WHERE age IS NOT NULL
-            GROUP BY age_group
-            ORDER BY age_group
-        """)
-        age_distribution = [dict(row) for row in cursor.fetchall()]
+        # 风险等级分布
+        risk_distribution = [{'name': row['name'], 'value': row['value']} for row in risk_rows
+                             if row['name'] is not None and row['name'] != '']
         
-        # 获取最新孕产妇数据（用于表格显示）- 完整信息
-        cursor.execute("""
-            SELECT 
-                id, 
-                name, 
-                age, 
-                gestational_weeks, 
-                risk_level,
-                pregnancy_type,
-                weight,
-                height,
-                systolic_pressure || '/' || diastolic_pressure as blood_pressure,
-                heart_rate,
-                blood_sugar,
-                last_menstrual_date,
-                due_date,
-                created_at
-            FROM maternal_info 
-            ORDER BY created_at DESC 
-            LIMIT 10
+        # 查询二：最新孕产妇数据（用于表格显示）和最新的体重、血压数据（用于图表）合并为一次查询，
+        # 两部分都沿 created_at 索引倒序读取，不需要排序整表
+        def case_column(name):
+            if name == 'blood_pressure':
+                return f"{column('systolic_pressure')} || '/' || {column('diastolic_pressure')} as blood_pressure"
+            return f"{column(name)} as {name}"
+        case_columns = ', '.join(case_column(name) for name in HOME_CASE_COLUMNS)
+        body_filter = ' AND '.join(f"{column(name)} IS NOT NULL" for name in ('weight', 'systolic_pressure'))
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT 'case' as kind, {case_columns}, {column('systolic_pressure')} as systolic
+                FROM maternal_info 
+                ORDER BY created_at DESC 
+                LIMIT 10
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'body' as kind, {case_columns}, {column('systolic_pressure')} as systolic
+                FROM maternal_info 
+                WHERE {body_filter}
+                ORDER BY created_at DESC 
+                LIMIT 10
+            )
         """)
-        columns = [desc[0] for desc in cursor.description]
         casesData = []
+        xData = []
+        y1Data = []
+        y2Data = []
         for row in cursor.fetchall():
-            casesData.append(dict(zip(columns, row)))
-        
-        # 获取体重和血压数据用于图表
-        cursor.execute("""
-            SELECT name as xData, weight as y1Data, 
-                   systolic_pressure as y2Data
-            FROM maternal_info 
-            WHERE weight IS NOT NULL AND systolic_pressure IS NOT NULL 
-            ORDER BY created_at DESC 
-            LIMIT 10
-        """)
-        body_data = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        body_data_list = []
-        for row in body_data:
-            body_data_list.append(dict(zip(columns, row)))
-        
-        xData = [row['xData'] for row in body_data_list]
-        y1Data = [row['y1Data'] for row in body_data_list]
-        y2Data = [row['y2Data'] for row in body_data_list]
+            if row['kind'] == 'case':
+                casesData.append({name: row[name] for name in HOME_CASE_COLUMNS})
+            else:
+                xData.append(row['name'])
+                y1Data.append(row['weight'])
+                y2Data.append(row['systolic'])
         
         conn.close()
         
@@ -483,62 +547,25 @@ def getMaternalHealthData():
     try:
         maternalData = getMaternalCasesData()
         
-        # 导入风险预测器
-        from maternal_risk_predictor import MaternalRiskPredictor
-        predictor = MaternalRiskPredictor()
+        # 读取后台预计算的风险评分（只读取本次返回的记录）
+        from risk_scoring_service import load_risk_predictions, score_records, to_risk_prediction
+        conn = get_db_connection()
+        try:
+            stored_predictions = load_risk_predictions(conn, [case['id'] for case in maternalData if case.get('id')])
+            # 尚未评分的记录（新增后后台线程还未处理）在这里评分并保存，之后的请求直接读取
+            pending = [case['id'] for case in maternalData if case.get('id') and case['id'] not in stored_predictions]
+            if pending:
+                try:
+                    stored_predictions.update(score_records(conn, pending))
+                except Exception as e:
+                    print(f"临时风险评估出错: {e}")
+        finally:
+            conn.close()
         
-        # 为每个孕产妇记录生成风险评估
         for case in maternalData:
-            try:
-                # 准备预测所需的数据，使用maternal_info表中的实际字段名
-                patient_data = {
-                    'age': case.get('age', 25),  # 从表中直接获取年龄
-                    'systolic_pressure': case.get('systolic_pressure', 120),  # 获取收缩压
-                    'diastolic_pressure': case.get('diastolic_pressure', 80),  # 获取舒张压
-                    'current_gestational_week': case.get('gestational_weeks', 0),  # 使用正确的字段名
-                    'parity': case.get('parity', 0),
-                    'gravidity': case.get('pregnancy_count', 0),  # 使用正确的字段名
-                    'previous_cesarean': '剖宫产' in case.get('notes', '') or '剖腹产' in case.get('notes', ''),  # 从notes中推断
-                    'pregnancy_complications': case.get('notes', '')  # 使用notes字段存储并发症信息
-                }
-                
-                # 执行综合风险评估
-                risk_result = predictor.predict_comprehensive_risk(patient_data)
-                
-                # 更新记录的风险信息
-                if risk_result:
-                    # 正确提取各风险类型的风险分数和信息
-                    case['risk_prediction'] = {
-                        'gestational_diabetes_risk': risk_result.get('gestational_diabetes', {}).get('risk_score', 0) / 100,  # 转换为小数
-                        'preeclampsia_risk': risk_result.get('preeclampsia', {}).get('risk_score', 0) / 100,
-                        'preterm_birth_risk': risk_result.get('preterm_birth', {}).get('risk_score', 0) / 100,
-                        'overall_risk_level': risk_result.get('overall_risk_level', '低风险'),
-                        'risk_factors': [factor.get('name', '') for factor in risk_result.get('top_risk_factors', [])],
-                        'recommendations': risk_result.get('recommendations', [])
-                    }
-                    # 更新risk_level字段以保持向后兼容
-                    case['risk_level'] = risk_result.get('overall_risk_level', '低风险')
-                else:
-                    # 如果预测失败，使用基于规则的简单风险评估
-                    case['risk_prediction'] = {
-                        'gestational_diabetes_risk': 0.05,
-                        'preeclampsia_risk': 0.05,
-                        'preterm_birth_risk': 0.05,
-                        'overall_risk_level': '低风险',
-                        'risk_factors': [],
-                        'recommendations': []
-                    }
-            except Exception as e:
-                print(f"对孕产妇 {case.get('name', 'Unknown')} 进行风险评估时出错: {e}")
-                # 出错时设置默认值
-                case['risk_prediction'] = {
-                    'gestational_diabetes_risk': 0.05,
-                    'preeclampsia_risk': 0.05,
-                    'preterm_birth_risk': 0.05,
-                    'overall_risk_level': '低风险',
-                    'risk_factors': [],
-                    'recommendations': []
-                }
+            case['risk_prediction'] = stored_predictions.get(case.get('id')) or to_risk_prediction(None)
+            # 更新risk_level字段以保持向后兼容
+            case['risk_level'] = case['risk_prediction']['overall_risk_level']
         
         # 统计分析
         total_cases = len(maternalData)
@@ -549,29 +576,61 @@ def getMaternalHealthData():
             risk = case.get('risk_level', '未知')
             risk_stats[risk] = risk_stats.get(risk, 0) + 1
         
-        # 孕周分布
-        week_stats = {'早期(<12周)': 0, '中期(12-28周)': 0, '晚期(>28周)': 0}
-        for case in maternalData:
-            week = case.get('gestational_week', 0)
-            if week < 12:
-                week_stats['早期(<12周)'] += 1
-            elif week <= 28:
-                week_stats['中期(12-28周)'] += 1
-            else:
-                week_stats['晚期(>28周)'] += 1
-        
-        # 年龄分布
-        age_stats = {'20-25岁': 0, '26-30岁': 0, '31-35岁': 0, '35岁以上': 0}
-        for case in maternalData:
-            age = case.get('age', 0)
-            if 20 <= age <= 25:
-                age_stats['20-25岁'] += 1
-            elif 26 <= age <= 30:
-                age_stats['26-30岁'] += 1
-            elif 31 <= age <= 35:
-                age_stats['31-35岁'] += 1
-            elif age > 35:
-                age_stats['35岁以上'] += 1
+        # 孕周和年龄分布：优先在列式快照上向量化统计
+        from utils.maternal_snapshot import get_maternal_snapshot
+        snapshot = get_maternal_snapshot()
+        if snapshot is not None and len(snapshot):
+            import numpy as np
+            weeks = np.nan_to_num(snapshot.numeric['gestational_weeks'], nan=0.0)
+            ages = np.nan_to_num(snapshot.numeric['age'], nan=0.0)
+            early = int((weeks < 12).sum())
+            middle = int(((weeks >= 12) & (weeks <= 28)).sum())
+            week_stats = {'早期(<12周)': early, '中期(12-28周)': middle,
+                          '晚期(>28周)': len(snapshot) - early - middle}
+            age_stats = {
+                '20-25岁': int(((ages >= 20) & (ages <= 25)).sum()),
+                '26-30岁': int(((ages >= 26) & (ages <= 30)).sum()),
+                '31-35岁': int(((ages >= 31) & (ages <= 35)).sum()),
+                '35岁以上': int((ages > 35).sum())
+            }
+        else:
+            # 快照关闭时逐行统计。getMaternalCasesData 按列位置映射字段名，孕周和年龄直接读取
+            # maternal_info 的 gestational_weeks / age 列，空值和非数值按 0 计，与快照一致
+            def as_number(value):
+                try:
+                    return float(value) if value is not None else 0.0
+                except (TypeError, ValueError):
+                    return 0.0
+            
+            conn = get_db_connection()
+            try:
+                rows = conn.execute('SELECT gestational_weeks, age FROM maternal_info').fetchall()
+            finally:
+                conn.close()
+            
+            # 孕周分布
+            week_stats = {'早期(<12周)': 0, '中期(12-28周)': 0, '晚期(>28周)': 0}
+            for row in rows:
+                week = as_number(row['gestational_weeks'])
+                if week < 12:
+                    week_stats['早期(<12周)'] += 1
+                elif week <= 28:
+                    week_stats['中期(12-28周)'] += 1
+                else:
+                    week_stats['晚期(>28周)'] += 1
+            
+            # 年龄分布
+            age_stats = {'20-25岁': 0, '26-30岁': 0, '31-35岁': 0, '35岁以上': 0}
+            for row in rows:
+                age = as_number(row['age'])
+                if 20 <= age <= 25:
+                    age_stats['20-25岁'] += 1
+                elif 26 <= age <= 30:
+                    age_stats['26-30岁'] += 1
+                elif 31 <= age <= 35:
+                    age_stats['31-35岁'] += 1
+                elif age > 35:
+                    age_stats['35岁以上'] += 1
         
         return jsonify({
             'message': 'success',
@@ -1040,5 +1099,7 @@ def start_fetal_monitoring():
 if __name__ == '__main__':
     print("医疗数据分析系统启动中...")
     print("请访问: http://localhost:8081")
+    # 启动后台服务（风险评分、分析报告预生成、预测模型拟合等）
+    start_background_services()
     # 使用socketio.run代替app.run，以支持WebSocket连接
     socketio.run(app, debug=True, host='0.0.0.0', port=8081)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据导出性能基准
+比较原实现（fetchall 转字典列表、构造 DataFrame、写临时文件后 send_file）与流式导出的耗时和峰值内存，
+以及 Parquet / Arrow 列式导出的耗时、文件大小和读回耗时。每种方式在独立子进程中运行以单独统计内存。
+
+用法: python benchmark_data_export.py [行数，默认200000]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import resource
+import tempfile
+import multiprocessing
+
+from benchmark_data_list import MEDICAL_SCHEMA
+
+
+def prepare_database(path, count, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.executemany('''
+        INSERT INTO medical_data (name, gender, age, disease_type, systolic_pressure, diastolic_pressure,
+                                  weight, height, symptoms, diagnosis, treatment, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', ((f'患者{i}', rng.choice('男女'), rng.randint(1, 90), rng.choice(('高血压', '糖尿病', '贫血')),
+           rng.randint(95, 165), rng.randint(60, 105), round(rng.uniform(45, 95), 1),
+           round(rng.uniform(150, 185), 1), '头晕', '观察', '随访',
+           f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 08:00:00', '2024-12-31 08:00:00')
+          for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def legacy_export(db_path, format_type):
+    """原 /api/data/export 的处理方式"""
+    import pandas as pd
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    data = [dict(row) for row in conn.execute('SELECT * FROM medical_data ORDER BY created_at DESC')]
+    conn.close()
+    df = pd.DataFrame(data)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{format_type}')
+    if format_type == 'xlsx':
+        df.to_excel(temp_file.name, index=False)
+    else:
+        df.to_csv(temp_file.name, index=False)
+    temp_file.close()
+    # send_file 发送文件的过程不计入
+    size = os.path.getsize(temp_file.name)
+    os.remove(temp_file.name)
+    return size
+
+
+def streaming_export(db_path, format_type):
+    from utils import data_access, export_stream
+
+    data_access.configure(mode='split', files={'data': db_path})
+    rows = export_stream.query_rows('data', 'SELECT * FROM medical_data ORDER BY created_at DESC')
+    response = export_stream.export_response(rows, format_type, 'export')
+    size = sum(len(block) for block in response.response)
+    response.close()
+    return size
+
+
+def read_back(db_path, format_type):
+    """导出文件读回 DataFrame 的耗时"""
+    import pandas as pd
+    from utils import data_access, export_stream
+
+    data_access.configure(mode='split', files={'data': db_path})
+    rows = export_stream.query_rows('data', 'SELECT * FROM medical_data ORDER BY created_at DESC')
+    response = export_stream.export_response(rows, format_type, 'export')
+    with tempfile.NamedTemporaryFile(suffix=f'.{format_type}') as handle:
+        for block in response.response:
+            handle.write(block)
+        handle.flush()
+        readers = {'csv': pd.read_csv, 'xlsx': pd.read_excel, 'parquet': pd.read_parquet,
+                   'arrow': pd.read_feather}
+        start = time.perf_counter()
+        readers[format_type](handle.name)
+        return time.perf_counter() - start
+
+
+MODES = {'legacy': legacy_export, 'streaming': streaming_export, 'read': read_back}
+
+
+def _child(mode, format_type, db_path, queue):
+    start = time.perf_counter()
+    result = MODES[mode](db_path, format_type)
+    elapsed = result if mode == 'read' else time.perf_counter() - start
+    queue.put((result, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def run(mode, format_type, db_path):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child, args=(mode, format_type, db_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'data.db')
+        prepare_database(db_path, count)
+        for format_type in ('csv', 'xlsx', 'parquet', 'arrow'):
+            modes = ('legacy', 'streaming') if format_type in ('csv', 'xlsx') else ('streaming',)
+            for mode in modes:
+                size, elapsed, peak = run(mode, format_type, db_path)
+                print(f"{format_type} {mode}: {count} 行, {size / 1024 / 1024:.1f}MB, {elapsed:.1f}s, "
+                      f"峰值内存 {peak:.0f}MB")
+            print(f"{format_type} 读回: {run('read', format_type, db_path)[1]:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
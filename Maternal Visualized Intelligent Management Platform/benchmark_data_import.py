@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据导入性能基准
+生成合成 CSV，比较原实现（整体读入 DataFrame、iterrows 逐行 execute）与流式导入的耗时和峰值内存。
+目标表安装仪表盘计数触发器和全文索引触发器，与线上状态一致。每种方式在独立子进程中运行以单独统计内存。
+
+用法: python benchmark_data_import.py [行数，默认1000000] [原实现行数，默认100000]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import resource
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+from benchmark_data_list import MEDICAL_SCHEMA
+
+HEADER = ['name', 'gender', 'age', 'disease_type', 'systolic_pressure', 'diastolic_pressure',
+          'weight', 'height', 'symptoms', 'diagnosis', 'treatment']
+DISEASES = ('高血压', '糖尿病', '贫血', '正常', '妊娠期高血压')
+
+
+def write_csv(path, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        handle.write(','.join(HEADER) + '\n')
+        for i in range(count):
+            handle.write(f"患者{i},{rng.choice('男女')},{rng.randint(1, 90)},{rng.choice(DISEASES)},"
+                         f"{rng.randint(95, 165)},{rng.randint(60, 105)},{rng.uniform(45, 95):.1f},"
+                         f"{rng.uniform(150, 185):.1f},头晕,观察,随访\n")
+
+
+def prepare_database(path):
+    import dashboard_materializer
+    from utils import text_search
+
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.commit()
+    dashboard_materializer.install(conn)
+    text_search.ensure_search_index(conn, 'medical_data')
+    conn.close()
+
+
+def legacy_import(csv_path, db_path):
+    """原 /api/data/import 的处理方式（原实现用 read_excel 读取，这里对 CSV 使用 read_csv）"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for index, row in df.iterrows():
+        cursor.execute("""
+            INSERT INTO medical_data (
+                name, gender, age, disease_type, systolic_pressure, diastolic_pressure,
+                weight, height, symptoms, diagnosis, treatment, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (row.get('name'), row.get('gender'), int(row.get('age')), row.get('disease_type'),
+              int(row.get('systolic_pressure')), int(row.get('diastolic_pressure')),
+              float(row.get('weight')), float(row.get('height')), row.get('symptoms'),
+              row.get('diagnosis'), row.get('treatment'), datetime.now(), datetime.now()))
+    conn.commit()
+    conn.close()
+    return len(df)
+
+
+def streaming_import(csv_path, db_path):
+    import data_importer
+
+    conn = sqlite3.connect(db_path)
+    stats = data_importer.run_import(csv_path, 'medical', conn)
+    conn.close()
+    return stats['success']
+
+
+def _child(mode, csv_path, db_path, queue):
+    func = legacy_import if mode == 'legacy' else streaming_import
+    start = time.perf_counter()
+    rows = func(csv_path, db_path)
+    elapsed = time.perf_counter() - start
+    queue.put((rows, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def run(mode, csv_path, db_path):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child, args=(mode, csv_path, db_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    legacy_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for mode, rows in (('legacy', legacy_count), ('streaming', legacy_count), ('streaming_full', count)):
+            csv_path = os.path.join(tmp, f'{rows}.csv')
+            if not os.path.exists(csv_path):
+                write_csv(csv_path, rows)
+            db_path = os.path.join(tmp, f'{mode}.db')
+            prepare_database(db_path)
+            results[mode] = run('legacy' if mode == 'legacy' else 'streaming', csv_path, db_path)
+            conn = sqlite3.connect(db_path)
+            assert conn.execute('SELECT COUNT(*) FROM medical_data').fetchone()[0] == rows
+            conn.close()
+            print(f"{mode}: {results[mode][0]} 行, {results[mode][1]:.1f}s, "
+                  f"{results[mode][0] / results[mode][1]:.0f} 行/秒, 峰值内存 {results[mode][2]:.0f}MB")
+        print(f"{legacy_count} 行加速比: {results['legacy'][1] / results['streaming'][1]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
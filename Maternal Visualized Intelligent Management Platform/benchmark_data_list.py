@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据列表接口分页性能基准
+在合成的 medical_data + maternal_info 上比较原实现（联合子查询 COUNT(*) + ORDER BY ... LIMIT/OFFSET）
+与 /api/data/list 当前实现（页码分页、游标分页）在第一页和深页的耗时
+
+用法: python benchmark_data_list.py [每张表行数，默认500000] [重复次数，默认5]
+"""
+
+import io
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+
+from benchmark_home_data import create_maternal_table, timed
+
+MEDICAL_SCHEMA = '''
+    CREATE TABLE medical_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        gender TEXT,
+        age INTEGER,
+        height REAL,
+        weight REAL,
+        systolic_pressure INTEGER,
+        diastolic_pressure INTEGER,
+        disease_type TEXT,
+        symptoms TEXT,
+        diagnosis TEXT,
+        treatment TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+DISEASES = ('高血压', '糖尿病', '贫血', '正常', None)
+
+
+def create_list_tables(path, count, seed=0):
+    """生成两张各 count 行的表，created_at 以秒为单位，存在跨表的相同时间戳"""
+    create_maternal_table(path, count, seed)
+    rng = random.Random(seed + 1)
+    now = datetime.now().replace(microsecond=0)
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.executemany('''
+        INSERT INTO medical_data (name, gender, age, disease_type, systolic_pressure, diastolic_pressure, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', ((f'患者{i}', rng.choice(('男', '女')), rng.randint(1, 90), rng.choice(DISEASES), rng.randint(95, 165),
+           rng.randint(60, 105), (now - timedelta(seconds=rng.randrange(730 * 86400))).strftime('%Y-%m-%d %H:%M:%S'))
+          for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def legacy_page(conn, union_query, page, size):
+    """原 /api/data/list 的查询方式"""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) as total FROM ({union_query}) as combined_data")
+    total = cursor.fetchone()[0]
+    cursor.execute(f"SELECT * FROM ({union_query}) as combined_data ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                   (size, (page - 1) * size))
+    return total, [dict(row) for row in cursor.fetchall()]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    size = 20
+    deep_page = count // size
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        print(f"生成每张表 {count} 行合成数据...")
+        create_list_tables(path, count)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app
+        import data_management_api
+        from utils import data_access
+        data_access.configure(mode='split', files={'data': path})
+        try:
+            conn = sqlite3.connect(path)
+            union_query = data_management_api.get_union_query()
+            _, legacy_first = timed(lambda: legacy_page(conn, union_query, 1, size), repeat)
+            _, legacy_deep = timed(lambda: legacy_page(conn, union_query, deep_page, size), repeat)
+            conn.close()
+
+            client = app.app.test_client()
+            client.get('/api/data/list', query_string={'size': 1})  # 建索引
+            _, page_first = timed(lambda: client.get('/api/data/list', query_string={
+                'page': 1, 'size': size, 'count': 'none'}).get_json(), repeat)
+            _, page_deep = timed(lambda: client.get('/api/data/list', query_string={
+                'page': deep_page, 'size': size, 'count': 'none'}).get_json(), repeat)
+
+            # 游标分页：先走到深页，再测量继续翻页的耗时
+            response = client.get('/api/data/list', query_string={'page': deep_page - 1, 'size': size,
+                                                                  'count': 'none'}).get_json()
+            token = response['next_cursor']
+            cursor_deep_result, cursor_deep = timed(lambda: client.get('/api/data/list', query_string={
+                'cursor': token, 'size': size, 'count': 'none'}).get_json(), repeat)
+            expected = client.get('/api/data/list', query_string={'page': deep_page, 'size': size,
+                                                                  'count': 'none'}).get_json()
+            _, exact_count = timed(lambda: client.get('/api/data/list', query_string={
+                'size': size, 'count': 'exact'}).get_json(), repeat)
+        finally:
+            data_access.configure()
+
+    print(f"每张表行数: {count}, 每页 {size} 条, 深页为第 {deep_page} 页, 重复 {repeat} 次取中位数")
+    print(f"原实现 第1页: {legacy_first * 1000:.1f}ms, 深页: {legacy_deep * 1000:.1f}ms（均含 COUNT(*)）")
+    print(f"页码分页 第1页: {page_first * 1000:.1f}ms, 深页: {page_deep * 1000:.1f}ms（不统计总数）")
+    print(f"游标分页 深页: {cursor_deep * 1000:.1f}ms（不统计总数）")
+    print(f"精确总数 第1页: {exact_count * 1000:.1f}ms")
+    print(f"游标分页与页码分页结果一致: {cursor_deep_result['data'] == expected['data']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+首页数据接口性能基准
+在合成的 maternal_info 表上比较原实现（7 次查询、DATE(created_at) 过滤、无索引）
+与 /getHomeData 当前实现（2 次合并查询、created_at 区间过滤、索引）的耗时
+
+用法: python benchmark_home_data.py [行数，默认1000000] [重复次数，默认5]
+"""
+
+import io
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import statistics
+import contextlib
+import time
+from datetime import datetime, timedelta
+
+# 合成数据表结构：app.py 与 init_database.py 两个版本表结构的并集
+MATERNAL_SCHEMA = '''
+    CREATE TABLE maternal_info (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        age INTEGER,
+        gestational_weeks INTEGER,
+        pregnancy_count INTEGER,
+        parity INTEGER,
+        pregnancy_type TEXT,
+        weight REAL,
+        height REAL,
+        systolic_pressure INTEGER,
+        diastolic_pressure INTEGER,
+        heart_rate REAL,
+        blood_sugar REAL,
+        last_menstrual_date DATE,
+        due_date DATE,
+        risk_level TEXT,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+RISK_LEVELS = ('低风险', '中风险', '高风险', None, '')
+
+
+def create_maternal_table(path, count, seed=0, today=None):
+    """生成 count 行合成数据，created_at 分布在最近两年（含当天）"""
+    rng = random.Random(seed)
+    now = datetime.combine(today or datetime.now().date(), datetime.min.time()) + timedelta(hours=12)
+    conn = sqlite3.connect(path)
+    conn.execute(MATERNAL_SCHEMA)
+
+    def rows():
+        for i in range(count):
+            created = now - timedelta(seconds=rng.randrange(730 * 86400) if i % 1000 else rng.randrange(43200))
+            weight = None if i % 17 == 0 else round(rng.uniform(45, 95), 1)
+            yield (f'孕妇{i}', rng.randint(18, 45) if i % 50 else None, rng.randint(4, 41), rng.randint(1, 4),
+                   rng.randint(0, 3), rng.choice(('单胎', '双胎')), weight, round(rng.uniform(150, 180), 1),
+                   rng.randint(95, 165), rng.randint(60, 105), rng.randint(60, 110), round(rng.uniform(4, 9), 1),
+                   None, None, rng.choice(RISK_LEVELS), '无', created.strftime('%Y-%m-%d %H:%M:%S'))
+
+    conn.executemany('''
+        INSERT INTO maternal_info (name, age, gestational_weeks, pregnancy_count, parity, pregnancy_type, weight,
+                                   height, systolic_pressure, diastolic_pressure, heart_rate, blood_sugar,
+                                   last_menstrual_date, due_date, risk_level, notes, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows())
+    conn.commit()
+    conn.close()
+
+
+def legacy_home_queries(conn):
+    """原 /getHomeData 孕产妇分支的 7 次查询，返回与接口相同的数据字段"""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) as count FROM maternal_info")
+    total_patients = cursor.fetchone()[0]
+    today = datetime.now().strftime('%Y-%m-%d')
+    cursor.execute("SELECT COUNT(*) as count FROM maternal_info WHERE DATE(created_at) = ?", (today,))
+    new_patients = cursor.fetchone()[0]
+    cursor.execute("SELECT MAX(age) as max_age, MIN(age) as min_age FROM maternal_info WHERE age IS NOT NULL")
+    age_stats = cursor.fetchone()
+    cursor.execute("""
+        SELECT risk_level as name, COUNT(*) as value
+        FROM maternal_info
+        WHERE risk_level IS NOT NULL AND risk_level != ''
+        GROUP BY risk_level
+    """)
+    risk_distribution = [dict(row) for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT CASE WHEN age < 20 THEN '20岁以下' WHEN age < 30 THEN '20-29岁' WHEN age < 35 THEN '30-34岁'
+                    WHEN age < 40 THEN '35-39岁' ELSE '40岁以上' END as age_group, COUNT(*) as value
+        FROM maternal_info WHERE age IS NOT NULL GROUP BY age_group ORDER BY age_group
+    """)
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT id, name, age, gestational_weeks, risk_level, pregnancy_type, weight, height,
+               systolic_pressure || '/' || diastolic_pressure as blood_pressure,
+               heart_rate, blood_sugar, last_menstrual_date, due_date, created_at
+        FROM maternal_info ORDER BY created_at DESC LIMIT 10
+    """)
+    cases = [dict(row) for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT name as xData, weight as y1Data, systolic_pressure as y2Data
+        FROM maternal_info WHERE weight IS NOT NULL AND systolic_pressure IS NOT NULL
+        ORDER BY created_at DESC LIMIT 10
+    """)
+    body = [dict(row) for row in cursor.fetchall()]
+    return {
+        'maxNum': total_patients,
+        'newPatients': new_patients,
+        'maxAge': age_stats[0] or 0,
+        'minAge': age_stats[1] or 0,
+        'pieData': risk_distribution,
+        'casesData': cases,
+        'lastData': {'xData': [row['xData'] for row in body], 'y1Data': [row['y1Data'] for row in body],
+                     'y2Data': [row['y2Data'] for row in body]}
+    }
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'home.db')
+        print(f"生成 {count} 行合成数据...")
+        create_maternal_table(path, count)
+
+        conn = sqlite3.connect(path)
+        legacy, legacy_time = timed(lambda: legacy_home_queries(conn), repeat)
+        conn.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app
+        from utils import data_access
+        data_access.configure(mode='split', files={'system': path})
+        try:
+            conn = sqlite3.connect(path)
+            start = time.perf_counter()
+            app.ensure_home_indexes(conn.cursor())
+            conn.commit()
+            index_time = time.perf_counter() - start
+            conn.close()
+
+            client = app.app.test_client()
+            response, current_time = timed(lambda: client.get('/getHomeData').get_json(), repeat)
+        finally:
+            data_access.configure()
+
+    data = response['data']
+    same = all(data[key] == legacy[key] for key in ('maxNum', 'maxAge', 'minAge', 'pieData', 'lastData'))
+    print(f"行数: {count}, 重复 {repeat} 次取中位数")
+    print(f"原实现（7 次查询，无索引）: {legacy_time * 1000:.1f}ms")
+    print(f"当前实现（2 次查询，含 HTTP 处理）: {current_time * 1000:.1f}ms")
+    print(f"一次性建索引耗时: {index_time:.2f}s")
+    print(f"加速比: {legacy_time / current_time:.1f}x")
+    print(f"统计结果一致: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+模型冷启动性能基准
+分别用 joblib 模型和 .npz 轻量级模型启动新进程，测量"导入预测器 + 加载模型 + 首次预测"的耗时和峰值内存
+
+依赖 Linux /proc 读取峰值内存
+
+用法: python benchmark_model_cold_start.py [模型类型，默认 random_forest] [重复次数，默认5]
+模型类型: random_forest / xgboost / lightgbm / logistic_regression
+"""
+
+import os
+import sys
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import contextlib
+import io
+
+import joblib
+import numpy as np
+
+from benchmark_batch_prediction import make_records, RISK_TYPES
+from lightweight_models import export_model
+
+# 子进程：计时从解释器启动后开始，包含导入和模型加载
+CHILD_SCRIPT = r'''
+import time
+start = time.perf_counter()
+import sys, io, json, contextlib
+sys.path.insert(0, sys.argv[2])
+with contextlib.redirect_stdout(io.StringIO()):
+    from maternal_risk_predictor import MaternalRiskPredictor
+    predictor = MaternalRiskPredictor(models_dir=sys.argv[1])
+    ready = time.perf_counter() - start
+    result = predictor.predict_comprehensive_risk({'age': 36, 'bmi': 29, 'blood_sugar': 7.1,
+                                                    'systolic_pressure': 150, 'diastolic_pressure': 95,
+                                                    'gestational_weeks': 30})
+first = time.perf_counter() - start
+# ru_maxrss 在 Linux 上会继承父进程的峰值，改读进程自身的 VmHWM
+with open('/proc/self/status') as f:
+    max_rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM'))
+print(json.dumps({
+    'ready': ready,
+    'first_prediction': first,
+    'max_rss_mb': max_rss_kb / 1024,
+    'ml': [predictor.is_ml_available(t) for t in ('preeclampsia', 'gestational_diabetes', 'preterm_birth')]
+}))
+'''
+
+
+def build_model(model_type):
+    if model_type == 'xgboost':
+        from xgboost import XGBClassifier
+        return XGBClassifier(n_estimators=200, max_depth=6, verbosity=0)
+    if model_type == 'lightgbm':
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(n_estimators=200, verbose=-1)
+    if model_type == 'logistic_regression':
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(max_iter=2000)
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42, n_jobs=1)
+
+
+def prepare_models(model_type, joblib_dir, npz_dir):
+    """在合成数据上训练模型，分别保存为 joblib 和 .npz 两个目录"""
+    from maternal_risk_predictor import MaternalRiskPredictor
+
+    records = make_records(5000)
+    predictor = MaternalRiskPredictor(models_dir=joblib_dir)
+    for risk_type in RISK_TYPES:
+        X = predictor._build_feature_matrix(records, risk_type)
+        score = X.sum(axis=1)
+        y = (score > np.median(score)).astype(int)
+        model = build_model(model_type).fit(X, y)
+
+        joblib.dump(model, os.path.join(joblib_dir, f'{risk_type}_model.joblib'))
+        export_model(model, os.path.join(npz_dir, f'{risk_type}_model.npz'), X_check=X)
+        for models_dir in (joblib_dir, npz_dir):
+            with open(os.path.join(models_dir, f'{risk_type}_model_info.json'), 'w', encoding='utf-8') as f:
+                json.dump({'model_type': model_type}, f)
+
+
+def measure(models_dir, repeat):
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, models_dir, project_dir],
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    assert all(all(run['ml']) for run in runs), "模型未被加载"
+    return {key: statistics.median(run[key] for run in runs)
+            for key in ('ready', 'first_prediction', 'max_rss_mb')}
+
+
+def file_size_kb(models_dir, suffix):
+    return sum(os.path.getsize(os.path.join(models_dir, name))
+               for name in os.listdir(models_dir) if name.endswith(suffix)) / 1024
+
+
+def main():
+    model_type = sys.argv[1] if len(sys.argv) > 1 else 'random_forest'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    tmp = tempfile.mkdtemp()
+    try:
+        joblib_dir = os.path.join(tmp, 'joblib')
+        npz_dir = os.path.join(tmp, 'npz')
+        os.makedirs(joblib_dir)
+        os.makedirs(npz_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            prepare_models(model_type, joblib_dir, npz_dir)
+
+        print(f"模型类型: {model_type}, 重复次数: {repeat}（取中位数）")
+        for label, models_dir, suffix in (('joblib', joblib_dir, '.joblib'), ('npz', npz_dir, '.npz')):
+            result = measure(models_dir, repeat)
+            print(f"{label:>6}: 就绪 {result['ready'] * 1000:.0f}ms, 首次预测完成 {result['first_prediction'] * 1000:.0f}ms, "
+                  f"峰值内存 {result['max_rss_mb']:.1f}MB, 模型文件 {file_size_kb(models_dir, suffix):.0f}KB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+应用启动导入耗时基准
+在新进程中以 python -X importtime 导入 Flask 应用，统计总导入耗时、耗时最多的模块，
+并检查启动阶段是否加载了只应在首次请求时才导入的重量级依赖（对应 gunicorn worker 的启动时间）
+
+用法: python benchmark_startup_import.py [模块名，默认 app] [重复次数，默认5] [显示的模块数，默认15]
+"""
+
+import os
+import sys
+import statistics
+import subprocess
+
+# 启动阶段不应加载的重量级依赖（由各路由在首次调用时导入）
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'matplotlib', 'seaborn', 'plotly',
+                 'reportlab', 'pdfkit', 'openai', 'joblib', 'xgboost', 'lightgbm')
+
+
+def run_importtime(module):
+    """在子进程中导入模块，返回 {模块名: (自身耗时µs, 累计耗时µs)}"""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=project_dir, capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings.setdefault(name.strip(), (int(self_us), int(cumulative_us)))
+    return timings
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else 'app'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    top = int(sys.argv[3]) if len(sys.argv) > 3 else 15
+
+    runs = [run_importtime(module) for _ in range(repeat)]
+    totals = [run[module][1] for run in runs]
+    last = runs[-1]
+
+    print(f"模块: {module}, 重复次数: {repeat}")
+    print(f"导入总耗时: 中位数 {statistics.median(totals) / 1000:.0f}ms, "
+          f"最小 {min(totals) / 1000:.0f}ms, 最大 {max(totals) / 1000:.0f}ms")
+    print(f"导入模块数: {len(last)}")
+
+    print(f"\n累计耗时最多的顶层包（前{top}个）:")
+    packages = {}
+    for name, (_, cumulative_us) in last.items():
+        package = name.split('.')[0]
+        if package != module:
+            packages[package] = max(packages.get(package, 0), cumulative_us)
+    for package, cumulative_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {package}")
+
+    loaded = [name for name in HEAVY_MODULES if name in last]
+    print(f"\n启动时加载的重量级依赖: {', '.join(loaded) if loaded else '无'}")
+
+
+if __name__ == '__main__':
+    main()
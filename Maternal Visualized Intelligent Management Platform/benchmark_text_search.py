@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+关键字检索性能基准
+在合成的 medical_data 表上比较前导通配符 LIKE（全表扫描）与 FTS5 trigram 索引
+在列表接口典型查询（统计总数 + 按 created_at 取第一页）上的耗时，并给出建索引和写入的额外开销
+
+用法: python benchmark_text_search.py [行数，默认1000000] [重复次数，默认5]
+"""
+
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmark_data_list import MEDICAL_SCHEMA
+from benchmark_home_data import timed
+from utils import text_search
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤'
+GIVEN = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英文华建国玉兰红梅海燕春梅志强晓东婷雪琳欣怡子涵梓萱'
+DISEASES = ('高血压', '糖尿病', '贫血', '妊娠期高血压', '妊娠期糖尿病', '甲状腺功能减退', '正常', None)
+
+# 检索的关键字：完整姓名（命中少）、常见疾病（命中多）、不存在的关键字
+KEYWORDS = ('王秀英', '糖尿病', '不存在的')
+
+
+def random_name(rng):
+    return rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2))))
+
+
+def create_medical_table(path, count, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.executemany('INSERT INTO medical_data (name, gender, age, disease_type, created_at) VALUES (?, ?, ?, ?, ?)',
+                     ((random_name(rng), rng.choice(('男', '女')), rng.randint(1, 90), rng.choice(DISEASES),
+                       (now - timedelta(seconds=rng.randrange(730 * 86400))).strftime('%Y-%m-%d %H:%M:%S'))
+                      for _ in range(count)))
+    conn.execute('CREATE INDEX idx_medical_data_created_at ON medical_data (created_at)')
+    conn.commit()
+    conn.close()
+
+
+def list_query(conn, condition, params):
+    """列表接口的典型查询：总数 + 第一页"""
+    total = conn.execute(f'SELECT COUNT(*) FROM medical_data WHERE {condition}', params).fetchone()[0]
+    rows = conn.execute(f'SELECT id, name, disease_type FROM medical_data WHERE {condition} '
+                        f'ORDER BY created_at DESC LIMIT 20', params).fetchall()
+    return total, rows
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'search.db')
+        print(f"生成 {count} 行合成数据...")
+        create_medical_table(path, count)
+        conn = sqlite3.connect(path)
+
+        start = time.perf_counter()
+        assert text_search.ensure_search_index(conn, 'medical_data')
+        build_time = time.perf_counter() - start
+
+        print(f"行数: {count}, 重复 {repeat} 次取中位数")
+        print(f"建立 FTS5 索引耗时: {build_time:.2f}s")
+        for keyword in KEYWORDS:
+            like = ("(name LIKE ? OR disease_type LIKE ?)", [f'%{keyword}%'] * 2)
+            fts = text_search.keyword_condition(conn, 'medical_data', keyword)
+            like_result, like_time = timed(lambda: list_query(conn, *like), repeat)
+            fts_result, fts_time = timed(lambda: list_query(conn, *fts), repeat)
+            print(f"关键字 {keyword}: 命中 {like_result[0]} 行, LIKE {like_time * 1000:.1f}ms, "
+                  f"FTS5 {fts_time * 1000:.1f}ms, 加速比 {like_time / fts_time:.1f}x, "
+                  f"结果一致: {like_result == fts_result}")
+
+        # 触发器维护索引带来的写入开销
+        rows = [(f'新患者{i}', '女', 30, '高血压', '2024-01-01 00:00:00') for i in range(10000)]
+        insert = 'INSERT INTO medical_data (name, gender, age, disease_type, created_at) VALUES (?, ?, ?, ?, ?)'
+        start = time.perf_counter()
+        conn.executemany(insert, rows)
+        conn.commit()
+        with_index = time.perf_counter() - start
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER medical_data_fts_{event}')
+        start = time.perf_counter()
+        conn.executemany(insert, rows)
+        conn.commit()
+        without_index = time.perf_counter() - start
+        print(f"写入 10000 行: 有索引 {with_index * 1000:.0f}ms, 无索引 {without_index * 1000:.0f}ms")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pytest 配置：测试进程中不自动启动后台服务（风险评分、导入任务恢复等），
+避免后台线程读写真实数据库或干扰各测试使用的临时数据库。
+"""
+
+import os
+
+os.environ.setdefault('BACKGROUND_SERVICES', '0')
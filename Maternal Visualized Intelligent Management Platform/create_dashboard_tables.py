@@ -1,8 +1,10 @@
 import sqlite3
 import os
 
-# 数据库路径
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+from utils.data_access import database_path
+
+# 数据库路径（由数据访问层按路由模式解析）
+DB_PATH = database_path('data')
 
 def create_dashboard_tables():
     """创建仪表盘相关的表"""
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+仪表盘增量物化
+在 medical_data / maternal_info 上安装 SQLite 触发器，插入、更新、删除记录时同步维护
+dashboard_counters 计数表（总数、按日、按月、疾病类型、性别、孕期阶段、风险等级）。
+触发器在数据库层生效，任何进程、任何接口（包括批量导入脚本）写入都会更新计数，
+仪表盘接口读取计数表（每个维度只有几十行）即可得到最新的统计结果，不再需要全表重算或定时任务。
+
+首次安装或触发器定义变化时按 GROUP BY 重建一次计数；之后只做增量更新。
+"""
+
+import hashlib
+import calendar
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+
+COUNTER_TABLE = 'dashboard_counters'
+
+# 记录已安装触发器定义的维度名（签名不一致时重新安装并重建计数）
+INSTALLED_DIMENSION = '__installed__'
+
+# 各表的计数维度：{维度: (取值表达式, 依赖的列)}，表达式中的 {row} 替换为 NEW / OLD / 表名
+DIMENSIONS = {
+    'medical_data': {
+        'total': ("''", ()),
+        'day': ("COALESCE(substr({row}.created_at, 1, 10), '未知')", ('created_at',)),
+        'month': ("COALESCE(substr({row}.created_at, 1, 7), '未知')", ('created_at',)),
+        'disease_type': ("COALESCE({row}.disease_type, '未知')", ('disease_type',)),
+        'gender': ("COALESCE({row}.gender, '未知')", ('gender',))
+    },
+    'maternal_info': {
+        'total': ("''", ()),
+        'day': ("COALESCE(substr({row}.created_at, 1, 10), '未知')", ('created_at',)),
+        'month': ("COALESCE(substr({row}.created_at, 1, 7), '未知')", ('created_at',)),
+        'stage': ("CASE WHEN COALESCE({row}.gestational_weeks, 0) < 12 THEN '早期' "
+                  "WHEN {row}.gestational_weeks <= 28 THEN '中期' ELSE '晚期' END", ('gestational_weeks',)),
+        'risk_level': ("COALESCE(NULLIF({row}.risk_level, ''), '未知')", ('risk_level',))
+    }
+}
+
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+# 医疗数据表没有科室列，科室分布按总数模拟（与原 update_dashboard_data.py 一致）
+SIMULATED_DEPARTMENTS = [('妇产科', 4), ('内科', 5), ('外科', 6), ('儿科', 7), ('急诊科', 8)]
+
+
+def _table_columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _dimensions(conn, table: str) -> Dict[str, str]:
+    """表中实际存在的维度（缺少依赖列的维度跳过，兼容不同版本的表结构）"""
+    columns = set(_table_columns(conn, table))
+    if not columns:
+        return {}
+    return {name: expression for name, (expression, needed) in DIMENSIONS[table].items()
+            if all(column in columns for column in needed)}
+
+
+def _trigger_sql(table: str, dimensions: Dict[str, str]) -> List[str]:
+    """插入 +1、删除 -1、更新时旧值 -1 新值 +1"""
+    def upserts(row, delta):
+        return ''.join(
+            f"INSERT INTO {COUNTER_TABLE} (source, dimension, key, value) "
+            f"VALUES ('{table}', '{name}', {expression.format(row=row)}, {delta}) "
+            f"ON CONFLICT (source, dimension, key) DO UPDATE SET value = value + excluded.value;\n"
+            for name, expression in dimensions.items()
+        )
+
+    watched = sorted({column for name in dimensions for column in DIMENSIONS[table][name][1]})
+    update_of = f" OF {', '.join(watched)}" if watched else ''
+    return [
+        f"CREATE TRIGGER {table}_dashboard_insert AFTER INSERT ON {table} BEGIN\n"
+        f"{upserts('NEW', 1)}END",
+        f"CREATE TRIGGER {table}_dashboard_delete AFTER DELETE ON {table} BEGIN\n"
+        f"{upserts('OLD', -1)}END",
+        f"CREATE TRIGGER {table}_dashboard_update AFTER UPDATE{update_of} ON {table} BEGIN\n"
+        f"{upserts('OLD', -1)}{upserts('NEW', 1)}END"
+    ]
+
+
+def ensure_counter_table(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {COUNTER_TABLE} (
+            source TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, dimension, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def rebuild(conn, table: str):
+    """按 GROUP BY 重新计算一张表的全部计数（安装时或计数被手工修改后调用）"""
+    conn.execute(f'DELETE FROM {COUNTER_TABLE} WHERE source = ? AND dimension != ?', (table, INSTALLED_DIMENSION))
+    for name, expression in _dimensions(conn, table).items():
+        key = expression.format(row=table)
+        conn.execute(f'''
+            INSERT INTO {COUNTER_TABLE} (source, dimension, key, value)
+            SELECT '{table}', '{name}', {key}, COUNT(*) FROM {table} GROUP BY {key}
+        ''')
+
+
+def install(conn) -> List[str]:
+    """
+    在 conn 对应的数据库上安装计数表和触发器（可重复调用）
+
+    触发器定义未变化时不做任何修改；首次安装或表结构变化导致定义变化时，
+    在同一事务中重建触发器和计数，保证计数与表数据一致。
+
+    Returns:
+        list: 本次（重新）安装的表
+    """
+    ensure_counter_table(conn)
+    conn.commit()
+    installed = []
+    for table in DIMENSIONS:
+        dimensions = _dimensions(conn, table)
+        if not dimensions:
+            continue
+        statements = _trigger_sql(table, dimensions)
+        signature = hashlib.sha1('\n'.join(statements).encode('utf-8')).hexdigest()
+        current = conn.execute(
+            f'SELECT key FROM {COUNTER_TABLE} WHERE source = ? AND dimension = ?', (table, INSTALLED_DIMENSION)
+        ).fetchone()
+        if current is not None and current[0] == signature:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for event in ('insert', 'delete', 'update'):
+                conn.execute(f'DROP TRIGGER IF EXISTS {table}_dashboard_{event}')
+            for statement in statements:
+                conn.execute(statement)
+            rebuild(conn, table)
+            conn.execute(f'DELETE FROM {COUNTER_TABLE} WHERE source = ? AND dimension = ?',
+                         (table, INSTALLED_DIMENSION))
+            conn.execute(f'INSERT INTO {COUNTER_TABLE} (source, dimension, key, value) VALUES (?, ?, ?, 0)',
+                         (table, INSTALLED_DIMENSION, signature))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        installed.append(table)
+    return installed
+
+
+_installed_paths = set()
+
+
+def ensure_installed(conn):
+    """读取计数前确认计数表已安装（每个数据库文件只检查一次），split 模式下业务库同样可用"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    if path in _installed_paths:
+        return
+    install(conn)
+    _installed_paths.add(path)
+
+
+def uninstall(conn):
+    """删除触发器和计数表（大批量导入前可先卸载，导入后重新 install 一次性重建）"""
+    for table in DIMENSIONS:
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {table}_dashboard_{event}')
+    conn.execute(f'DROP TABLE IF EXISTS {COUNTER_TABLE}')
+    conn.commit()
+    _installed_paths.clear()
+
+
+def read_counters(conn, source: str) -> Optional[Dict[str, Dict[str, int]]]:
+    """读取一张表的计数 {维度: {取值: 数量}}，未安装时返回 None"""
+    try:
+        rows = conn.execute(f'SELECT dimension, key, value FROM {COUNTER_TABLE} WHERE source = ?',
+                            (source,)).fetchall()
+    except Exception:
+        return None
+    counters = {}
+    for dimension, key, value in rows:
+        counters.setdefault(dimension, {})[key] = value
+    if INSTALLED_DIMENSION not in counters:
+        return None
+    counters.pop(INSTALLED_DIMENSION)
+    counters.setdefault('total', {})
+    return counters
+
+
+def _distribution(counts: Dict[str, int], limit: int = None) -> List[Dict[str, Any]]:
+    """按数量倒序（数量相同按名称）的 [{'name', 'value'}]，计数为 0 的取值（已全部删除）不返回"""
+    items = sorted(((key, value) for key, value in counts.items() if value > 0),
+                   key=lambda item: (-item[1], item[0]))
+    return [{'name': key, 'value': value} for key, value in items[:limit]]
+
+
+def _recent_months(today, count: int) -> List[str]:
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return list(reversed(months))
+
+
+def build_medical_snapshot(conn, today=None) -> Optional[Dict[str, Any]]:
+    """医疗数据仪表盘（字段与 dashboard_medical 表一致），未安装计数时返回 None"""
+    counters = read_counters(conn, 'medical_data')
+    if counters is None:
+        return None
+    today = today or datetime.now().date()
+    total = counters['total'].get('', 0)
+    today_count = counters.get('day', {}).get(today.strftime('%Y-%m-%d'), 0)
+
+    department_distribution = [{'name': name, 'value': total // divisor} for name, divisor in SIMULATED_DEPARTMENTS]
+    department_details = []
+    for dept in department_distribution:
+        department_details.append({
+            'name': dept['name'],
+            'todayPatients': today_count // len(department_distribution) + 1,
+            'weekPatients': dept['value'] // 4,
+            'monthPatients': dept['value'],
+            'doctorCount': 3 + (sum(map(ord, dept['name'])) % 5),
+            'bedCount': 10 + (sum(map(ord, dept['name'])) % 15),
+            'occupancyRate': 60 + (sum(map(ord, dept['name'])) % 30),
+            'avgWaitTime': str(15 + (sum(map(ord, dept['name'])) % 25)) + '分钟'
+        })
+
+    months = counters.get('month', {})
+    return {
+        'total': total,
+        'today': today_count,
+        'disease_distribution': _distribution(counters.get('disease_type', {}), 10),
+        'department_distribution': department_distribution,
+        'monthly_trend': [{'name': month, 'value': months.get(month, 0)} for month in _recent_months(today, 6)],
+        'department_details': department_details
+    }
+
+
+def build_overview_snapshot(conn, today=None) -> Optional[Dict[str, Any]]:
+    """概览仪表盘（字段与 dashboard_overview 表一致），未安装计数时返回 None"""
+    counters = read_counters(conn, 'medical_data')
+    if counters is None:
+        return None
+    today = today or datetime.now().date()
+    now = datetime.now()
+    total_patients = counters['total'].get('', 0)
+    days = counters.get('day', {})
+
+    daily_cases = []
+    for offset in range(6, -1, -1):
+        day = today - timedelta(days=offset)
+        daily_cases.append({'name': WEEKDAY_NAMES[day.weekday()], 'value': days.get(day.strftime('%Y-%m-%d'), 0)})
+
+    return {
+        'total_patients': total_patients,
+        'today_new_cases': days.get(today.strftime('%Y-%m-%d'), 0),
+        # 没有独立的患者表，以女性患者数作为孕产妇数（与原 update_dashboard_data.py 一致）
+        'total_maternal': counters.get('gender', {}).get('女', 0),
+        'alert_count': 5,
+        'trends': {'daily_cases': daily_cases},
+        'statistics': {
+            'risk_level_distribution': [
+                {'name': '低风险', 'value': total_patients // 3},
+                {'name': '中风险', 'value': total_patients // 3},
+                {'name': '高风险', 'value': total_patients // 3}
+            ]
+        },
+        'recent_alerts': [{
+            'time': (now - timedelta(hours=i)).strftime('%H:%M'),
+            'department': '妇产科',
+            'patientCount': 10 + i,
+            'avgWaitTime': f'{20 + i}分钟',
+            'status': '正常'
+        } for i in range(5)]
+    }
+
+
+def build_maternal_snapshot(conn, today=None) -> Optional[Dict[str, Any]]:
+    """孕产妇仪表盘的计数部分（总数、今日新增、孕期阶段和风险等级分布），未安装计数时返回 None"""
+    counters = read_counters(conn, 'maternal_info')
+    if counters is None:
+        return None
+    today = today or datetime.now().date()
+    stages = counters.get('stage', {})
+    return {
+        'total': counters['total'].get('', 0),
+        'today': counters.get('day', {}).get(today.strftime('%Y-%m-%d'), 0),
+        'pregnancy_distribution': [{'name': name, 'value': stages.get(name, 0)}
+                                   for name in ('早期', '中期', '晚期')],
+        'risk_distribution': _distribution(counters['risk_level']) if 'risk_level' in counters else None
+    }
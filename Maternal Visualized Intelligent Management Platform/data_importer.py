@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式数据导入
+按块解析 CSV / XLSX（openpyxl 只读模式逐行读取），每块做向量化校验后分批写入数据库，
+整个文件不会一次性载入内存，百万行文件的内存占用只与块大小有关。
+
+每批数据先用 executemany 写入临时暂存表，再用一条 INSERT ... SELECT 写入目标表：
+目标表上的触发器（仪表盘计数、全文索引）在同一条语句内执行，避免逐行语句带来的额外开销。
+
+后台执行、进度推送和取消由 job_queue 负责。
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 各数据类型的导入规则：目标表、必填列、写入列、数值列
+IMPORT_SPECS = {
+    'medical': {
+        'table': 'medical_data',
+        'required': ['name', 'gender', 'age', 'disease_type'],
+        'columns': ['name', 'gender', 'age', 'disease_type', 'systolic_pressure', 'diastolic_pressure',
+                    'weight', 'height', 'symptoms', 'diagnosis', 'treatment'],
+        'numeric': ['age', 'systolic_pressure', 'diastolic_pressure', 'weight', 'height']
+    },
+    'maternal': {
+        'table': 'maternal_info',
+        'required': ['name', 'age', 'gestational_weeks', 'pregnancy_count', 'parity', 'pregnancy_type'],
+        'columns': ['name', 'age', 'gestational_weeks', 'pregnancy_count', 'parity', 'pregnancy_type',
+                    'weight', 'height', 'systolic_pressure', 'diastolic_pressure', 'notes'],
+        'numeric': ['age', 'gestational_weeks', 'pregnancy_count', 'parity', 'weight', 'height',
+                    'systolic_pressure', 'diastolic_pressure']
+    }
+}
+
+# 每次解析的行数
+DEFAULT_CHUNK_ROWS = 20000
+
+# 每个事务写入的行数
+DEFAULT_BATCH_ROWS = 5000
+
+# 结果中保留的错误明细条数
+MAX_ERROR_DETAILS = 50
+
+
+class ImportFileError(Exception):
+    """导入文件格式错误（缺少必填列、无法解析等），message 可直接返回给前端"""
+
+
+def _detect_encoding(path: str) -> str:
+    """CSV 编码：UTF-8（含 BOM）优先，否则按 Excel 另存为 CSV 常见的 GB18030 读取"""
+    with open(path, 'rb') as handle:
+        head = handle.read(65536)
+    try:
+        head.decode('utf-8-sig')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # 块末尾截断的多字节字符不算编码错误
+        if e.start >= len(head) - 3:
+            return 'utf-8-sig'
+        return 'gb18030'
+
+
+def _iter_csv(path: str, chunk_rows: int):
+    import pandas as pd
+
+    reader = pd.read_csv(path, chunksize=chunk_rows, dtype=str, encoding=_detect_encoding(path),
+                         skipinitialspace=True)
+    for chunk in reader:
+        chunk.columns = [str(column).strip() for column in chunk.columns]
+        yield chunk
+
+
+def _iter_xlsx(path: str, chunk_rows: int):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(column).strip() if column is not None else '' for column in header]
+        chunk = []
+        for row in rows:
+            # 只读模式下表格末尾可能有空行
+            if not any(value is not None and value != '' for value in row):
+                continue
+            # 只读模式下行尾的空单元格不会返回，按表头补齐
+            chunk.append(row[:len(columns)] + (None,) * (len(columns) - len(row)))
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _iter_xls(path: str, chunk_rows: int):
+    # 旧版 .xls 没有流式读取方式，整体读取后分块（该格式最多 65536 行）
+    import pandas as pd
+
+    frame = pd.read_excel(path)
+    frame.columns = [str(column).strip() for column in frame.columns]
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def iter_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator:
+    """按扩展名分块读取文件，每块为一个 DataFrame"""
+    extension = os.path.splitext(path)[1].lower()
+    readers = {'.csv': _iter_csv, '.xlsx': _iter_xlsx, '.xls': _iter_xls}
+    if extension not in readers:
+        raise ImportFileError(f'不支持的文件格式: {extension}')
+    return readers[extension](path, chunk_rows)
+
+
+def count_rows(path: str) -> Optional[int]:
+    """估计数据行数用于显示进度（XLSX 读取表格尺寸，CSV 统计换行数），无法估计时返回 None"""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(path, read_only=True)
+            try:
+                max_row = workbook.active.max_row
+            finally:
+                workbook.close()
+            return max_row - 1 if max_row else None
+        if extension == '.csv':
+            lines = 0
+            with open(path, 'rb') as handle:
+                for block in iter(lambda: handle.read(1 << 20), b''):
+                    lines += block.count(b'\n')
+            return max(lines - 1, 0)
+    except Exception as e:
+        logger.warning(f"估计导入行数失败: {e}")
+    return None
+
+
+def validate_chunk(frame, spec: Dict[str, Any], first_row: int):
+    """
+    向量化校验一块数据
+
+    Args:
+        frame: 当前块
+        spec: IMPORT_SPECS 中的导入规则
+        first_row: 当前块第一行在文件中的行号（表头为第 1 行）
+
+    Returns:
+        tuple: (有效行的值列表, 错误明细列表 [{'row': 行号, 'message': 原因}])
+    """
+    import pandas as pd
+
+    frame = frame.reindex(columns=spec['columns']).reset_index(drop=True)
+    names = frame['name'].astype('string').str.strip()
+    problems = pd.Series('', index=frame.index, dtype=object)
+    problems[names.isna() | (names == '')] = '姓名为空; '
+    for column in spec['numeric']:
+        raw = frame[column]
+        numbers = pd.to_numeric(raw, errors='coerce')
+        # 只有转换失败的单元格需要区分空白和非数值
+        failed = numbers.isna() & raw.notna()
+        if failed.any():
+            bad = failed.copy()
+            bad[failed] = raw[failed].astype('string').str.strip() != ''
+            problems[bad] = problems[bad] + f'{column}不是数值; '
+        frame[column] = numbers
+    frame['name'] = names
+
+    invalid = problems != ''
+    errors = [{'row': first_row + int(index), 'message': problems[index].rstrip('; ')}
+              for index in frame.index[invalid]]
+    valid = frame[~invalid].astype(object)
+    valid = valid.where(valid.notna(), None)
+    return list(valid.itertuples(index=False, name=None)), errors
+
+
+class _StagedWriter:
+    """通过临时暂存表分批写入目标表"""
+
+    def __init__(self, connection, table: str, columns: List[str]):
+        self.connection = connection
+        self.table = table
+        self.columns = columns + ['created_at', 'updated_at']
+        self.staging = f'import_staging_{table}'
+        names = ', '.join(self.columns)
+        connection.execute(f'CREATE TEMP TABLE IF NOT EXISTS {self.staging} ({names})')
+        self.stage_sql = f"INSERT INTO {self.staging} ({names}) VALUES ({', '.join('?' * len(self.columns))})"
+        self.copy_sql = f'INSERT INTO {table} ({names}) SELECT {names} FROM {self.staging} ORDER BY rowid'
+        self.row_sql = f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(self.columns))})"
+
+    def write(self, rows: List[tuple]):
+        """
+        在一个事务中写入一批数据，返回写入失败的行下标（整批失败时逐行重试定位）
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [row + (now, now) for row in rows]
+        try:
+            self.connection.execute(f'DELETE FROM {self.staging}')
+            self.connection.executemany(self.stage_sql, rows)
+            self.connection.execute(self.copy_sql)
+            self.connection.commit()
+            return []
+        except Exception as e:
+            self.connection.rollback()
+            logger.warning(f"批量写入{self.table}失败，逐行重试: {e}")
+        failed = []
+        for index, row in enumerate(rows):
+            try:
+                self.connection.execute(self.row_sql, row)
+            except Exception:
+                failed.append(index)
+        self.connection.commit()
+        return failed
+
+    def close(self):
+        self.connection.execute(f'DROP TABLE IF EXISTS {self.staging}')
+
+
+def run_import(path: str, data_type: str, connection, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               batch_rows: int = DEFAULT_BATCH_ROWS, progress: Callable[[Dict[str, Any]], None] = None,
+               cancelled: Callable[[], bool] = None) -> Dict[str, Any]:
+    """
+    流式导入一个文件
+
+    Args:
+        path: CSV / XLSX / XLS 文件路径
+        data_type: medical 或 maternal
+        connection: 目标数据库连接
+        chunk_rows: 每次解析的行数
+        batch_rows: 每个事务写入的行数
+        progress: 每批写入后回调，参数为当前统计
+        cancelled: 返回 True 时在当前批次结束后停止导入（已提交的批次保留）
+
+    Returns:
+        dict: processed / success / errors 行数、错误明细 error_details、是否被取消 cancelled
+    """
+    if data_type not in IMPORT_SPECS:
+        raise ImportFileError(f'不支持的数据类型: {data_type}')
+    spec = IMPORT_SPECS[data_type]
+    stats = {'processed': 0, 'success': 0, 'errors': 0, 'error_details': [], 'cancelled': False}
+
+    def add_errors(details):
+        stats['errors'] += len(details)
+        room = MAX_ERROR_DETAILS - len(stats['error_details'])
+        stats['error_details'].extend(details[:max(room, 0)])
+
+    writer = None
+    try:
+        for chunk in iter_chunks(path, chunk_rows):
+            if writer is None:
+                missing = [column for column in spec['required'] if column not in chunk.columns]
+                if missing:
+                    raise ImportFileError(f'缺少必填列: {", ".join(missing)}')
+                writer = _StagedWriter(connection, spec['table'], spec['columns'])
+
+            first_row = stats['processed'] + 2
+            rows, errors = validate_chunk(chunk, spec, first_row)
+            add_errors(errors)
+            # 有效行在文件中的行号，用于定位写入失败的行
+            error_rows = {error['row'] for error in errors}
+            row_numbers = [first_row + index for index in range(len(chunk)) if first_row + index not in error_rows]
+            for start in range(0, len(rows), batch_rows):
+                if cancelled is not None and cancelled():
+                    stats['cancelled'] = True
+                    return stats
+                batch = rows[start:start + batch_rows]
+                failed = writer.write(batch)
+                stats['success'] += len(batch) - len(failed)
+                add_errors([{'row': row_numbers[start + index], 'message': '写入数据库失败'} for index in failed])
+                if progress is not None:
+                    progress(dict(stats, processed=stats['processed'] + min(start + batch_rows, len(chunk))))
+            stats['processed'] += len(chunk)
+            if progress is not None:
+                progress(dict(stats))
+        if writer is None:
+            raise ImportFileError('文件中没有数据')
+        return stats
+    finally:
+        if writer is not None:
+            writer.close()
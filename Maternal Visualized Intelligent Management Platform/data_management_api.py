@@ -1,9 +1,15 @@
 from flask import Blueprint, request, jsonify, send_file
-import pandas as pd
 import os
 from datetime import datetime, timedelta
 import sqlite3
+from utils.data_access import get_db, database_path
+from utils.text_search import keyword_condition
+from utils import export_stream
+import dashboard_materializer
+import data_importer
+from job_queue import get_job_queue
 import json
+import base64
 import logging
 from werkzeug.utils import secure_filename
 import tempfile
@@ -16,11 +22,12 @@ logger = logging.getLogger(__name__)
 data_bp = Blueprint('data', __name__, url_prefix='/api/data')
 
 # SQLite数据库配置
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+DB_PATH = database_path('data')
 
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_IMPORT_FILE_SIZE = 512 * 1024 * 1024  # 流式导入不受内存限制，允许百万行级别的文件
 
 # 模板数据定义
 MEDICAL_TEMPLATE_DATA = {
@@ -54,8 +61,7 @@ MATERNAL_TEMPLATE_DATA = {
 def get_db_connection():
     """获取数据库连接"""
     try:
-        connection = sqlite3.connect(DB_PATH)
-        connection.row_factory = sqlite3.Row
+        connection = get_db('data')
         return connection
     except Exception as e:
         logger.error(f"数据库连接失败: {e}")
@@ -66,58 +72,201 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# 列表查询的两个数据源 {数据类型: (表名, 列表达式)}，列顺序与原联合查询一致
+LIST_SOURCES = {
+    'medical': ('medical_data', """
+        id, name, age, gender, systolic_pressure, diastolic_pressure,
+        weight, height, disease_type, symptoms, diagnosis, treatment,
+        created_at, updated_at, 'medical' as data_type,
+        NULL as gestational_weeks, NULL as pregnancy_count, NULL as parity,
+        NULL as pregnancy_type, NULL as notes"""),
+    'maternal': ('maternal_info', """
+        id, name, age, NULL as gender, systolic_pressure, diastolic_pressure,
+        weight, height, NULL as disease_type, NULL as symptoms, NULL as diagnosis, NULL as treatment,
+        created_at, updated_at, 'maternal' as data_type,
+        gestational_weeks, pregnancy_count, parity, pregnancy_type, notes""")
+}
+
+# 列表排序键：created_at DESC, data_type DESC, id DESC（每个分支内可直接使用 created_at 索引）
+LIST_ORDER = "created_at DESC, data_type DESC, id DESC"
+
+# 总数统计方式：exact 精确计数，approx 无筛选时读取仪表盘计数表，none 不统计
+COUNT_MODES = ('exact', 'approx', 'none')
+
+# 已创建列表索引的数据库文件
+_list_indexed_paths = set()
+
+
+def ensure_list_indexes(connection):
+    """为两个数据源的 created_at 创建索引（每个数据库文件只检查一次）"""
+    path = connection.execute("PRAGMA database_list").fetchone()[2]
+    if path in _list_indexed_paths:
+        return
+    for table, _ in LIST_SOURCES.values():
+        columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if 'created_at' in columns:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table} (created_at)")
+    connection.commit()
+    _list_indexed_paths.add(path)
+
+
+def encode_cursor(row):
+    """用最后一行的排序键生成下一页游标"""
+    key = json.dumps([row['created_at'], row['data_type'], row['id']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """解析游标，返回 (created_at, data_type, id)；格式不正确时抛出 ValueError"""
+    try:
+        created_at, data_type, record_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError('无效的分页游标')
+    if data_type not in LIST_SOURCES or not isinstance(record_id, int):
+        raise ValueError('无效的分页游标')
+    return created_at, data_type, record_id
+
+
+def _cursor_conditions(data_type, cursor):
+    """
+    分支内“排在游标之后”的条件（按 LIST_ORDER 降序），返回 [(条件, 参数)]
+    同一 created_at 下 data_type 较大的分支排在前面，因此只需比较 created_at 或 (created_at, id)；
+    created_at 为空的记录排在最后，单独作为一个条件，避免 OR 导致无法使用索引区间查找
+    """
+    created_at, cursor_type, record_id = cursor
+    if created_at is None:
+        # 游标已进入空值部分
+        if data_type > cursor_type:
+            return []
+        if data_type < cursor_type:
+            return [("created_at IS NULL", [])]
+        return [("created_at IS NULL AND id < ?", [record_id])]
+    if data_type > cursor_type:
+        condition, params = "created_at < ?", [created_at]
+    elif data_type < cursor_type:
+        condition, params = "created_at <= ?", [created_at]
+    else:
+        condition, params = "(created_at, id) < (?, ?)", [created_at, record_id]
+    return [(condition, params), ("created_at IS NULL", [])]
+
+
+def _branch_filters(connection, data_type, keyword, start_date, end_date):
+    conditions, params = [], []
+    if keyword:
+        # medical 分支匹配姓名和疾病类型，maternal 分支只匹配姓名
+        condition, keyword_params = keyword_condition(connection, LIST_SOURCES[data_type][0], keyword)
+        conditions.append(condition)
+        params.extend(keyword_params)
+    if start_date:
+        conditions.append("created_at >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("created_at <= ?")
+        params.append(end_date)
+    return conditions, params
+
+
+def query_data_page(cursor, data_type='', keyword='', start_date='', end_date='',
+                    size=20, offset=0, after=None):
+    """
+    分页查询两个数据源
+    每个分支先按排序键取前 offset + size 条（使用 created_at 索引，不再对两张全表排序），
+    再合并排序取当前页；传入游标 after 时 offset 为 0，任意页的代价与第一页相同
+
+    Returns:
+        list: 当前页数据，多取一条用于判断是否还有下一页
+    """
+    branches, params = [], []
+    for source_type, (table, columns) in LIST_SOURCES.items():
+        if data_type and data_type != source_type:
+            continue
+        filters, filter_params = _branch_filters(cursor.connection, source_type, keyword, start_date, end_date)
+        parts = _cursor_conditions(source_type, after) if after is not None else [(None, [])]
+        for condition, cursor_params in parts:
+            conditions = filters + [condition] if condition else filters
+            where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+            branches.append(f"""
+                SELECT * FROM (
+                    SELECT {columns} FROM {table}{where_clause}
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                )""")
+            params.extend(filter_params + cursor_params + [offset + size + 1])
+    if not branches:
+        return []
+    query = " UNION ALL ".join(branches) + f" ORDER BY {LIST_ORDER} LIMIT ? OFFSET ?"
+    cursor.execute(query, params + [size + 1, offset])
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def count_data(cursor, data_type='', keyword='', start_date='', end_date='', mode='exact'):
+    """
+    统计列表总数，返回 (总数, 是否为估计值)
+    approx 在没有关键字和日期筛选时读取 dashboard_materializer 维护的计数表（列表所在的库上首次使用时安装），
+    计数表不可用时退回精确计数
+    """
+    if mode == 'none':
+        return None, False
+    sources = [source_type for source_type in LIST_SOURCES if not data_type or data_type == source_type]
+    if mode == 'approx' and not (keyword or start_date or end_date):
+        try:
+            dashboard_materializer.ensure_installed(cursor.connection)
+        except sqlite3.Error as e:
+            logger.warning(f"安装仪表盘计数表失败，改为精确计数: {e}")
+        counters = [dashboard_materializer.read_counters(cursor.connection, LIST_SOURCES[source_type][0])
+                    for source_type in sources]
+        if all(counter is not None for counter in counters):
+            return sum(counter['total'].get('', 0) for counter in counters), True
+    total = 0
+    for source_type in sources:
+        conditions, params = _branch_filters(cursor.connection, source_type, keyword, start_date, end_date)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        cursor.execute(f"SELECT COUNT(*) FROM {LIST_SOURCES[source_type][0]}{where_clause}", params)
+        total += cursor.fetchone()[0]
+    return total, False
+
+
 @data_bp.route('/list', methods=['GET'])
 def get_data_list():
-    """获取数据列表"""
+    """
+    获取数据列表
+    支持两种分页方式：page/size 页码分页（默认精确总数，兼容原接口）；
+    cursor 游标分页（传入上一页返回的 next_cursor，第一页传空字符串，默认估计总数）。
+    count 参数可指定总数统计方式：exact / approx / none
+    """
     try:
-        page = int(request.args.get('page', 1))
-        size = int(request.args.get('size', 20))
+        try:
+            page = int(request.args.get('page', 1))
+            size = int(request.args.get('size', 20))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'page和size必须为整数'}), 400
+        if page < 1 or size < 1:
+            return jsonify({'success': False, 'message': 'page和size必须大于等于1'}), 400
         data_type = request.args.get('data_type', '')
         keyword = request.args.get('keyword', '')
         start_date = request.args.get('start_date', '')
         end_date = request.args.get('end_date', '')
+        cursor_token = request.args.get('cursor')
+        count_mode = request.args.get('count', 'exact' if cursor_token is None else 'approx')
+        
+        if count_mode not in COUNT_MODES:
+            return jsonify({'success': False, 'message': f'不支持的count参数: {count_mode}'}), 400
+        try:
+            after = decode_cursor(cursor_token) if cursor_token else None
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
         try:
-            offset = (page - 1) * size
+            offset = (page - 1) * size if cursor_token is None else 0
             
             connection = get_db_connection()
+            ensure_list_indexes(connection)
             cursor = connection.cursor()
             
-            # 构建查询条件
-            where_conditions = []
-            params = []
-            
-            if data_type:
-                where_conditions.append("data_type = ?")
-                params.append(data_type)
-            
-            if keyword:
-                where_conditions.append("(name LIKE ? OR disease_type LIKE ?)")
-                params.extend([f'%{keyword}%', f'%{keyword}%'])
-            
-            if start_date:
-                where_conditions.append("created_at >= ?")
-                params.append(start_date)
-            
-            if end_date:
-                where_conditions.append("created_at <= ?")
-                params.append(end_date)
-            
-            where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-            
-            # 查询总数
-            count_query = f"SELECT COUNT(*) as total FROM ({get_union_query()}) as combined_data{where_clause}"
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()[0]
-            
-            # 查询数据
-            query = f"""
-            SELECT * FROM ({get_union_query()}) as combined_data{where_clause}
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
-            """
-            cursor.execute(query, params + [size, offset])
-            data = [dict(row) for row in cursor.fetchall()]
+            filters = dict(data_type=data_type, keyword=keyword, start_date=start_date, end_date=end_date)
+            total, estimated = count_data(cursor, mode=count_mode, **filters)
+            rows = query_data_page(cursor, size=size, offset=offset, after=after, **filters)
+            data = rows[:size]
+            has_more = len(rows) > size
             
             cursor.close()
             connection.close()
@@ -126,8 +275,11 @@ def get_data_list():
                 'success': True,
                 'data': data,
                 'total': total,
+                'total_estimated': estimated,
                 'page': page,
-                'size': size
+                'size': size,
+                'has_more': has_more,
+                'next_cursor': encode_cursor(data[-1]) if has_more else None
             })
         except sqlite3.OperationalError as e:
             # 如果表不存在或数据库错误，返回模拟数据
@@ -198,22 +350,9 @@ def get_data_list():
 
 def get_union_query():
     """获取联合查询SQL"""
-    return """
-    SELECT 
-        id, name, age, gender, systolic_pressure, diastolic_pressure, 
-        weight, height, disease_type, symptoms, diagnosis, treatment,
-        created_at, updated_at, 'medical' as data_type,
-        NULL as gestational_weeks, NULL as pregnancy_count, NULL as parity,
-        NULL as pregnancy_type, NULL as notes
-    FROM medical_data
-    UNION ALL
-    SELECT 
-        id, name, age, NULL as gender, systolic_pressure, diastolic_pressure,
-        weight, height, NULL as disease_type, NULL as symptoms, NULL as diagnosis, NULL as treatment,
-        created_at, updated_at, 'maternal' as data_type,
-        gestational_weeks, pregnancy_count, parity, pregnancy_type, notes
-    FROM maternal_info
-    """
+    return "\n    UNION ALL\n".join(
+        f"    SELECT {columns}\n    FROM {table}" for table, columns in LIST_SOURCES.values()
+    )
 
 @data_bp.route('/medical/add', methods=['POST'])
 def add_medical_data():
@@ -466,7 +605,10 @@ def delete_maternal_data(record_id):
 
 @data_bp.route('/import', methods=['POST'])
 def import_data():
-    """导入数据"""
+    """
+    导入数据
+    上传文件保存到临时文件后在后台流式导入，立即返回任务编号，通过 /import/jobs/<job_id> 查询进度
+    """
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'message': '没有选择文件'}), 400
@@ -478,84 +620,57 @@ def import_data():
         if not allowed_file(file.filename):
             return jsonify({'success': False, 'message': '不支持的文件格式'}), 400
         
-        if file.content_length > MAX_FILE_SIZE:
-            return jsonify({'success': False, 'message': '文件大小超过限制'}), 400
-        
         data_type = request.form.get('data_type', 'medical')
+        if data_type not in data_importer.IMPORT_SPECS:
+            return jsonify({'success': False, 'message': f'不支持的数据类型: {data_type}'}), 400
         
-        # 读取Excel文件
-        df = pd.read_excel(file)
-        
-        # 数据验证和清洗
-        if data_type == 'medical':
-            required_columns = ['name', 'gender', 'age', 'disease_type']
-        else:
-            required_columns = ['name', 'age', 'gestational_weeks', 'pregnancy_count', 'parity', 'pregnancy_type']
-        
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return jsonify({'success': False, 'message': f'缺少必填列: {", ".join(missing_columns)}'}), 400
-        
-        # 批量插入数据
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        success_count = 0
-        error_count = 0
-        
-        for index, row in df.iterrows():
-            try:
-                if data_type == 'medical':
-                    insert_query = """
-                    INSERT INTO medical_data (
-                        name, gender, age, disease_type, systolic_pressure, diastolic_pressure,
-                        weight, height, symptoms, diagnosis, treatment, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    values = (
-                        row.get('name'), row.get('gender'), row.get('age'), row.get('disease_type'),
-                        row.get('systolic_pressure'), row.get('diastolic_pressure'),
-                        row.get('weight'), row.get('height'), row.get('symptoms'),
-                        row.get('diagnosis'), row.get('treatment'), datetime.now(), datetime.now()
-                    )
-                else:
-                    insert_query = """
-                    INSERT INTO maternal_info (
-                        name, age, gestational_weeks, pregnancy_count, parity, pregnancy_type,
-                        weight, height, systolic_pressure, diastolic_pressure, notes, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    values = (
-                        row.get('name'), row.get('age'), row.get('gestational_weeks'), 
-                        row.get('pregnancy_count'), row.get('parity'), row.get('pregnancy_type'),
-                        row.get('weight'), row.get('height'), row.get('systolic_pressure'),
-                        row.get('diastolic_pressure'), row.get('notes'), datetime.now(), datetime.now()
-                    )
-                
-                cursor.execute(insert_query, values)
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"导入第{index+1}行数据失败: {e}")
-                error_count += 1
-                continue
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
+        # 上传内容按块写入临时文件，不在内存中保留整个文件
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{extension}')
+        temp_file.close()
+        file.save(temp_file.name)
+        if os.path.getsize(temp_file.name) > MAX_IMPORT_FILE_SIZE:
+            os.remove(temp_file.name)
+            return jsonify({'success': False, 'message': '文件大小超过限制'}), 400
         
+        job = get_job_queue().submit(temp_file.name, data_type, filename=file.filename)
         return jsonify({
             'success': True,
-            'message': f'数据导入完成，成功{success_count}条，失败{error_count}条'
-        })
+            'message': '导入任务已创建',
+            'data': job
+        }), 202
         
     except Exception as e:
         logger.error(f"导入数据失败: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@data_bp.route('/import/jobs', methods=['GET'])
+def list_import_jobs():
+    """最近的导入任务列表"""
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    return jsonify({'success': True, 'data': get_job_queue().list(limit)})
+
+@data_bp.route('/import/jobs/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """查询导入任务进度"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '导入任务不存在'}), 404
+    return jsonify({'success': True, 'data': job})
+
+@data_bp.route('/import/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_import_job(job_id):
+    """取消导入任务（执行中的任务在当前批次提交后停止，已写入的数据保留）"""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '导入任务不存在'}), 404
+    return jsonify({'success': True, 'message': '已请求取消导入任务', 'data': job})
+
 @data_bp.route('/<data_type>/template', methods=['GET'])
 def download_template(data_type):
     """下载数据模板"""
+    import pandas as pd
+    
     try:
         # 创建临时文件
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
@@ -588,15 +703,13 @@ def download_template(data_type):
 
 @data_bp.route('/export', methods=['GET'])
 def export_data():
-    """导出数据"""
+    """导出数据（按块读取游标流式生成，format 为 excel（默认）/ csv / parquet / arrow）"""
     try:
         data_type = request.args.get('data_type', 'medical')
+        format_type = request.args.get('format', 'excel')
         start_date = request.args.get('start_date', '')
         end_date = request.args.get('end_date', '')
         
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         # 构建查询条件
         where_conditions = []
         params = []
@@ -617,29 +730,18 @@ def export_data():
         else:
             query = f"SELECT * FROM maternal_info{where_clause} ORDER BY created_at DESC"
         
-        cursor.execute(query, params)
-        data = [dict(row) for row in cursor.fetchall()]
+        format_type = format_type.lower()
+        if format_type not in export_stream.FORMATS:
+            return jsonify({'success': False, 'message': f'不支持的导出格式: {format_type}'}), 400
+        if format_type in export_stream.COLUMNAR_FORMATS and not export_stream.columnar_available():
+            return jsonify({'success': False, 'message': '服务器未安装 pyarrow，无法导出该格式'}), 400
         
-        cursor.close()
-        connection.close()
-        
-        if not data:
+        rows = export_stream.query_rows('data', query, params)
+        if rows is None:
             return jsonify({'success': False, 'message': '没有数据可导出'}), 404
         
-        # 转换为DataFrame
-        df = pd.DataFrame(data)
-        
-        # 创建临时文件
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        df.to_excel(temp_file.name, index=False)
-        temp_file.close()
-        
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name=f'{data_type}_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        return export_stream.export_response(rows, format_type,
+                                             f'{data_type}_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
         
     except Exception as e:
         logger.error(f"导出数据失败: {e}")
@@ -718,35 +820,31 @@ def log_operation(operation, data_type, record_id, description):
 
 @data_bp.route('/import-history', methods=['GET'])
 def get_import_history():
-    """获取数据导入历史"""
+    """获取数据导入历史（来自导入任务表）"""
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # 查询与导入相关的操作日志
-        cursor.execute("""
-        SELECT id, action, resource_type, resource_id, details, created_at 
-        FROM operation_logs 
-        WHERE action LIKE '%import%' OR action LIKE '%导入%'
-        ORDER BY created_at DESC
-        LIMIT 50
-        """)
-        
         history = []
-        for row in cursor.fetchall():
-            # 转换为前端期望的格式
+        for job in get_job_queue().list(50):
+            # 同时提供数据导入页和数据中心页使用的字段
             history.append({
-                'id': row[0],
-                'operation': row[1],
-                'data_type': row[2],
-                'record_id': row[3],
-                'description': row[4],
-                'created_at': row[5]
+                'id': job['job_id'],
+                'file_name': job['filename'],
+                'filename': job['filename'],
+                'data_type': job['data_type'],
+                'total_records': job['total_rows'] if job['total_rows'] is not None else job['processed'],
+                'success_records': job['success'],
+                'failed_records': job['errors'],
+                'records_count': job['success'],
+                'import_status': job['status'],
+                'status': 'success' if job['status'] == 'completed' else job['status'],
+                'message': job['message'],
+                'error_details': '\n'.join(f"第{error['row']}行: {error['message']}"
+                                           for error in job['error_details']),
+                'created_at': job['created_at'],
+                'upload_time': job['created_at'],
+                'start_time': job['started_at'],
+                'end_time': job['finished_at']
             })
         
-        cursor.close()
-        connection.close()
-        
         return jsonify({
             'code': 200,
             'data': history
@@ -754,4 +852,15 @@ def get_import_history():
         
     except Exception as e:
         logger.error(f"获取导入历史失败: {e}")
-        return jsonify({'code': 500, 'message': str(e)})
\ No newline at end of file
+        return jsonify({'code': 500, 'message': str(e)})
+
+
+@data_bp.route('/import-record/<record_id>', methods=['DELETE'])
+def delete_import_record(record_id):
+    """删除已结束的导入记录"""
+    queue = get_job_queue()
+    if queue.get(record_id) is None:
+        return jsonify({'success': False, 'message': '导入记录不存在'}), 404
+    if not queue.delete(record_id):
+        return jsonify({'success': False, 'message': '导入任务尚未结束，请先取消'}), 409
+    return jsonify({'success': True, 'message': '导入记录已删除'})
\ No newline at end of file
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按原始记录计算的分布统计
+趋势分析中的年龄、血压、时段分布以及前后半段、周期对比，原来只对按天平均值分组。
+这里对时间范围内的每条记录统计：游标分块读取需要的列，每块转换为 NumPy 数组后，
+用 np.searchsorted 定位分箱和时间桶、np.bincount 计数并累加到结果中，内存占用与记录数无关。
+
+分箱定义可配置（DEFAULT_BINS，或请求中给出的分界点），
+结果按 (数据库, 表, 粒度, 时间起点, 分箱定义, 范围内的数据版本) 缓存：版本只统计起点之后各天的版本，
+范围内的数据变化后自动失效，范围之外（更早的日期）写入的记录不影响缓存。
+"""
+
+import math
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metric_rollups
+from report_engine import ReportCache
+
+# 每次从游标读取的行数
+FETCH_ROWS = 5000
+
+# 分布名 -> 列表达式、分界点和标签。值 v 属于第 i 个区间当且仅当 edges[i-1] <= v < edges[i]，
+# 两端的区间不设界限；标签数比分界点多一个
+DEFAULT_BINS = {
+    'age': {
+        'column': 'age',
+        'edges': [25, 30, 35, 40],
+        'labels': ['<25', '25-30', '30-35', '35-40', '>40']
+    },
+    'pressure': {
+        'column': 'systolic_pressure',
+        'edges': [120, 140],
+        'labels': ['正常', '偏高', '高血压']
+    },
+    'time': {
+        'column': 'CAST(substr(created_at, 12, 2) AS INTEGER)',
+        'edges': [12, 18],
+        'labels': ['上午', '下午', '晚上']
+    }
+}
+
+# 按时间桶累计的指标（用于前后半段对比）
+BUCKET_METRICS = ('age',)
+
+_cache = ReportCache(max_size=64)
+
+
+def make_bins(edges: Sequence[float], labels: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    由分界点生成分箱（未给出标签时按 "<a"、"a-b"、">=z" 生成）
+
+    Raises:
+        ValueError: 分界点为空、不是严格递增的有限数，或标签数不等于分界点数加一
+    """
+    edges = [float(edge) for edge in edges]
+    if not edges or any(not math.isfinite(edge) for edge in edges):
+        raise ValueError('分界点必须为非空的有限数列')
+    if any(left >= right for left, right in zip(edges, edges[1:])):
+        raise ValueError('分界点必须严格递增')
+    edges = [int(edge) if edge.is_integer() else edge for edge in edges]
+    if labels is None:
+        labels = ([f'<{edges[0]}'] + [f'{left}-{right}' for left, right in zip(edges, edges[1:])]
+                  + [f'>={edges[-1]}'])
+    if len(labels) != len(edges) + 1:
+        raise ValueError('标签数应比分界点数多一个')
+    return {'edges': edges, 'labels': list(labels)}
+
+
+def parse_edges(value: str) -> List[float]:
+    """解析逗号分隔的分界点，例如 "20,25,30,35,40" """
+    try:
+        return [float(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError(f'分界点格式不正确: {value}')
+
+
+def resolve_bins(overrides: Optional[Dict[str, Sequence[float]]] = None) -> Dict[str, Dict[str, Any]]:
+    """默认分箱，overrides 中给出分界点的分布改用新的分界点（标签自动生成）"""
+    bins = {}
+    for name, definition in DEFAULT_BINS.items():
+        if overrides and overrides.get(name):
+            bins[name] = dict(make_bins(overrides[name]), column=definition['column'])
+        else:
+            bins[name] = dict(definition)
+    return bins
+
+
+def _table_columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _numeric(expression: str) -> str:
+    """只保留存储为数值的值，其余（文本、空值）读为 NULL，转换为数组后为 NaN"""
+    return f"CASE WHEN typeof({expression}) IN ('integer', 'real') THEN {expression} END"
+
+
+def _range_start(conn, grain: str, modifiers: Optional[Tuple[str, ...]]) -> Optional[str]:
+    """与 metric_rollups.read_series 相同的起点：datetime('now', ...) 截取到桶的长度"""
+    if modifiers is None:
+        return None
+    placeholders = ', '.join('?' * len(modifiers))
+    return conn.execute(f"SELECT substr(datetime('now', {placeholders}), 1, ?)",
+                        list(modifiers) + [metric_rollups.BUCKET_LENGTHS[grain]]).fetchone()[0]
+
+
+def scan(conn, table: str, grain: str, modifiers: Optional[Tuple[str, ...]], buckets: Sequence[str],
+         bins: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    扫描时间范围内的记录，计算各分布的计数以及每个时间桶的记录数和指标总和
+
+    Args:
+        table: 源表
+        grain: 时间桶粒度（hour / day / month）
+        modifiers: 起点的 datetime('now', ...) 修饰符，None 表示不限
+        buckets: 升序的时间桶（趋势序列中的桶）
+        bins: 分布名 -> {'column', 'edges', 'labels'}
+
+    Returns:
+        dict: {'distributions': {分布名: {标签: 记录数}}, 'buckets': 桶列表,
+               'bucket_count': 每桶记录数, 'bucket_n' / 'bucket_total': {指标: 每桶非空个数 / 总和}}
+    """
+    metric_rollups.ensure_installed(conn)
+    columns = set(_table_columns(conn, table))
+    start = _range_start(conn, grain, modifiers)
+    # 起点截取到天（按小时的起点所在的整天、按月的 "YYYY-MM" 与当月各天比较时同样包含当月），
+    # 范围内任何一天的记录变化都会使版本增大
+    version = metric_rollups.data_version(conn, table, start[:10] if start is not None else None, None)
+    key = (conn.execute('PRAGMA database_list').fetchone()[2], table, grain, start, tuple(buckets),
+           tuple((name, tuple(spec['edges']), tuple(spec['labels']), spec['column'])
+                 for name, spec in sorted(bins.items())),
+           version)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    # 表中不存在的列不参与统计（分布为全 0）
+    binned = {name: spec for name, spec in bins.items() if spec['column'] in columns or '(' in spec['column']}
+    metrics = [metric for metric in BUCKET_METRICS if metric in columns]
+    expressions = ([f'substr(created_at, 1, {metric_rollups.BUCKET_LENGTHS[grain]})']
+                   + [_numeric(spec['column']) for spec in binned.values()]
+                   + [_numeric(metric) for metric in metrics])
+    condition, params = ('created_at >= ?', [start]) if start is not None else ('created_at IS NOT NULL', [])
+
+    bucket_array = np.asarray(buckets, dtype=str)
+    histograms = {name: np.zeros(len(spec['labels']), dtype=np.int64) for name, spec in bins.items()}
+    edges = {name: np.asarray(spec['edges'], dtype=float) for name, spec in binned.items()}
+    bucket_count = np.zeros(len(buckets), dtype=np.int64)
+    bucket_n = {metric: np.zeros(len(buckets), dtype=np.int64) for metric in metrics}
+    bucket_total = {metric: np.zeros(len(buckets), dtype=float) for metric in metrics}
+
+    cursor = conn.execute(f"SELECT {', '.join(expressions)} FROM {table} WHERE {condition}", params)
+    while True:
+        rows = cursor.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        values = list(zip(*rows))
+        offset = 1
+        for name in binned:
+            array = np.asarray(values[offset], dtype=float)
+            array = array[~np.isnan(array)]
+            histograms[name] += np.bincount(np.searchsorted(edges[name], array, side='right'),
+                                            minlength=len(histograms[name]))
+            offset += 1
+
+        if not len(buckets):
+            continue
+        row_buckets = np.asarray(values[0], dtype=str)
+        index = np.minimum(np.searchsorted(bucket_array, row_buckets), len(buckets) - 1)
+        matched = bucket_array[index] == row_buckets
+        bucket_count += np.bincount(index[matched], minlength=len(buckets))
+        for metric in metrics:
+            array = np.asarray(values[offset], dtype=float)
+            valid = matched & ~np.isnan(array)
+            bucket_n[metric] += np.bincount(index[valid], minlength=len(buckets))
+            bucket_total[metric] += np.bincount(index[valid], weights=array[valid], minlength=len(buckets))
+            offset += 1
+
+    result = {
+        'distributions': {name: dict(zip(bins[name]['labels'], counts.tolist()))
+                          for name, counts in histograms.items()},
+        'buckets': list(buckets),
+        'bucket_count': bucket_count,
+        'bucket_n': bucket_n,
+        'bucket_total': bucket_total
+    }
+    _cache.put(key, result)
+    return result
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+时间序列预测
+按 (数据类型, 指标) 在 metric_rollups 的按天汇总上拟合指数平滑模型，拟合状态保存在 forecast_models 表中：
+
+- 数据覆盖两个完整周期（14 天）以上时，使用带阻尼趋势和按星期季节项的加法 Holt-Winters（ETS(A,Ad,A)）
+- 数据较少时使用阻尼趋势的 Holt 模型（ETS(A,Ad,N)）
+
+平滑参数以一步预测误差平方和最小为目标由 scipy 拟合。预测值和预测区间由保存的状态（水平、趋势、
+季节项、残差标准差）按解析公式计算，计算量只与预测天数成正比，请求中不再拟合模型。
+ForecastService 在后台定时对数据已变化或已跨天的序列重新拟合；请求发现保存的状态已过时时仍返回该状态，
+并提前唤醒后台服务重新拟合，只有从未拟合过的序列才在请求中拟合一次。
+"""
+
+import json
+import math
+import sqlite3
+import logging
+from datetime import date, timedelta
+from statistics import NormalDist
+from threading import Thread, Event
+from typing import Dict, Any, List, Optional, Tuple
+
+import metric_rollups
+from utils.data_access import database_path
+
+logger = logging.getLogger(__name__)
+
+FORECAST_TABLE = 'forecast_models'
+
+# 每天记录数（其余指标为 metric_rollups 中的列名，预测其每日平均值）
+COUNT_METRIC = 'count'
+
+# 季节周期（天），季节项按星期几保存
+SEASON_DAYS = 7
+
+# 拟合使用的历史天数
+FIT_DAYS = 365
+
+# 拟合所需的最少天数
+MIN_POINTS = 3
+
+# 最大预测天数
+MAX_HORIZON = 366
+
+# 默认预测区间的置信水平
+DEFAULT_LEVEL = 0.95
+
+
+def _initial_state(values: List[float], weekdays: List[int], seasonal: bool):
+    """初始水平、趋势和季节项：季节模型取前两个周期的均值，非季节模型取前两个值"""
+    season = [0.0] * SEASON_DAYS
+    if seasonal:
+        first, second = values[:SEASON_DAYS], values[SEASON_DAYS:2 * SEASON_DAYS]
+        level = sum(first) / SEASON_DAYS
+        trend = (sum(second) - sum(first)) / SEASON_DAYS / SEASON_DAYS
+        for value, weekday in zip(first, weekdays):
+            season[weekday] = value - level
+        return level, trend, season
+    return values[0], values[1] - values[0], season
+
+
+def _smooth(values: List[float], weekdays: List[int], params: Tuple[float, float, float, float], initial):
+    """
+    误差修正形式的平滑递推
+
+    Returns:
+        tuple: (一步预测误差列表, (水平, 趋势, 季节项))
+    """
+    alpha, beta, gamma, phi = params
+    level, trend, season = initial[0], initial[1], list(initial[2])
+    errors = []
+    for value, weekday in zip(values, weekdays):
+        error = value - (level + phi * trend + season[weekday])
+        errors.append(error)
+        level = level + phi * trend + alpha * error
+        trend = phi * trend + beta * error
+        season[weekday] += gamma * error
+    return errors, (level, trend, season)
+
+
+def fit_model(dates: List[date], values: List[float]) -> Dict[str, Any]:
+    """
+    拟合一条按天的序列（日期连续）
+
+    Returns:
+        dict: 模型状态，可直接 JSON 序列化后保存
+    """
+    from scipy.optimize import minimize
+
+    values = [float(value) for value in values]
+    weekdays = [day.weekday() for day in dates]
+    seasonal = len(values) >= 2 * SEASON_DAYS
+    initial = _initial_state(values, weekdays, seasonal)
+
+    def unpack(x):
+        # 可容许区域：beta <= alpha，gamma <= 1 - alpha
+        if seasonal:
+            alpha, beta, gamma, phi = x
+        else:
+            (alpha, beta, phi), gamma = x, 0.0
+        return float(alpha), float(min(beta, alpha)), float(min(gamma, 1 - alpha)), float(phi)
+
+    def sse(x):
+        errors, _ = _smooth(values, weekdays, unpack(x), initial)
+        return sum(error * error for error in errors)
+
+    if seasonal:
+        x0, bounds = [0.3, 0.05, 0.1, 0.95], [(0.01, 0.99), (0.0, 0.99), (0.0, 0.99), (0.8, 0.98)]
+    else:
+        x0, bounds = [0.3, 0.05, 0.95], [(0.01, 0.99), (0.0, 0.99), (0.8, 0.98)]
+    result = minimize(sse, x0, method='L-BFGS-B', bounds=bounds)
+    params = unpack(result.x)
+    errors, (level, trend, season) = _smooth(values, weekdays, params, initial)
+
+    squared = sum(error * error for error in errors)
+    mean = sum(values) / len(values)
+    total = sum((value - mean) ** 2 for value in values)
+    alpha, beta, gamma, phi = params
+    return {
+        'model': 'holt_winters' if seasonal else 'holt',
+        'alpha': alpha,
+        'beta': beta,
+        'gamma': gamma,
+        'phi': phi,
+        'level': level,
+        'trend': trend,
+        'season': season,
+        'sigma': math.sqrt(squared / max(len(values) - len(x0), 1)),
+        'r2': 1 - squared / total if total > 0 else 0.0,
+        'n_obs': len(values),
+        'last_date': dates[-1].isoformat()
+    }
+
+
+def forecast_state(state: Dict[str, Any], horizon: int, level: float = DEFAULT_LEVEL) -> Dict[str, List]:
+    """
+    由模型状态计算 last_date 之后 horizon 天的预测值和预测区间
+
+    h 步预测方差为 sigma² (1 + Σ_{j<h} c_j²)，c_j = alpha + beta (phi + ... + phi^j) + gamma [j 为周期的整数倍]
+    """
+    alpha, beta, gamma, phi = state['alpha'], state['beta'], state['gamma'], state['phi']
+    last = date.fromisoformat(state['last_date'])
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+
+    result = {'dates': [], 'mean': [], 'lower': [], 'upper': []}
+    damped, variance = 0.0, 1.0
+    for h in range(1, horizon + 1):
+        damped += phi ** h
+        day = last + timedelta(days=h)
+        mean = state['level'] + damped * state['trend'] + state['season'][day.weekday()]
+        spread = z * state['sigma'] * math.sqrt(variance)
+        result['dates'].append(day.isoformat())
+        result['mean'].append(mean)
+        result['lower'].append(mean - spread)
+        result['upper'].append(mean + spread)
+        coefficient = alpha + beta * damped + (gamma if h % SEASON_DAYS == 0 else 0.0)
+        variance += coefficient * coefficient
+    return result
+
+
+def ensure_forecast_table(conn):
+    """创建模型状态表（已存在时不做任何修改）；数据不足以拟合时 state_json 为空"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {FORECAST_TABLE} (
+            data_type TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            state_json TEXT,
+            data_version INTEGER NOT NULL,
+            series_end TEXT NOT NULL,
+            fitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (data_type, metric)
+        )
+    ''')
+    conn.commit()
+
+
+class ForecastEngine:
+    """按 (数据类型, 指标) 保存拟合状态的预测引擎"""
+
+    def __init__(self, sources: Dict[str, str], fields: Dict[str, Dict[str, str]]):
+        """
+        Args:
+            sources: 数据类型 -> 源表
+            fields: 数据类型 -> {字段: 指标列}，每个指标列预测每日平均值，另外预测每日记录数
+        """
+        self.sources = sources
+        self.metrics = {
+            data_type: [COUNT_METRIC] + list(dict.fromkeys(fields[data_type].values())) for data_type in sources
+        }
+        self.fitted = 0
+        self._ready_paths = set()
+        # 发现保存的状态过时时调用（ForecastService 注册为提前唤醒后台拟合）
+        self.on_stale = None
+
+    def _ensure_ready(self, conn):
+        path = conn.execute('PRAGMA database_list').fetchone()[2]
+        if path in self._ready_paths:
+            return
+        metric_rollups.ensure_installed(conn)
+        ensure_forecast_table(conn)
+        self._ready_paths.add(path)
+
+    def daily_series(self, conn, data_type: str, metric: str) -> Tuple[List[date], List[float]]:
+        """
+        最近 FIT_DAYS 天到昨天（今天尚不完整）的每日序列，从第一个有数据的日期开始
+
+        没有记录的日期：记录数为 0，平均值沿用前一天的值
+        """
+        series = metric_rollups.read_series(conn, self.sources[data_type], 'day',
+                                            (f'-{FIT_DAYS} days',), ('start of day',))
+        observed = {}
+        for entry in series:
+            value = entry['count'] if metric == COUNT_METRIC else metric_rollups.metric_avg(entry, metric)
+            if value is not None:
+                observed[entry['bucket']] = value
+        if not observed:
+            return [], []
+
+        end = date.fromisoformat(conn.execute("SELECT date('now', '-1 day')").fetchone()[0])
+        day = date.fromisoformat(min(observed))
+        dates, values = [], []
+        previous = None
+        while day <= end:
+            value = observed.get(day.isoformat())
+            if value is None:
+                value = 0 if metric == COUNT_METRIC else previous
+            dates.append(day)
+            values.append(value)
+            previous = value
+            day += timedelta(days=1)
+        return dates, values
+
+    def _current(self, conn, data_type: str) -> Tuple[int, str]:
+        """
+        当前的 (数据版本, 序列截止日期)，与保存的值不同时模型需要重新拟合
+
+        数据版本只统计截止日期（昨天）及之前各天，今天写入的记录不在拟合的序列中，不使模型过时
+        """
+        series_end = conn.execute("SELECT date('now', '-1 day')").fetchone()[0]
+        return metric_rollups.data_version(conn, self.sources[data_type], None, series_end), series_end
+
+    def refit(self, conn, data_types: Optional[List[str]] = None, force: bool = False) -> int:
+        """
+        重新拟合数据版本已变化或序列已跨天的模型
+
+        Returns:
+            int: 本次拟合的模型数
+        """
+        self._ensure_ready(conn)
+        fitted = 0
+        for data_type in data_types or list(self.sources):
+            version, series_end = self._current(conn, data_type)
+            for metric in self.metrics[data_type]:
+                current = conn.execute(
+                    f'SELECT data_version, series_end FROM {FORECAST_TABLE} WHERE data_type = ? AND metric = ?',
+                    (data_type, metric)
+                ).fetchone()
+                if not force and current is not None and tuple(current) == (version, series_end):
+                    continue
+                dates, values = self.daily_series(conn, data_type, metric)
+                state = fit_model(dates, values) if len(values) >= MIN_POINTS else None
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO {FORECAST_TABLE}
+                        (data_type, metric, state_json, data_version, series_end, fitted_at)
+                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (data_type, metric, json.dumps(state) if state else None, version, series_end))
+                conn.commit()
+                fitted += 1
+        self.fitted += fitted
+        return fitted
+
+    def forecast(self, conn, data_type: str, metric: str, horizon: int,
+                 level: float = DEFAULT_LEVEL) -> Optional[Dict[str, Any]]:
+        """
+        从保存的状态计算预测（该数据类型尚未拟合过时先拟合一次）
+
+        保存的状态对应的数据版本或序列截止日期已过时，仍使用该状态（结果中 stale 为 True），
+        并通过 on_stale 提前唤醒后台服务重新拟合，请求延迟不受拟合影响
+
+        Returns:
+            dict: dates / mean / lower / upper 以及模型信息；历史数据不足时返回 None
+
+        Raises:
+            ValueError: 数据类型、指标、预测天数或置信水平不正确
+        """
+        if data_type not in self.sources or metric not in self.metrics[data_type]:
+            raise ValueError(f'不支持的预测指标: {data_type}.{metric}')
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise ValueError(f'预测天数应在 1 到 {MAX_HORIZON} 之间')
+        if not 0 < level < 1:
+            raise ValueError('置信水平应在 0 到 1 之间')
+        self._ensure_ready(conn)
+
+        query = (f'SELECT state_json, fitted_at, data_version, series_end FROM {FORECAST_TABLE} '
+                 'WHERE data_type = ? AND metric = ?')
+        row = conn.execute(query, (data_type, metric)).fetchone()
+        if row is None:
+            self.refit(conn, [data_type])
+            row = conn.execute(query, (data_type, metric)).fetchone()
+        stale = tuple(row[2:]) != self._current(conn, data_type)
+        if stale and self.on_stale is not None:
+            self.on_stale()
+        if row[0] is None:
+            return None
+
+        state = json.loads(row[0])
+        result = forecast_state(state, horizon, level)
+        result.update({
+            'model': state['model'],
+            'r2': state['r2'],
+            'sigma': state['sigma'],
+            'last_date': state['last_date'],
+            'fitted_at': row[1],
+            'stale': stale
+        })
+        return result
+
+
+class ForecastService:
+    """后台定时重新拟合预测模型"""
+
+    def __init__(self, engine: ForecastEngine, db_path: Optional[str] = None, interval: float = 3600.0):
+        """
+        Args:
+            engine: 预测引擎
+            db_path: 数据库文件路径，默认为主库
+            interval: 两轮检查之间的间隔（秒）
+        """
+        self.engine = engine
+        self.db_path = db_path
+        self.interval = interval
+        self.last_fitted = 0
+
+        self.is_running = False
+        self.fitting_thread = None
+        self.stop_event = Event()
+        self.wake_event = Event()
+        # 请求发现模型过时时提前唤醒本服务
+        engine.on_stale = self.trigger
+
+    def run_once(self) -> int:
+        """执行一轮拟合"""
+        conn = sqlite3.connect(self.db_path or database_path('system'))
+        try:
+            self.last_fitted = self.engine.refit(conn)
+        finally:
+            conn.close()
+        if self.last_fitted:
+            logger.info(f"预测模型已重新拟合 {self.last_fitted} 个")
+        return self.last_fitted
+
+    def trigger(self):
+        """提前唤醒后台线程执行一轮拟合（例如请求发现保存的模型已过时）"""
+        self.wake_event.set()
+
+    def start(self):
+        """启动后台拟合线程"""
+        if self.is_running:
+            logger.warning("预测模型服务已在运行")
+            return
+
+        self.is_running = True
+        self.stop_event.clear()
+        self.fitting_thread = Thread(target=self._fitting_loop, daemon=True)
+        self.fitting_thread.start()
+
+        logger.info("预测模型服务已启动")
+
+    def stop(self):
+        """停止后台拟合线程"""
+        self.is_running = False
+        self.stop_event.set()
+        self.wake_event.set()
+
+        if self.fitting_thread:
+            self.fitting_thread.join(timeout=10)
+
+        logger.info("预测模型服务已停止")
+
+    def _fitting_loop(self):
+        """拟合主循环"""
+        while self.is_running and not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"预测模型拟合失败：{e}")
+
+            self.wake_event.wait(timeout=self.interval)
+            self.wake_event.clear()
@@ -1,18 +1,19 @@
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime
 import sqlite3
+from utils.data_access import get_db, database_path
+from utils.text_search import keyword_condition
 import os
 
 # 医院管理API蓝图
 hospital_bp = Blueprint('hospital', __name__)
 
 # SQLite数据库配置
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+DB_PATH = database_path('data')
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db('data')
     return conn
 
 def require_admin(func):
@@ -43,8 +44,9 @@ def get_hospitals():
         params = []
         
         if search:
-            where_conditions.append("(name LIKE ? OR address LIKE ? OR contact_phone LIKE ?)")
-            params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+            condition, search_params = keyword_condition(conn, 'hospitals', search)
+            where_conditions.append(condition)
+            params.extend(search_params)
         
         where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
         
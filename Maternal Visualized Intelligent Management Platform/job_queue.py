@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台导入任务队列
+导入任务保存在 import_jobs 表中，由固定大小的工作线程池执行，不占用请求线程。
+执行过程中按时间间隔把进度写回任务表，并通过 Socket.IO 推送 import_progress / import_finished 事件；
+支持取消排队中或执行中的任务（执行中的任务在当前批次提交后停止）。
+
+多个进程（多个 gunicorn 工作进程、flask shell 等）可以共用同一张任务表：
+- 工作线程用带 status 条件的 UPDATE 领取任务，同一任务只会被一个进程执行；
+- 执行中的任务由所在进程定期更新 heartbeat_at，取消请求写入 cancel_requested 列，
+  执行任务的进程在批次之间读取，因此取消请求可以由任意进程处理；
+- recover() 只在服务启动时显式调用（不在导入或创建队列时执行）：心跳超时的执行中任务
+  标记为失败，排队任务在上传文件仍存在时重新提交（已被其他进程领取的任务不会重复执行）。
+"""
+
+import os
+import json
+import uuid
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+import data_importer
+from utils.data_access import get_db, database_path
+
+logger = logging.getLogger(__name__)
+
+JOB_TABLE = 'import_jobs'
+
+# 任务状态
+QUEUED = 'queued'
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+# 默认工作线程数（SQLite 同一时间只有一个写事务，多个线程主要用于重叠文件解析）
+DEFAULT_MAX_WORKERS = 2
+
+# 进度写库和推送的最小间隔（秒）
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+# 执行中任务更新心跳的间隔（秒），以及心跳超过多久未更新视为所在进程已退出（秒）
+DEFAULT_HEARTBEAT_INTERVAL = 15.0
+DEFAULT_STALE_AFTER = 120.0
+
+# Socket.IO 事件名
+PROGRESS_EVENT = 'import_progress'
+FINISHED_EVENT = 'import_finished'
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+# 后来增加的列 {列名: 定义}，旧版本创建的任务表在第一次使用时补上
+ADDED_COLUMNS = {
+    'owner': 'TEXT',
+    'heartbeat_at': 'TIMESTAMP',
+    'cancel_requested': 'INTEGER DEFAULT 0'
+}
+
+
+def ensure_job_table(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {JOB_TABLE} (
+            id TEXT PRIMARY KEY,
+            filename TEXT,
+            data_type TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total_rows INTEGER,
+            processed INTEGER DEFAULT 0,
+            success INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            error_details_json TEXT,
+            message TEXT,
+            user_id INTEGER,
+            created_at TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            owner TEXT,
+            heartbeat_at TIMESTAMP,
+            cancel_requested INTEGER DEFAULT 0
+        )
+    ''')
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({JOB_TABLE})')}
+    for column, definition in ADDED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {JOB_TABLE} ADD COLUMN {column} {definition}')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{JOB_TABLE}_created_at ON {JOB_TABLE} (created_at)')
+    conn.commit()
+
+
+def job_to_dict(row) -> Dict[str, Any]:
+    """任务表中的一行转换为接口返回的任务信息"""
+    job = dict(row)
+    job['job_id'] = job.pop('id')
+    job.pop('file_path', None)
+    for column in ADDED_COLUMNS:
+        job.pop(column, None)
+    job['error_details'] = json.loads(job.pop('error_details_json') or '[]')
+    job['cancelled'] = job['status'] == CANCELLED
+    if job['status'] == COMPLETED:
+        job['percent'] = 100
+    elif job['total_rows']:
+        job['percent'] = min(99, int(job['processed'] * 100 / job['total_rows']))
+    else:
+        job['percent'] = None
+    return job
+
+
+class ImportJobQueue:
+    """
+    导入任务队列
+
+    Args:
+        database: 任务表和导入目标所在的逻辑数据库
+        max_workers: 工作线程数
+        socketio: 用于推送进度的 SocketIO 实例，为 None 时不推送
+        progress_interval: 进度写库和推送、读取取消标记的最小间隔（秒）
+        batch_rows: 每个事务写入的行数
+        heartbeat_interval: 执行中任务更新心跳的间隔（秒）
+        stale_after: 心跳超过该时间未更新的执行中任务在 recover() 时视为中断（秒）
+    """
+
+    def __init__(self, database: str = 'data', max_workers: int = DEFAULT_MAX_WORKERS, socketio=None,
+                 progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+                 batch_rows: int = data_importer.DEFAULT_BATCH_ROWS,
+                 heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+                 stale_after: float = DEFAULT_STALE_AFTER):
+        self.database = database
+        self.socketio = socketio
+        self.progress_interval = progress_interval
+        self.batch_rows = batch_rows
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        # 本队列实例的标识，写入所领取任务的 owner 列
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import-job')
+        self._cancel_requested = set()
+        self._running = set()
+        self._heartbeat = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._table_paths = set()
+
+    def _execute(self, sql: str, params=()) -> List[Any]:
+        conn = get_db(self.database)
+        try:
+            # 任务表在每个数据库文件第一次使用时创建
+            path = database_path(self.database)
+            if path not in self._table_paths:
+                ensure_job_table(conn)
+                self._table_paths.add(path)
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _update(self, job_id: str, **fields):
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(f'UPDATE {JOB_TABLE} SET {assignments} WHERE id = ?', list(fields.values()) + [job_id])
+
+    def _emit(self, event: str, job: Dict[str, Any]):
+        if self.socketio is None:
+            return
+        try:
+            self.socketio.emit(event, job)
+        except Exception as e:
+            logger.warning(f"推送导入进度失败: {e}")
+
+    def submit(self, path: str, data_type: str, filename: str = None, user_id: int = None) -> Dict[str, Any]:
+        """保存任务并排队执行，返回任务信息（任务结束后删除上传文件）"""
+        job_id = uuid.uuid4().hex
+        self._execute(f'''
+            INSERT INTO {JOB_TABLE} (id, filename, data_type, file_path, status, user_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (job_id, filename or os.path.basename(path), data_type, path, QUEUED, user_id, _now()))
+        self.executor.submit(self._run, job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute(f'SELECT * FROM {JOB_TABLE} WHERE id = ?', (job_id,))
+        return job_to_dict(rows[0]) if rows else None
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        rows = self._execute(f'SELECT * FROM {JOB_TABLE} ORDER BY created_at DESC, rowid DESC LIMIT ?', (limit,))
+        return [job_to_dict(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        取消任务：排队中的任务直接标记为已取消；执行中的任务写入取消标记，
+        执行该任务的进程（不一定是当前进程）在当前批次结束后停止
+        """
+        job = self.get(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+        # 一条语句同时处理两种状态，避免任务在两次更新之间被领取而漏掉取消请求
+        self._execute(f'''
+            UPDATE {JOB_TABLE} SET cancel_requested = 1,
+                status = CASE WHEN status = ? THEN ? ELSE status END,
+                message = CASE WHEN status = ? THEN ? ELSE message END,
+                finished_at = CASE WHEN status = ? THEN ? ELSE finished_at END
+            WHERE id = ? AND status IN (?, ?)
+        ''', (QUEUED, CANCELLED, QUEUED, '任务已取消', QUEUED, _now(), job_id, QUEUED, PROCESSING))
+        with self._lock:
+            if job_id in self._running:
+                self._cancel_requested.add(job_id)
+        job = self.get(job_id)
+        if job['status'] == CANCELLED:
+            self._emit(FINISHED_EVENT, job)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """删除已结束的任务记录"""
+        rows = self._execute(f'DELETE FROM {JOB_TABLE} WHERE id = ? AND status IN (?, ?, ?) RETURNING id',
+                             (job_id,) + FINISHED_STATUSES)
+        return bool(rows)
+
+    def recover(self) -> int:
+        """
+        服务启动时处理遗留的任务（由应用启动流程显式调用）
+
+        心跳超时（所在进程已退出）的执行中任务标记为失败，其他进程正在执行的任务不受影响；
+        排队任务在上传文件仍存在时重新提交，领取时的条件更新保证不会被多个进程重复执行。
+
+        Returns:
+            int: 重新提交的排队任务数
+        """
+        threshold = (datetime.now() - timedelta(seconds=self.stale_after)).strftime('%Y-%m-%d %H:%M:%S')
+        self._execute(f'''
+            UPDATE {JOB_TABLE} SET status = ?, message = ?, finished_at = ?
+            WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+        ''', (FAILED, '服务重启，导入中断（已提交的批次保留）', _now(), PROCESSING, threshold))
+        resubmitted = 0
+        for job_id, path in self._execute(f'SELECT id, file_path FROM {JOB_TABLE} WHERE status = ? ORDER BY created_at',
+                                          (QUEUED,)):
+            if os.path.exists(path):
+                self.executor.submit(self._run, job_id)
+                resubmitted += 1
+            else:
+                self._execute(f'''
+                    UPDATE {JOB_TABLE} SET status = ?, message = ?, finished_at = ? WHERE id = ? AND status = ?
+                ''', (FAILED, '上传文件已不存在', _now(), job_id, QUEUED))
+        return resubmitted
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancel_requested
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='import-job-heartbeat',
+                                                   daemon=True)
+                self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        """定期更新本队列执行中任务的心跳，没有执行中的任务时退出"""
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._lock:
+                if not self._running:
+                    self._heartbeat = None
+                    return
+            try:
+                self._execute(f'UPDATE {JOB_TABLE} SET heartbeat_at = ? WHERE owner = ? AND status = ?',
+                              (_now(), self.owner, PROCESSING))
+            except Exception as e:
+                logger.warning(f"更新导入任务心跳失败: {e}")
+        with self._lock:
+            self._heartbeat = None
+
+    def _run(self, job_id: str):
+        # 条件更新领取任务：只有状态仍为排队中时才能领取，多个进程同时提交同一任务时只有一个执行
+        now = _now()
+        rows = self._execute(f'''
+            UPDATE {JOB_TABLE} SET status = ?, started_at = ?, owner = ?, heartbeat_at = ?
+            WHERE id = ? AND status = ? RETURNING *
+        ''', (PROCESSING, now, self.owner, now, job_id, QUEUED))
+        if not rows:
+            # 已取消或已结束的任务清理上传文件；其他进程正在执行的任务不做处理
+            rows = self._execute(f'SELECT status, file_path FROM {JOB_TABLE} WHERE id = ?', (job_id,))
+            if rows and rows[0]['status'] in FINISHED_STATUSES:
+                self._finish_file(rows[0]['file_path'])
+            return
+        job = dict(rows[0])
+        with self._lock:
+            self._running.add(job_id)
+        self._start_heartbeat()
+
+        last_report = [0.0]
+
+        def report(stats):
+            if time.monotonic() - last_report[0] < self.progress_interval:
+                return
+            last_report[0] = time.monotonic()
+            self._update(job_id, processed=stats['processed'], success=stats['success'], errors=stats['errors'])
+            self._emit(PROGRESS_EVENT, self.get(job_id))
+
+        last_poll = [0.0]
+
+        def cancelled():
+            # 本进程收到的取消请求立即生效，其他进程写入的取消标记按进度间隔读取
+            if self._is_cancelled(job_id):
+                return True
+            if time.monotonic() - last_poll[0] < self.progress_interval:
+                return False
+            last_poll[0] = time.monotonic()
+            rows = self._execute(f'SELECT cancel_requested FROM {JOB_TABLE} WHERE id = ?', (job_id,))
+            return bool(rows and rows[0]['cancel_requested'])
+
+        conn = get_db(self.database)
+        try:
+            self._update(job_id, total_rows=data_importer.count_rows(job['file_path']))
+            self._emit(PROGRESS_EVENT, self.get(job_id))
+            stats = data_importer.run_import(job['file_path'], job['data_type'], conn, batch_rows=self.batch_rows,
+                                             progress=report, cancelled=cancelled)
+            if stats['cancelled']:
+                status, message = CANCELLED, f"任务已取消，已导入{stats['success']}条"
+            else:
+                status = COMPLETED
+                message = f"数据导入完成，成功{stats['success']}条，失败{stats['errors']}条"
+            self._update(job_id, status=status, message=message, processed=stats['processed'],
+                         success=stats['success'], errors=stats['errors'],
+                         error_details_json=json.dumps(stats['error_details'], ensure_ascii=False),
+                         finished_at=_now())
+        except data_importer.ImportFileError as e:
+            self._update(job_id, status=FAILED, message=str(e), finished_at=_now())
+        except Exception as e:
+            logger.error(f"导入任务{job_id}失败: {e}")
+            self._update(job_id, status=FAILED, message=f'导入失败: {e}', finished_at=_now())
+        finally:
+            conn.close()
+            with self._lock:
+                self._cancel_requested.discard(job_id)
+                self._running.discard(job_id)
+            self._finish_file(job['file_path'])
+        self._emit(FINISHED_EVENT, self.get(job_id))
+
+    @staticmethod
+    def _finish_file(path: Optional[str]):
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+        self._stopping.set()
+
+
+_queue: Optional[ImportJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def init_job_queue(socketio=None, **kwargs) -> ImportJobQueue:
+    """创建全局导入任务队列（应用启动时传入 socketio 以推送进度；遗留任务由启动流程调用 recover() 处理）"""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.shutdown(wait=False)
+        _queue = ImportJobQueue(socketio=socketio, **kwargs)
+        return _queue
+
+
+def get_job_queue() -> ImportJobQueue:
+    """获取全局导入任务队列，未初始化时创建一个不推送进度的队列"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ImportJobQueue()
+        return _queue
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轻量级模型格式
+将训练好的模型导出为只依赖 NumPy 的 .npz 文件（线性系数或展平的树数组），
+推理时无需加载 sklearn / xgboost / lightgbm，缩短冷启动时间并降低内存占用。
+
+支持的模型：
+- 线性模型：LogisticRegression 等具有 coef_ / intercept_ 的二分类模型
+- sklearn 树模型：DecisionTreeClassifier、RandomForestClassifier、ExtraTreesClassifier、
+  GradientBoostingClassifier
+- XGBoost（gbtree，binary:logistic）与 LightGBM（binary）分类器
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# 缺失值处理方式（与 LightGBM 的 missing_type 对应）
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+
+# LightGBM 判断零值缺失的阈值
+_ZERO_THRESHOLD = 1e-35
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class LightweightModel:
+    """
+    仅依赖 NumPy 的推理模型，接口与 sklearn 分类器一致（predict / predict_proba）
+    """
+
+    def __init__(self, arrays: Dict[str, Any]):
+        self.kind = str(arrays['kind'])
+        self.n_features = int(arrays['n_features'])
+        self.source_model = str(arrays.get('source_model', 'unknown'))
+
+        if self.kind == 'linear':
+            self.coef = np.asarray(arrays['coef'], dtype=float)
+            self.intercept = float(arrays['intercept'])
+        elif self.kind == 'tree_ensemble':
+            self.feature = np.asarray(arrays['feature'], dtype=np.int32)
+            self.threshold = np.asarray(arrays['threshold'], dtype=float)
+            self.left = np.asarray(arrays['left'], dtype=np.int32)
+            self.right = np.asarray(arrays['right'], dtype=np.int32)
+            self.value = np.asarray(arrays['value'], dtype=float)
+            self.default_left = np.asarray(arrays['default_left'], dtype=bool)
+            self.missing_type = np.asarray(arrays['missing_type'], dtype=np.int8)
+            self.roots = np.asarray(arrays['roots'], dtype=np.int32)
+            self.max_depth = int(arrays['max_depth'])
+            self.aggregation = str(arrays['aggregation'])
+            self.link = str(arrays['link'])
+            self.base = float(arrays['base'])
+            self.float32_inputs = bool(arrays['float32_inputs'])
+            self.strict_less = bool(arrays['strict_less'])
+        else:
+            raise ValueError(f"不支持的轻量级模型类型: {self.kind}")
+
+    @classmethod
+    def load(cls, path: str) -> 'LightweightModel':
+        """从 .npz 文件加载模型"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        version = int(arrays.get('format_version', 0))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的轻量级模型格式版本: {version}")
+        return cls(arrays)
+
+    def _decision(self, X: np.ndarray) -> np.ndarray:
+        """计算每条记录的原始输出（线性得分、树输出的均值或累加值）"""
+        if self.kind == 'linear':
+            return X @ self.coef + self.intercept
+
+        if self.float32_inputs:
+            # sklearn / XGBoost 在 float32 精度下比较阈值
+            X = X.astype(np.float32).astype(float)
+        n = X.shape[0]
+        rows = np.arange(n)[:, None]
+        # 所有记录在所有树上同时下行，迭代次数等于最大树深
+        nodes = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            x = X[rows, np.where(internal, feature, 0)]
+            missing_type = self.missing_type[nodes]
+            # 未记录缺失值处理方式的节点将 NaN 按 0 比较（与 LightGBM 一致）
+            x = np.where((missing_type == MISSING_NONE) & np.isnan(x), 0.0, x)
+
+            threshold = self.threshold[nodes]
+            go_left = x < threshold if self.strict_less else x <= threshold
+            is_missing = ((missing_type == MISSING_NAN) & np.isnan(x)) | \
+                         ((missing_type == MISSING_ZERO) & (np.isnan(x) | (np.abs(x) <= _ZERO_THRESHOLD)))
+            go_left = np.where(is_missing, self.default_left[nodes], go_left)
+
+            nodes = np.where(internal, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+
+        outputs = self.value[nodes]
+        if self.aggregation == 'mean':
+            return self.base + outputs.mean(axis=1)
+        return self.base + outputs.sum(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """返回形状为 (记录数, 2) 的类别概率"""
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"输入特征数量为 {X.shape[1]}，模型需要 {self.n_features} 个")
+        decision = self._decision(X)
+        if self.kind == 'linear' or self.link == 'logistic':
+            positive = _sigmoid(decision)
+        else:
+            positive = decision
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+
+class _TreeBuilder:
+    """将多棵树展平为统一的节点数组"""
+
+    def __init__(self):
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.value: List[float] = []
+        self.default_left: List[bool] = []
+        self.missing_type: List[int] = []
+        self.roots: List[int] = []
+        self.max_depth = 0
+
+    def add_tree(self, feature, threshold, left, right, value, default_left=None, missing_type=None):
+        """添加一棵树（节点编号为树内局部编号，叶子节点的 left/right 为 -1）"""
+        offset = len(self.feature)
+        count = len(feature)
+        left = np.asarray(left)
+        right = np.asarray(right)
+        is_leaf = left < 0
+
+        self.roots.append(offset)
+        self.feature.extend(np.where(is_leaf, -1, feature).tolist())
+        self.threshold.extend(np.asarray(threshold, dtype=float).tolist())
+        self.left.extend(np.where(is_leaf, -1, left + offset).tolist())
+        self.right.extend(np.where(is_leaf, -1, right + offset).tolist())
+        self.value.extend(np.asarray(value, dtype=float).tolist())
+        self.default_left.extend([False] * count if default_left is None else list(map(bool, default_left)))
+        self.missing_type.extend([MISSING_NONE] * count if missing_type is None else list(missing_type))
+
+        # 计算树深
+        depth = {0: 0}
+        for node in range(count):
+            if not is_leaf[node]:
+                depth[int(left[node])] = depth[node] + 1
+                depth[int(right[node])] = depth[node] + 1
+        self.max_depth = max(self.max_depth, max(depth.values()))
+
+    def to_arrays(self, aggregation: str, link: str, base: float,
+                  float32_inputs: bool, strict_less: bool) -> Dict[str, Any]:
+        return {
+            'kind': 'tree_ensemble',
+            'feature': np.asarray(self.feature, dtype=np.int32),
+            'threshold': np.asarray(self.threshold, dtype=float),
+            'left': np.asarray(self.left, dtype=np.int32),
+            'right': np.asarray(self.right, dtype=np.int32),
+            'value': np.asarray(self.value, dtype=float),
+            'default_left': np.asarray(self.default_left, dtype=bool),
+            'missing_type': np.asarray(self.missing_type, dtype=np.int8),
+            'roots': np.asarray(self.roots, dtype=np.int32),
+            'max_depth': self.max_depth,
+            'aggregation': aggregation,
+            'link': link,
+            'base': float(base),
+            'float32_inputs': float32_inputs,
+            'strict_less': strict_less
+        }
+
+
+def _sklearn_tree_arrays(tree, leaf_values) -> Dict[str, Any]:
+    arrays = {
+        'feature': tree.feature,
+        'threshold': tree.threshold,
+        'left': tree.children_left,
+        'right': tree.children_right,
+        'value': leaf_values
+    }
+    # sklearn >= 1.3 记录了缺失值进入的分支
+    missing_go_to_left = getattr(tree, 'missing_go_to_left', None)
+    if missing_go_to_left is not None:
+        arrays['default_left'] = missing_go_to_left
+        arrays['missing_type'] = [MISSING_NAN] * tree.node_count
+    return arrays
+
+
+def _export_sklearn_forest(model) -> Dict[str, Any]:
+    """决策树 / 随机森林：每棵树输出叶子节点的正类概率，取平均"""
+    estimators = getattr(model, 'estimators_', None) or [model]
+    builder = _TreeBuilder()
+    for estimator in estimators:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1)
+        positive = np.divide(counts[:, 1], totals, out=np.zeros_like(totals), where=totals > 0)
+        builder.add_tree(**_sklearn_tree_arrays(tree, positive))
+    return builder.to_arrays('mean', 'identity', 0.0, float32_inputs=True, strict_less=False)
+
+
+def _export_sklearn_gradient_boosting(model) -> Dict[str, Any]:
+    """GradientBoostingClassifier：初始值加上学习率乘以各回归树输出之和"""
+    if model.estimators_.shape[1] != 1:
+        raise ValueError("仅支持二分类的 GradientBoostingClassifier")
+    builder = _TreeBuilder()
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        builder.add_tree(**_sklearn_tree_arrays(tree, tree.value[:, 0, 0] * model.learning_rate))
+    base = float(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0])
+    return builder.to_arrays('sum', 'logistic', base, float32_inputs=True, strict_less=False)
+
+
+def _export_xgboost(model) -> Dict[str, Any]:
+    """XGBoost：从 JSON 模型读取树数组，叶子值保存在 split_conditions 中"""
+    config = json.loads(model.get_booster().save_raw('json'))
+    learner = config['learner']
+    if learner['gradient_booster']['name'] != 'gbtree' or learner['objective']['name'] != 'binary:logistic':
+        raise ValueError("仅支持 gbtree + binary:logistic 的 XGBoost 模型")
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    builder = _TreeBuilder()
+    for tree in learner['gradient_booster']['model']['trees']:
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32).astype(float)
+        left = np.asarray(tree['left_children'])
+        builder.add_tree(
+            feature=tree['split_indices'],
+            threshold=conditions,
+            left=left,
+            right=tree['right_children'],
+            value=np.where(left < 0, conditions, 0.0),
+            default_left=tree['default_left'],
+            missing_type=[MISSING_NAN] * len(left)
+        )
+    base = float(np.log(base_score / (1 - base_score)))
+    return builder.to_arrays('sum', 'logistic', base, float32_inputs=True, strict_less=True)
+
+
+def _export_lightgbm(model) -> Dict[str, Any]:
+    """LightGBM：从 dump_model 的嵌套树结构展平"""
+    booster = getattr(model, 'booster_', model)
+    dump = booster.dump_model()
+    if not str(dump.get('objective', '')).startswith('binary'):
+        raise ValueError("仅支持二分类的 LightGBM 模型")
+    missing_codes = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+    builder = _TreeBuilder()
+    for tree_info in dump['tree_info']:
+        feature, threshold, left, right, value, default_left, missing_type = [], [], [], [], [], [], []
+
+        def visit(node):
+            index = len(feature)
+            feature.append(0)
+            threshold.append(0.0)
+            left.append(-1)
+            right.append(-1)
+            value.append(0.0)
+            default_left.append(False)
+            missing_type.append(MISSING_NONE)
+            if 'leaf_value' in node or 'split_feature' not in node:
+                value[index] = float(node.get('leaf_value', 0.0))
+                return index
+            if node.get('decision_type', '<=') != '<=':
+                raise ValueError("不支持 LightGBM 类别特征分裂")
+            feature[index] = int(node['split_feature'])
+            threshold[index] = float(node['threshold'])
+            default_left[index] = bool(node.get('default_left', False))
+            missing_type[index] = missing_codes.get(node.get('missing_type', 'None'), MISSING_NONE)
+            left[index] = visit(node['left_child'])
+            right[index] = visit(node['right_child'])
+            return index
+
+        visit(tree_info['tree_structure'])
+        builder.add_tree(feature, threshold, left, right, value, default_left, missing_type)
+
+    aggregation = 'mean' if dump.get('average_output') else 'sum'
+    return builder.to_arrays(aggregation, 'logistic', 0.0, float32_inputs=False, strict_less=False)
+
+
+def convert_model(model) -> Dict[str, Any]:
+    """将训练好的模型转换为轻量级格式的数组字典"""
+    name = type(model).__name__
+    module = type(model).__module__
+
+    if module.startswith('xgboost'):
+        arrays = _export_xgboost(model)
+    elif module.startswith('lightgbm'):
+        arrays = _export_lightgbm(model)
+    elif name == 'GradientBoostingClassifier':
+        arrays = _export_sklearn_gradient_boosting(model)
+    elif hasattr(model, 'tree_') or name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        arrays = _export_sklearn_forest(model)
+    elif hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+        coef = np.asarray(model.coef_, dtype=float)
+        if coef.shape[0] != 1:
+            raise ValueError("仅支持二分类线性模型")
+        arrays = {'kind': 'linear', 'coef': coef[0], 'intercept': float(np.ravel(model.intercept_)[0])}
+    else:
+        raise ValueError(f"不支持导出的模型类型: {name}")
+
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is None:
+        n_features = int(arrays['feature'].max()) + 1 if arrays['kind'] == 'tree_ensemble' else len(arrays['coef'])
+    arrays['n_features'] = int(n_features)
+    arrays['source_model'] = name
+    arrays['format_version'] = FORMAT_VERSION
+    return arrays
+
+
+def export_model(model, path: str, X_check: Optional[np.ndarray] = None, tolerance: float = 1e-6) -> LightweightModel:
+    """
+    导出模型为 .npz 文件
+
+    Args:
+        model: 训练好的分类模型
+        path: 输出文件路径
+        X_check: 可选的校验数据，导出后对比原模型与轻量级模型的预测概率
+        tolerance: 允许的最大概率误差
+
+    Returns:
+        LightweightModel: 导出的轻量级模型
+    """
+    arrays = convert_model(model)
+    lightweight = LightweightModel(arrays)
+
+    if X_check is not None:
+        X_check = np.asarray(X_check, dtype=float)
+        expected = model.predict_proba(X_check)[:, 1]
+        actual = lightweight.predict_proba(X_check)[:, 1]
+        max_error = float(np.max(np.abs(expected - actual))) if len(X_check) else 0.0
+        if max_error > tolerance:
+            raise ValueError(f"轻量级模型与原模型预测不一致，最大误差 {max_error:.2e}")
+
+    np.savez_compressed(path, **{key: np.asarray(value) for key, value in arrays.items()})
+    return lightweight
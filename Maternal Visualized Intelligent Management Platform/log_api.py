@@ -1,6 +1,8 @@
 # 操作日志API
 from flask import Blueprint, request, jsonify, session
 import sqlite3
+from utils.data_access import get_db, database_path
+from utils.text_search import keyword_condition
 import os
 from datetime import datetime, timedelta
 import json
@@ -10,13 +12,12 @@ import uuid
 log_bp = Blueprint('log', __name__, url_prefix='/api/logs')
 
 # SQLite数据库配置
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+DB_PATH = database_path('data')
 
 def get_db_connection():
     """获取数据库连接"""
     try:
-        connection = sqlite3.connect(DB_PATH)
-        connection.row_factory = sqlite3.Row
+        connection = get_db('data')
         return connection
     except Exception as e:
         print(f"数据库连接错误: {e}")
@@ -96,8 +97,9 @@ def get_operation_logs():
             params.append(current_user_id)
         
         if search:
-            where_conditions.append("(username LIKE ? OR action LIKE ? OR module LIKE ?)")
-            params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+            condition, search_params = keyword_condition(conn, 'operation_logs', search)
+            where_conditions.append(condition)
+            params.extend(search_params)
         
         if action:
             where_conditions.append("action = ?")
@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
 import sqlite3
+from utils.data_access import get_db, database_path
 import os
 from datetime import datetime, timedelta
 import json
 import logging
 
+from risk_rule_engine import get_rule_table
+from utils import export_stream
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,115 +17,25 @@ logger = logging.getLogger(__name__)
 maternal_bp = Blueprint('maternal', __name__, url_prefix='/api/maternal')
 
 # SQLite数据库配置
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+DB_PATH = database_path('data')
 
 def get_db_connection():
     """获取数据库连接"""
     try:
-        connection = sqlite3.connect(DB_PATH)
-        connection.row_factory = sqlite3.Row
+        connection = get_db('data')
         return connection
     except Exception as e:
         logger.error(f"数据库连接失败: {e}")
         raise
 
 def calculate_risk_score(data):
-    """计算孕产妇健康风险评分"""
-    risk_score = 0
-    risk_factors = []
-    
-    # 年龄风险
-    age = int(data.get('age', 0))
-    if age >= 35:
-        risk_score += 20
-        risk_factors.append("高龄产妇")
-    elif age < 18:
-        risk_score += 15
-        risk_factors.append("低龄产妇")
-    
-    # 孕周风险
-    gestational_week = int(data.get('gestationalWeek', 0))
-    if gestational_week < 12:
-        risk_score += 5
-    elif gestational_week > 42:
-        risk_score += 15
-        risk_factors.append("过期妊娠")
-    
-    # BMI风险
-    height = float(data.get('height', 0))
-    weight = float(data.get('weight', 0))
-    if height > 0:
-        bmi = weight / ((height/100) ** 2)
-        if bmi < 18.5:
-            risk_score += 10
-            risk_factors.append("体重过轻")
-        elif bmi > 30:
-            risk_score += 15
-            risk_factors.append("肥胖")
-    
-    # 血压风险
-    vital_signs = data.get('vitalSigns', {})
-    systolic = int(vital_signs.get('systolic', 0))
-    diastolic = int(vital_signs.get('diastolic', 0))
-    if systolic >= 140 or diastolic >= 90:
-        risk_score += 20
-        risk_factors.append("高血压")
-    elif systolic >= 130 or diastolic >= 80:
-        risk_score += 10
-        risk_factors.append("血压偏高")
-    
-    # 病史风险
-    medical_history = data.get('medicalHistory', {})
-    chronic_diseases = medical_history.get('chronicDiseases', {})
-    if chronic_diseases.get('hypertension', 0) == 1:
-        risk_score += 15
-        risk_factors.append("慢性高血压")
-    if chronic_diseases.get('diabetes', 0) == 1:
-        risk_score += 15
-        risk_factors.append("糖尿病")
-    if chronic_diseases.get('cardiovascular', 0) == 1:
-        risk_score += 20
-        risk_factors.append("心血管疾病")
-    
-    # 妊娠史风险
-    pregnancy_history = medical_history.get('pregnancyHistory', {})
-    if pregnancy_history.get('preeclampsia', 0) == 1:
-        risk_score += 25
-        risk_factors.append("子痫前期史")
-    if pregnancy_history.get('gestationalDiabetes', 0) == 1:
-        risk_score += 15
-        risk_factors.append("妊娠期糖尿病史")
-    if pregnancy_history.get('preterm', 0) == 1:
-        risk_score += 10
-        risk_factors.append("早产史")
-    
-    # 生活习惯风险
-    lifestyle = data.get('lifestyle', {})
-    if lifestyle.get('smoking', 0) >= 1:
-        risk_score += 15
-        risk_factors.append("吸烟")
-    if lifestyle.get('alcohol', 0) >= 1:
-        risk_score += 10
-        risk_factors.append("饮酒")
-    if lifestyle.get('stressLevel', 0) >= 3:
-        risk_score += 10
-        risk_factors.append("高压力水平")
-    
-    # 限制风险评分在0-100范围内
-    risk_score = min(100, max(0, risk_score))
-    
-    # 确定风险等级
-    if risk_score <= 30:
-        risk_level = "低风险"
-    elif risk_score <= 60:
-        risk_level = "中风险"
-    else:
-        risk_level = "高风险"
+    """计算孕产妇健康风险评分（规则定义见 risk_rules.json 中的 maternal_assessment）"""
+    evaluation = get_rule_table()['maternal_assessment'].evaluate([data])
     
     return {
-        "riskScore": risk_score,
-        "riskLevel": risk_level,
-        "riskFactors": risk_factors
+        "riskScore": int(evaluation.score(0)),
+        "riskLevel": evaluation.level(0),
+        "riskFactors": evaluation.factor_names(0)
     }
 
 def generate_complications(risk_score, data):
@@ -511,22 +425,14 @@ def save_prediction():
 
 @maternal_bp.route('/export', methods=['GET'])
 def export_predictions():
-    """导出预测数据"""
+    """导出预测数据（按块读取游标流式生成，format 为 csv（默认）/ excel / parquet / arrow）"""
     try:
-        import pandas as pd
-        import tempfile
-        from flask import send_file
-        
         # 获取查询参数
         format_type = request.args.get('format', 'csv')
         start_date = request.args.get('startDate', '')
         end_date = request.args.get('endDate', '')
         risk_level = request.args.get('riskLevel', '')
         
-        # 连接数据库
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         # 构建查询条件
         where_conditions = []
         params = []
@@ -552,44 +458,31 @@ def export_predictions():
         FROM maternal_predictions{where_clause}
         ORDER BY created_at DESC
         """
-        cursor.execute(query, params)
-        data = [dict(row) for row in cursor.fetchall()]
+        format_type = format_type.lower()
+        if format_type not in export_stream.FORMATS:
+            return jsonify({
+                'message': f'不支持的导出格式: {format_type}',
+                'code': 400,
+                'data': None
+            }), 400
+        if format_type in export_stream.COLUMNAR_FORMATS and not export_stream.columnar_available():
+            return jsonify({
+                'message': '服务器未安装 pyarrow，无法导出该格式',
+                'code': 400,
+                'data': None
+            }), 400
         
-        cursor.close()
-        connection.close()
+        rows = export_stream.query_rows('data', query, params)
         
-        if not data:
+        if rows is None:
             return jsonify({
                 'message': '没有数据可导出',
                 'code': 404,
                 'data': None
             }), 404
         
-        # 转换为DataFrame
-        df = pd.DataFrame(data)
-        
-        # 创建临时文件
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        if format_type.lower() == 'excel':
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-            df.to_excel(temp_file.name, index=False)
-            filename = f'maternal_predictions_{timestamp}.xlsx'
-            mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        else:
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-            df.to_csv(temp_file.name, index=False)
-            filename = f'maternal_predictions_{timestamp}.csv'
-            mimetype = 'text/csv'
-        
-        temp_file.close()
-        
-        return send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name=filename,
-            mimetype=mimetype
-        )
+        return export_stream.export_response(rows, format_type, f'maternal_predictions_{timestamp}')
         
     except Exception as e:
         logger.error(f"导出预测数据失败: {e}")
@@ -6,9 +6,10 @@
 提供RESTful API接口，用于孕产妇风险预测，集成了完整的机器学习预测流程
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import os
 import json
+import itertools
 from datetime import datetime
 import logging
 from typing import Dict, Any, List, Tuple
@@ -21,7 +22,7 @@ logging.basicConfig(
 logger = logging.getLogger("maternal_risk_api")
 
 # 导入必要的模块和组件
-from maternal_risk_predictor import MaternalRiskPredictor
+from maternal_risk_predictor import SharedPredictor, predictor_registry
 
 # 简化版组件类定义
 class SimpleDataPreprocessor:
@@ -116,7 +117,8 @@ class SimpleExceptionHandler:
 maternal_risk_bp = Blueprint('maternal_risk_prediction_bp', __name__, url_prefix='/api/maternal_risk')
 
 # 初始化简化的组件
-predictor = MaternalRiskPredictor()
+# 预测器为进程级共享实例，模型文件更新后自动热加载
+predictor = SharedPredictor(predictor_registry)
 preprocessor = SimpleDataPreprocessor()
 model_manager = SimpleModelManager()
 explainer = SimpleModelExplainer()
@@ -169,6 +171,7 @@ def health_check():
             'preterm_birth': ml_available_preterm
         },
         'active_model_versions': active_versions,
+        'prediction_cache': predictor.get_cache_stats(),
         'components_ready': all([
             preprocessor is not None,
             model_manager is not None,
@@ -753,6 +756,145 @@ def predict_comprehensive():
         
         logger.error(f"[{request_id}] 综合风险预测请求处理失败: {str(e)}")
         return jsonify(error_response), 500
+
+
+# 批量预测配置
+BATCH_MAX_RECORDS = 100000
+BATCH_CHUNK_SIZE = 5000
+BATCH_REQUIRED_FIELDS = ['age', 'gestational_weeks', 'systolic_pressure', 'diastolic_pressure']
+BATCH_VALUE_RANGES = {
+    'age': {'min': 12, 'max': 60},
+    'gestational_weeks': {'min': 0, 'max': 44},
+    'systolic_pressure': {'min': 60, 'max': 250},
+    'diastolic_pressure': {'min': 40, 'max': 150}
+}
+
+def _validate_batch_record(record):
+    """
+    校验批量预测中的单条记录
+    
+    Returns:
+        str or None: 错误信息，校验通过时返回None
+    """
+    if not isinstance(record, dict):
+        return '记录必须是JSON对象'
+    for field in BATCH_REQUIRED_FIELDS:
+        value = record.get(field)
+        if value is None:
+            return f'缺少必填字段: {field}'
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f'字段 {field} 必须是数字'
+        value_range = BATCH_VALUE_RANGES[field]
+        if not value_range['min'] <= value <= value_range['max']:
+            return f"字段 {field} 超出范围 [{value_range['min']}, {value_range['max']}]"
+    return None
+
+def _iter_batch_records():
+    """
+    从请求体中逐条读取待预测记录
+    
+    支持 JSON 数组（或 {"records": [...]}）与 NDJSON（每行一个JSON对象）。
+    
+    Yields:
+        (record, error): 解析成功时error为None，解析失败时record为None
+    """
+    content_type = (request.content_type or '').lower()
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f'JSON解析失败: {e}'
+        return
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        raise ValueError('请求体必须是JSON数组、包含records字段的对象或NDJSON')
+    for record in data:
+        yield record, None
+
+# 批量综合风险预测端点
+@maternal_risk_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    批量综合风险评估端点
+    
+    使用向量化预测路径一次性评估多名患者，结果以NDJSON流式返回，
+    每行对应一条输入记录（按输入顺序），单条记录的错误在对应行中返回。
+    """
+    request_id = datetime.now().strftime("req_%Y%m%d_%H%M%S_%f")
+    # 整个批次使用同一预测器实例，避免中途热加载导致结果来自不同模型版本
+    batch_predictor = predictor_registry.get()
+    model_version = model_manager.get_active_model_version('preeclampsia')
+    
+    records = _iter_batch_records()
+    # 提前读取首条记录，使请求体格式错误能以400返回而非中断数据流
+    try:
+        first = next(records, None)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': {'message': str(e)}}), 400
+    
+    logger.info(f"[{request_id}] 开始处理批量综合风险预测请求")
+    
+    def generate():
+        stats = {'total': 0, 'succeeded': 0, 'failed': 0}
+        pending = []
+        
+        def flush():
+            valid = [(index, record) for index, record, error in pending if error is None]
+            results = batch_predictor.predict_comprehensive_batch([record for _, record in valid])
+            predicted = dict(zip((index for index, _ in valid), results))
+            lines = []
+            for index, record, error in pending:
+                line = {'index': index}
+                if isinstance(record, dict) and 'id' in record:
+                    line['id'] = record['id']
+                if error is None:
+                    line['success'] = True
+                    line.update(predicted[index])
+                    stats['succeeded'] += 1
+                else:
+                    line['success'] = False
+                    line['error'] = error
+                    stats['failed'] += 1
+                lines.append(json.dumps(line, ensure_ascii=False))
+            pending.clear()
+            return '\n'.join(lines) + '\n'
+        
+        truncated = False
+        stream = records if first is None else itertools.chain([first], records)
+        for record, error in stream:
+            if stats['total'] >= BATCH_MAX_RECORDS:
+                truncated = True
+                break
+            if error is None:
+                error = _validate_batch_record(record)
+            pending.append((stats['total'], record, error))
+            stats['total'] += 1
+            if len(pending) >= BATCH_CHUNK_SIZE:
+                yield flush()
+        if pending:
+            yield flush()
+        if truncated:
+            yield json.dumps({
+                'index': stats['total'],
+                'success': False,
+                'error': f'超出单次批量预测上限 {BATCH_MAX_RECORDS} 条，其余记录未处理'
+            }, ensure_ascii=False) + '\n'
+        
+        logger.info(f"[{request_id}] 批量综合风险预测完成，共 {stats['total']} 条，"
+                    f"成功 {stats['succeeded']} 条，失败 {stats['failed']} 条")
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Request-ID'] = request_id
+    response.headers['X-Model-Version'] = model_version
+    return response
+
 @maternal_risk_bp.route('/train/models', methods=['POST'])
 def train_models():
     """训练所有模型"""
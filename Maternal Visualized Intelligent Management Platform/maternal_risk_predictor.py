@@ -7,13 +7,90 @@
 """
 
 import numpy as np
-import pandas as pd
 from typing import Dict, Any, List
 import os
 import json
-import joblib
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from risk_rule_engine import get_rule_table
+from lightweight_models import LightweightModel
+
+
+class PredictionCache:
+    """
+    有界的 LRU/TTL 预测缓存（线程安全）
+    
+    缓存模型输出的风险概率，键为 (风险类型, 模型版本, 特征向量)。
+    超过容量时淘汰最久未使用的条目，超过有效期的条目在读取时失效。
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        """
+        Args:
+            max_size: 最大缓存条目数，0 表示禁用缓存
+            ttl: 条目有效期（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """读取缓存，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        """写入缓存，超过容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """清空缓存（计数器保留）"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
 class MaternalRiskPredictor:
     """
     孕产妇健康风险预测器
@@ -21,15 +98,28 @@ class MaternalRiskPredictor:
     支持机器学习模型和规则引擎双模式
     """
     
-    def __init__(self):
+    RISK_TYPES = ('gestational_diabetes', 'preeclampsia', 'preterm_birth')
+    
+    def __init__(self, models_dir: str = 'models', cache_size: int = 10000, cache_ttl: float = 300.0):
         """
         初始化预测器，加载机器学习模型
+        
+        Args:
+            models_dir: 模型文件所在目录
+            cache_size: 预测缓存的最大条目数，0 表示禁用缓存
+            cache_ttl: 预测缓存条目的有效期（秒）
         """
+        self.models_dir = models_dir
+        # 规则引擎回退预测和风险因素识别共用的规则表
+        self.rule_table = get_rule_table()
+        # 模型输出缓存；热加载会创建新的预测器实例，旧缓存随之失效
+        self.prediction_cache = PredictionCache(max_size=cache_size, ttl=cache_ttl)
         self.models = {}
         self.model_info = {}
         self.features = {}
         self.preprocessors = {}
-        self.last_used_ml = {}
+        # 每个线程独立的"最近一次预测是否使用了模型"标记，见 last_used_ml
+        self._local = threading.local()
         # 添加默认风险阈值配置
         self.risk_thresholds = {
             'preeclampsia': {
@@ -46,12 +136,54 @@ class MaternalRiskPredictor:
             }
         }
         self.load_models()
+        self.model_version = self._resolve_model_version()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取预测缓存的命中、未命中和淘汰计数"""
+        stats = self.prediction_cache.stats()
+        stats['model_version'] = self.model_version
+        return stats
+    
+    def _cache_key(self, risk_type: str, feature_row) -> tuple:
+        """预测缓存键：风险类型、模型版本和预处理后的特征向量"""
+        return (risk_type, self.model_version, tuple(np.asarray(feature_row, dtype=float).tolist()))
+    
+    def _resolve_model_version(self) -> str:
+        """
+        生成当前预测器的模型版本标识，用于判断已保存的评分是否过期
+        
+        未加载模型的风险类型记为规则表标识（规则表版本和内容摘要），使用模型的风险类型在模型版本后
+        附加规则表标识（风险因素由规则表识别）。模型文件增删、version_info.json 更新或 risk_rules.json
+        修改都会改变该标识。
+        """
+        version_info = {}
+        version_file = os.path.join(self.models_dir, 'version_info.json')
+        if os.path.exists(version_file):
+            try:
+                with open(version_file, 'r', encoding='utf-8') as f:
+                    version_info = json.load(f)
+            except Exception as e:
+                print(f"读取模型版本信息失败: {e}")
+        
+        rules = self.rule_table.tag
+        parts = []
+        for risk_type in ['gestational_diabetes', 'preeclampsia', 'preterm_birth']:
+            if risk_type not in self.models:
+                parts.append(f'{risk_type}:{rules}')
+                continue
+            # 兼容 train_risk_models.py 写入的全局版本格式和按风险类型记录的格式
+            if 'version' in version_info:
+                version = f"{version_info['version']}@{version_info.get('updated_at', '')}"
+            else:
+                version = version_info.get(risk_type, {}).get('active_version', 'unknown')
+            parts.append(f'{risk_type}:{version}+{rules}')
+        return ';'.join(parts)
     
     def load_models(self):
         """
         加载预训练的机器学习模型
         """
-        models_dir = 'models'
+        models_dir = self.models_dir
         
         # 默认特征列表 - 确保每个风险类型都有特征配置，使用与测试用例匹配的字段名
         default_features = {
@@ -75,12 +207,12 @@ class MaternalRiskPredictor:
                 # 初始化默认特征
                 self.features[risk_type] = default_features[risk_type]
                 
-                # 加载模型文件
-                model_file = os.path.join(models_dir, f'{risk_type}_model.joblib')
+                # 加载模型文件（优先使用仅依赖 NumPy 的 .npz 轻量级格式）
+                model_file = self._find_model_file(models_dir, risk_type)
                 
-                if os.path.exists(model_file):
+                if model_file is not None:
                     try:
-                        model = joblib.load(model_file)
+                        model = self._load_model_file(model_file)
                         # 检查模型是否有必要的方法
                         if hasattr(model, 'predict') and hasattr(model, 'predict_proba'):
                             self.models[risk_type] = model
@@ -119,6 +251,7 @@ class MaternalRiskPredictor:
                 preprocessor_path = os.path.join(models_dir, f'{risk_type}_preprocessor.joblib')
                 if os.path.exists(preprocessor_path):
                     try:
+                        import joblib
                         preprocessor = joblib.load(preprocessor_path)
                         self.preprocessors[risk_type] = preprocessor
                     except Exception as e:
@@ -133,6 +266,43 @@ class MaternalRiskPredictor:
                 self.features[risk_type] = default_features[risk_type]
                 self.last_used_ml[risk_type] = False
     
+    @property
+    def last_used_ml(self) -> Dict[str, bool]:
+        """
+        当前线程最近一次预测是否使用了机器学习模型 {风险类型: bool}
+
+        预测器实例在进程内共享，该标记按线程分开保存，并发请求之间互不影响；
+        新代码应直接读取预测结果中的 using_ml 字段。
+        """
+        flags = getattr(self._local, 'flags', None)
+        if flags is None:
+            flags = self._local.flags = {}
+        return flags
+    
+    @staticmethod
+    def _find_model_file(models_dir, risk_type):
+        """
+        查找模型文件，.npz 轻量级格式优先于 .joblib
+        
+        Returns:
+            str: 模型文件路径，不存在时返回None
+        """
+        for suffix in ('.npz', '.joblib'):
+            model_file = os.path.join(models_dir, f'{risk_type}_model{suffix}')
+            if os.path.exists(model_file):
+                return model_file
+        return None
+    
+    @staticmethod
+    def _load_model_file(model_file):
+        """
+        加载模型文件，只有 .joblib 格式才导入 joblib（及其依赖的 sklearn 等库）
+        """
+        if model_file.endswith('.npz'):
+            return LightweightModel.load(model_file)
+        import joblib
+        return joblib.load(model_file)
+    
     def preprocess_input(self, patient_data, risk_type):
         """
         预处理输入数据，使其符合模型要求
@@ -150,38 +320,52 @@ class MaternalRiskPredictor:
                 print(f"未找到 {risk_type} 的特征配置")
                 return None
             
-            # 创建特征数据框
-            df = pd.DataFrame([patient_data])
-            
-            # 确保所有需要的特征都存在
-            input_features = []
-            for feature in self.features[risk_type]:
-                if feature in df.columns and pd.notna(df[feature].values[0]):
-                    # 确保值是数字类型
-                    try:
-                        value = float(df[feature].values[0])
-                        if not np.isnan(value):
-                            input_features.append(value)
-                        else:
-                            input_features.append(0.0)  # 替换nan为默认值
-                    except (ValueError, TypeError):
-                        input_features.append(0.0)  # 替换非数字为默认值
-                else:
-                    input_features.append(0.0)  # 默认值
+            # 与批量预测共用同一套特征构建逻辑，保证单条与批量结果一致
+            features_array = self._build_feature_matrix([patient_data], risk_type)
             
             # 确保至少有一个有效特征
-            if not input_features:
+            if features_array.size == 0:
                 print("没有有效的特征可用")
                 return None
             
-            # 转换为numpy数组并重塑为2D数组
-            features_array = np.array(input_features, dtype=float).reshape(1, -1)
             return features_array
         except Exception as e:
             print(f"预处理特征时出错: {e}")
             # 返回默认特征数组
             return np.zeros((1, len(self.features.get(risk_type, []))), dtype=float)
     
+    @staticmethod
+    def _coerce_feature_value(value) -> float:
+        """
+        将单个特征值转换为浮点数，缺失、非数字或NaN均替换为0.0
+        """
+        if value is None:
+            return 0.0
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            return 0.0
+        return 0.0 if np.isnan(value) else value
+    
+    def _build_feature_matrix(self, records: List[Dict[str, Any]], risk_type: str) -> np.ndarray:
+        """
+        为一批患者构建特征矩阵
+        
+        Args:
+            records: 患者原始数据列表
+            risk_type: 风险类型
+            
+        Returns:
+            np.ndarray: 形状为 (记录数, 特征数) 的浮点矩阵
+        """
+        features = self.features.get(risk_type, [])
+        coerce = self._coerce_feature_value
+        matrix = np.array(
+            [[coerce(record.get(feature)) for feature in features] for record in records],
+            dtype=float
+        )
+        return matrix.reshape(len(records), len(features))
+    
     def is_ml_available(self, model_type: str = None) -> bool:
         """
         检查机器学习模型是否可用
@@ -236,33 +420,22 @@ class MaternalRiskPredictor:
             
             # 预测概率 - 添加try-except捕获特征数量不匹配的错误
             try:
-                probability = model.predict_proba(input_data)[0][1]
+                cache_key = self._cache_key(risk_type, input_data[0])
+                probability = self.prediction_cache.get(cache_key)
+                if probability is None:
+                    probability = model.predict_proba(input_data)[0][1]
+                    self.prediction_cache.put(cache_key, probability)
                 
                 # 转换为风险等级
-                if probability >= 0.7:
-                    risk_level = '高风险'
-                elif probability >= 0.4:
-                    risk_level = '中风险'
-                else:
-                    risk_level = '低风险'
+                risk_level = self._get_risk_level(probability)
                 
                 # 获取风险因素
                 risk_factors = self._identify_risk_factors(patient_data, risk_type)
                 
-                # 获取建议
-                recommendations = self._get_recommendations(risk_type)
-                
                 # 设置使用了机器学习的标记
                 self.last_used_ml[risk_type] = True
                 
-                return {
-                    'risk_type': risk_type,
-                    'risk_level': risk_level,
-                    'risk_probability': round(probability, 2),
-                    'top_risk_factors': risk_factors,
-                    'recommendations': recommendations,
-                    'model_type': info['model_type']
-                }
+                return self._format_ml_result(risk_type, probability, risk_level, risk_factors, info)
             except ValueError as e:
                 # 捕获特征数量不匹配的错误
                 if "features as input" in str(e) or "维度不匹配" in str(e):
@@ -278,144 +451,64 @@ class MaternalRiskPredictor:
             self.last_used_ml[risk_type] = False
             return None
     
-    def _predict_gestational_diabetes_rules(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
-        """基于规则的妊娠期糖尿病风险预测（备用方法）"""
-        # 基于BMI、血糖和年龄计算风险，确保转换为数值类型
-        try:
-            bmi = float(patient_data.get('bmi', 22))
-        except (ValueError, TypeError):
-            bmi = 22
-        try:
-            glucose_level = float(patient_data.get('glucose_level', 90))
-        except (ValueError, TypeError):
-            glucose_level = 90
-        try:
-            age = int(patient_data.get('age', 30))
-        except (ValueError, TypeError):
-            age = 30
-        
-        # 生成有意义的风险因素
-        risk_factors = []
-        if bmi > 28:
-            risk_factors.append({'name': '体重指数过高', 'importance': 0.7})
-        if glucose_level > 100:
-            risk_factors.append({'name': '血糖水平偏高', 'importance': 0.8})
-        if age > 35:
-            risk_factors.append({'name': '高龄产妇', 'importance': 0.5})
-        
-        # 计算基于规则的风险概率
-        risk_probability = 0.15  # 基础风险
-        if bmi > 28:
-            risk_probability += 0.3
-        if glucose_level > 100:
-            risk_probability += 0.35
-        if age > 35:
-            risk_probability += 0.2
-        
-        # 确保概率在0-1范围内
-        risk_probability = min(0.95, max(0.05, risk_probability))
-        # 保留2位小数
-        risk_probability = round(risk_probability, 2)
-        
+    def _format_ml_result(self, risk_type, probability, risk_level, risk_factors, info):
+        """
+        组装机器学习预测结果（单条与批量预测共用）
+        """
         return {
-            'risk_type': 'gestational_diabetes',
-            'risk_level': '高风险' if risk_probability >= 0.7 else ('中风险' if risk_probability >= 0.4 else '低风险'),
-            'risk_probability': risk_probability,
+            'risk_type': risk_type,
+            'risk_level': risk_level,
+            'risk_probability': round(probability, 2),
             'top_risk_factors': risk_factors,
-            'recommendations': ['保持健康饮食', '适当运动', '定期监测血糖'],
-            'model_type': 'rule_based'
+            'recommendations': self._get_recommendations(risk_type),
+            'model_type': info['model_type'],
+            'using_ml': True
         }
     
-    def _predict_preeclampsia_rules(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
-        """基于规则的子痫前期风险预测（备用方法）"""
-        # 基于血压计算风险因素，确保转换为数值类型
-        try:
-            blood_pressure = float(patient_data.get('blood_pressure', 120))
-        except (ValueError, TypeError):
-            blood_pressure = 120
-        try:
-            age = int(patient_data.get('age', 30))
-        except (ValueError, TypeError):
-            age = 30
-        
-        # 生成有意义的风险因素
-        risk_factors = []
-        if blood_pressure > 140:
-            risk_factors.append({'name': '血压偏高', 'importance': 0.8})
-        if age > 40:
-            risk_factors.append({'name': '高龄产妇', 'importance': 0.6})
-        
-        # 计算基于规则的风险概率
-        risk_probability = 0.2  # 基础风险
-        if blood_pressure > 140:
-            risk_probability += 0.3
-        if age > 40:
-            risk_probability += 0.2
-        
-        # 确保概率在0-1范围内
-        risk_probability = min(0.95, max(0.05, risk_probability))
-        # 保留2位小数
-        risk_probability = round(risk_probability, 2)
+    def _predict_with_rules(self, risk_type: str, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        使用规则引擎进行预测（备用方法）
         
-        return {
-            'risk_type': 'preeclampsia',
-            'risk_level': '高风险' if risk_probability >= 0.7 else ('中风险' if risk_probability >= 0.4 else '低风险'),
-            'risk_probability': risk_probability,
-            'top_risk_factors': risk_factors,
-            'recommendations': ['请咨询医生获取专业建议', '定期进行产检', '注意监测血压变化'],
-            'model_type': 'rule_based'
-        }
+        Args:
+            risk_type: 风险类型
+            patient_data: 患者数据
+            
+        Returns:
+            基于规则的风险评估结果
+        """
+        return self._predict_batch_with_rules(risk_type, [patient_data])[0]
     
-    def _predict_preterm_birth_rules(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
-        """基于规则的早产风险预测（备用方法）"""
-        # 基于孕周和血压计算风险，确保转换为数值类型
-        try:
-            pregnancy_weeks = float(patient_data.get('pregnancy_weeks', 28))
-        except (ValueError, TypeError):
-            pregnancy_weeks = 28
-        try:
-            blood_pressure = float(patient_data.get('blood_pressure', 120))
-        except (ValueError, TypeError):
-            blood_pressure = 120
-        
-        # 生成有意义的风险因素
-        risk_factors = []
-        if pregnancy_weeks < 24:
-            risk_factors.append({'name': '孕周较小', 'importance': 0.6})
-        if blood_pressure > 140:
-            risk_factors.append({'name': '血压偏高', 'importance': 0.5})
-        if patient_data.get('previous_preterm', 0) == 1:
-            risk_factors.append({'name': '既往早产史', 'importance': 0.7})
-        
-        # 计算基于规则的风险概率
-        risk_probability = 0.1  # 基础风险
-        if pregnancy_weeks < 24:
-            risk_probability += 0.3
-        if blood_pressure > 140:
-            risk_probability += 0.2
-        if patient_data.get('previous_preterm', 0) == 1:
-            risk_probability += 0.3
+    def _predict_batch_with_rules(self, risk_type: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        使用规则引擎批量预测，规则定义见 risk_rules.json，整批数据一次向量化求值
         
-        # 确保概率在0-1范围内
-        risk_probability = min(0.95, max(0.05, risk_probability))
-        # 保留2位小数
-        risk_probability = round(risk_probability, 2)
+        字段别名（blood_sugar / glucose_level、blood_pressure / systolic_pressure 等）
+        由规则表统一解析，与风险因素识别共用同一套规则。
+        """
+        if risk_type not in self.RISK_TYPES:
+            raise ValueError(f"不支持的风险类型: {risk_type}")
+        self.last_used_ml[risk_type] = False
         
-        return {
-            'risk_type': 'preterm_birth',
-            'risk_level': '高风险' if risk_probability >= 0.7 else ('中风险' if risk_probability >= 0.4 else '低风险'),
-            'risk_probability': risk_probability,
-            'top_risk_factors': risk_factors,
-            'recommendations': ['避免剧烈活动', '保持充分休息', '定期产检监测宫颈长度'],
-            'model_type': 'rule_based'
-        }
+        rule_set = self.rule_table[risk_type]
+        evaluation = rule_set.evaluate(records)
+        scores = evaluation.scores.tolist()
+        levels = evaluation.levels.tolist()
+        return [{
+            'risk_type': risk_type,
+            'risk_level': levels[i],
+            'risk_probability': scores[i],
+            'top_risk_factors': evaluation.factors(i),
+            'recommendations': list(rule_set.recommendations),
+            'model_type': 'rule_based',
+            'using_ml': False
+        } for i in range(len(evaluation))]
     
-    def predict_gestational_diabetes_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
-        """预测妊娠期糖尿病风险"""
+    def _predict_single(self, risk_type: str, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+        """单条风险预测：优先使用机器学习模型，失败时回退到规则引擎"""
         try:
             # 首先尝试使用机器学习模型
-            if 'gestational_diabetes' in self.models:
-                ml_result = self._predict_with_ml('gestational_diabetes', patient_data)
+            if risk_type in self.models:
+                ml_result = self._predict_with_ml(risk_type, patient_data)
                 # 检查机器学习预测是否返回了有效结果
                 if ml_result is not None:
                     return ml_result
@@ -423,101 +516,109 @@ class MaternalRiskPredictor:
                 print("机器学习预测返回None，回退到基于规则的方法")
             
             # 回退到基于规则的方法
-            self.last_used_ml['gestational_diabetes'] = False
-            # 确保使用与测试用例匹配的字段名
-            # 如果blood_sugar存在，将其赋值给glucose_level用于规则预测
-            if 'blood_sugar' in patient_data:
-                patient_data_copy = patient_data.copy()
-                patient_data_copy['glucose_level'] = patient_data['blood_sugar']
-                return self._predict_gestational_diabetes_rules(patient_data_copy)
-            return self._predict_gestational_diabetes_rules(patient_data)
+            return self._predict_with_rules(risk_type, patient_data)
                 
         except Exception as e:
             # 如果机器学习预测失败，使用基于规则的方法
             print(f"机器学习预测失败，使用基于规则的方法: {e}")
-            self.last_used_ml['gestational_diabetes'] = False
-            # 确保使用与测试用例匹配的字段名
-            if 'blood_sugar' in patient_data:
-                patient_data_copy = patient_data.copy()
-                patient_data_copy['glucose_level'] = patient_data['blood_sugar']
-                return self._predict_gestational_diabetes_rules(patient_data_copy)
-            return self._predict_gestational_diabetes_rules(patient_data)
+            return self._predict_with_rules(risk_type, patient_data)
+    
+    def predict_gestational_diabetes_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
+        """预测妊娠期糖尿病风险"""
+        return self._predict_single('gestational_diabetes', patient_data)
     
     def predict_preeclampsia_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """预测子痫前期风险"""
-        try:
-            # 首先尝试使用机器学习模型
-            if 'preeclampsia' in self.models:
-                ml_result = self._predict_with_ml('preeclampsia', patient_data)
-                # 检查机器学习预测是否返回了有效结果
-                if ml_result is not None:
-                    return ml_result
-                # 如果机器学习预测返回None，回退到基于规则的方法
-                print("机器学习预测返回None，回退到基于规则的方法")
-            
-            # 回退到基于规则的方法
-            self.last_used_ml['preeclampsia'] = False
-            # 确保使用与规则匹配的字段名
-            patient_data_copy = patient_data.copy()
-            # 如果有收缩压和舒张压，计算平均血压作为blood_pressure
-            if 'systolic_pressure' in patient_data and 'diastolic_pressure' in patient_data:
-                patient_data_copy['blood_pressure'] = (patient_data['systolic_pressure'] + patient_data['diastolic_pressure']) / 2
-            elif 'systolic_pressure' in patient_data:
-                patient_data_copy['blood_pressure'] = patient_data['systolic_pressure']
-            return self._predict_preeclampsia_rules(patient_data_copy)
-                
-        except Exception as e:
-            # 如果机器学习预测失败，使用基于规则的方法
-            print(f"机器学习预测失败，使用基于规则的方法: {e}")
-            self.last_used_ml['preeclampsia'] = False
-            # 确保使用与规则匹配的字段名
-            patient_data_copy = patient_data.copy()
-            # 如果有收缩压和舒张压，计算平均血压作为blood_pressure
-            if 'systolic_pressure' in patient_data and 'diastolic_pressure' in patient_data:
-                patient_data_copy['blood_pressure'] = (patient_data['systolic_pressure'] + patient_data['diastolic_pressure']) / 2
-            elif 'systolic_pressure' in patient_data:
-                patient_data_copy['blood_pressure'] = patient_data['systolic_pressure']
-            return self._predict_preeclampsia_rules(patient_data_copy)
+        return self._predict_single('preeclampsia', patient_data)
     
     def predict_preterm_birth_risk(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """预测早产风险"""
+        return self._predict_single('preterm_birth', patient_data)
+    
+    def predict_batch(self, records: List[Dict[str, Any]], risk_type: str) -> List[Dict[str, Any]]:
+        """
+        批量预测单一风险类型
+        
+        为整批患者构建一个特征矩阵，每个模型只调用一次 predict_proba，
+        风险等级按阈值向量化计算。结果与逐条调用 predict_<risk_type>_risk 完全一致。
+        
+        Args:
+            records: 患者数据字典列表
+            risk_type: 风险类型（preeclampsia / gestational_diabetes / preterm_birth）
+            
+        Returns:
+            与 records 顺序一致的风险评估结果列表
+        """
+        if risk_type not in self.features:
+            raise ValueError(f"不支持的风险类型: {risk_type}")
+        
+        records = list(records)
+        results = [None] * len(records)
+        
+        if records and risk_type in self.models:
+            ml_results = self._predict_batch_with_ml(risk_type, records)
+            if ml_results is None:
+                print(f"{risk_type} 批量机器学习预测失败，回退到基于规则的方法")
+            else:
+                results = ml_results
+        
+        # 机器学习不可用的记录回退到规则引擎，一次向量化求值
+        fallback = [i for i, result in enumerate(results) if result is None]
+        if fallback:
+            rule_results = self._predict_batch_with_rules(risk_type, [records[i] for i in fallback])
+            for i, result in zip(fallback, rule_results):
+                results[i] = result
+        
+        if records:
+            self.last_used_ml[risk_type] = results[-1]['using_ml']
+        return results
+    
+    def _predict_batch_with_ml(self, risk_type: str, records: List[Dict[str, Any]]):
+        """
+        使用机器学习模型批量预测
+        
+        Returns:
+            list or None: 结果列表；整批失败时返回None
+        """
+        model = self.models.get(risk_type)
+        info = self.model_info.get(risk_type)
+        if model is None or info is None or not self.features.get(risk_type):
+            return None
+        
         try:
-            # 首先尝试使用机器学习模型
-            if 'preterm_birth' in self.models:
-                ml_result = self._predict_with_ml('preterm_birth', patient_data)
-                # 检查机器学习预测是否返回了有效结果
-                if ml_result is not None:
-                    return ml_result
-                # 如果机器学习预测返回None，回退到基于规则的方法
-                print("机器学习预测返回None，回退到基于规则的方法")
+            input_matrix = self._build_feature_matrix(records, risk_type)
+            cache_keys = [self._cache_key(risk_type, row) for row in input_matrix]
+            probabilities = np.empty(len(records), dtype=float)
             
-            # 回退到基于规则的方法
-            self.last_used_ml['preterm_birth'] = False
-            # 确保使用与规则匹配的字段名
-            patient_data_copy = patient_data.copy()
-            if 'gestational_weeks' in patient_data and 'pregnancy_weeks' not in patient_data:
-                patient_data_copy['pregnancy_weeks'] = patient_data['gestational_weeks']
-            # 为了确保blood_pressure字段存在（基于规则的预测需要），提供默认值
-            if 'blood_pressure' not in patient_data_copy:
-                patient_data_copy['blood_pressure'] = patient_data.get('systolic_pressure', 120)
-            return self._predict_preterm_birth_rules(patient_data_copy)
-                
+            # 只对缓存未命中的行调用模型
+            missing = []
+            for i, key in enumerate(cache_keys):
+                cached = self.prediction_cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    probabilities[i] = cached
+            if missing:
+                computed = model.predict_proba(input_matrix[missing])[:, 1]
+                probabilities[missing] = computed
+                for i, probability in zip(missing, computed):
+                    self.prediction_cache.put(cache_keys[i], probability)
         except Exception as e:
-            # 如果机器学习预测失败，使用基于规则的方法
-            print(f"机器学习预测失败，使用基于规则的方法: {e}")
-            self.last_used_ml['preterm_birth'] = False
-            # 确保使用与规则匹配的字段名
-            patient_data_copy = patient_data.copy()
-            if 'gestational_weeks' in patient_data and 'pregnancy_weeks' not in patient_data:
-                patient_data_copy['pregnancy_weeks'] = patient_data['gestational_weeks']
-            # 为了确保blood_pressure字段存在（基于规则的预测需要），提供默认值
-            if 'blood_pressure' not in patient_data_copy:
-                patient_data_copy['blood_pressure'] = patient_data.get('systolic_pressure', 120)
-            return self._predict_preterm_birth_rules(patient_data_copy)
+            print(f"批量预测过程中出错: {e}")
+            return None
+        
+        risk_levels = self._get_risk_levels(probabilities)
+        # 整批一次识别风险因素
+        evaluation = self.rule_table[risk_type].evaluate(records)
+        
+        return [
+            self._format_ml_result(risk_type, probability, risk_level, evaluation.factors(i), info)
+            for i, (probability, risk_level) in enumerate(zip(probabilities, risk_levels))
+        ]
     
     def _identify_risk_factors(self, patient_data, risk_type):
         """
-        识别患者的风险因素
+        识别患者的风险因素（与规则引擎共用 risk_rules.json 中的规则）
         
         Args:
             patient_data (dict): 患者数据
@@ -526,49 +627,9 @@ class MaternalRiskPredictor:
         Returns:
             list: 风险因素列表
         """
-        risk_factors = []
-        
-        if risk_type == 'gestational_diabetes':
-            # 年龄因素
-            if patient_data.get('age', 0) >= 35:
-                risk_factors.append({'name': '高龄产妇', 'importance': 0.5})
-                
-            # BMI因素
-            bmi = patient_data.get('bmi', 0)
-            if bmi >= 28:
-                risk_factors.append({'name': '体重指数过高', 'importance': 0.7})
-            elif bmi >= 24:
-                risk_factors.append({'name': '体重指数偏高', 'importance': 0.4})
-            
-            # 血糖
-            glucose_level = patient_data.get('glucose_level', 0)
-            if glucose_level >= 100:
-                risk_factors.append({'name': '血糖水平偏高', 'importance': 0.8})
-            
-        elif risk_type == 'preeclampsia':
-            # 年龄因素
-            if patient_data.get('age', 0) >= 40:
-                risk_factors.append({'name': '高龄产妇', 'importance': 0.6})
-            
-            # 血压
-            blood_pressure = patient_data.get('blood_pressure', 0)
-            if blood_pressure >= 140:
-                risk_factors.append({'name': '血压偏高', 'importance': 0.8})
-            elif blood_pressure >= 130:
-                risk_factors.append({'name': '血压处于正常高值', 'importance': 0.5})
-            
-        elif risk_type == 'preterm_birth':
-            # 孕周
-            pregnancy_weeks = patient_data.get('pregnancy_weeks', 0)
-            if pregnancy_weeks < 24:
-                risk_factors.append({'name': '孕周较小', 'importance': 0.6})
-            
-            # 血压
-            blood_pressure = patient_data.get('blood_pressure', 0)
-            if blood_pressure >= 140:
-                risk_factors.append({'name': '血压偏高', 'importance': 0.5})
-        
-        return risk_factors
+        if risk_type not in self.rule_table:
+            return []
+        return self.rule_table[risk_type].evaluate([patient_data]).factors(0)
     
     def _get_recommendations(self, risk_type):
         """
@@ -616,121 +677,173 @@ class MaternalRiskPredictor:
             gestational_diabetes_result = self.predict_gestational_diabetes_risk(patient_data)
             preterm_birth_result = self.predict_preterm_birth_risk(patient_data)
             
-            # 确保所有预测方法都返回了有效结果
-            if not preeclampsia_result:
-                preeclampsia_result = self._get_default_risk_result('preeclampsia')
-            if not gestational_diabetes_result:
-                gestational_diabetes_result = self._get_default_risk_result('gestational_diabetes')
-            if not preterm_birth_result:
-                preterm_birth_result = self._get_default_risk_result('preterm_birth')
-            
-            # 计算综合风险评分
-            risk_scores = [
-                preeclampsia_result['risk_probability'],
-                gestational_diabetes_result['risk_probability'],
-                preterm_birth_result['risk_probability']
-            ]
-            risk_factors = []
-            risk_factors.extend(preeclampsia_result.get('top_risk_factors', []))
-            risk_factors.extend(gestational_diabetes_result.get('top_risk_factors', []))
-            risk_factors.extend(preterm_birth_result.get('top_risk_factors', []))
-            
             # 计算平均风险
-            overall_risk = np.mean(risk_scores)
-            # 保留2位小数
-            overall_risk = round(overall_risk, 2)
-            
-            # 确定风险等级
-            if overall_risk >= 0.7:
-                risk_level = '高风险'
-            elif overall_risk >= 0.4:
-                risk_level = '中风险'
-            else:
-                risk_level = '低风险'
-            
-            # 合并风险因素（去重）
-            unique_factors = {}
-            for factor in risk_factors:
-                if isinstance(factor, dict) and 'name' in factor and 'importance' in factor:
-                    name = factor['name']
-                    if name not in unique_factors or factor['importance'] > unique_factors[name]['importance']:
-                        unique_factors[name] = factor
-            
-            # 按重要性排序
-            sorted_factors = sorted(unique_factors.values(), key=lambda x: x['importance'], reverse=True)[:5]
+            overall_risk = np.mean([
+                (preeclampsia_result or self._get_default_risk_result('preeclampsia'))['risk_probability'],
+                (gestational_diabetes_result or self._get_default_risk_result('gestational_diabetes'))['risk_probability'],
+                (preterm_birth_result or self._get_default_risk_result('preterm_birth'))['risk_probability']
+            ])
             
-            # 获取个性化的健康建议
-            personalized_recommendations = self.get_comprehensive_recommendations(risk_level, overall_risk, patient_data)
-            
-            # 创建综合结果 - 移除'data'包装层
-            result = {
-                'comprehensive': {
-                    'overall_risk_level': risk_level,
-                    'overall_risk_score': overall_risk,
-                    'risk_description': f'根据您的健康数据分析，您的综合风险等级为{risk_level}。',
-                    'recommendations': personalized_recommendations
-                },
-                'preeclampsia': {
-                    'risk_level': preeclampsia_result['risk_level'],
-                    'risk_score': round(preeclampsia_result['risk_probability'] * 100, 2),
-                    'description': f'子痫前期风险等级为{preeclampsia_result["risk_level"]}。',
-                    'key_factors': [factor['name'] for factor in preeclampsia_result.get('top_risk_factors', [])[:3] if isinstance(factor, dict) and 'name' in factor]
-                },
-                'gestational_diabetes': {
-                    'risk_level': gestational_diabetes_result['risk_level'],
-                    'risk_score': round(gestational_diabetes_result['risk_probability'] * 100, 2),
-                    'description': f'妊娠期糖尿病风险等级为{gestational_diabetes_result["risk_level"]}。',
-                    'key_factors': [factor['name'] for factor in gestational_diabetes_result.get('top_risk_factors', [])[:3] if isinstance(factor, dict) and 'name' in factor]
-                },
-                'preterm_birth': {
-                    'risk_level': preterm_birth_result['risk_level'],
-                    'risk_score': round(preterm_birth_result['risk_probability'] * 100, 2),
-                    'description': f'早产风险等级为{preterm_birth_result["risk_level"]}。',
-                    'key_factors': [factor['name'] for factor in preterm_birth_result.get('top_risk_factors', [])[:3] if isinstance(factor, dict) and 'name' in factor]
-                },
-                'top_risk_factors': sorted_factors,
-                'overall_risk_level': risk_level,
-                'overall_risk_score': overall_risk,
-                'recommendations': personalized_recommendations
-            }
-            
-            return result
+            return self._assemble_comprehensive_result(
+                patient_data, overall_risk,
+                preeclampsia_result, gestational_diabetes_result, preterm_birth_result
+            )
             
         except Exception as e:
             print(f"综合风险评估错误: {e}")
             import traceback
             traceback.print_exc()
             # 返回默认的错误响应
-            return {
-                'comprehensive': {
-                    'overall_risk_level': '低风险',
-                    'overall_risk_score': 0.3,
-                    'risk_description': '预测过程中发生错误，请稍后再试。',
-                    'recommendations': ['请咨询医生获取专业建议', '定期进行产检', '保持健康的生活方式']
-                },
-                'preeclampsia': {
-                    'risk_level': '低风险',
-                    'risk_score': 30.0,
-                    'description': '子痫前期风险等级为低风险。',
-                    'key_factors': []
-                },
-                'gestational_diabetes': {
-                    'risk_level': '低风险',
-                    'risk_score': 25.0,
-                    'description': '妊娠期糖尿病风险等级为低风险。',
-                    'key_factors': []
-                },
-                'preterm_birth': {
-                    'risk_level': '低风险',
-                    'risk_score': 20.0,
-                    'description': '早产风险等级为低风险。',
-                    'key_factors': []
-                },
-                'top_risk_factors': [],
+            return self._get_default_comprehensive_result()
+    
+    def predict_comprehensive_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量综合风险评估
+        
+        每种风险类型只调用一次模型，综合评分按行向量化计算。
+        结果与逐条调用 predict_comprehensive_risk 完全一致。
+        
+        Args:
+            records: 患者数据字典列表
+            
+        Returns:
+            与 records 顺序一致的综合风险预测结果列表
+        """
+        records = list(records)
+        if not records:
+            return []
+        
+        risk_types = ['preeclampsia', 'gestational_diabetes', 'preterm_birth']
+        try:
+            batch_results = {risk_type: self.predict_batch(records, risk_type) for risk_type in risk_types}
+        except Exception as e:
+            # 整批失败时逐条评估，使单条记录的异常只影响其自身
+            print(f"批量综合风险评估失败，改为逐条评估: {e}")
+            return [self.predict_comprehensive_risk(record) for record in records]
+        
+        # 计算每条记录的平均风险
+        risk_scores = np.array(
+            [[result['risk_probability'] for result in batch_results[risk_type]] for risk_type in risk_types],
+            dtype=float
+        ).T
+        overall_risks = risk_scores.mean(axis=1)
+        
+        results = []
+        for i, record in enumerate(records):
+            try:
+                results.append(self._assemble_comprehensive_result(
+                    record, overall_risks[i],
+                    batch_results['preeclampsia'][i],
+                    batch_results['gestational_diabetes'][i],
+                    batch_results['preterm_birth'][i]
+                ))
+            except Exception as e:
+                print(f"综合风险评估错误: {e}")
+                results.append(self._get_default_comprehensive_result())
+        return results
+    
+    def _assemble_comprehensive_result(self, patient_data, overall_risk,
+                                       preeclampsia_result, gestational_diabetes_result, preterm_birth_result):
+        """
+        根据各专项风险结果组装综合评估结果（单条与批量评估共用）
+        """
+        # 确保所有预测方法都返回了有效结果
+        if not preeclampsia_result:
+            preeclampsia_result = self._get_default_risk_result('preeclampsia')
+        if not gestational_diabetes_result:
+            gestational_diabetes_result = self._get_default_risk_result('gestational_diabetes')
+        if not preterm_birth_result:
+            preterm_birth_result = self._get_default_risk_result('preterm_birth')
+        
+        risk_factors = []
+        risk_factors.extend(preeclampsia_result.get('top_risk_factors', []))
+        risk_factors.extend(gestational_diabetes_result.get('top_risk_factors', []))
+        risk_factors.extend(preterm_birth_result.get('top_risk_factors', []))
+        
+        # 保留2位小数
+        overall_risk = round(overall_risk, 2)
+        
+        # 确定风险等级
+        risk_level = self._get_risk_level(overall_risk)
+        
+        # 合并风险因素（去重）
+        unique_factors = {}
+        for factor in risk_factors:
+            if isinstance(factor, dict) and 'name' in factor and 'importance' in factor:
+                name = factor['name']
+                if name not in unique_factors or factor['importance'] > unique_factors[name]['importance']:
+                    unique_factors[name] = factor
+        
+        # 按重要性排序
+        sorted_factors = sorted(unique_factors.values(), key=lambda x: x['importance'], reverse=True)[:5]
+        
+        # 获取个性化的健康建议
+        personalized_recommendations = self.get_comprehensive_recommendations(risk_level, overall_risk, patient_data)
+        
+        # 创建综合结果 - 移除'data'包装层
+        return {
+            'comprehensive': {
+                'overall_risk_level': risk_level,
+                'overall_risk_score': overall_risk,
+                'risk_description': f'根据您的健康数据分析，您的综合风险等级为{risk_level}。',
+                'recommendations': personalized_recommendations
+            },
+            'preeclampsia': {
+                'risk_level': preeclampsia_result['risk_level'],
+                'risk_score': round(preeclampsia_result['risk_probability'] * 100, 2),
+                'description': f'子痫前期风险等级为{preeclampsia_result["risk_level"]}。',
+                'key_factors': [factor['name'] for factor in preeclampsia_result.get('top_risk_factors', [])[:3] if isinstance(factor, dict) and 'name' in factor]
+            },
+            'gestational_diabetes': {
+                'risk_level': gestational_diabetes_result['risk_level'],
+                'risk_score': round(gestational_diabetes_result['risk_probability'] * 100, 2),
+                'description': f'妊娠期糖尿病风险等级为{gestational_diabetes_result["risk_level"]}。',
+                'key_factors': [factor['name'] for factor in gestational_diabetes_result.get('top_risk_factors', [])[:3] if isinstance(factor, dict) and 'name' in factor]
+            },
+            'preterm_birth': {
+                'risk_level': preterm_birth_result['risk_level'],
+                'risk_score': round(preterm_birth_result['risk_probability'] * 100, 2),
+                'description': f'早产风险等级为{preterm_birth_result["risk_level"]}。',
+                'key_factors': [factor['name'] for factor in preterm_birth_result.get('top_risk_factors', [])[:3] if isinstance(factor, dict) and 'name' in factor]
+            },
+            'top_risk_factors': sorted_factors,
+            'overall_risk_level': risk_level,
+            'overall_risk_score': overall_risk,
+            'recommendations': personalized_recommendations
+        }
+    
+    def _get_default_comprehensive_result(self) -> Dict[str, Any]:
+        """预测过程出错时返回的默认综合评估结果"""
+        return {
+            'comprehensive': {
                 'overall_risk_level': '低风险',
                 'overall_risk_score': 0.3,
+                'risk_description': '预测过程中发生错误，请稍后再试。',
                 'recommendations': ['请咨询医生获取专业建议', '定期进行产检', '保持健康的生活方式']
-            }
+            },
+            'preeclampsia': {
+                'risk_level': '低风险',
+                'risk_score': 30.0,
+                'description': '子痫前期风险等级为低风险。',
+                'key_factors': []
+            },
+            'gestational_diabetes': {
+                'risk_level': '低风险',
+                'risk_score': 25.0,
+                'description': '妊娠期糖尿病风险等级为低风险。',
+                'key_factors': []
+            },
+            'preterm_birth': {
+                'risk_level': '低风险',
+                'risk_score': 20.0,
+                'description': '早产风险等级为低风险。',
+                'key_factors': []
+            },
+            'top_risk_factors': [],
+            'overall_risk_level': '低风险',
+            'overall_risk_score': 0.3,
+            'recommendations': ['请咨询医生获取专业建议', '定期进行产检', '保持健康的生活方式']
+        }
     
     def _get_risk_level(self, probability: float) -> str:
         """根据概率获取风险等级"""
@@ -740,6 +853,15 @@ class MaternalRiskPredictor:
             return '中风险'
         else:
             return '低风险'
+    
+    def _get_risk_levels(self, probabilities) -> List[str]:
+        """根据概率数组向量化获取风险等级，阈值与 _get_risk_level 一致"""
+        probabilities = np.asarray(probabilities, dtype=float)
+        return np.select(
+            [probabilities >= 0.7, probabilities >= 0.4],
+            ['高风险', '中风险'],
+            default='低风险'
+        ).tolist()
             
     def _get_default_risk_result(self, risk_type: str) -> Dict[str, Any]:
         """
@@ -846,4 +968,110 @@ class MaternalRiskPredictor:
         recommendations.append('避免熬夜，建立规律的作息时间')
         
         # 限制建议数量，避免信息过载
-        return recommendations[:10]  # 最多返回10条建议
\ No newline at end of file
+        return recommendations[:10]  # 最多返回10条建议
+
+
+class PredictorRegistry:
+    """
+    进程级共享的预测器注册表
+    
+    整个进程只加载一次模型；当 version_info.json 或模型文件的修改时间变化时，
+    由检查到变化的那个请求线程同步构建新的预测器实例并原子替换。
+    重新加载期间其他请求不等待锁，继续使用旧实例。
+    """
+    
+    WATCHED_SUFFIXES = ('.joblib', '.npz', '_model_info.json')
+    
+    def __init__(self, models_dir: str = 'models', check_interval: float = 5.0):
+        """
+        Args:
+            models_dir: 模型文件所在目录
+            check_interval: 检查模型文件变化的最小间隔（秒）
+        """
+        self.models_dir = models_dir
+        self.check_interval = check_interval
+        self.reload_count = 0
+        self._lock = threading.Lock()
+        self._predictor = None
+        self._signature = None
+        self._last_check = 0.0
+    
+    def _compute_signature(self):
+        """根据模型目录中相关文件的修改时间和大小计算签名"""
+        if not os.path.isdir(self.models_dir):
+            return None
+        entries = []
+        for name in sorted(os.listdir(self.models_dir)):
+            if name != 'version_info.json' and not name.endswith(self.WATCHED_SUFFIXES):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.models_dir, name))
+            except OSError:
+                continue
+            entries.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+    
+    def get(self) -> MaternalRiskPredictor:
+        """获取当前预测器实例，必要时热加载"""
+        predictor = self._predictor
+        if predictor is not None and time.monotonic() - self._last_check < self.check_interval:
+            return predictor
+        
+        # 已有实例时不阻塞请求：其他线程正在检查或重新加载则直接使用当前实例
+        if not self._lock.acquire(blocking=predictor is None):
+            return predictor
+        try:
+            if self._predictor is not None and time.monotonic() - self._last_check < self.check_interval:
+                return self._predictor
+            signature = self._compute_signature()
+            if self._predictor is None or signature != self._signature:
+                self._load(signature)
+            self._last_check = time.monotonic()
+            return self._predictor
+        finally:
+            self._lock.release()
+    
+    def reload(self) -> MaternalRiskPredictor:
+        """强制重新加载模型"""
+        with self._lock:
+            self._load(self._compute_signature())
+            self._last_check = time.monotonic()
+            return self._predictor
+    
+    def _load(self, signature):
+        """构建新的预测器实例并原子替换（调用方需持有锁）"""
+        try:
+            predictor = MaternalRiskPredictor(models_dir=self.models_dir)
+        except Exception as e:
+            print(f"重新加载预测器失败: {e}")
+            if self._predictor is None:
+                raise
+            return
+        if self._predictor is not None:
+            self.reload_count += 1
+            print("检测到模型文件变化，预测器已热加载")
+        self._predictor = predictor
+        self._signature = signature
+
+
+class SharedPredictor:
+    """
+    共享预测器代理
+    
+    属性访问转发到注册表中的当前实例，模型热加载后自动指向新实例，
+    便于以模块级变量的形式导入使用。
+    """
+    
+    def __init__(self, registry: PredictorRegistry):
+        self._registry = registry
+    
+    def __getattr__(self, name):
+        return getattr(self._registry.get(), name)
+
+
+predictor_registry = PredictorRegistry()
+
+
+def get_predictor() -> MaternalRiskPredictor:
+    """获取进程级共享的预测器实例"""
+    return predictor_registry.get()
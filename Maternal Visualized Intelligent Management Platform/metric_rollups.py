@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指标时间汇总表（rollup）
+在 medical_data / maternal_info 上安装 SQLite 触发器，按小时、天、月以及全部时间（all）四种粒度，
+为每个数值指标增量维护 非空个数 n、总和 total、平方和 total_sq，另有 __rows__ 指标记录行数。
+平均值 = total / n，标准差由平方和求出；任意时间范围的趋势只读取对应粒度的若干汇总行，
+查询代价与表中的记录数无关。
+
+与 dashboard_materializer 相同：首次安装或触发器定义变化时按 GROUP BY 重建一次，之后只做增量更新。
+只统计存储为数值的值（与数值列中混入的文本无关）；删除、修改记录时从对应的桶中减去旧值。
+"""
+
+import re
+import math
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+ROLLUP_TABLE = 'metric_rollups'
+
+# 记录已安装触发器定义的粒度名（签名不一致时重新安装并重建）
+INSTALLED_GRAIN = '__installed__'
+
+# 行数指标
+ROWS_METRIC = '__rows__'
+
+# 数据版本：每次插入、删除、修改记录时，记录所在的天以及全部时间（all）的版本各加 1，只增不减。
+# 日期范围内各天版本之和在范围内的数据发生变化后必然增大，可作为该范围聚合结果的缓存键
+VERSION_METRIC = '__version__'
+VERSION_GRAINS = ('all', 'day')
+
+# 粒度 -> 桶表达式，{row} 替换为 NEW / OLD / 表名
+GRAINS = {
+    'all': "''",
+    'hour': "substr({row}.created_at, 1, 13)",
+    'day': "substr({row}.created_at, 1, 10)",
+    'month': "substr({row}.created_at, 1, 7)"
+}
+
+# 桶字符串的长度（查询起点按同样的长度截取）
+BUCKET_LENGTHS = {'hour': 13, 'day': 10, 'month': 7}
+
+# 各表汇总的数值指标（表中不存在的列跳过）
+METRICS = {
+    'medical_data': ['age', 'systolic_pressure', 'diastolic_pressure', 'heart_rate', 'blood_sugar',
+                     'weight', 'height'],
+    'maternal_info': ['age', 'gestational_weeks', 'systolic_pressure', 'diastolic_pressure',
+                      'fetal_heart_rate', 'weight', 'height']
+}
+
+# 命名的时间范围 -> (粒度, SQLite datetime('now', ...) 修饰符)，修饰符为 None 表示全部时间
+TIME_RANGES = {
+    'day': ('hour', ('-24 hours',)),
+    'week': ('day', ('-7 days',)),
+    'month': ('day', ('-30 days',)),
+    'quarter': ('day', ('-90 days',)),
+    'year': ('month', ('start of month', '-11 months')),
+    'all': ('month', None)
+}
+
+# 超过该天数的范围按月汇总
+MAX_DAILY_RANGE_DAYS = 93
+
+
+def _table_columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _metrics(conn, table: str) -> List[str]:
+    """表中实际存在的指标列；表不存在或没有 created_at 时返回空列表"""
+    columns = set(_table_columns(conn, table))
+    if 'created_at' not in columns:
+        return []
+    return [metric for metric in METRICS[table] if metric in columns]
+
+
+def _value(row: str, metric: str) -> str:
+    return f"CASE WHEN typeof({row}.{metric}) IN ('integer', 'real') THEN {row}.{metric} END"
+
+
+def _delta_sql(table: str, metrics: List[str], row: str, sign: int) -> str:
+    """一条语句更新一行记录涉及的全部 (粒度, 桶, 指标)"""
+    grains = ' UNION ALL '.join(
+        f"SELECT '{grain}' AS grain, {expression.format(row=row)} AS bucket" for grain, expression in GRAINS.items()
+    )
+    values = ' UNION ALL '.join(
+        [f"SELECT '{ROWS_METRIC}' AS metric, 1 AS value"]
+        + [f"SELECT '{metric}', {_value(row, metric)}" for metric in metrics]
+    )
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} (source, grain, bucket, metric, n, total, total_sq) "
+        f"SELECT '{table}', g.grain, g.bucket, v.metric, {sign}, {sign} * v.value, {sign} * v.value * v.value "
+        f"FROM ({grains}) AS g, ({values}) AS v "
+        f"WHERE g.bucket IS NOT NULL AND v.value IS NOT NULL "
+        f"ON CONFLICT (source, grain, bucket, metric) DO UPDATE SET "
+        f"n = n + excluded.n, total = total + excluded.total, total_sq = total_sq + excluded.total_sq;\n"
+    )
+
+
+def _version_sql(table: str, rows: List[str]) -> str:
+    """记录所在的天和全部时间的版本加 1"""
+    buckets = ' UNION ALL '.join(
+        f"SELECT '{grain}' AS grain, {GRAINS[grain].format(row=row)} AS bucket"
+        for row in rows for grain in VERSION_GRAINS
+    )
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} (source, grain, bucket, metric, n) "
+        f"SELECT '{table}', b.grain, b.bucket, '{VERSION_METRIC}', 1 FROM ({buckets}) AS b "
+        f"WHERE b.bucket IS NOT NULL "
+        f"ON CONFLICT (source, grain, bucket, metric) DO UPDATE SET n = n + 1;\n"
+    )
+
+
+def _cleanup_sql(table: str, row: str) -> str:
+    """删除旧值所在桶中个数减为 0 的汇总行（每个粒度一条语句，按主键定位）"""
+    return ''.join(
+        f"DELETE FROM {ROLLUP_TABLE} WHERE source = '{table}' AND grain = '{grain}' "
+        f"AND bucket = {expression.format(row=row)} AND n = 0;\n"
+        for grain, expression in GRAINS.items()
+    )
+
+
+def _trigger_sql(table: str, metrics: List[str]) -> List[str]:
+    watched = ', '.join(['created_at'] + metrics)
+    return [
+        f"CREATE TRIGGER {table}_rollup_insert AFTER INSERT ON {table} BEGIN\n"
+        f"{_delta_sql(table, metrics, 'NEW', 1)}{_version_sql(table, ['NEW'])}END",
+        f"CREATE TRIGGER {table}_rollup_delete AFTER DELETE ON {table} BEGIN\n"
+        f"{_delta_sql(table, metrics, 'OLD', -1)}{_cleanup_sql(table, 'OLD')}{_version_sql(table, ['OLD'])}END",
+        f"CREATE TRIGGER {table}_rollup_update AFTER UPDATE OF {watched} ON {table} BEGIN\n"
+        f"{_delta_sql(table, metrics, 'OLD', -1)}{_delta_sql(table, metrics, 'NEW', 1)}"
+        f"{_cleanup_sql(table, 'OLD')}{_version_sql(table, ['OLD', 'NEW'])}END"
+    ]
+
+
+def ensure_rollup_table(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            source TEXT NOT NULL,
+            grain TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            total_sq REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, grain, bucket, metric)
+        ) WITHOUT ROWID
+    ''')
+
+
+def rebuild(conn, table: str):
+    """按 GROUP BY 重新计算一张表的全部汇总（数据版本保留并加 1）"""
+    conn.execute(f'DELETE FROM {ROLLUP_TABLE} WHERE source = ? AND grain != ? AND metric != ?',
+                 (table, INSTALLED_GRAIN, VERSION_METRIC))
+    metrics = _metrics(conn, table)
+    values = ', '.join([f'1 AS "{ROWS_METRIC}"'] + [f'{_value(table, metric)} AS "{metric}"' for metric in metrics])
+    for grain, expression in GRAINS.items():
+        bucket = expression.format(row=table)
+        source = f'SELECT {bucket} AS bucket, {values} FROM {table} WHERE {bucket} IS NOT NULL'
+        for metric in [ROWS_METRIC] + metrics:
+            conn.execute(f'''
+                INSERT INTO {ROLLUP_TABLE} (source, grain, bucket, metric, n, total, total_sq)
+                SELECT '{table}', '{grain}', bucket, '{metric}', COUNT("{metric}"), TOTAL("{metric}"),
+                       TOTAL("{metric}" * "{metric}")
+                FROM ({source}) GROUP BY bucket HAVING COUNT("{metric}") > 0
+            ''')
+    # 重建前后的数据可能不同（例如触发器未安装期间的修改），已有版本和有数据的桶的版本都要变化
+    conn.execute(f'UPDATE {ROLLUP_TABLE} SET n = n + 1 WHERE source = ? AND metric = ?', (table, VERSION_METRIC))
+    for grain in VERSION_GRAINS:
+        bucket = GRAINS[grain].format(row=table)
+        conn.execute(f'''
+            INSERT INTO {ROLLUP_TABLE} (source, grain, bucket, metric, n)
+            SELECT DISTINCT '{table}', '{grain}', {bucket}, '{VERSION_METRIC}', 1 FROM {table}
+            WHERE {bucket} IS NOT NULL
+            ON CONFLICT (source, grain, bucket, metric) DO NOTHING
+        ''')
+
+
+def install(conn) -> List[str]:
+    """
+    在 conn 对应的数据库上安装汇总表和触发器（可重复调用）
+
+    触发器定义未变化时不做任何修改；首次安装或表结构变化导致定义变化时，
+    在同一事务中重建触发器和汇总数据。
+
+    Returns:
+        list: 本次（重新）安装的表
+    """
+    ensure_rollup_table(conn)
+    conn.commit()
+    installed = []
+    for table in METRICS:
+        metrics = _metrics(conn, table)
+        if not metrics:
+            continue
+        statements = _trigger_sql(table, metrics)
+        signature = hashlib.sha1('\n'.join(statements).encode('utf-8')).hexdigest()
+        current = conn.execute(
+            f'SELECT bucket FROM {ROLLUP_TABLE} WHERE source = ? AND grain = ?', (table, INSTALLED_GRAIN)
+        ).fetchone()
+        if current is not None and current[0] == signature:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for event in ('insert', 'delete', 'update'):
+                conn.execute(f'DROP TRIGGER IF EXISTS {table}_rollup_{event}')
+            for statement in statements:
+                conn.execute(statement)
+            rebuild(conn, table)
+            conn.execute(f'DELETE FROM {ROLLUP_TABLE} WHERE source = ? AND grain = ?', (table, INSTALLED_GRAIN))
+            conn.execute(f"INSERT INTO {ROLLUP_TABLE} (source, grain, bucket, metric) VALUES (?, ?, ?, '')",
+                         (table, INSTALLED_GRAIN, signature))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        installed.append(table)
+    return installed
+
+
+_installed_paths = set()
+
+
+def ensure_installed(conn):
+    """接口调用前确认汇总已安装（每个数据库文件只检查一次）"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    if path in _installed_paths:
+        return
+    install(conn)
+    _installed_paths.add(path)
+
+
+def uninstall(conn):
+    """删除触发器和汇总表"""
+    for table in METRICS:
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS {table}_rollup_{event}')
+    conn.execute(f'DROP TABLE IF EXISTS {ROLLUP_TABLE}')
+    conn.commit()
+    _installed_paths.clear()
+
+
+def parse_time_range(value: str) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """
+    解析时间范围，返回 (粒度, datetime('now', ...) 修饰符)
+
+    支持 TIME_RANGES 中的名称，以及 24h / 7d / 3m / 1y 这样的数量加单位（小时、天、月、年）：
+    小时范围按小时汇总，不超过 MAX_DAILY_RANGE_DAYS 天按天汇总，更长的范围按月汇总。
+    格式不正确时抛出 ValueError。
+    """
+    value = (value or 'month').strip().lower()
+    if value in TIME_RANGES:
+        return TIME_RANGES[value]
+    match = re.fullmatch(r'(\d+)([hdmy])', value)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f'不支持的时间范围: {value}')
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'h':
+        return 'hour', (f'-{count} hours',)
+    days = {'d': count, 'm': count * 31, 'y': count * 366}[unit]
+    if days <= MAX_DAILY_RANGE_DAYS:
+        return 'day', ({'d': f'-{count} days', 'm': f'-{count} months', 'y': f'-{count} years'}[unit],)
+    months = count if unit == 'm' else count * 12 if unit == 'y' else math.ceil(count / 30)
+    return 'month', ('start of month', f'-{months - 1} months')
+
+
+def _metric_stats(n: int, total: float, total_sq: float) -> Dict[str, Any]:
+    if not n:
+        return {'n': 0, 'avg': None, 'std': None}
+    mean = total / n
+    return {'n': n, 'avg': mean, 'std': math.sqrt(max(total_sq / n - mean * mean, 0.0))}
+
+
+def read_series(conn, source: str, grain: str, modifiers: Optional[Tuple[str, ...]] = None,
+                before: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+    """
+    读取一个粒度下的汇总序列（按桶升序，不含已无记录的桶）
+
+    Args:
+        source: 表名
+        grain: hour / day / month
+        modifiers: 起点 datetime('now', ...) 的修饰符，None 表示不限
+        before: 终点（不含）的修饰符，None 表示不限
+
+    Returns:
+        list: [{'bucket': 桶, 'count': 行数, 指标: {'n', 'avg', 'std'}}]
+    """
+    conditions = ['source = ?', 'grain = ?', 'metric != ?']
+    params = [source, grain, VERSION_METRIC]
+    for bound, operator in ((modifiers, '>='), (before, '<')):
+        if bound is not None:
+            conditions.append(f"bucket {operator} substr(datetime('now', {', '.join('?' * len(bound))}), 1, ?)")
+            params.extend(list(bound) + [BUCKET_LENGTHS[grain]])
+    rows = conn.execute(f'''
+        SELECT bucket, metric, n, total, total_sq FROM {ROLLUP_TABLE}
+        WHERE {' AND '.join(conditions)} ORDER BY bucket
+    ''', params).fetchall()
+
+    series = {}
+    for bucket, metric, n, total, total_sq in rows:
+        entry = series.setdefault(bucket, {'bucket': bucket, 'count': 0})
+        if metric == ROWS_METRIC:
+            entry['count'] = n
+        else:
+            entry[metric] = _metric_stats(n, total, total_sq)
+    return [entry for entry in series.values() if entry['count'] > 0]
+
+
+def read_totals(conn, source: str) -> Dict[str, Any]:
+    """全部时间的汇总 {'count': 行数, 指标: {'n', 'avg', 'std'}}"""
+    series = read_series(conn, source, 'all')
+    return series[0] if series else {'bucket': '', 'count': 0}
+
+
+def data_version(conn, source: str, start: Optional[str] = None, end: Optional[str] = None) -> int:
+    """
+    源表的数据版本
+
+    Args:
+        start / end: 日期范围（YYYY-MM-DD，包含两端），都为 None 时返回全部时间的版本
+
+    Returns:
+        int: 范围内各天版本之和，范围内的数据变化后必然增大
+    """
+    if start is None and end is None:
+        row = conn.execute(f'SELECT n FROM {ROLLUP_TABLE} WHERE source = ? AND grain = ? AND bucket = ? AND metric = ?',
+                           (source, 'all', '', VERSION_METRIC)).fetchone()
+        return row[0] if row else 0
+    conditions = ['source = ?', "grain = 'day'"]
+    params = [source]
+    if start is not None:
+        conditions.append('bucket >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('bucket <= ?')
+        params.append(end)
+    row = conn.execute(f'''
+        SELECT TOTAL(n) FROM {ROLLUP_TABLE} WHERE {' AND '.join(conditions)} AND metric = ?
+    ''', params + [VERSION_METRIC]).fetchone()
+    return int(row[0])
+
+
+def metric_avg(entry: Dict[str, Any], metric: str) -> Optional[float]:
+    """汇总行中某个指标的平均值（表中没有该指标或没有数值时为 None）"""
+    stats = entry.get(metric)
+    return stats['avg'] if stats else None
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库合并工具
+将 medical_data.db、maternal_health.db 合并进主库 medical_system.db，合并后数据访问层（utils/data_access.py）
+在 auto 模式下自动把所有逻辑库路由到主库，仪表盘可以直接单条 SQL 联表。
+
+合并规则：
+- 主库中不存在的表：按源库的建表语句创建并整表复制，同时复制索引、触发器和视图
+- 主库中已存在的表：补齐缺少的列后按主键合并；主键相同且内容一致的行视为重复跳过，
+  主键相同但内容不同（或违反唯一约束）的行按 --on-conflict 处理（skip 跳过 / replace 覆盖 / fail 中止）
+- AUTOINCREMENT 自增主键只是各文件各自分配的行号，两个文件的 id 必然重叠：除 id 外内容一致的行视为重复，
+  其余行不带 id 插入，由主库分配新的 id（只有违反其他唯一约束的行才按冲突处理）
+- 由其他表派生的表（DERIVED_TABLES：仪表盘计数、指标汇总、风险评分、预测模型、分析报告、导入任务）
+  不作为数据合并，其触发器和索引也不复制；合并后按主库数据重建或清空，由对应服务重新生成
+- 整个合并在一个事务中完成，合并前默认备份主库，合并结果记录在 db_migrations 表中
+
+用法: python migrate_databases.py [--target 主库路径] [--source 源库路径 ...]
+                                  [--on-conflict skip|replace|fail] [--dry-run] [--no-backup] [--force]
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import Dict, Any, List
+
+import metric_rollups
+import dashboard_materializer
+from utils import data_access
+from utils.data_access import MIGRATIONS_TABLE, PRIMARY, merged_sources
+
+CONFLICT_POLICIES = ('skip', 'replace', 'fail')
+
+# 派生表 -> 合并后的处理：
+# rebuild 按合并后的数据重新计算（主库已安装时）；clear 清空，由对应服务按需重新生成；
+# keep 只保留主库的记录（风险评分服务为新增记录评分，导入任务是各自进程的运行状态）
+DERIVED_TABLES = {
+    dashboard_materializer.COUNTER_TABLE: 'rebuild',
+    metric_rollups.ROLLUP_TABLE: 'rebuild',
+    'maternal_risk_scores': 'keep',
+    'forecast_models': 'clear',
+    'analysis_reports': 'clear',
+    'import_jobs': 'keep'
+}
+
+# 派生表的重建函数及其覆盖的源表
+REBUILDERS = {
+    dashboard_materializer.COUNTER_TABLE: (dashboard_materializer.rebuild, dashboard_materializer.DIMENSIONS),
+    metric_rollups.ROLLUP_TABLE: (metric_rollups.rebuild, metric_rollups.METRICS)
+}
+
+SOURCE_SCHEMA = 'merge_source'
+
+
+class MergeConflictError(Exception):
+    """合并时存在冲突行且策略为 fail"""
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_columns(conn, schema: str, table: str) -> List[Dict[str, Any]]:
+    return [dict(zip(('cid', 'name', 'type', 'notnull', 'default', 'pk'), row))
+            for row in conn.execute(f'PRAGMA {schema}.table_info({_quote(table)})')]
+
+
+def _schema_objects(conn, schema: str, object_type: str):
+    return conn.execute(
+        f"SELECT name, tbl_name, sql FROM {schema}.sqlite_master "
+        f"WHERE type = ? AND name NOT LIKE 'sqlite_%' AND sql IS NOT NULL ORDER BY rowid",
+        (object_type,)
+    ).fetchall()
+
+
+def _surrogate_key(conn, table: str):
+    """主库表的 AUTOINCREMENT 自增主键列名，没有时返回 None"""
+    row = conn.execute(f"SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if not row or not re.search(r'\bAUTOINCREMENT\b', row[0] or '', re.IGNORECASE):
+        return None
+    keys = [column['name'] for column in _table_columns(conn, 'main', table) if column['pk']]
+    return keys[0] if len(keys) == 1 else None
+
+
+def _references_derived(sql: str) -> bool:
+    return any(re.search(rf'\b{table}\b', sql) for table in DERIVED_TABLES)
+
+
+def ensure_migrations_table(conn):
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            source TEXT PRIMARY KEY,
+            source_path TEXT,
+            merged_at TIMESTAMP,
+            report TEXT
+        )
+    ''')
+
+
+def _merge_table(conn, table: str, on_conflict: str) -> Dict[str, Any]:
+    """把源库中的一张表合并进主库同名表"""
+    target_columns = _table_columns(conn, 'main', table)
+    source_columns = _table_columns(conn, SOURCE_SCHEMA, table)
+    report = {'table': table, 'created': False, 'added_columns': [], 'inserted': 0,
+              'duplicates': 0, 'conflicts': 0, 'replaced': 0, 'new_ids': False}
+    src = f'{SOURCE_SCHEMA}.{_quote(table)}'
+    dst = f'main.{_quote(table)}'
+
+    if not target_columns:
+        sql = conn.execute(f"SELECT sql FROM {SOURCE_SCHEMA}.sqlite_master WHERE type = 'table' AND name = ?",
+                           (table,)).fetchone()[0]
+        conn.execute(sql)
+        cursor = conn.execute(f'INSERT INTO {dst} SELECT * FROM {src}')
+        report['created'] = True
+        report['inserted'] = cursor.rowcount
+        return report
+
+    # 补齐主库缺少的列，避免源库数据丢失
+    target_names = {column['name'] for column in target_columns}
+    for column in source_columns:
+        if column['name'] not in target_names:
+            conn.execute(f"ALTER TABLE {dst} ADD COLUMN {_quote(column['name'])} {column['type']}")
+            report['added_columns'].append(column['name'])
+
+    columns = [column['name'] for column in source_columns]
+    surrogate = _surrogate_key(conn, table)
+    if surrogate is not None:
+        # 自增 id 不参与比较也不复制，新行由主库分配 id
+        columns = [name for name in columns if name != surrogate]
+        report['new_ids'] = True
+    column_list = ', '.join(_quote(name) for name in columns)
+    source_list = ', '.join(f's.{_quote(name)}' for name in columns)
+    same_row = ' AND '.join(f'm.{_quote(name)} IS s.{_quote(name)}' for name in columns) or '1'
+    if surrogate is not None:
+        key_match = same_row
+    else:
+        pk_columns = [column['name'] for column in sorted(target_columns, key=lambda c: c['pk']) if column['pk']]
+        key_match = ' AND '.join(f'm.{_quote(name)} IS s.{_quote(name)}' for name in pk_columns or columns)
+    order = f' ORDER BY s.{_quote(surrogate)}' if surrogate is not None else ''
+
+    total = conn.execute(f'SELECT COUNT(*) FROM {src}').fetchone()[0]
+    report['duplicates'] = conn.execute(
+        f'SELECT COUNT(*) FROM {src} s WHERE EXISTS (SELECT 1 FROM {dst} m WHERE {same_row})'
+    ).fetchone()[0]
+
+    # 主键不冲突的新行（违反其他唯一约束的行被忽略，计入冲突）
+    cursor = conn.execute(
+        f'INSERT OR IGNORE INTO {dst} ({column_list}) SELECT {source_list} FROM {src} s '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {dst} m WHERE {key_match}){order}'
+    )
+    report['inserted'] = max(cursor.rowcount, 0)
+    report['conflicts'] = total - report['duplicates'] - report['inserted']
+
+    if report['conflicts'] and on_conflict == 'fail':
+        raise MergeConflictError(f"表 {table} 有 {report['conflicts']} 行与主库冲突")
+    if report['conflicts'] and on_conflict == 'replace':
+        cursor = conn.execute(
+            f'INSERT OR REPLACE INTO {dst} ({column_list}) SELECT {source_list} FROM {src} s '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {dst} m WHERE {same_row}){order}'
+        )
+        report['replaced'] = max(cursor.rowcount, 0)
+    return report
+
+
+def _refresh_derived(conn, merged_tables: List[str]) -> List[Dict[str, Any]]:
+    """按合并后的数据重建或清空主库中的派生表"""
+    existing = {row[0] for row in _schema_objects(conn, 'main', 'table')}
+    actions = []
+    for table, action in DERIVED_TABLES.items():
+        if table not in existing or action == 'keep':
+            continue
+        if action == 'clear':
+            conn.execute(f'DELETE FROM main.{_quote(table)}')
+        else:
+            rebuild, sources = REBUILDERS[table]
+            for source in sources:
+                if source in merged_tables:
+                    rebuild(conn, source)
+        actions.append({'table': table, 'action': action})
+    return actions
+
+
+def merge_database(conn, source_path: str, on_conflict: str = 'skip', dry_run: bool = False) -> Dict[str, Any]:
+    """
+    将一个源库合并进 conn 对应的主库，并在 db_migrations 中记录
+
+    conn 须为自动提交模式（isolation_level=None）：ATTACH 不能在事务中执行，合并本身在单个事务中完成。
+
+    Returns:
+        dict: 合并报告，包含每张表的新增、重复和冲突行数
+    """
+    if on_conflict not in CONFLICT_POLICIES:
+        raise ValueError(f"不支持的冲突处理策略: {on_conflict}")
+
+    conn.execute(f'ATTACH DATABASE ? AS {SOURCE_SCHEMA}', (source_path,))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            ensure_migrations_table(conn)
+            tables = _schema_objects(conn, SOURCE_SCHEMA, 'table')
+            # 全文检索等虚拟表及其影子表属于可重建的索引，不参与合并
+            virtual = [name for name, _, sql in tables if sql.upper().startswith('CREATE VIRTUAL TABLE')]
+            skipped = [name for name, _, _ in tables
+                       if name in virtual or any(name.startswith(f'{v}_') for v in virtual)]
+            reports = [_merge_table(conn, name, on_conflict) for name, _, _ in tables
+                       if name != MIGRATIONS_TABLE and name not in skipped and name not in DERIVED_TABLES]
+
+            # 复制主库中不存在的索引、触发器和视图（派生表上的索引和维护派生表的触发器除外，
+            # 由对应模块在主库上安装）
+            copied_objects = []
+            for object_type in ('index', 'trigger', 'view'):
+                existing = {row[0] for row in _schema_objects(conn, 'main', object_type)}
+                for name, table, sql in _schema_objects(conn, SOURCE_SCHEMA, object_type):
+                    if name in existing or table in DERIVED_TABLES or _references_derived(sql):
+                        continue
+                    conn.execute(sql)
+                    copied_objects.append(name)
+
+            derived = _refresh_derived(conn, [table['table'] for table in reports])
+
+            report = {
+                'source': os.path.basename(source_path),
+                'source_path': os.path.abspath(source_path),
+                'tables': reports,
+                'copied_objects': copied_objects,
+                'skipped_tables': skipped,
+                'derived_tables': derived,
+                'rows_inserted': sum(table['inserted'] for table in reports),
+                'rows_conflicting': sum(table['conflicts'] for table in reports)
+            }
+            conn.execute(
+                f'INSERT OR REPLACE INTO {MIGRATIONS_TABLE} (source, source_path, merged_at, report) '
+                f'VALUES (?, ?, ?, ?)',
+                (report['source'], report['source_path'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                 json.dumps(report, ensure_ascii=False))
+            )
+            conn.execute('ROLLBACK' if dry_run else 'COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.execute(f'DETACH DATABASE {SOURCE_SCHEMA}')
+    return report
+
+
+def backup_database(path: str) -> str:
+    """使用 SQLite 在线备份接口备份主库"""
+    root, ext = os.path.splitext(path)
+    backup_path = f"{root}.pre_merge_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext or '.db'}"
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(backup_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return backup_path
+
+
+def migrate(target: str = None, sources: List[str] = None, on_conflict: str = 'skip',
+            dry_run: bool = False, backup: bool = True, force: bool = False) -> List[Dict[str, Any]]:
+    """
+    合并多个源库到主库
+
+    Args:
+        target: 主库路径，默认为数据访问层配置的主库
+        sources: 源库路径列表，默认为数据访问层配置的其他逻辑库文件
+        on_conflict: 冲突行处理策略
+        dry_run: 只统计不写入（事务最终回滚）
+        backup: 合并前备份主库
+        force: 重新合并已记录过的源库
+
+    Returns:
+        list: 每个源库的合并报告
+    """
+    files = data_access.database_files()
+    target = os.path.abspath(target or files[PRIMARY])
+    if sources is None:
+        sources = [path for name, path in files.items() if name != PRIMARY]
+    sources = [os.path.abspath(path) for path in sources
+               if os.path.exists(path) and os.path.abspath(path) != target]
+
+    if backup and not dry_run and sources and os.path.exists(target):
+        print(f"已备份主库: {backup_database(target)}")
+
+    # isolation_level=None：手动控制事务
+    conn = sqlite3.connect(target, isolation_level=None)
+    reports = []
+    try:
+        merged = merged_sources(conn)
+        for source in sources:
+            if os.path.basename(source) in merged and not force:
+                print(f"跳过已合并的源库: {source}")
+                continue
+            reports.append(merge_database(conn, source, on_conflict, dry_run))
+    finally:
+        conn.close()
+
+    # 刷新数据访问层缓存的路由模式
+    data_access.refresh()
+    return reports
+
+
+def print_report(reports: List[Dict[str, Any]], dry_run: bool = False):
+    prefix = '[预演] ' if dry_run else ''
+    if not reports:
+        print(f"{prefix}没有需要合并的源库")
+    for report in reports:
+        print(f"{prefix}源库 {report['source_path']}: 新增 {report['rows_inserted']} 行, "
+              f"冲突 {report['rows_conflicting']} 行")
+        for table in report['tables']:
+            flags = '新建' if table['created'] else '合并'
+            extra = f", 新增列 {table['added_columns']}" if table['added_columns'] else ''
+            if table['new_ids']:
+                extra += ', 新行重新分配 id'
+            print(f"  {flags} {table['table']}: 新增 {table['inserted']}, 重复 {table['duplicates']}, "
+                  f"冲突 {table['conflicts']}, 覆盖 {table['replaced']}{extra}")
+        if report['skipped_tables']:
+            print(f"  跳过虚拟表: {', '.join(report['skipped_tables'])}")
+        if report['derived_tables']:
+            actions = {'rebuild': '重建', 'clear': '清空'}
+            derived = [f"{actions[item['action']]} {item['table']}" for item in report['derived_tables']]
+            print(f"  派生表: {', '.join(derived)}")
+        if report['copied_objects']:
+            print(f"  复制索引/触发器/视图: {', '.join(report['copied_objects'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='合并 SQLite 数据库文件到主库')
+    parser.add_argument('--target', help='主库路径（默认 medical_system.db 或 MEDICAL_DB_PATH）')
+    parser.add_argument('--source', action='append', help='源库路径，可多次指定（默认 medical_data.db 和 maternal_health.db）')
+    parser.add_argument('--on-conflict', choices=CONFLICT_POLICIES, default='skip', help='主键冲突行的处理方式')
+    parser.add_argument('--dry-run', action='store_true', help='只统计不写入')
+    parser.add_argument('--no-backup', action='store_true', help='合并前不备份主库')
+    parser.add_argument('--force', action='store_true', help='重新合并已记录的源库')
+    args = parser.parse_args(argv)
+
+    try:
+        reports = migrate(args.target, args.source, args.on_conflict, args.dry_run,
+                          backup=not args.no_backup, force=args.force)
+    except MergeConflictError as e:
+        print(f"合并中止，当前源库的修改已回滚: {e}")
+        return 1
+    print_report(reports, args.dry_run)
+    if not args.dry_run:
+        print(f"当前路由模式: {data_access.routing_mode()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
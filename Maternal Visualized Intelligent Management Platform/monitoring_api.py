@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 import sqlite3
+from utils.db_pool import get_pool_stats
+from utils.data_access import get_db
 import json
 import os
 from datetime import datetime, timedelta
@@ -9,8 +11,7 @@ monitoring_bp = Blueprint('monitoring', __name__, url_prefix='/api/monitoring')
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect('medical_system.db')
-    conn.row_factory = sqlite3.Row
+    conn = get_db('system')
     return conn
 
 @monitoring_bp.route('/realtime', methods=['GET'])
@@ -360,4 +361,13 @@ def resolve_alert(alert_id):
         return jsonify({
             'code': 500,
             'message': f'解决预警失败: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@monitoring_bp.route('/db-pool', methods=['GET'])
+def get_db_pool_stats():
+    """获取数据库连接池统计"""
+    return jsonify({
+        'code': 200,
+        'message': '获取连接池统计成功',
+        'data': get_pool_stats()
+    })
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, send_file
 import sqlite3
+from utils.data_access import get_db
+from utils.text_search import keyword_condition
 import json
 from datetime import datetime
 import io
@@ -11,9 +13,7 @@ nutrition_bp = Blueprint('nutrition', __name__, url_prefix='/api')
 # 数据库连接函数
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect('maternal_health.db')
-    # 设置返回字典格式
-    conn.row_factory = sqlite3.Row
+    conn = get_db('nutrition')
     return conn
 
 # 获取营养建议列表
@@ -44,8 +44,9 @@ def get_nutrition_advice():
         
         # 添加过滤条件
         if patient_name:
-            query += " AND patient_name LIKE ?"
-            params.append(f"%{patient_name}%")
+            name_condition, name_params = keyword_condition(conn, 'nutrition_advice', patient_name)
+            query += f" AND {name_condition}"
+            params.extend(name_params)
         
         if gestational_stage:
             query += " AND gestational_stage = ?"
@@ -74,8 +75,8 @@ def get_nutrition_advice():
         count_params = []
         
         if patient_name:
-            count_conditions += " AND patient_name LIKE ?"
-            count_params.append(f"%{patient_name}%")
+            count_conditions += f" AND {name_condition}"
+            count_params.extend(name_params)
         if gestational_stage:
             count_conditions += " AND gestational_stage = ?"
             count_params.append(gestational_stage)
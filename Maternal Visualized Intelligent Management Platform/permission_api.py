@@ -1,6 +1,7 @@
 # 权限管理API
 from flask import Blueprint, request, jsonify, session
 import sqlite3
+from utils.data_access import get_db, database_path
 import os
 from datetime import datetime
 import functools
@@ -9,13 +10,12 @@ import functools
 permission_bp = Blueprint('permission', __name__, url_prefix='/api/permissions')
 
 # SQLite数据库配置
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+DB_PATH = database_path('data')
 
 def get_db_connection():
     """获取数据库连接"""
     try:
-        connection = sqlite3.connect(DB_PATH)
-        connection.row_factory = sqlite3.Row
+        connection = get_db('data')
         return connection
     except Exception as e:
         print(f"数据库连接错误: {e}")
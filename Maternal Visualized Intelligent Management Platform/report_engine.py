@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析报告引擎
+报告的统计查询全部使用参数化 SQL（created_at 上的范围条件，可使用索引，语句可被缓存），
+生成结果按 (报告类型, 数据类型, 日期范围, 数据版本) 缓存在进程内的 LRU 中。
+数据版本来自 metric_rollups 触发器维护的每日版本，范围内的数据变化后缓存键随之变化，无需主动失效。
+
+结束日期早于今天的报告（范围已完全过去）另外保存在 analysis_reports 表中，进程重启后也能直接读取；
+precompute() 预先生成最近若干个完整自然月的报告。
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+import metric_rollups
+
+logger = logging.getLogger(__name__)
+
+REPORT_TABLE = 'analysis_reports'
+
+# summary: 记录数和各指标平均值；detailed: 另附按天的记录数和指标平均值
+REPORT_TYPES = ('summary', 'detailed')
+
+# precompute() 预先生成的完整自然月数
+PRECOMPUTE_MONTHS = 12
+
+
+class ReportCache:
+    """有界的 LRU 报告缓存（线程安全），键中包含数据版本，因此不需要有效期"""
+
+    def __init__(self, max_size: int = 256):
+        """
+        Args:
+            max_size: 最大缓存条目数，0 表示禁用缓存
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """读取缓存，未命中时返回 None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """写入缓存，超过容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存（计数器保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def ensure_report_table(conn):
+    """创建报告表（已存在时不做任何修改）；未限制开始日期的范围 start_date 保存为空字符串"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {REPORT_TABLE} (
+            report_type TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
+            report_json TEXT NOT NULL,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (report_type, data_type, start_date, end_date)
+        )
+    ''')
+    conn.commit()
+
+
+def parse_date_range(start: Optional[str], end: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    校验日期范围（YYYY-MM-DD，包含两端，可以只给出一端）
+
+    Raises:
+        ValueError: 日期格式不正确或开始日期晚于结束日期
+    """
+    bounds = []
+    for value in (start, end):
+        if not value:
+            bounds.append(None)
+            continue
+        try:
+            bounds.append(datetime.strptime(str(value), '%Y-%m-%d').date().isoformat())
+        except ValueError:
+            raise ValueError(f'日期格式不正确: {value}，应为 YYYY-MM-DD')
+    if bounds[0] and bounds[1] and bounds[0] > bounds[1]:
+        raise ValueError('开始日期不能晚于结束日期')
+    return bounds[0], bounds[1]
+
+
+def _range_condition(start: Optional[str], end: Optional[str]) -> Tuple[str, list]:
+    """日期范围转换为 created_at 上的半开区间条件"""
+    conditions, params = [], []
+    if start:
+        conditions.append('created_at >= ?')
+        params.append(start)
+    if end:
+        conditions.append('created_at < ?')
+        params.append((date.fromisoformat(end) + timedelta(days=1)).isoformat())
+    return (' AND '.join(conditions) or '1 = 1'), params
+
+
+def _complete_months(today: date, months: int):
+    """today 之前的 months 个完整自然月 [(开始日期, 结束日期)]，由近及远"""
+    ranges = []
+    end = today.replace(day=1) - timedelta(days=1)
+    for _ in range(months):
+        start = end.replace(day=1)
+        ranges.append((start.isoformat(), end.isoformat()))
+        end = start - timedelta(days=1)
+    return ranges
+
+
+class ReportEngine:
+    """参数化查询、带缓存的分析报告生成"""
+
+    def __init__(self, sources: Dict[str, str], fields: Dict[str, Dict[str, str]], cache_size: int = 256):
+        """
+        Args:
+            sources: 数据类型 -> 源表
+            fields: 数据类型 -> {报告字段: 指标列}，表中没有的列输出为 0
+            cache_size: 进程内缓存的报告数
+        """
+        self.sources = sources
+        self.fields = fields
+        self.cache = ReportCache(max_size=cache_size)
+        self.computed = 0
+        self._ready_paths = set()
+        self._lock = threading.Lock()
+
+    def _ensure_ready(self, conn):
+        """汇总触发器和报告表每个数据库文件只检查一次"""
+        path = conn.execute('PRAGMA database_list').fetchone()[2]
+        if path in self._ready_paths:
+            return
+        metric_rollups.ensure_installed(conn)
+        ensure_report_table(conn)
+        with self._lock:
+            self._ready_paths.add(path)
+
+    def generate(self, conn, report_type: str, data_type: str, start: Optional[str] = None,
+                 end: Optional[str] = None) -> Dict[str, Any]:
+        """
+        返回报告（优先读取缓存和已保存的报告）
+
+        Raises:
+            ValueError: 报告类型、数据类型或日期范围不正确
+        """
+        return self._load_or_compute(conn, report_type, data_type, start, end)[0]
+
+    def _load_or_compute(self, conn, report_type, data_type, start, end) -> Tuple[Dict[str, Any], bool]:
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f'不支持的报告类型: {report_type}')
+        if data_type not in self.sources:
+            raise ValueError(f'不支持的数据类型: {data_type}')
+        start, end = parse_date_range(start, end)
+        self._ensure_ready(conn)
+
+        table = self.sources[data_type]
+        version = metric_rollups.data_version(conn, table, start, end)
+        key = (report_type, data_type, start, end, version)
+        report = self.cache.get(key)
+        if report is not None:
+            return dict(report), False
+
+        # 结束日期早于今天（按数据库的 UTC 时间，与 created_at 默认值一致）的报告持久保存
+        persistent = end is not None and end < conn.execute("SELECT date('now')").fetchone()[0]
+        if persistent:
+            row = conn.execute(f'''
+                SELECT data_version, report_json FROM {REPORT_TABLE}
+                WHERE report_type = ? AND data_type = ? AND start_date = ? AND end_date = ?
+            ''', (report_type, data_type, start or '', end)).fetchone()
+            if row is not None and row[0] == version:
+                report = json.loads(row[1])
+                self.cache.put(key, report)
+                return dict(report), False
+
+        report = self._compute(conn, report_type, data_type, start, end)
+        self.computed += 1
+        if persistent:
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {REPORT_TABLE}
+                    (report_type, data_type, start_date, end_date, data_version, report_json, generated_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (report_type, data_type, start or '', end, version, json.dumps(report, ensure_ascii=False)))
+            conn.commit()
+        self.cache.put(key, report)
+        return dict(report), True
+
+    def _compute(self, conn, report_type, data_type, start, end) -> Dict[str, Any]:
+        table = self.sources[data_type]
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        fields = self.fields[data_type]
+        averages = ', '.join(f'AVG({metric})' if metric in columns else 'NULL' for metric in fields.values())
+        condition, params = _range_condition(start, end)
+
+        row = conn.execute(f'SELECT COUNT(*), {averages} FROM {table} WHERE {condition}', params).fetchone()
+        summary = {'total_records': row[0]}
+        summary.update({field: round(value or 0, 2) for field, value in zip(fields, row[1:])})
+
+        charts = []
+        if report_type == 'detailed':
+            rows = conn.execute(f'''
+                SELECT substr(created_at, 1, 10) AS day, COUNT(*), {averages} FROM {table}
+                WHERE {condition} AND created_at IS NOT NULL
+                GROUP BY day ORDER BY day
+            ''', params).fetchall()
+            chart = {'type': 'daily_records', 'dates': [r[0] for r in rows], 'count': [r[1] for r in rows]}
+            for index, field in enumerate(fields, start=2):
+                chart[field] = [round(r[index] or 0, 2) for r in rows]
+            charts.append(chart)
+
+        return {
+            'report_type': report_type,
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'data_type': data_type,
+            'date_range': {'start': start, 'end': end},
+            'summary': summary,
+            'charts': charts,
+            'recommendations': []
+        }
+
+    def precompute(self, conn, months: int = PRECOMPUTE_MONTHS) -> int:
+        """
+        预先生成并保存最近 months 个完整自然月的各类报告（已是最新版本的跳过）
+
+        Returns:
+            int: 本次重新生成的报告数
+        """
+        self._ensure_ready(conn)
+        today = date.fromisoformat(conn.execute("SELECT date('now')").fetchone()[0])
+        generated = 0
+        for start, end in _complete_months(today, months):
+            for data_type in self.sources:
+                for report_type in REPORT_TYPES:
+                    generated += self._load_or_compute(conn, report_type, data_type, start, end)[1]
+        if generated:
+            logger.info(f"已预先生成 {generated} 份分析报告")
+        return generated
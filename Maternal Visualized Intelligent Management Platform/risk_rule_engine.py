@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+孕产妇风险规则引擎
+从 risk_rules.json 加载声明式规则表，编译为基于 NumPy 的向量化谓词，一次对整列数据求值。
+规则引擎回退预测、机器学习结果的风险因素识别以及孕产妇专项风险评分共用同一张规则表。
+"""
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, Any, List, Mapping, Sequence
+
+import numpy as np
+
+# 默认规则表路径
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'risk_rules.json')
+
+# 支持的比较运算符
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal
+}
+
+
+def _derive_bmi(weight: np.ndarray, height: np.ndarray) -> np.ndarray:
+    """由体重(kg)和身高(cm)计算BMI，身高无效时为NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bmi = weight / ((height / 100) ** 2)
+    return np.where(height > 0, bmi, np.nan)
+
+
+# 派生字段的计算函数
+DERIVATIONS = {
+    'bmi': _derive_bmi
+}
+
+
+def _coerce(value) -> float:
+    """将单个值转换为浮点数，缺失、非数字或NaN均视为缺失（NaN）"""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _lookup(record, parts):
+    """按点分路径读取嵌套字典中的值"""
+    value = record
+    for part in parts:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class CompiledField:
+    """编译后的输入字段：按来源顺序取第一个有效值，缺失时使用默认值"""
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.sources = []
+        for source in spec.get('sources', []):
+            if isinstance(source, str):
+                source = {'path': source}
+            self.sources.append((source['path'], tuple(source['path'].split('.')), float(source.get('scale', 1.0))))
+
+        default = spec.get('default')
+        self.default = np.nan if default is None else float(default)
+        self.cast = spec.get('cast')
+        if self.cast not in (None, 'int'):
+            raise ValueError(f"字段 {name} 不支持的类型转换: {self.cast}")
+
+        self.derive = spec.get('derive')
+        self.derive_from = list(spec.get('from', []))
+        if self.derive is not None and self.derive not in DERIVATIONS:
+            raise ValueError(f"字段 {name} 不支持的派生方式: {self.derive}")
+
+    def resolve(self, source_column, size: int, resolved: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        计算字段列
+
+        Args:
+            source_column: 按 (路径, 路径分段) 返回原始数据列的函数
+            size: 记录数
+            resolved: 已计算的字段列（派生字段依赖）
+        """
+        if self.derive is not None:
+            values = DERIVATIONS[self.derive](*[resolved[name] for name in self.derive_from])
+        else:
+            values = np.full(size, np.nan)
+
+        for path, parts, scale in self.sources:
+            missing = np.isnan(values)
+            if not missing.any():
+                break
+            column = source_column(path, parts)
+            if scale != 1.0:
+                column = column * scale
+            values = np.where(missing, column, values)
+
+        values = np.where(np.isnan(values), self.default, values)
+        if self.cast == 'int':
+            values = np.trunc(values)
+        return values
+
+
+class CompiledRule:
+    """编译后的单条规则"""
+
+    def __init__(self, spec: Dict[str, Any], field_names):
+        self.all = self._compile_conditions(spec.get('when', []), field_names)
+        self.any = self._compile_conditions(spec.get('any', []), field_names)
+        if not self.all and not self.any:
+            raise ValueError(f"规则缺少条件: {spec}")
+        self.group = spec.get('group')
+        self.factor = spec.get('factor')
+        self.importance = spec.get('importance')
+        self.weight = float(spec.get('weight', 0))
+
+    @staticmethod
+    def _compile_conditions(conditions, field_names):
+        compiled = []
+        for field, op, value in conditions:
+            if field not in field_names:
+                raise ValueError(f"规则引用了未定义的字段: {field}")
+            if op not in OPERATORS:
+                raise ValueError(f"不支持的运算符: {op}")
+            compiled.append((field, OPERATORS[op], float(value)))
+        return compiled
+
+    def mask(self, columns: Dict[str, np.ndarray], size: int) -> np.ndarray:
+        """对整列数据求值，返回命中掩码（NaN参与的比较均不命中）"""
+        result = np.ones(size, dtype=bool)
+        for field, op, value in self.all:
+            result &= op(columns[field], value)
+        if self.any:
+            any_mask = np.zeros(size, dtype=bool)
+            for field, op, value in self.any:
+                any_mask |= op(columns[field], value)
+            result &= any_mask
+        return result
+
+    def to_factor(self) -> Dict[str, Any]:
+        factor = {'name': self.factor}
+        if self.importance is not None:
+            factor['importance'] = self.importance
+        return factor
+
+
+class RuleEvaluation:
+    """规则集在一批数据上的求值结果"""
+
+    def __init__(self, rule_set: 'CompiledRuleSet', scores: np.ndarray, levels: np.ndarray, matches: np.ndarray):
+        self.rule_set = rule_set
+        self.scores = scores
+        self.levels = levels
+        # 形状为 (规则数, 记录数) 的命中矩阵
+        self.matches = matches
+        self._factor_rows = None
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _rows(self):
+        if self._factor_rows is None:
+            factor_rules = [(k, rule.to_factor()) for k, rule in enumerate(self.rule_set.rules) if rule.factor]
+            if factor_rules:
+                # 按命中组合编码，相同组合只计算一次因素列表
+                indices = [k for k, _ in factor_rules]
+                codes = (self.matches[indices].T.astype(np.int64) << np.arange(len(indices))).sum(axis=1)
+                patterns = {}
+                for code in np.unique(codes).tolist():
+                    patterns[code] = [factor for bit, (_, factor) in enumerate(factor_rules) if code >> bit & 1]
+                # 每条记录返回独立的字典，调用方修改时互不影响
+                self._factor_rows = [[dict(factor) for factor in patterns[code]] for code in codes.tolist()]
+            else:
+                self._factor_rows = [[] for _ in range(len(self))]
+        return self._factor_rows
+
+    def score(self, index: int) -> float:
+        return float(self.scores[index])
+
+    def level(self, index: int) -> str:
+        return str(self.levels[index])
+
+    def factors(self, index: int) -> List[Dict[str, Any]]:
+        """第 index 条记录命中的风险因素（按规则表顺序）"""
+        return self._rows()[index]
+
+    def factor_names(self, index: int) -> List[str]:
+        return [factor['name'] for factor in self._rows()[index]]
+
+
+class CompiledRuleSet:
+    """编译后的规则集：字段解析、规则谓词、评分与风险等级"""
+
+    def __init__(self, name: str, spec: Dict[str, Any], shared_fields: Dict[str, Any]):
+        self.name = name
+        # 规则集自身的字段覆盖共享字段，并按声明顺序排在后面（派生字段依赖前面的字段）
+        own_fields = spec.get('fields', {})
+        field_specs = {key: field for key, field in shared_fields.items() if key not in own_fields}
+        field_specs.update(own_fields)
+        self.fields = [CompiledField(field_name, field_spec) for field_name, field_spec in field_specs.items()]
+
+        field_names = set(field_specs)
+        self.rules = [CompiledRule(rule, field_names) for rule in spec.get('rules', [])]
+
+        self.base = float(spec.get('base', 0))
+        self.min = spec.get('min')
+        self.max = spec.get('max')
+        self.round = spec.get('round')
+        self.levels = [(level, OPERATORS[op], float(threshold)) for level, op, threshold in spec.get('levels', [])]
+        self.default_level = spec.get('default_level', '低风险')
+        self.recommendations = list(spec.get('recommendations', []))
+
+    def evaluate(self, records: Sequence[Dict[str, Any]]) -> RuleEvaluation:
+        """对一批字典记录求值"""
+        records = list(records)
+        cache = {}
+
+        def source_column(path, parts):
+            if path not in cache:
+                if len(parts) == 1:
+                    values = [record.get(path, np.nan) for record in records]
+                else:
+                    values = [_lookup(record, parts) for record in records]
+                try:
+                    # 全部为数值（或数字字符串）时由 NumPy 整列转换
+                    cache[path] = np.array(values, dtype=float)
+                except (ValueError, TypeError):
+                    cache[path] = np.array([_coerce(value) for value in values], dtype=float)
+            return cache[path]
+
+        return self._evaluate(source_column, len(records))
+
+    def evaluate_columns(self, columns: Mapping[str, Any]) -> RuleEvaluation:
+        """对按列组织的数据求值，列名与字段来源路径一致"""
+        sizes = {len(column) for column in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError("各列长度不一致")
+        size = sizes.pop() if sizes else 0
+
+        def source_column(path, parts):
+            if path not in columns:
+                return np.full(size, np.nan)
+            column = np.asarray(columns[path])
+            if column.dtype.kind in 'biuf':
+                return column.astype(float)
+            return np.array([_coerce(value) for value in column], dtype=float)
+
+        return self._evaluate(source_column, size)
+
+    def _evaluate(self, source_column, size: int) -> RuleEvaluation:
+        resolved = {}
+        for field in self.fields:
+            resolved[field.name] = field.resolve(source_column, size, resolved)
+
+        scores = np.full(size, self.base, dtype=float)
+        matches = np.zeros((len(self.rules), size), dtype=bool)
+        fired_groups = {}
+        for k, rule in enumerate(self.rules):
+            mask = rule.mask(resolved, size)
+            # 同一分组内只命中第一条满足条件的规则（相当于 if/elif）
+            if rule.group is not None:
+                fired = fired_groups.get(rule.group)
+                if fired is not None:
+                    mask &= ~fired
+                    fired |= mask
+                else:
+                    fired_groups[rule.group] = mask.copy()
+            matches[k] = mask
+            # 按规则顺序逐条累加，保证与逐条计算的浮点结果一致
+            scores = scores + np.where(mask, rule.weight, 0.0)
+
+        if self.max is not None:
+            scores = np.minimum(self.max, scores)
+        if self.min is not None:
+            scores = np.maximum(self.min, scores)
+        if self.round is not None:
+            scores = np.round(scores, self.round)
+
+        if self.levels:
+            levels = np.select([op(scores, threshold) for _, op, threshold in self.levels],
+                               [level for level, _, _ in self.levels], default=self.default_level)
+        else:
+            levels = np.full(size, self.default_level)
+
+        return RuleEvaluation(self, scores, levels, matches)
+
+
+class RuleTable:
+    """规则表：按名称管理多个编译后的规则集"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.version = spec.get('version', 'unknown')
+        # 规则表内容的摘要：修改规则而未更新 version 时同样能区分
+        self.digest = hashlib.sha256(
+            json.dumps(spec, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:12]
+        shared_fields = spec.get('fields', {})
+        self.rule_sets = {
+            name: CompiledRuleSet(name, rule_spec, shared_fields)
+            for name, rule_spec in spec.get('rule_sets', {}).items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str = RULES_PATH) -> 'RuleTable':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @property
+    def tag(self) -> str:
+        """规则表标识，例如 rules@1.0#3f2a9c0d41be，用于模型版本"""
+        return f'rules@{self.version}#{self.digest}'
+
+    def __contains__(self, name):
+        return name in self.rule_sets
+
+    def __getitem__(self, name) -> CompiledRuleSet:
+        return self.rule_sets[name]
+
+
+_rule_table = None
+_rule_table_lock = threading.Lock()
+
+
+def get_rule_table() -> RuleTable:
+    """获取进程级共享的规则表（首次调用时加载并编译）"""
+    global _rule_table
+    if _rule_table is None:
+        with _rule_table_lock:
+            if _rule_table is None:
+                _rule_table = RuleTable.from_file(RULES_PATH)
+    return _rule_table
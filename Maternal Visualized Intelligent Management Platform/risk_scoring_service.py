@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+孕产妇风险评分预计算服务
+综合风险评估结果按记录ID保存在 maternal_risk_scores 表中，并记录评分时的模型版本和
+源记录的 updated_at。后台线程只对新增、输入已变化或模型版本过期的记录重新评分，
+仪表盘接口直接读取已保存的结果；后台线程尚未处理的新记录由请求线程评分一次并保存。
+"""
+
+import json
+import sqlite3
+import logging
+from threading import Thread, Event
+from typing import Dict, Any, Iterable, List, Optional
+
+from maternal_risk_predictor import get_predictor
+from utils.data_access import database_path
+
+logger = logging.getLogger(__name__)
+
+# 与 app.py / utils/query.py 使用同一个数据库（主库）
+DB_PATH = database_path('system')
+
+# 预测失败或尚无评分时使用的默认风险信息
+DEFAULT_RISK_PREDICTION = {
+    'gestational_diabetes_risk': 0.05,
+    'preeclampsia_risk': 0.05,
+    'preterm_birth_risk': 0.05,
+    'overall_risk_level': '低风险',
+    'risk_factors': [],
+    'recommendations': []
+}
+
+# build_patient_data 的输入转换版本（2: 传入 gestational_weeks 和 BMI/体重/身高/血糖）
+PATIENT_DATA_VERSION = 2
+
+
+def ensure_risk_score_table(conn: sqlite3.Connection):
+    """创建风险评分表（已存在时不做任何修改）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS maternal_risk_scores (
+            maternal_id INTEGER PRIMARY KEY,
+            model_version TEXT NOT NULL,
+            source_updated_at TIMESTAMP,
+            overall_risk_level TEXT,
+            overall_risk_score REAL,
+            gestational_diabetes_risk REAL,
+            preeclampsia_risk REAL,
+            preterm_birth_risk REAL,
+            risk_factors TEXT,
+            recommendations TEXT,
+            scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def _positive_number(value) -> Optional[float]:
+    """转换为正数，缺失、非数字或不大于 0 时返回 None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def build_patient_data(case: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将 maternal_info 记录转换为风险预测所需的输入
+
+    字段名与预测器特征（gestational_weeks、bmi、blood_sugar）和规则表字段的来源一致；
+    记录中没有 BMI 时由体重(kg)和身高(cm)计算。修改这里的转换后需要增大 PATIENT_DATA_VERSION。
+    """
+    notes = case.get('notes') or ''
+    weight = _positive_number(case.get('weight'))
+    height = _positive_number(case.get('height'))
+    bmi = _positive_number(case.get('bmi'))
+    if bmi is None and weight is not None and height is not None:
+        bmi = round(weight / (height / 100) ** 2, 1)
+    patient_data = {
+        'age': case.get('age', 25),
+        'systolic_pressure': case.get('systolic_pressure', 120),
+        'diastolic_pressure': case.get('diastolic_pressure', 80),
+        'parity': case.get('parity', 0),
+        'gravidity': case.get('pregnancy_count', 0),
+        # 从备注中推断剖宫产史和并发症
+        'previous_cesarean': '剖宫产' in notes or '剖腹产' in notes,
+        'pregnancy_complications': notes
+    }
+    # 缺失的测量值不传入，由预测器和规则表使用各自的默认值
+    optional = {'gestational_weeks': case.get('gestational_weeks'), 'weight': weight, 'height': height,
+                'bmi': bmi, 'blood_sugar': case.get('blood_sugar')}
+    patient_data.update({name: value for name, value in optional.items() if value is not None})
+    return patient_data
+
+
+def scoring_version(predictor) -> str:
+    """保存的评分版本：预测器模型版本加输入转换的版本，任一变化时记录重新评分"""
+    return f'{predictor.model_version};inputs:{PATIENT_DATA_VERSION}'
+
+
+def to_risk_prediction(risk_result: Dict[str, Any]) -> Dict[str, Any]:
+    """将综合风险评估结果转换为仪表盘使用的 risk_prediction 结构"""
+    if not risk_result:
+        return dict(DEFAULT_RISK_PREDICTION)
+    return {
+        'gestational_diabetes_risk': risk_result.get('gestational_diabetes', {}).get('risk_score', 0) / 100,
+        'preeclampsia_risk': risk_result.get('preeclampsia', {}).get('risk_score', 0) / 100,
+        'preterm_birth_risk': risk_result.get('preterm_birth', {}).get('risk_score', 0) / 100,
+        'overall_risk_level': risk_result.get('overall_risk_level', '低风险'),
+        'risk_factors': [factor.get('name', '') for factor in risk_result.get('top_risk_factors', [])],
+        'recommendations': risk_result.get('recommendations', [])
+    }
+
+
+def _source_version_expr(conn: sqlite3.Connection) -> str:
+    """返回判断记录是否变化所用的列表达式，兼容没有 updated_at 列的旧表结构"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(maternal_info)')}
+    if 'updated_at' in columns and 'created_at' in columns:
+        return 'COALESCE(mi.updated_at, mi.created_at)'
+    if 'updated_at' in columns:
+        return 'mi.updated_at'
+    if 'created_at' in columns:
+        return 'mi.created_at'
+    return 'NULL'
+
+
+def _save_scores(conn: sqlite3.Connection, predictor, model_version: str,
+                 cases: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    为一批 maternal_info 记录评分并保存（cases 需包含查询时读取的 _source_updated_at）
+
+    Returns:
+        dict: 记录ID到 risk_prediction 结构的映射
+    """
+    results = predictor.predict_comprehensive_batch([build_patient_data(case) for case in cases])
+
+    predictions = {}
+    values = []
+    for case, risk_result in zip(cases, results):
+        prediction = to_risk_prediction(risk_result)
+        predictions[case['id']] = prediction
+        values.append((
+            case['id'], model_version, case['_source_updated_at'],
+            prediction['overall_risk_level'],
+            (risk_result or {}).get('comprehensive', {}).get('overall_risk_score'),
+            prediction['gestational_diabetes_risk'],
+            prediction['preeclampsia_risk'],
+            prediction['preterm_birth_risk'],
+            json.dumps(prediction['risk_factors'], ensure_ascii=False),
+            json.dumps(prediction['recommendations'], ensure_ascii=False)
+        ))
+    conn.executemany('''
+        INSERT OR REPLACE INTO maternal_risk_scores (
+            maternal_id, model_version, source_updated_at, overall_risk_level,
+            overall_risk_score, gestational_diabetes_risk, preeclampsia_risk,
+            preterm_birth_risk, risk_factors, recommendations, scored_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', values)
+    conn.commit()
+    return predictions
+
+
+def rescore_stale(conn: sqlite3.Connection, predictor=None, batch_size: int = 1000) -> int:
+    """
+    对缺少评分、输入已变化或模型版本过期的记录重新评分
+
+    Args:
+        conn: 数据库连接
+        predictor: 风险预测器，默认使用进程级共享实例
+        batch_size: 每批评分的记录数
+
+    Returns:
+        int: 本次重新评分的记录数
+    """
+    table = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='maternal_info'"
+    ).fetchone()
+    if not table:
+        return 0
+
+    ensure_risk_score_table(conn)
+    # 整轮评分使用同一个预测器实例，保证模型版本与评分结果一致
+    predictor = predictor or get_predictor()
+    model_version = scoring_version(predictor)
+    source_expr = _source_version_expr(conn)
+
+    # 清理源记录已删除的评分
+    conn.execute('DELETE FROM maternal_risk_scores WHERE maternal_id NOT IN (SELECT id FROM maternal_info)')
+    conn.commit()
+
+    # 按主键分页扫描，每批只取需要重新评分的记录
+    stale_sql = f'''
+        SELECT mi.*, {source_expr} AS _source_updated_at
+        FROM maternal_info mi
+        LEFT JOIN maternal_risk_scores s ON s.maternal_id = mi.id
+        WHERE mi.id > ?
+          AND (s.maternal_id IS NULL
+               OR s.model_version IS NOT ?
+               OR s.source_updated_at IS NOT {source_expr})
+        ORDER BY mi.id
+        LIMIT ?
+    '''
+
+    previous_factory = conn.row_factory
+    conn.row_factory = sqlite3.Row
+    rescored = 0
+    last_id = 0
+    try:
+        while True:
+            rows = conn.execute(stale_sql, (last_id, model_version, batch_size)).fetchall()
+            if not rows:
+                break
+            cases = [dict(row) for row in rows]
+            _save_scores(conn, predictor, model_version, cases)
+            rescored += len(cases)
+            last_id = cases[-1]['id']
+    finally:
+        conn.row_factory = previous_factory
+
+    return rescored
+
+
+def score_records(conn: sqlite3.Connection, maternal_ids: Iterable[int],
+                  predictor=None) -> Dict[int, Dict[str, Any]]:
+    """
+    立即为指定记录评分并保存（后台线程尚未处理的新记录由请求线程补上，之后的请求直接读取）
+
+    Returns:
+        dict: 记录ID到 risk_prediction 结构的映射（不存在的ID不返回）
+    """
+    ids = [int(maternal_id) for maternal_id in maternal_ids]
+    if not ids:
+        return {}
+    ensure_risk_score_table(conn)
+    predictor = predictor or get_predictor()
+    previous_factory = conn.row_factory
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(f'''
+            SELECT mi.*, {_source_version_expr(conn)} AS _source_updated_at
+            FROM maternal_info mi WHERE mi.id IN (SELECT value FROM json_each(?))
+            ORDER BY mi.id
+        ''', (json.dumps(ids),)).fetchall()
+        cases = [dict(row) for row in rows]
+        return _save_scores(conn, predictor, scoring_version(predictor), cases) if cases else {}
+    finally:
+        conn.row_factory = previous_factory
+
+
+def load_risk_predictions(conn: sqlite3.Connection,
+                          maternal_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    读取已保存的风险评分
+
+    Args:
+        conn: 数据库连接
+        maternal_ids: 只读取这些记录的评分，默认读取全部
+
+    Returns:
+        dict: 记录ID到 risk_prediction 结构的映射
+    """
+    table = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='maternal_risk_scores'"
+    ).fetchone()
+    if not table:
+        return {}
+
+    sql = '''
+        SELECT maternal_id, gestational_diabetes_risk, preeclampsia_risk, preterm_birth_risk,
+               overall_risk_level, risk_factors, recommendations
+        FROM maternal_risk_scores
+    '''
+    params = ()
+    if maternal_ids is not None:
+        # ID 列表作为一个 JSON 参数传入，不受 SQLite 参数个数上限的限制
+        sql += ' WHERE maternal_id IN (SELECT value FROM json_each(?))'
+        params = (json.dumps([int(maternal_id) for maternal_id in maternal_ids]),)
+
+    predictions = {}
+    for maternal_id, gd_risk, pe_risk, pb_risk, level, factors, recommendations in conn.execute(sql, params):
+        predictions[maternal_id] = {
+            'gestational_diabetes_risk': gd_risk,
+            'preeclampsia_risk': pe_risk,
+            'preterm_birth_risk': pb_risk,
+            'overall_risk_level': level,
+            'risk_factors': json.loads(factors) if factors else [],
+            'recommendations': json.loads(recommendations) if recommendations else []
+        }
+    return predictions
+
+
+class RiskScoringService:
+    """后台风险评分服务"""
+
+    def __init__(self, db_path: str = DB_PATH, interval: float = 30.0, batch_size: int = 1000):
+        """
+        Args:
+            db_path: 数据库文件路径
+            interval: 两轮检查之间的间隔（秒）
+            batch_size: 每批评分的记录数
+        """
+        self.db_path = db_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_rescored = 0
+
+        self.is_running = False
+        self.scoring_thread = None
+        self.stop_event = Event()
+        self.wake_event = Event()
+
+    def run_once(self) -> int:
+        """执行一轮增量评分"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.last_rescored = rescore_stale(conn, batch_size=self.batch_size)
+        finally:
+            conn.close()
+        if self.last_rescored:
+            logger.info(f"风险评分已更新 {self.last_rescored} 条记录")
+        return self.last_rescored
+
+    def trigger(self):
+        """提前唤醒后台线程执行一轮评分（例如发现尚未评分的记录时）"""
+        self.wake_event.set()
+
+    def start(self):
+        """启动后台评分线程"""
+        if self.is_running:
+            logger.warning("风险评分服务已在运行")
+            return
+
+        self.is_running = True
+        self.stop_event.clear()
+        self.scoring_thread = Thread(target=self._scoring_loop, daemon=True)
+        self.scoring_thread.start()
+
+        logger.info("风险评分服务已启动")
+
+    def stop(self):
+        """停止后台评分线程"""
+        self.is_running = False
+        self.stop_event.set()
+        self.wake_event.set()
+
+        if self.scoring_thread:
+            self.scoring_thread.join(timeout=10)
+
+        logger.info("风险评分服务已停止")
+
+    def _scoring_loop(self):
+        """评分主循环"""
+        while self.is_running and not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"风险评分失败：{e}")
+
+            self.wake_event.wait(timeout=self.interval)
+            self.wake_event.clear()
+
+
+risk_scoring_service = RiskScoringService()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量风险预测接口测试脚本
+验证 /api/maternal_risk/predict/batch 的JSON数组、NDJSON输入及逐条错误返回
+"""
+
+import json
+import logging
+
+from flask import Flask
+
+import maternal_risk_api
+from maternal_risk_api import maternal_risk_bp
+from maternal_risk_predictor import get_predictor
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_batch_endpoint")
+
+VALID_RECORD = {
+    'id': 7,
+    'age': 36,
+    'gestational_weeks': 22,
+    'systolic_pressure': 150,
+    'diastolic_pressure': 95,
+    'bmi': 29.5
+}
+
+
+def make_client():
+    """创建仅注册风险预测蓝图的测试客户端"""
+    app = Flask(__name__)
+    app.register_blueprint(maternal_risk_bp)
+    return app.test_client()
+
+
+def parse_ndjson(response):
+    """解析NDJSON响应"""
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line.strip()]
+
+
+def test_batch_json_array():
+    """JSON数组输入：结果与单条综合评估一致，非法记录逐条返回错误"""
+    client = make_client()
+    records = [VALID_RECORD, {'age': 30}, 'not-an-object', dict(VALID_RECORD, age='abc')]
+    response = client.post('/api/maternal_risk/predict/batch', json=records)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = parse_ndjson(response)
+    assert [line['index'] for line in lines] == [0, 1, 2, 3]
+    assert [line['success'] for line in lines] == [True, False, False, False]
+    assert lines[0]['id'] == 7
+
+    expected = get_predictor().predict_comprehensive_risk(VALID_RECORD)
+    assert lines[0]['comprehensive'] == expected['comprehensive']
+    assert lines[0]['overall_risk_level'] == expected['overall_risk_level']
+    assert '缺少必填字段' in lines[1]['error']
+
+
+def test_batch_ndjson_stream():
+    """NDJSON输入：无法解析的行在对应位置返回错误"""
+    client = make_client()
+    body = '\n'.join([json.dumps(VALID_RECORD), '{broken', '', json.dumps(dict(VALID_RECORD, id=8))])
+    response = client.post('/api/maternal_risk/predict/batch', data=body,
+                           content_type='application/x-ndjson')
+    lines = parse_ndjson(response)
+    assert [line['success'] for line in lines] == [True, False, True]
+    assert lines[2]['id'] == 8
+    assert 'JSON解析失败' in lines[1]['error']
+
+
+def test_batch_chunking_and_limit():
+    """分块处理与批量上限"""
+    client = make_client()
+    original_chunk, original_limit = maternal_risk_api.BATCH_CHUNK_SIZE, maternal_risk_api.BATCH_MAX_RECORDS
+    maternal_risk_api.BATCH_CHUNK_SIZE, maternal_risk_api.BATCH_MAX_RECORDS = 3, 5
+    try:
+        records = [dict(VALID_RECORD, id=i) for i in range(7)]
+        lines = parse_ndjson(client.post('/api/maternal_risk/predict/batch', json=records))
+    finally:
+        maternal_risk_api.BATCH_CHUNK_SIZE, maternal_risk_api.BATCH_MAX_RECORDS = original_chunk, original_limit
+    assert [line['id'] for line in lines[:5]] == [0, 1, 2, 3, 4]
+    assert all(line['success'] for line in lines[:5])
+    assert lines[5]['success'] is False and '上限' in lines[5]['error']
+    assert len(lines) == 6
+
+
+def test_batch_rejects_invalid_body():
+    """请求体不是数组时返回400"""
+    client = make_client()
+    response = client.post('/api/maternal_risk/predict/batch', json={'age': 30})
+    assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    test_batch_json_array()
+    test_batch_ndjson_stream()
+    test_batch_chunking_and_limit()
+    test_batch_rejects_invalid_body()
+    logger.info("批量预测接口测试全部通过")
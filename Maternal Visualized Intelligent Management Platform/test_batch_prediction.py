@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量风险预测测试脚本
+验证 predict_batch / predict_comprehensive_batch 与逐条预测结果完全一致
+"""
+
+import random
+import logging
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from maternal_risk_predictor import MaternalRiskPredictor
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_batch_prediction")
+
+RISK_TYPES = ['preeclampsia', 'gestational_diabetes', 'preterm_birth']
+
+
+def make_records(count, seed=42):
+    """生成测试用患者数据，包含部分缺失和非法字段"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        records.append({
+            'age': rng.randint(18, 45),
+            'bmi': round(rng.uniform(17, 35), 1),
+            'blood_sugar': round(rng.uniform(3, 9), 1),
+            'systolic_pressure': rng.randint(90, 170),
+            'diastolic_pressure': rng.randint(55, 110),
+            'gestational_weeks': rng.randint(8, 41),
+            'previous_preterm': rng.choice([0, 1])
+        })
+    records.append({})
+    records.append({'age': None, 'bmi': float('nan'), 'blood_sugar': 'abc'})
+    return records
+
+
+def attach_models(predictor, records):
+    """为每种风险类型拟合一个临时逻辑回归模型，以覆盖机器学习路径"""
+    for risk_type in RISK_TYPES:
+        X = predictor._build_feature_matrix(records, risk_type)
+        score = X.sum(axis=1)
+        y = (score > np.median(score)).astype(int)
+        predictor.models[risk_type] = LogisticRegression(max_iter=1000).fit(X, y)
+        predictor.model_info[risk_type] = {'model_type': 'logistic_regression'}
+
+
+def test_rule_based_batch_matches_single():
+    """无模型时批量结果与逐条规则预测一致"""
+    predictor = MaternalRiskPredictor()
+    predictor.models = {}
+    records = make_records(200)
+
+    for risk_type in RISK_TYPES:
+        single = [getattr(predictor, f'predict_{risk_type}_risk')(record) for record in records]
+        assert predictor.predict_batch(records, risk_type) == single
+
+    single = [predictor.predict_comprehensive_risk(record) for record in records]
+    assert predictor.predict_comprehensive_batch(records) == single
+
+
+def test_ml_batch_matches_single():
+    """机器学习模型下批量结果与逐条预测一致"""
+    predictor = MaternalRiskPredictor()
+    records = make_records(300)
+    attach_models(predictor, records)
+
+    for risk_type in RISK_TYPES:
+        single = [getattr(predictor, f'predict_{risk_type}_risk')(record) for record in records]
+        batch = predictor.predict_batch(records, risk_type)
+        assert batch == single
+        # 含缺失和非法值的记录由规则表统一按默认值处理，不再回退到规则引擎
+        assert all(result['model_type'] == 'logistic_regression' for result in batch)
+
+    single = [predictor.predict_comprehensive_risk(record) for record in records]
+    assert predictor.predict_comprehensive_batch(records) == single
+
+
+def test_batch_calls_model_once_per_risk_type():
+    """每种风险类型的模型在一个批次中只调用一次"""
+    predictor = MaternalRiskPredictor()
+    records = make_records(50)
+    attach_models(predictor, records)
+
+    calls = {}
+    for risk_type in RISK_TYPES:
+        model = predictor.models[risk_type]
+        original = model.predict_proba
+
+        def counting_predict_proba(X, _original=original, _risk_type=risk_type):
+            calls[_risk_type] = calls.get(_risk_type, 0) + 1
+            return _original(X)
+        model.predict_proba = counting_predict_proba
+
+    predictor.predict_comprehensive_batch(records)
+    assert calls == {risk_type: 1 for risk_type in RISK_TYPES}
+
+
+def test_empty_batch():
+    """空批次返回空列表"""
+    predictor = MaternalRiskPredictor()
+    assert predictor.predict_comprehensive_batch([]) == []
+    assert predictor.predict_batch([], 'preeclampsia') == []
+
+
+if __name__ == "__main__":
+    test_rule_based_batch_matches_single()
+    test_ml_batch_matches_single()
+    test_batch_calls_model_once_per_risk_type()
+    test_empty_batch()
+    logger.info("批量预测测试全部通过")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+首页分布聚合测试脚本
+验证 SQL 聚合 / 单次遍历的结果与逐条统计 getAllCasesData 的结果一致，且同一请求内只扫描一次
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+from flask import Flask
+
+from utils import data_access
+from utils import getAllData
+from utils.getAllData import (getPieData, getConfigOne, getFoundData, getGenderData,
+                              getCircleData, getBodyData)
+from utils.getPublicData import getAllCasesData
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_dashboard_aggregation")
+
+
+def count_by(casesList, key):
+    """逐条统计，保持首次出现顺序（原实现的统计方式）"""
+    counts = {}
+    for caseItem in casesList:
+        value = key(caseItem)
+        counts[value] = counts.get(value, 0) + 1
+    return list(counts.items())
+
+
+def disease_of(caseItem):
+    return caseItem.get('disease') or caseItem.get('pregnancy_status', '未知')
+
+
+def assert_matches_row_by_row():
+    casesList = getAllCasesData()
+    assert casesList
+    ages = [int(caseItem['age']) for caseItem in casesList]
+    diseases = count_by(casesList, disease_of)
+    departments = count_by(casesList, lambda c: c.get('department', '未知'))
+
+    pie = {item['name']: item['value'] for item in getPieData()}
+    assert pie['0-10岁'] == sum(age < 10 for age in ages)
+    assert pie['20-30岁'] == sum(20 <= age < 30 for age in ages)
+    assert pie['30-40岁'] == sum(30 <= age < 40 for age in ages)
+    assert pie['60岁以上'] == sum(age >= 60 for age in ages)
+    assert sum(pie.values()) == len(casesList)
+
+    top, config = getConfigOne()
+    assert [(item['name'], item['value']) for item in config] == diseases
+    assert top == config[:6]
+
+    by_count = sorted(diseases, key=lambda data: data[1], reverse=True)
+    assert getFoundData() == (len(casesList), by_count[0][0],
+                              sorted(departments, key=lambda data: data[1], reverse=True)[0][0],
+                              sorted(count_by(casesList, lambda c: c.get('hospital', '未知')),
+                                     key=lambda data: data[1], reverse=True)[0][0],
+                              max(ages + [0]), min(ages + [100]))
+
+    boyList, girlList, ratio = getGenderData()
+    girls = [c for c in casesList if c.get('gender', '女') == '女']
+    boys = [c for c in casesList if c.get('gender', '女') == '男']
+    assert [(item['name'], item['value']) for item in girlList] == count_by(girls, disease_of)
+    assert [(item['name'], item['value']) for item in boyList] == count_by(boys, disease_of)
+    assert ratio == [int(round(len(girls) / len(casesList) * 100, 0)),
+                     int(round(len(boys) / len(casesList) * 100, 0))]
+
+    assert [(item['name'], item['value']) for item in getCircleData()] == \
+        sorted(departments, key=lambda data: data[1], reverse=True)
+    xData, y1Data, y2Data = getBodyData()
+    assert xData == [name for name, _ in by_count]
+    assert y1Data == y2Data == [0] * len(xData)
+
+
+def test_maternal_info_group_by_matches_row_by_row():
+    """孕产妇表走列式快照或 SQL 聚合，结果都与逐条统计一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        conn = sqlite3.connect(path)
+        # 与项目中的 maternal_info 表结构一致（getAllCasesData 按列位置读取）
+        conn.execute('''
+            CREATE TABLE maternal_info (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER,
+                gestational_weeks INTEGER, pregnancy_count INTEGER, parity INTEGER, pregnancy_type TEXT,
+                weight REAL, height REAL, systolic_pressure INTEGER, diastolic_pressure INTEGER, notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.executemany('INSERT INTO maternal_info (name, age, notes) VALUES (?, ?, ?)', [
+            ('孕妇A', 28, '产检正常'), ('孕妇B', 35, '血压异常'), ('孕妇C', 19, ''),
+            ('孕妇D', 42, '胎位异常'), ('孕妇E', 31, '无'), ('孕妇F', 8, '无'), ('孕妇G', 60, '无')
+        ])
+        conn.commit()
+        conn.close()
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            # 列式快照和 SQL 聚合两条路径
+            assert_matches_row_by_row()
+            assert getFoundData()[4:] == (60, 8)
+            os.environ['MEDICAL_COLUMNAR_SNAPSHOT'] = '0'
+            assert_matches_row_by_row()
+            assert getFoundData()[4:] == (60, 8)
+        finally:
+            os.environ.pop('MEDICAL_COLUMNAR_SNAPSHOT', None)
+            data_access.configure()
+
+
+def test_cases_table_single_pass_matches_row_by_row():
+    """普通病例表单次遍历统计，男女分布与科室、医院排名一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE cases (id INTEGER PRIMARY KEY, age INTEGER, gender INTEGER, disease TEXT,
+                                department TEXT, hospital TEXT, duration INTEGER)
+        ''')
+        conn.executemany('INSERT INTO cases VALUES (?, ?, ?, ?, ?, ?, 1)', [
+            (1, 45, 1, '高血压', '心内科', '人民医院'), (2, 33, 2, '妊娠糖尿病', '产科', '妇幼'),
+            (3, 67, 1, '高血压', '心内科', '人民医院'), (4, 25, 2, '贫血', '血液科', '妇幼'),
+            (5, 52, 2, '高血压', '心内科', '妇幼')
+        ])
+        conn.commit()
+        conn.close()
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            assert_matches_row_by_row()
+        finally:
+            data_access.configure()
+
+
+def test_aggregates_shared_within_request():
+    """同一请求内多个函数只计算一次，下一个请求重新计算"""
+    app = Flask(__name__)
+    calls = []
+    original = getAllData.computeCaseAggregates
+
+    def counting():
+        calls.append(1)
+        return getAllData._emptyAggregates()
+
+    getAllData.computeCaseAggregates = counting
+    try:
+        with app.test_request_context('/getHomeData'):
+            getPieData()
+            getConfigOne()
+            getFoundData()
+            getGenderData()
+            getCircleData()
+            getBodyData()
+        assert len(calls) == 1
+        with app.test_request_context('/getHomeData'):
+            assert getFoundData() == (0, '未知', '未知', '未知', 0, 100)
+        assert len(calls) == 2
+    finally:
+        getAllData.computeCaseAggregates = original
+
+
+def test_maternal_health_week_stats_same_without_snapshot():
+    """/getMaternalHealthData 的孕周、年龄分布在关闭快照后与快照路径一致"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE maternal_info (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER,
+                gestational_weeks INTEGER, pregnancy_count INTEGER, parity INTEGER, pregnancy_type TEXT,
+                weight REAL, height REAL, systolic_pressure INTEGER, diastolic_pressure INTEGER, notes TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.executemany('INSERT INTO maternal_info (name, age, gestational_weeks) VALUES (?, ?, ?)', [
+            ('孕妇A', 24, 8), ('孕妇B', 29, 20), ('孕妇C', 33, 28), ('孕妇D', 38, 36), ('孕妇E', None, None)
+        ])
+        conn.commit()
+        conn.close()
+        client = app.app.test_client()
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            with contextlib.redirect_stdout(io.StringIO()):
+                snapshot = client.get('/getMaternalHealthData').get_json()['data']
+                os.environ['MEDICAL_COLUMNAR_SNAPSHOT'] = '0'
+                fallback = client.get('/getMaternalHealthData').get_json()['data']
+            assert snapshot['weekStats'] == {'早期(<12周)': 2, '中期(12-28周)': 2, '晚期(>28周)': 1}
+            assert fallback['weekStats'] == snapshot['weekStats']
+            assert fallback['ageStats'] == snapshot['ageStats']
+        finally:
+            os.environ.pop('MEDICAL_COLUMNAR_SNAPSHOT', None)
+            data_access.configure()
+
+
+if __name__ == "__main__":
+    test_maternal_info_group_by_matches_row_by_row()
+    test_cases_table_single_pass_matches_row_by_row()
+    test_aggregates_shared_within_request()
+    test_maternal_health_week_stats_same_without_snapshot()
+    logger.info("首页分布聚合测试全部通过")
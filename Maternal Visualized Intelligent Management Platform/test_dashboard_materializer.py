@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+仪表盘增量物化测试脚本
+验证触发器维护的计数在插入、更新、删除后与全表 GROUP BY 重算的结果一致
+"""
+
+import os
+import sqlite3
+import tempfile
+import logging
+from datetime import datetime, timedelta
+
+import dashboard_materializer
+from dashboard_materializer import COUNTER_TABLE
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_dashboard_materializer")
+
+MEDICAL_SCHEMA = '''
+    CREATE TABLE medical_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id TEXT, name TEXT, age INTEGER, gender TEXT,
+        disease_type TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+MATERNAL_SCHEMA = '''
+    CREATE TABLE maternal_info (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER, gestational_weeks INTEGER,
+        risk_level TEXT, notes TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def counters_snapshot(conn):
+    return sorted(conn.execute(f'SELECT source, dimension, key, value FROM {COUNTER_TABLE} '
+                               f'WHERE value != 0 AND dimension != ?', (dashboard_materializer.INSTALLED_DIMENSION,)))
+
+
+def assert_matches_rebuild(conn):
+    """增量计数与全量重建的结果一致"""
+    incremental = counters_snapshot(conn)
+    for table in dashboard_materializer.DIMENSIONS:
+        dashboard_materializer.rebuild(conn, table)
+    assert incremental == counters_snapshot(conn)
+
+
+def test_triggers_track_insert_update_delete():
+    """插入、更新、删除后计数与重建一致，渲染结果与原 SQL 统计一致"""
+    today = datetime.now().date()
+    stamp = lambda days: (datetime.combine(today, datetime.min.time()) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'system.db'))
+        conn.execute(MEDICAL_SCHEMA)
+        conn.execute(MATERNAL_SCHEMA)
+        # 安装前已有的数据由 GROUP BY 回填
+        conn.executemany('INSERT INTO medical_data (name, gender, disease_type, created_at) VALUES (?, ?, ?, ?)', [
+            ('甲', '女', '高血压', stamp(0)), ('乙', '男', '糖尿病', stamp(40)), ('丙', '女', None, stamp(3))
+        ])
+        conn.commit()
+        assert dashboard_materializer.install(conn) == ['medical_data', 'maternal_info']
+        assert dashboard_materializer.install(conn) == []
+
+        conn.executemany('INSERT INTO medical_data (name, gender, disease_type, created_at) VALUES (?, ?, ?, ?)', [
+            ('丁', '女', '高血压', stamp(0)), ('戊', '男', '高血压', stamp(1))
+        ])
+        conn.executemany('INSERT INTO maternal_info (name, gestational_weeks, risk_level, created_at) VALUES (?, ?, ?, ?)', [
+            ('孕妇A', 8, '低风险', stamp(0)), ('孕妇B', 20, '高风险', stamp(2)), ('孕妇C', 36, '', stamp(0)),
+            ('孕妇D', None, None, stamp(0)), ('孕妇E', 12, '中风险', None)
+        ])
+        conn.execute("UPDATE medical_data SET disease_type = '糖尿病', created_at = ? WHERE name = '丁'", (stamp(1),))
+        conn.execute("UPDATE maternal_info SET gestational_weeks = 30 WHERE name = '孕妇A'")
+        conn.execute("UPDATE maternal_info SET notes = '复查' WHERE name = '孕妇B'")
+        conn.execute("DELETE FROM medical_data WHERE name = '乙'")
+        conn.execute("DELETE FROM maternal_info WHERE name = '孕妇E'")
+        conn.commit()
+        assert_matches_rebuild(conn)
+
+        medical = dashboard_materializer.build_medical_snapshot(conn, today)
+        assert medical['total'] == conn.execute('SELECT COUNT(*) FROM medical_data').fetchone()[0] == 4
+        assert medical['today'] == 1
+        assert medical['disease_distribution'] == [{'name': '高血压', 'value': 2}, {'name': '未知', 'value': 1},
+                                                   {'name': '糖尿病', 'value': 1}]
+        assert [item['value'] for item in medical['monthly_trend']][-1] == sum(
+            stamp(days)[:7] == today.strftime('%Y-%m') for days in (0, 1, 3, 1))
+
+        overview = dashboard_materializer.build_overview_snapshot(conn, today)
+        assert overview['total_maternal'] == 3
+        assert overview['today_new_cases'] == 1
+        assert [item['value'] for item in overview['trends']['daily_cases']][-2:] == [2, 1]
+
+        maternal = dashboard_materializer.build_maternal_snapshot(conn, today)
+        assert maternal['total'] == 4
+        assert maternal['today'] == 3
+        assert maternal['pregnancy_distribution'] == [{'name': '早期', 'value': 1}, {'name': '中期', 'value': 1},
+                                                      {'name': '晚期', 'value': 2}]
+        assert {item['name']: item['value'] for item in maternal['risk_distribution']} == {'未知': 2, '高风险': 1, '低风险': 1}
+        conn.close()
+
+
+def test_schema_without_optional_columns():
+    """缺少 risk_level 等列的旧表结构只安装存在的维度，未安装时渲染返回 None"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'data.db'))
+        assert dashboard_materializer.build_medical_snapshot(conn) is None
+        conn.execute('CREATE TABLE maternal_info (id INTEGER PRIMARY KEY, name TEXT, gestational_weeks INTEGER, created_at TIMESTAMP)')
+        assert dashboard_materializer.install(conn) == ['maternal_info']
+        assert dashboard_materializer.build_medical_snapshot(conn) is None
+        conn.execute("INSERT INTO maternal_info (name, gestational_weeks, created_at) VALUES ('孕妇', 10, '2024-01-01 08:00:00')")
+        conn.commit()
+        maternal = dashboard_materializer.build_maternal_snapshot(conn)
+        assert maternal['total'] == 1
+        assert maternal['risk_distribution'] is None
+
+        # 表结构变化后重新安装并重建计数
+        conn.execute('ALTER TABLE maternal_info ADD COLUMN risk_level TEXT')
+        conn.execute("UPDATE maternal_info SET risk_level = '中风险'")
+        conn.commit()
+        assert dashboard_materializer.install(conn) == ['maternal_info']
+        assert dashboard_materializer.build_maternal_snapshot(conn)['risk_distribution'] == [{'name': '中风险', 'value': 1}]
+
+        dashboard_materializer.uninstall(conn)
+        assert dashboard_materializer.build_maternal_snapshot(conn) is None
+        conn.execute("INSERT INTO maternal_info (name, gestational_weeks) VALUES ('孕妇2', 20)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_triggers_track_insert_update_delete()
+    test_schema_without_optional_columns()
+    logger.info("仪表盘增量物化测试全部通过")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大屏聚合接口测试脚本
+验证 /api/dashboard/screen 合并的各部分与单独接口的结果一致、各部分并发执行且工作线程归还连接、
+以及 ETag / If-None-Match：数据未变化时返回 304，数据变化后返回新内容
+"""
+
+import io
+import os
+import time
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+import dashboard_materializer
+from utils import data_access
+from utils.db_pool import get_pool_stats
+from test_dashboard_materializer import MEDICAL_SCHEMA, MATERNAL_SCHEMA
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    import analysis_api
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_dashboard_screen")
+
+
+@contextlib.contextmanager
+def screen_environment():
+    """安装了仪表盘计数的独立主库"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        conn = sqlite3.connect(path)
+        conn.execute(MEDICAL_SCHEMA)
+        conn.execute(MATERNAL_SCHEMA)
+        conn.executemany('INSERT INTO medical_data (name, gender, disease_type) VALUES (?, ?, ?)',
+                         [(f'患者{i}', '女' if i % 3 else '男', ('高血压', '糖尿病')[i % 2]) for i in range(50)])
+        conn.executemany('INSERT INTO maternal_info (name, gestational_weeks, risk_level) VALUES (?, ?, ?)',
+                         [(f'孕妇{i}', 6 + i % 34, ('低风险', '高风险')[i % 2]) for i in range(20)])
+        conn.commit()
+        dashboard_materializer.install(conn)
+        conn.close()
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            yield path
+        finally:
+            data_access.configure()
+
+
+def test_screen_matches_individual_endpoints():
+    """各部分与单独接口的数据一致，附带各部分耗时"""
+    with screen_environment():
+        client = app.app.test_client()
+        response = client.get('/api/dashboard/screen')
+        assert response.status_code == 200
+        body = response.get_json()
+        assert set(body['data']) == set(analysis_api.SCREEN_SECTIONS)
+        for name in ('medical', 'maternal', 'comparison'):
+            assert body['data'][name] == client.get(f'/api/dashboard/{name}').get_json()['data']
+        overview = client.get('/api/dashboard/overview').get_json()['data']
+        assert body['data']['overview']['total_patients'] == overview['total_patients'] == 50
+        assert body['data']['maternal']['total'] == 20
+        assert set(body['timings']) == set(analysis_api.SCREEN_SECTIONS) | {'total'}
+        assert 'overview;dur=' in response.headers['Server-Timing']
+
+        response = client.get('/api/dashboard/screen', query_string={'sections': 'medical,maternal'})
+        assert set(response.get_json()['data']) == {'medical', 'maternal'}
+        response = client.get('/api/dashboard/screen', query_string={'sections': 'medical,unknown'})
+        assert response.status_code == 400
+
+
+def test_sections_run_concurrently_and_release_connections():
+    """各部分在不同线程中同时执行，结束后工作线程不再持有连接"""
+    with screen_environment() as path:
+        previous = dict(analysis_api.SCREEN_SECTIONS)
+
+        def slow(build):
+            def section():
+                payload = build()
+                time.sleep(0.3)
+                return payload
+            return section
+
+        try:
+            for name, build in previous.items():
+                analysis_api.SCREEN_SECTIONS[name] = slow(build)
+            start = time.perf_counter()
+            response = app.app.test_client().get('/api/dashboard/screen')
+            elapsed = time.perf_counter() - start
+        finally:
+            analysis_api.SCREEN_SECTIONS.update(previous)
+        assert response.status_code == 200
+        assert elapsed < 0.3 * len(previous) - 0.3
+        assert min(response.get_json()['timings'][name] for name in previous) >= 300
+
+        stats = get_pool_stats()
+        pool = next(stats[key] for key in stats if os.path.abspath(stats[key]['db_path']) == os.path.abspath(path))
+        assert pool['in_use'] == 0
+
+
+def test_etag_returns_not_modified():
+    """If-None-Match 与当前 ETag 匹配时返回 304，数据变化后 ETag 变化"""
+    with screen_environment() as path:
+        client = app.app.test_client()
+        response = client.get('/api/dashboard/screen', query_string={'sections': 'medical,maternal'})
+        etag = response.headers['ETag']
+        assert etag.startswith('W/')
+
+        response = client.get('/api/dashboard/screen', query_string={'sections': 'medical,maternal'},
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.data == b''
+
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO maternal_info (name, gestational_weeks, risk_level) VALUES ('新', 30, '高风险')")
+        conn.commit()
+        conn.close()
+        response = client.get('/api/dashboard/screen', query_string={'sections': 'medical,maternal'},
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert response.get_json()['data']['maternal']['total'] == 21
+
+
+if __name__ == "__main__":
+    test_screen_matches_individual_endpoints()
+    test_sections_run_concurrently_and_release_connections()
+    test_etag_returns_not_modified()
+    logger.info("大屏聚合接口测试全部通过")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据访问层与数据库合并工具测试脚本
+验证逻辑库路由（split / attach / single / auto）以及 migrate_databases 的合并、冲突处理、幂等性、
+自增 id 重叠的行重新分配 id，和派生表不作为数据合并、合并后重建
+"""
+
+import os
+import sqlite3
+import tempfile
+import logging
+
+from utils import data_access
+from utils.data_access import get_db, database_path, routing_mode
+import metric_rollups
+import dashboard_materializer
+from migrate_databases import migrate, MergeConflictError
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_data_access")
+
+
+def create_databases(tmp):
+    """创建主库（孕产妇信息、用户）和业务库（用户、医院）"""
+    files = {
+        'system': os.path.join(tmp, 'system.db'),
+        'data': os.path.join(tmp, 'data.db'),
+        'nutrition': os.path.join(tmp, 'nutrition.db')
+    }
+    conn = sqlite3.connect(files['system'])
+    conn.executescript('''
+        CREATE TABLE maternal_info (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, hospital_id INTEGER);
+        INSERT INTO maternal_info (name, hospital_id) VALUES ('孕妇A', 1), ('孕妇B', 2);
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE);
+        INSERT INTO users VALUES (1, 'admin'), (3, 'carol');
+    ''')
+    conn.close()
+
+    conn = sqlite3.connect(files['data'])
+    conn.executescript('''
+        CREATE TABLE hospitals (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE INDEX idx_hospitals_name ON hospitals (name);
+        INSERT INTO hospitals VALUES (1, '市妇幼'), (2, '人民医院');
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, phone TEXT);
+        INSERT INTO users VALUES (1, 'admin', NULL), (2, 'bob', '138'), (3, 'dave', NULL), (4, 'carol', NULL);
+    ''')
+    conn.close()
+    return files
+
+
+def count(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_split_and_attach_routing():
+    """split 模式各库独立；attach 模式可跨文件联表"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = create_databases(tmp)
+        try:
+            data_access.configure(mode='split', files=files)
+            assert database_path('data') == files['data']
+            conn = get_db('data')
+            assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 4
+            conn.close()
+
+            data_access.configure(mode='attach', files=files)
+            conn = get_db('system')
+            rows = conn.execute('''
+                SELECT m.name, h.name AS hospital FROM maternal_info m
+                JOIN data.hospitals h ON h.id = m.hospital_id ORDER BY m.id
+            ''').fetchall()
+            conn.close()
+            assert [tuple(row) for row in rows] == [('孕妇A', '市妇幼'), ('孕妇B', '人民医院')]
+        finally:
+            data_access.configure()
+
+
+def test_migrate_merges_and_routes_to_single_database():
+    """合并后 auto 模式路由到主库，冲突行被跳过并记录"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = create_databases(tmp)
+        try:
+            data_access.configure(mode='auto', files=files)
+            assert routing_mode() == 'split'
+
+            reports = migrate(backup=False)
+            assert [report['source'] for report in reports] == ['data.db']
+            tables = {table['table']: table for table in reports[0]['tables']}
+            assert tables['hospitals']['created'] and tables['hospitals']['inserted'] == 2
+            users = tables['users']
+            assert (users['inserted'], users['duplicates'], users['conflicts']) == (1, 1, 2)
+            assert users['added_columns'] == ['phone']
+            assert 'idx_hospitals_name' in reports[0]['copied_objects']
+
+            data_access.configure(files=files)
+            assert routing_mode() == 'single'
+            assert database_path('data') == files['system']
+            conn = get_db('data')
+            rows = conn.execute('''
+                SELECT m.name, h.name FROM maternal_info m JOIN hospitals h ON h.id = m.hospital_id
+            ''').fetchall()
+            usernames = [row[0] for row in conn.execute('SELECT username FROM users ORDER BY id')]
+            conn.close()
+            assert len(rows) == 2
+            assert usernames == ['admin', 'bob', 'carol']
+
+            # 再次运行时跳过已合并的源库
+            assert migrate(backup=False) == []
+        finally:
+            data_access.configure()
+
+
+def test_fail_policy_and_dry_run_leave_target_unchanged():
+    """fail 策略和预演都不修改主库"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = create_databases(tmp)
+        try:
+            data_access.configure(mode='split', files=files)
+            try:
+                migrate(on_conflict='fail', backup=False)
+            except MergeConflictError:
+                pass
+            else:
+                raise AssertionError("存在冲突时应中止合并")
+            assert count(files['system'], 'SELECT COUNT(*) FROM users') == 2
+            assert count(files['system'], "SELECT COUNT(*) FROM sqlite_master WHERE name = 'hospitals'") == 0
+
+            reports = migrate(dry_run=True, backup=False)
+            assert reports[0]['rows_inserted'] == 3
+            assert count(files['system'], "SELECT COUNT(*) FROM sqlite_master WHERE name = 'hospitals'") == 0
+
+            reports = migrate(on_conflict='replace', backup=False)
+            users = reports[0]['tables'][1]
+            assert users['replaced'] == 2
+            conn = sqlite3.connect(files['system'])
+            usernames = [row[0] for row in conn.execute('SELECT username FROM users ORDER BY id')]
+            conn.close()
+            assert usernames == ['admin', 'bob', 'dave', 'carol']
+        finally:
+            data_access.configure()
+
+
+def test_autoincrement_rows_get_new_ids_and_derived_tables_rebuilt():
+    """两个文件的自增 id 重叠时源库的行全部保留并分配新 id，内容相同的行跳过；
+    派生表不复制，计数按合并后的数据重建，报告缓存清空，源库维护汇总表的触发器不复制"""
+    schema = """
+        CREATE TABLE maternal_info (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, age INTEGER,
+                                    created_at TIMESTAMP);
+        CREATE TABLE analysis_reports (cache_key TEXT PRIMARY KEY, report_json TEXT);
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {'system': os.path.join(tmp, 'system.db'), 'data': os.path.join(tmp, 'data.db')}
+        conn = sqlite3.connect(files['system'])
+        conn.executescript(schema + """
+            INSERT INTO maternal_info (name, age, created_at) VALUES ('a1', 25, '2024-01-01'), ('a2', 30, '2024-01-02');
+            INSERT INTO analysis_reports VALUES ('old', '{}');
+        """)
+        dashboard_materializer.install(conn)
+        conn.close()
+
+        conn = sqlite3.connect(files['data'])
+        conn.executescript(schema + """
+            INSERT INTO maternal_info (name, age, created_at) VALUES
+                ('b1', 26, '2024-02-01'), ('b2', 27, '2024-02-02'), ('b3', 28, '2024-02-03'),
+                ('a1', 25, '2024-01-01');
+            INSERT INTO analysis_reports VALUES ('source', '{}');
+            CREATE TABLE import_jobs (id TEXT PRIMARY KEY, status TEXT);
+            CREATE INDEX idx_import_jobs_status ON import_jobs (status);
+            INSERT INTO import_jobs VALUES ('job', 'queued');
+        """)
+        metric_rollups.install(conn)
+        conn.close()
+
+        try:
+            data_access.configure(mode='split', files=files)
+            report = migrate(backup=False)[0]
+            tables = {table['table']: table for table in report['tables']}
+            assert set(tables) == {'maternal_info'}
+            info = tables['maternal_info']
+            assert (info['inserted'], info['duplicates'], info['conflicts']) == (3, 1, 0) and info['new_ids']
+            assert report['derived_tables'] == [{'table': 'dashboard_counters', 'action': 'rebuild'},
+                                                {'table': 'analysis_reports', 'action': 'clear'}]
+
+            conn = sqlite3.connect(files['system'])
+            rows = conn.execute('SELECT id, name FROM maternal_info ORDER BY id').fetchall()
+            assert rows == [(1, 'a1'), (2, 'a2'), (3, 'b1'), (4, 'b2'), (5, 'b3')]
+            assert conn.execute('SELECT COUNT(*) FROM analysis_reports').fetchone()[0] == 0
+            names = {row[0] for row in conn.execute('SELECT name FROM sqlite_master')}
+            assert not names & {'import_jobs', 'idx_import_jobs_status', metric_rollups.ROLLUP_TABLE,
+                                'maternal_info_rollup_insert'}
+            assert dashboard_materializer.read_counters(conn, 'maternal_info')['total'] == {'': 5}
+
+            # 合并后的表照常写入，新行继续分配 id
+            conn.execute("INSERT INTO maternal_info (name) VALUES ('c1')")
+            assert conn.execute("SELECT id FROM maternal_info WHERE name = 'c1'").fetchone()[0] == 6
+            conn.close()
+        finally:
+            data_access.configure()
+
+
+if __name__ == "__main__":
+    test_split_and_attach_routing()
+    test_migrate_merges_and_routes_to_single_database()
+    test_fail_policy_and_dry_run_leave_target_unchanged()
+    test_autoincrement_rows_get_new_ids_and_derived_tables_rebuilt()
+    logger.info("数据访问层测试全部通过")
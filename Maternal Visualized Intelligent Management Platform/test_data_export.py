@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式导出测试脚本
+验证 /api/data/export 与 /api/maternal/export 分块读取游标生成的 CSV / XLSX / Parquet / Arrow 内容完整、
+筛选条件生效、临时文件在响应结束后删除，以及响应未被读取时连接同样被关闭
+"""
+
+import io
+import os
+import csv
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+from utils import data_access, export_stream
+from benchmark_data_list import MEDICAL_SCHEMA
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_data_export")
+
+PREDICTIONS_SCHEMA = '''
+    CREATE TABLE maternal_predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER, gestational_week INTEGER,
+        risk_level TEXT, risk_score INTEGER, confidence INTEGER, risk_factors TEXT, complications TEXT,
+        recommendations TEXT, input_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def create_database(path, medical_count=5000):
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.execute(PREDICTIONS_SCHEMA)
+    conn.executemany('INSERT INTO medical_data (name, gender, age, disease_type, created_at) VALUES (?, ?, ?, ?, ?)',
+                     [(f'患者{i}', '女', 20 + i % 40, '高血压' if i % 2 else '糖尿病',
+                       f'2024-{1 + i % 12:02d}-{1 + i % 28:02d} 08:00:{i % 60:02d}') for i in range(medical_count)])
+    conn.executemany('''
+        INSERT INTO maternal_predictions (name, age, gestational_week, risk_level, risk_score, confidence, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'孕妇{i}', 28, 20 + i % 20, ('低风险', '中风险', '高风险')[i % 3], i % 100, 90,
+           f'2024-05-{1 + i % 28:02d} 10:00:00') for i in range(30)])
+    conn.commit()
+    conn.close()
+
+
+@contextlib.contextmanager
+def export_environment():
+    """独立数据库，临时文件写入单独目录以便检查清理情况"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        create_database(path)
+        scratch = os.path.join(tmp, 'scratch')
+        os.mkdir(scratch)
+        previous = tempfile.tempdir
+        try:
+            data_access.configure(mode='split', files={'data': path})
+            tempfile.tempdir = scratch
+            yield path, scratch
+        finally:
+            tempfile.tempdir = previous
+            data_access.configure()
+
+
+def test_medical_export_xlsx_and_csv():
+    """医疗数据导出为 XLSX 与 CSV，内容与查询结果一致，临时文件已删除"""
+    from openpyxl import load_workbook
+
+    with export_environment() as (path, scratch):
+        client = app.app.test_client()
+        response = client.get('/api/data/export', query_string={'data_type': 'medical', 'start_date': '2024-07-01'})
+        assert response.status_code == 200
+        assert response.mimetype == export_stream.XLSX_MIMETYPE
+        assert 'attachment; filename=medical_data_' in response.headers['Content-Disposition']
+        workbook = load_workbook(io.BytesIO(response.data), read_only=True)
+        exported = list(workbook.active.iter_rows(values_only=True))
+        workbook.close()
+        response.close()
+        assert os.listdir(scratch) == []
+
+        conn = sqlite3.connect(path)
+        expected = conn.execute("SELECT * FROM medical_data WHERE created_at >= '2024-07-01' "
+                                "ORDER BY created_at DESC").fetchall()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(medical_data)')]
+        conn.close()
+        assert len(expected) > export_stream.FETCH_ROWS
+        assert list(exported[0]) == columns
+        assert [row[:5] for row in exported[1:]] == [row[:5] for row in expected]
+
+        response = client.get('/api/data/export', query_string={'data_type': 'medical', 'format': 'csv'})
+        text = response.data.decode('utf-8')
+        assert text.startswith('\ufeff')
+        records = list(csv.reader(io.StringIO(text[1:])))
+        assert records[0] == columns and len(records) == 5001
+        conn = sqlite3.connect(path)
+        newest = conn.execute('SELECT name FROM medical_data ORDER BY created_at DESC LIMIT 1').fetchone()[0]
+        conn.close()
+        assert records[1][1] == newest
+
+        response = client.get('/api/data/export', query_string={'data_type': 'medical', 'start_date': '2030-01-01'})
+        assert response.status_code == 404
+
+
+def test_prediction_export_filters_and_formats():
+    """预测数据按风险等级筛选导出，默认 CSV，format=excel 时为 XLSX"""
+    from openpyxl import load_workbook
+
+    with export_environment() as (path, scratch):
+        client = app.app.test_client()
+        response = client.get('/api/maternal/export', query_string={'riskLevel': '高风险'})
+        assert response.status_code == 200 and response.mimetype == 'text/csv'
+        records = list(csv.DictReader(io.StringIO(response.data.decode('utf-8-sig'))))
+        assert len(records) == 10 and {record['risk_level'] for record in records} == {'高风险'}
+        assert list(records[0]) == ['id', 'name', 'age', 'gestational_week', 'risk_level', 'risk_score',
+                                    'confidence', 'created_at']
+
+        response = client.get('/api/maternal/export', query_string={'format': 'excel', 'endDate': '2024-05-05'})
+        workbook = load_workbook(io.BytesIO(response.data), read_only=True)
+        # 5 月 1-4 日：i = 0-3, 28, 29
+        assert len(list(workbook.active.iter_rows(values_only=True))) == 1 + 6
+        workbook.close()
+        response.close()
+        assert os.listdir(scratch) == []
+
+        response = client.get('/api/maternal/export', query_string={'riskLevel': '不存在'})
+        assert response.status_code == 404 and response.get_json()['code'] == 404
+
+
+def test_unread_response_releases_resources():
+    """响应体未被读取就关闭时，只读连接关闭、临时文件删除"""
+    with export_environment() as (path, scratch):
+        for build in (export_stream.csv_response, export_stream.xlsx_response):
+            rows = export_stream.query_rows('data', 'SELECT * FROM medical_data', fetch_rows=100)
+            response = build(rows, 'export')
+            next(iter(response.response))
+            response.close()
+            try:
+                rows.connection.execute('SELECT 1')
+                assert False, '连接应已关闭'
+            except sqlite3.ProgrammingError:
+                pass
+            assert os.listdir(scratch) == []
+        assert export_stream.query_rows('data', 'SELECT * FROM medical_data WHERE id < 0') is None
+
+
+def test_columnar_exports_match_query():
+    """Parquet 与 Arrow 导出按行组写出，列类型由列中实际存放的值确定，内容与查询结果一致"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with export_environment() as (path, scratch):
+        client = app.app.test_client()
+        conn = sqlite3.connect(path)
+        expected = conn.execute('SELECT * FROM medical_data ORDER BY created_at DESC').fetchall()
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(medical_data)')]
+        conn.close()
+
+        # 响应体在读取时才生成
+        previous = export_stream.ROW_GROUP_ROWS
+        export_stream.ROW_GROUP_ROWS = 2000
+        try:
+            response = client.get('/api/data/export', query_string={'data_type': 'medical', 'format': 'parquet'})
+            data = response.data
+        finally:
+            export_stream.ROW_GROUP_ROWS = previous
+        assert response.status_code == 200 and response.mimetype == export_stream.PARQUET_MIMETYPE
+        assert response.headers['Content-Disposition'].endswith('.parquet')
+        parquet = pq.ParquetFile(io.BytesIO(data))
+        assert parquet.metadata.num_row_groups == 3
+        table = parquet.read()
+        assert table.column_names == columns
+        assert table.schema.field('age').type == pa.int64()
+        assert table.schema.field('name').type == pa.string()
+        # weight 全为空，按字符串保存
+        assert table.schema.field('weight').type == pa.string()
+        assert [tuple(row.values()) for row in table.to_pylist()] == expected
+
+        response = client.get('/api/maternal/export', query_string={'format': 'arrow', 'riskLevel': '低风险'})
+        assert response.mimetype == export_stream.ARROW_MIMETYPE
+        table = pa.ipc.open_file(pa.BufferReader(response.data)).read_all()
+        assert table.num_rows == 10 and set(table.column('risk_level').to_pylist()) == {'低风险'}
+        assert table.schema.field('risk_score').type == pa.int64()
+
+        response = client.get('/api/data/export', query_string={'format': 'pdf'})
+        assert response.status_code == 400
+
+
+def test_column_type_changes_after_first_chunk():
+    """第一块之后才出现的浮点数、文本和超大整数使列类型放宽，所有值原样导出；
+    二进制与其他类型混合的列无法放宽时导出失败，而不是写为空值"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with export_environment() as (path, scratch):
+        count = export_stream.FETCH_ROWS + 500
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE mixed (id INTEGER, score INTEGER, level INTEGER, big, note, data)')
+        conn.executemany('INSERT INTO mixed VALUES (?, ?, ?, ?, ?, ?)',
+                         [(i, 30, i % 3, 2 ** 60 + i, None, b'x') for i in range(count)])
+        conn.executemany('INSERT INTO mixed VALUES (?, ?, ?, ?, ?, ?)',
+                         [(count, 30.5, '未知', 0.5, 7, b'y'), (count + 1, None, 2, None, 'x', None)])
+        conn.commit()
+        expected = conn.execute('SELECT * FROM mixed ORDER BY id').fetchall()
+        conn.close()
+
+        rows = export_stream.query_rows('data', 'SELECT * FROM mixed ORDER BY id')
+        table = pa.Table.from_batches(list(export_stream.iter_record_batches(rows)))
+        assert [field.type for field in table.schema] == [pa.int64(), pa.float64(), pa.string(), pa.string(),
+                                                          pa.string(), pa.binary()]
+        assert table.column('score').to_pylist()[-2:] == [30.5, None]
+        assert table.column('level').to_pylist()[:3] == ['0', '1', '2']
+        assert table.column('level').to_pylist()[-2:] == ['未知', '2']
+        assert table.column('big').to_pylist()[:2] == [str(2 ** 60), str(2 ** 60 + 1)]
+        assert table.column('note').to_pylist()[-2:] == ['7', 'x']
+
+        rows = export_stream.query_rows('data', 'SELECT id, score, data FROM mixed ORDER BY id')
+        response = export_stream.export_response(rows, 'parquet', 'mixed')
+        restored = pq.read_table(io.BytesIO(b''.join(response.response)))
+        assert [tuple(row.values()) for row in restored.to_pylist()] == [(row[0], row[1], row[5]) for row in expected]
+
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE mixed SET data = 'text' WHERE id = ?", (count + 1,))
+        conn.commit()
+        conn.close()
+        rows = export_stream.query_rows('data', 'SELECT * FROM mixed ORDER BY id')
+        try:
+            export_stream.export_response(rows, 'arrow', 'mixed')
+        except ValueError as error:
+            assert 'data' in str(error)
+        else:
+            raise AssertionError('二进制与文本混合的列应使导出失败')
+        # 连接已关闭
+        try:
+            rows.connection.execute('SELECT 1')
+        except sqlite3.ProgrammingError:
+            pass
+        else:
+            raise AssertionError('导出失败后连接应已关闭')
+
+
+if __name__ == "__main__":
+    test_medical_export_xlsx_and_csv()
+    test_prediction_export_filters_and_formats()
+    test_unread_response_releases_resources()
+    test_columnar_exports_match_query()
+    test_column_type_changes_after_first_chunk()
+    logger.info("流式导出测试全部通过")
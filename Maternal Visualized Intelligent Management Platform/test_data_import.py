@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式数据导入测试脚本
+验证 CSV / XLSX 分块解析、向量化校验、分批写入的结果，目标表上的触发器同步更新，
+以及 /api/data/import 后台任务和进度查询接口
+"""
+
+import io
+import os
+import time
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+import data_importer
+import dashboard_materializer
+from utils import data_access, text_search
+from benchmark_data_list import MEDICAL_SCHEMA
+from benchmark_home_data import MATERNAL_SCHEMA
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_data_import")
+
+MEDICAL_HEADER = ['name', 'gender', 'age', 'disease_type', 'systolic_pressure', 'weight', 'symptoms']
+
+
+def medical_rows(count):
+    """每 7 行一个无效行：姓名为空或年龄不是数值"""
+    rows = []
+    for i in range(count):
+        name = '' if i % 7 == 3 else f'患者{i}'
+        age = 'abc' if i % 7 == 5 else str(20 + i % 50)
+        rows.append([name, '女' if i % 2 else '男', age, '高血压' if i % 3 else '糖尿病', str(110 + i % 30),
+                     '' if i % 4 else f'{60 + i % 20}.5', '头晕' if i % 5 == 0 else ''])
+    return rows
+
+
+def write_csv(path, header, rows, encoding='utf-8'):
+    with open(path, 'w', encoding=encoding, newline='') as handle:
+        handle.write(','.join(header) + '\n')
+        for row in rows:
+            handle.write(','.join(row) + '\n')
+
+
+def create_tables(path):
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.execute(MATERNAL_SCHEMA)
+    conn.commit()
+    return conn
+
+
+def test_csv_import_in_chunks_and_batches():
+    """GBK 编码 CSV 分块导入：无效行被跳过并记录行号，有效行全部写入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_tables(os.path.join(tmp, 'data.db'))
+        csv_path = os.path.join(tmp, 'medical.csv')
+        rows = medical_rows(100)
+        write_csv(csv_path, MEDICAL_HEADER, rows, encoding='gb18030')
+
+        progress = []
+        stats = data_importer.run_import(csv_path, 'medical', conn, chunk_rows=30, batch_rows=8,
+                                         progress=progress.append)
+        invalid = [i for i in range(100) if i % 7 in (3, 5)]
+        assert stats['processed'] == 100 and stats['errors'] == len(invalid)
+        assert stats['success'] == 100 - len(invalid)
+        assert [error['row'] for error in stats['error_details']] == [i + 2 for i in invalid]
+        assert stats['error_details'][0]['message'] == '姓名为空'
+        assert stats['error_details'][1]['message'] == 'age不是数值'
+        assert progress[-1]['processed'] == 100 == data_importer.count_rows(csv_path)
+        assert [item['processed'] for item in progress] == sorted(item['processed'] for item in progress)
+
+        imported = conn.execute('SELECT name, age, weight, symptoms, created_at FROM medical_data ORDER BY id').fetchall()
+        expected = [row for i, row in enumerate(rows) if i not in invalid]
+        assert [row[0] for row in imported] == [row[0] for row in expected]
+        assert [row[1] for row in imported] == [int(row[2]) for row in expected]
+        assert [row[2] for row in imported] == [float(row[5]) if row[5] else None for row in expected]
+        assert [row[3] for row in imported] == [row[6] or None for row in expected]
+        assert conn.execute("SELECT typeof(age) FROM medical_data LIMIT 1").fetchone()[0] == 'integer'
+        assert len(imported[0][4]) == 19
+        # 暂存表在导入结束后删除
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_temp_master WHERE name LIKE 'import_staging_%'").fetchone()[0] == 0
+        conn.close()
+
+
+def test_xlsx_import_keeps_triggers_in_sync():
+    """XLSX 只读模式导入，仪表盘计数和全文索引与导入后的数据一致；缺少必填列时报错"""
+    from openpyxl import Workbook
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_tables(os.path.join(tmp, 'data.db'))
+        dashboard_materializer.install(conn)
+        text_search.ensure_search_index(conn, 'maternal_info')
+
+        xlsx_path = os.path.join(tmp, 'maternal.xlsx')
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(['name', 'age', 'gestational_weeks', 'pregnancy_count', 'parity', 'pregnancy_type', 'notes'])
+        for i in range(50):
+            sheet.append([f'孕妇{i}号', 25 + i % 10, 8 + i % 32, 1, 0, '单胎', None])
+        sheet.append([None] * 7)
+        workbook.save(xlsx_path)
+
+        stats = data_importer.run_import(xlsx_path, 'maternal', conn, chunk_rows=16, batch_rows=5)
+        assert stats['success'] == stats['processed'] == 50 and stats['errors'] == 0
+        # write_only 生成的文件没有尺寸信息，无法估计行数
+        assert data_importer.count_rows(xlsx_path) in (None, 51)
+
+        counters = dashboard_materializer.build_maternal_snapshot(conn)
+        assert counters['total'] == 50
+        assert sum(item['value'] for item in counters['pregnancy_distribution']) == 50
+        condition, params = text_search.keyword_condition(conn, 'maternal_info', '孕妇12号')
+        assert conn.execute(f'SELECT COUNT(*) FROM maternal_info WHERE {condition}', params).fetchone()[0] == 1
+
+        write_csv(os.path.join(tmp, 'bad.csv'), ['name', 'age'], [['孕妇', '30']])
+        try:
+            data_importer.run_import(os.path.join(tmp, 'bad.csv'), 'maternal', conn)
+            assert False, '缺少必填列时应报错'
+        except data_importer.ImportFileError as e:
+            assert 'gestational_weeks' in str(e)
+        conn.close()
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/data/import/jobs/{job_id}').get_json()['data']
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('导入任务超时')
+
+
+def test_import_endpoint_runs_in_background():
+    """上传后立即返回任务编号，通过进度接口查询结果"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        create_tables(path).close()
+        csv_path = os.path.join(tmp, 'medical.csv')
+        write_csv(csv_path, MEDICAL_HEADER, medical_rows(20))
+        try:
+            data_access.configure(mode='split', files={'data': path})
+            client = app.app.test_client()
+            with open(csv_path, 'rb') as handle:
+                response = client.post('/api/data/import', data={'file': (handle, 'medical.csv'),
+                                                                 'data_type': 'medical'})
+            assert response.status_code == 202
+            job = wait_for_job(client, response.get_json()['data']['job_id'])
+            assert job['status'] == 'completed' and job['percent'] == 100
+            assert job['success'] == 20 - len([i for i in range(20) if i % 7 in (3, 5)])
+            assert '数据导入完成' in job['message']
+
+            with open(csv_path, 'rb') as handle:
+                response = client.post('/api/data/import', data={'file': (handle, 'medical.csv'),
+                                                                 'data_type': 'maternal'})
+            job = wait_for_job(client, response.get_json()['data']['job_id'])
+            assert job['status'] == 'failed' and '缺少必填列' in job['message']
+
+            assert client.get('/api/data/import/jobs/unknown').status_code == 404
+            with open(csv_path, 'rb') as handle:
+                assert client.post('/api/data/import', data={'file': (handle, 'medical.csv'),
+                                                             'data_type': 'other'}).status_code == 400
+        finally:
+            data_access.configure()
+
+
+if __name__ == "__main__":
+    test_csv_import_in_chunks_and_batches()
+    test_xlsx_import_keeps_triggers_in_sync()
+    test_import_endpoint_runs_in_background()
+    logger.info("流式数据导入测试全部通过")
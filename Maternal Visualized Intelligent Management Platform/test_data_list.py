@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据列表接口测试脚本
+验证 /api/data/list 的页码分页、游标分页与按排序键全量排序的结果一致，
+游标条件使用 created_at 索引，并覆盖相同时间戳、空时间戳和总数统计方式
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+from utils import data_access
+import dashboard_materializer
+import data_management_api
+from benchmark_data_list import MEDICAL_SCHEMA
+from benchmark_home_data import MATERNAL_SCHEMA
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_data_list")
+
+
+def create_tables(path):
+    """两张表的 created_at 有重复、跨表相同和空值"""
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.execute(MATERNAL_SCHEMA)
+    stamps = ['2024-01-01 08:00:00', '2024-01-02 09:00:00', '2024-01-02 09:00:00', None, '2024-01-03 10:00:00']
+    for i in range(23):
+        conn.execute("INSERT INTO medical_data (name, disease_type, created_at) VALUES (?, ?, ?)",
+                     (f'患者{i}', '高血压' if i % 3 else '糖尿病', stamps[i % len(stamps)]))
+    for i in range(17):
+        conn.execute("INSERT INTO maternal_info (name, created_at) VALUES (?, ?)",
+                     (f'孕妇{i}', stamps[(i + 1) % len(stamps)]))
+    conn.commit()
+    conn.close()
+
+
+def expected_order(path, data_type='', keyword=''):
+    """在 Python 中按 (created_at, data_type, id) 降序排序，空时间戳排在最后"""
+    conn = sqlite3.connect(path)
+    rows = []
+    for source_type, (table, _) in data_management_api.LIST_SOURCES.items():
+        if data_type and data_type != source_type:
+            continue
+        columns = 'id, name, created_at' + (', disease_type' if table == 'medical_data' else ', NULL')
+        for record_id, name, created_at, disease in conn.execute(f'SELECT {columns} FROM {table}'):
+            if keyword and keyword not in name and keyword not in (disease or ''):
+                continue
+            rows.append((created_at is not None, created_at or '', source_type, record_id))
+    conn.close()
+    rows.sort(reverse=True)
+    return [(source_type, record_id) for _, _, source_type, record_id in rows]
+
+
+def keys(data):
+    return [(item['data_type'], item['id']) for item in data]
+
+
+def get_list(client, **params):
+    response = client.get('/api/data/list', query_string=params)
+    return response.status_code, response.get_json()
+
+
+def with_data_db(path, func):
+    try:
+        data_access.configure(mode='split', files={'data': path})
+        return func(app.app.test_client())
+    finally:
+        data_access.configure()
+
+
+def test_page_and_cursor_pagination_match_full_sort():
+    """页码分页和游标分页逐页遍历的结果都与全量排序一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        create_tables(path)
+
+        def check(client):
+            for filters in ({}, {'data_type': 'maternal'}, {'keyword': '糖尿病'}):
+                expected = expected_order(path, **filters)
+                paged = []
+                for page in range(1, 10):
+                    status, body = get_list(client, page=page, size=6, **filters)
+                    assert status == 200 and body['total'] == len(expected)
+                    paged.extend(keys(body['data']))
+                assert paged == expected
+
+                walked, token = [], ''
+                while token is not None:
+                    status, body = get_list(client, cursor=token, size=4, **filters)
+                    assert status == 200
+                    walked.extend(keys(body['data']))
+                    token = body['next_cursor']
+                    assert body['has_more'] == (token is not None)
+                assert walked == expected, filters
+
+        with_data_db(path, check)
+
+
+def test_cursor_condition_uses_created_at_index():
+    """游标条件的每个分支都是 created_at 索引区间查找，而不是全表扫描"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute(MEDICAL_SCHEMA)
+    conn.execute(MATERNAL_SCHEMA)
+    data_management_api.ensure_list_indexes(conn)
+    table, columns = data_management_api.LIST_SOURCES['medical']
+    for cursor in (('2024-01-02 09:00:00', 'maternal', 5), ('2024-01-02 09:00:00', 'medical', 5)):
+        for condition, params in data_management_api._cursor_conditions('medical', cursor):
+            plan = ' '.join(row[3] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT {columns} FROM {table} WHERE {condition} "
+                f"ORDER BY created_at DESC, id DESC LIMIT 5", params))
+            assert 'SEARCH' in plan and 'idx_medical_data_created_at' in plan, plan
+    conn.close()
+
+
+def test_count_modes_and_invalid_cursor():
+    """count=none 不统计总数；split 模式下 approx 在业务库上安装并读取仪表盘计数表（不逐表 COUNT），
+    新写入的记录由触发器计入；无效游标和小于 1 的 page / size 返回 400"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        create_tables(path)
+
+        def check(client):
+            assert data_access.routing_mode() == 'split'
+            status, body = get_list(client, size=5, count='none')
+            assert body['total'] is None and len(body['data']) == 5
+            status, body = get_list(client, size=5)
+            assert body['total'] == 40 and body['total_estimated'] is False
+
+            status, body = get_list(client, cursor='', size=5)
+            assert body['total'] == 40 and body['total_estimated'] is True
+            conn = sqlite3.connect(path)
+            assert dashboard_materializer.read_counters(conn, 'medical_data')['total'] == {'': 23}
+            conn.execute("INSERT INTO maternal_info (name, created_at) VALUES ('新孕妇', '2024-01-04 08:00:00')")
+            conn.commit()
+            conn.close()
+            status, body = get_list(client, cursor=body['next_cursor'], size=5)
+            assert body['total'] == 41 and body['total_estimated'] is True
+            status, body = get_list(client, cursor='', size=5, keyword='孕妇')
+            assert body['total'] == 18 and body['total_estimated'] is False
+
+            assert get_list(client, cursor='not-a-cursor')[0] == 400
+            assert get_list(client, count='sometimes')[0] == 400
+            for params in ({'size': 0}, {'size': 0, 'cursor': ''}, {'page': 0}, {'size': -1}, {'page': 'x'}):
+                assert get_list(client, **params)[0] == 400
+
+        with_data_db(path, check)
+
+
+if __name__ == "__main__":
+    test_page_and_cursor_pagination_match_full_sort()
+    test_cursor_condition_uses_created_at_index()
+    test_count_modes_and_invalid_cursor()
+    logger.info("数据列表接口测试全部通过")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库连接池测试脚本
+验证连接复用、同线程嵌套获取、未提交事务回滚、未关闭连接的自动回收以及 PRAGMA 设置
+"""
+
+import os
+import gc
+import sqlite3
+import tempfile
+import threading
+import logging
+
+from flask import Flask
+
+from utils.db_pool import ConnectionPool, init_app, get_pool
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_db_pool")
+
+
+def make_pool(tmp, **kwargs):
+    path = os.path.join(tmp, 'test.db')
+    pool = ConnectionPool(path, **kwargs)
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.commit()
+    conn.close()
+    return pool
+
+
+def test_connections_are_reused_with_pragmas():
+    """归还的连接被后续获取复用，新连接启用 WAL 且结果可按列名访问"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp)
+        conn = pool.acquire()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1
+        conn.execute("INSERT INTO items (name) VALUES ('a')")
+        conn.commit()
+        assert conn.execute('SELECT name FROM items').fetchone()['name'] == 'a'
+        conn.close()
+
+        stats = pool.stats()
+        assert (stats['created'], stats['reused'], stats['in_use'], stats['idle']) == (1, 1, 0, 1)
+        pool.close_idle()
+
+
+def test_nested_acquire_shares_connection():
+    """同一线程嵌套获取得到同一连接，全部关闭后才归还"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp)
+        outer = pool.acquire()
+        inner = pool.acquire()
+        assert inner._conn is outer._conn
+        inner.close()
+        assert pool.stats()['in_use'] == 1
+        outer.close()
+        outer.close()
+        assert pool.stats()['in_use'] == 0
+        try:
+            outer.execute('SELECT 1')
+        except sqlite3.ProgrammingError:
+            pass
+        else:
+            raise AssertionError("关闭后的连接不应可用")
+        pool.close_idle()
+
+
+def test_uncommitted_transaction_rolled_back():
+    """未提交的修改在归还时回滚，不会泄漏给下一个使用者"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp)
+        conn = pool.acquire()
+        conn.execute("INSERT INTO items (name) VALUES ('draft')")
+        conn.close()
+
+        conn = pool.acquire()
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+        conn.close()
+        assert pool.stats()['rolled_back'] == 1
+        pool.close_idle()
+
+
+def test_unclosed_connection_released_when_dropped():
+    """未调用 close() 的连接在包装对象回收后自动归还"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp)
+
+        def leaky_query():
+            conn = pool.acquire()
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM items')
+            return cursor
+
+        cursor = leaky_query()
+        # 游标存活期间连接仍被占用
+        assert pool.stats()['in_use'] == 1
+        assert cursor.fetchone()[0] == 0
+        del cursor
+        gc.collect()
+        assert pool.stats()['in_use'] == 0
+        pool.close_idle()
+
+
+def test_threads_get_separate_connections():
+    """并发线程各自独占连接，空闲数量不超过上限"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = make_pool(tmp, max_idle=2)
+        barrier = threading.Barrier(4)
+        seen = []
+
+        def worker():
+            conn = pool.acquire()
+            seen.append(id(conn._conn))
+            barrier.wait()
+            conn.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        assert len(set(seen)) == 4
+        assert stats['max_in_use'] == 4 and stats['idle'] == 2 and stats['closed'] == 2
+        pool.close_idle()
+
+
+def test_request_teardown_reclaims_connections():
+    """请求中未关闭的连接在请求结束时被回收"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'app.db')
+        app = Flask(__name__)
+        init_app(app)
+        leaked = []
+
+        @app.route('/leak')
+        def leak():
+            conn = get_pool(path).acquire()
+            leaked.append(conn)
+            conn.execute('SELECT 1')
+            raise RuntimeError('模拟异常路径')
+
+        response = app.test_client().get('/leak')
+        assert response.status_code == 500
+        stats = get_pool(path).stats()
+        assert stats['in_use'] == 0 and stats['reclaimed'] == 1
+        get_pool(path).close_idle()
+
+
+if __name__ == "__main__":
+    test_connections_are_reused_with_pragmas()
+    test_nested_acquire_shares_connection()
+    test_uncommitted_transaction_rolled_back()
+    test_unclosed_connection_released_when_dropped()
+    test_threads_get_separate_connections()
+    test_request_teardown_reclaims_connections()
+    logger.info("数据库连接池测试全部通过")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+原始记录分布统计测试脚本
+验证分布与逐条分组的结果一致（非数值和空值不计入）、分界点可配置、
+结果按时间范围内的数据版本缓存（范围内数据变化后重新统计，范围外的写入不影响缓存），以及趋势接口的分布和对比按记录统计
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+import distribution_stats
+from distribution_stats import DEFAULT_BINS
+from utils import data_access
+from test_metric_rollups import create_system_database, stamp
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_distribution_stats")
+
+
+def brute_force(conn, table, column, edges, labels, start):
+    """逐条记录分组"""
+    counts = dict.fromkeys(labels, 0)
+    for value, in conn.execute(f'SELECT {column} FROM {table} WHERE created_at >= ?', (start,)):
+        if isinstance(value, (int, float)):
+            counts[labels[sum(value >= edge for edge in edges)]] += 1
+    return counts
+
+
+def window(conn, table, grain, modifiers):
+    start = distribution_stats._range_start(conn, grain, modifiers)
+    buckets = [row[0] for row in conn.execute(
+        f'SELECT DISTINCT substr(created_at, 1, ?) AS bucket FROM {table} WHERE created_at >= ? ORDER BY bucket',
+        (len(start), start))]
+    return start, buckets
+
+
+def test_scan_matches_brute_force():
+    """各分布与逐条分组一致，每个时间桶的记录数和年龄总和与 GROUP BY 一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        conn = sqlite3.connect(path)
+        conn.executemany('INSERT INTO medical_data (name, age, systolic_pressure, created_at) VALUES (?, ?, ?, ?)',
+                         [('文本', '未知', '偏高', stamp(days=1)), ('空值', None, None, stamp(days=2)),
+                          ('边界', 40, 140, stamp(days=3))])
+        conn.commit()
+        distribution_stats.clear_cache()
+
+        modifiers = ('-30 days',)
+        start, buckets = window(conn, 'medical_data', 'day', modifiers)
+        stats = distribution_stats.scan(conn, 'medical_data', 'day', modifiers, buckets,
+                                        distribution_stats.resolve_bins())
+        for name, spec in DEFAULT_BINS.items():
+            assert stats['distributions'][name] == brute_force(conn, 'medical_data', spec['column'],
+                                                               spec['edges'], spec['labels'], start)
+        assert sum(stats['distributions']['time'].values()) == sum(stats['bucket_count'])
+
+        expected = conn.execute('SELECT substr(created_at, 1, 10) AS bucket, COUNT(*), '
+                                "TOTAL(CASE WHEN typeof(age) = 'integer' THEN age END) FROM medical_data "
+                                'WHERE created_at >= ? GROUP BY bucket ORDER BY bucket', (start,)).fetchall()
+        assert [row[0] for row in expected] == buckets
+        assert stats['bucket_count'].tolist() == [row[1] for row in expected]
+        assert stats['bucket_total']['age'].tolist() == [row[2] for row in expected]
+
+        # 分块读取的结果与一次读取相同
+        previous = distribution_stats.FETCH_ROWS
+        try:
+            distribution_stats.FETCH_ROWS = 7
+            distribution_stats.clear_cache()
+            chunked = distribution_stats.scan(conn, 'medical_data', 'day', modifiers, buckets,
+                                              distribution_stats.resolve_bins())
+        finally:
+            distribution_stats.FETCH_ROWS = previous
+        assert chunked['distributions'] == stats['distributions']
+        assert chunked['bucket_count'].tolist() == stats['bucket_count'].tolist()
+        conn.close()
+
+
+def test_custom_bins_and_cache():
+    """自定义分界点生成对应的标签；相同参数命中缓存，范围内数据变化后重新统计，范围外的写入仍命中缓存"""
+    assert distribution_stats.make_bins([20, 30.5])['labels'] == ['<20', '20-30.5', '>=30.5']
+    for edges in ([], [30, 20], [20, 20], [float('nan')]):
+        try:
+            distribution_stats.make_bins(edges)
+        except ValueError:
+            continue
+        raise AssertionError(f'分界点 {edges} 应被拒绝')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        conn = sqlite3.connect(path)
+        distribution_stats.clear_cache()
+        bins = distribution_stats.resolve_bins({'age': [30, 45, 60]})
+        assert bins['pressure'] == DEFAULT_BINS['pressure']
+
+        buckets = [row[0] for row in conn.execute('SELECT DISTINCT substr(created_at, 1, 7) AS bucket '
+                                                  'FROM medical_data ORDER BY bucket')]
+        stats = distribution_stats.scan(conn, 'medical_data', 'month', None, buckets, bins)
+        expected = conn.execute('SELECT SUM(age < 30), SUM(age >= 30 AND age < 45), SUM(age >= 45 AND age < 60), '
+                                'SUM(age >= 60) FROM medical_data').fetchone()
+        assert list(stats['distributions']['age'].values()) == [row or 0 for row in expected]
+        assert list(stats['distributions']['age']) == ['<30', '30-45', '45-60', '>=60']
+
+        assert distribution_stats.scan(conn, 'medical_data', 'month', None, buckets, bins) is stats
+        assert distribution_stats.cache_stats()['hits'] == 1
+
+        conn.execute("INSERT INTO medical_data (name, age, created_at) VALUES ('新', 70, ?)", (stamp(),))
+        conn.commit()
+        updated = distribution_stats.scan(conn, 'medical_data', 'month', None, buckets, bins)
+        assert updated['distributions']['age']['>=60'] == stats['distributions']['age']['>=60'] + 1
+
+        # 最近 30 天的分布：更早日期的写入不使缓存失效，范围内的写入使其失效
+        modifiers = ('-30 days',)
+        start, buckets = window(conn, 'medical_data', 'day', modifiers)
+        recent = distribution_stats.scan(conn, 'medical_data', 'day', modifiers, buckets, bins)
+        hits = distribution_stats.cache_stats()['hits']
+        conn.execute("INSERT INTO medical_data (name, age, created_at) VALUES ('旧', 70, ?)", (stamp(days=60),))
+        conn.execute("UPDATE medical_data SET age = 71 WHERE created_at < ?", (start,))
+        conn.commit()
+        assert distribution_stats.scan(conn, 'medical_data', 'day', modifiers, buckets, bins) is recent
+        assert distribution_stats.cache_stats()['hits'] == hits + 1
+
+        conn.execute("INSERT INTO medical_data (name, age, created_at) VALUES ('新', 70, ?)", (stamp(days=1),))
+        conn.commit()
+        updated = distribution_stats.scan(conn, 'medical_data', 'day', modifiers, buckets, bins)
+        assert updated['distributions']['age']['>=60'] == recent['distributions']['age']['>=60'] + 1
+        conn.close()
+
+
+def test_trend_endpoint_counts_records():
+    """趋势接口的分布覆盖范围内的每条记录，对比按记录数统计；分界点格式错误时返回 400"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            client = app.app.test_client()
+            response = client.get('/api/analysis/trend', query_string={'data_type': 'medical', 'time_range': 'quarter'})
+            assert response.status_code == 200
+            data = response.get_json()['data']
+            total = sum(data['trend_data']['count'])
+            distributions = data['distribution_data']
+            assert sum(distributions['age_distribution'].values()) == total
+            assert sum(distributions['pressure_distribution'].values()) == total
+            assert sum(distributions['time_distribution'].values()) == total
+            halves = data['comparison_data']['metrics_comparison']
+            assert halves['first_half']['count'] + halves['second_half']['count'] == total
+            recent = data['comparison_data']['period_comparison']['recent_week']
+            assert recent['total_records'] == sum(data['trend_data']['count'][-7:])
+
+            response = client.get('/api/analysis/trend', query_string={'data_type': 'medical', 'age_bins': '30,50'})
+            assert set(response.get_json()['data']['distribution_data']['age_distribution']) == {'<30', '30-50', '>=50'}
+            for value in ('abc', '50,30'):
+                response = client.get('/api/analysis/trend', query_string={'pressure_bins': value})
+                assert response.status_code == 400
+        finally:
+            data_access.configure()
+
+
+if __name__ == "__main__":
+    test_scan_matches_brute_force()
+    test_custom_bins_and_cache()
+    test_trend_endpoint_counts_records()
+    logger.info("原始记录分布统计测试全部通过")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+时间序列预测测试脚本
+验证指数平滑模型能还原周季节性、预测区间的覆盖率接近置信水平，
+以及预测接口只读取保存的模型状态、数据变化后由后台服务重新拟合（请求发现模型过时时提前唤醒服务）
+"""
+
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import contextlib
+import logging
+from datetime import date, timedelta
+
+import forecasting
+from forecasting import ForecastEngine, ForecastService, FORECAST_TABLE
+from utils import data_access
+from test_metric_rollups import create_system_database, stamp
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    import analysis_api
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_forecasting")
+
+WEEKLY = [10, 5, 0, -5, -8, 3, -5]
+
+
+def synthetic_series(days, seed=0, start=date(2024, 1, 1)):
+    """带线性趋势、周季节性和正态噪声（标准差 3）的序列"""
+    rng = random.Random(seed)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    return dates, [50 + 0.05 * i + WEEKLY[day.weekday()] + rng.gauss(0, 3) for i, day in enumerate(dates)]
+
+
+def test_holt_winters_fit_and_intervals():
+    """季节模型还原周季节项，95% 预测区间的覆盖率接近 95%，区间随预测天数变宽"""
+    covered = total = 0
+    for seed in range(10):
+        dates, values = synthetic_series(365 + 28, seed)
+        state = forecasting.fit_model(dates[:365], values[:365])
+        assert state['model'] == 'holt_winters'
+        assert abs(state['sigma'] - 3) < 0.6
+        result = forecasting.forecast_state(state, 28)
+        assert result['dates'][0] == dates[365].isoformat()
+        for actual, lower, upper in zip(values[365:], result['lower'], result['upper']):
+            covered += lower <= actual <= upper
+            total += 1
+    assert 0.88 <= covered / total <= 0.99
+
+    # 季节项的形状与生成时一致
+    season = state['season']
+    assert max(range(7), key=lambda weekday: season[weekday]) == 0
+    assert min(range(7), key=lambda weekday: season[weekday]) == 4
+
+    widths = [upper - lower for lower, upper in zip(result['lower'], result['upper'])]
+    assert widths[-1] > widths[0]
+    wider = forecasting.forecast_state(state, 28, level=0.99)
+    assert wider['upper'][0] - wider['lower'][0] > widths[0]
+
+    # 不足两个周期时使用非季节模型
+    dates, values = synthetic_series(10)
+    assert forecasting.fit_model(dates, values)['model'] == 'holt'
+
+
+def test_prediction_endpoint_serves_saved_state():
+    """接口从保存的状态给出 90 天预测，请求中不重新拟合；数据变化后由服务重新拟合"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        previous = analysis_api.forecast_engine
+        engine = ForecastEngine(analysis_api.ANALYSIS_SOURCES, analysis_api.TREND_FIELDS)
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            analysis_api.forecast_engine = engine
+            service = ForecastService(engine, db_path=path)
+            fitted = service.run_once()
+            assert fitted == sum(len(metrics) for metrics in engine.metrics.values())
+            assert service.run_once() == 0
+
+            client = app.app.test_client()
+            response = client.get('/api/analysis/prediction', query_string={'data_type': 'medical', 'days': 90})
+            assert response.status_code == 200
+            data = response.get_json()['data']
+            assert len(data['predicted_data']) == 90 and len(data['confidence_intervals']) == 90
+            # 序列截止到昨天（今天尚不完整），预测从今天开始
+            assert data['predicted_data'][0]['date'] == stamp()[:10]
+            assert data['models']['count']['model'] == 'holt_winters'
+            for interval, point in zip(data['confidence_intervals'], data['predicted_data']):
+                assert interval['lower_bound'] <= point['predicted_count'] <= interval['upper_bound']
+            assert 20 <= data['predicted_data'][0]['predicted_age'] <= 70
+            assert engine.fitted == fitted
+
+            # 没有心率数据的指标不拟合
+            conn = sqlite3.connect(path)
+            assert conn.execute(f"SELECT state_json FROM {FORECAST_TABLE} "
+                                f"WHERE data_type = 'medical' AND metric = 'heart_rate'").fetchone() == (None,)
+
+            # 新数据使数据版本变化，下一轮只重新拟合该数据类型的模型
+            conn.execute("INSERT INTO maternal_info (name, age, created_at) VALUES ('新', 30, ?)", (stamp(days=2),))
+            conn.commit()
+            conn.close()
+            assert service.run_once() == len(engine.metrics['maternal'])
+
+            for query in ({'days': 0}, {'days': 1000}, {'days': 'abc'}, {'confidence': 1.5}):
+                response = client.get('/api/analysis/prediction', query_string=query)
+                assert response.status_code == 400
+        finally:
+            analysis_api.forecast_engine = previous
+            data_access.configure()
+
+
+def test_cold_start_fits_once():
+    """尚未拟合过的数据类型在第一次请求时拟合并保存；之后请求只读取保存的状态：
+    今天写入的记录不使模型过时，已拟合范围内的数据变化或序列跨天时返回原状态并唤醒后台服务，
+    由服务重新拟合；没有历史数据时返回空预测"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        conn = sqlite3.connect(path)
+        engine = ForecastEngine(analysis_api.ANALYSIS_SOURCES, analysis_api.TREND_FIELDS)
+        service = ForecastService(engine, db_path=path)
+        woken = []
+        engine.on_stale = lambda: woken.append(True)
+        fitted = len(engine.metrics['maternal'])
+        result = engine.forecast(conn, 'maternal', forecasting.COUNT_METRIC, 7)
+        assert len(result['mean']) == 7 and engine.fitted == fitted and not result['stale']
+        engine.forecast(conn, 'maternal', 'age', 7)
+        assert engine.fitted == fitted
+
+        # 今天的记录不在拟合的序列中
+        conn.execute("INSERT INTO maternal_info (name, age, created_at) VALUES ('今天', 30, ?)", (stamp(),))
+        conn.commit()
+        assert not engine.forecast(conn, 'maternal', forecasting.COUNT_METRIC, 7)['stale'] and not woken
+
+        # 昨天的新数据使模型过时：请求不拟合，返回原状态并唤醒后台服务
+        conn.executemany("INSERT INTO maternal_info (name, age, created_at) VALUES ('新', 30, ?)",
+                         [(stamp(days=1),)] * 50)
+        conn.commit()
+        served = engine.forecast(conn, 'maternal', forecasting.COUNT_METRIC, 7)
+        assert served['stale'] and served['mean'] == result['mean'] and woken
+        assert engine.fitted == fitted
+        # 后台服务一轮拟合所有数据类型（medical 尚未拟合过）
+        assert service.run_once() == sum(len(metrics) for metrics in engine.metrics.values())
+        updated = engine.forecast(conn, 'maternal', forecasting.COUNT_METRIC, 7)
+        assert not updated['stale'] and updated['mean'] != result['mean']
+
+        # 序列已跨天（保存的截止日期早于昨天）时同样只唤醒后台服务
+        woken.clear()
+        fitted = engine.fitted
+        conn.execute(f"UPDATE {FORECAST_TABLE} SET series_end = '2000-01-01' WHERE data_type = 'maternal'")
+        conn.commit()
+        assert engine.forecast(conn, 'maternal', 'age', 7)['stale'] and woken
+        assert engine.fitted == fitted
+
+        conn.execute('DELETE FROM medical_data')
+        conn.commit()
+        assert engine.forecast(conn, 'medical', forecasting.COUNT_METRIC, 7)['stale']
+        service.run_once()
+        assert engine.forecast(conn, 'medical', forecasting.COUNT_METRIC, 7) is None
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_holt_winters_fit_and_intervals()
+    test_prediction_endpoint_serves_saved_state()
+    test_cold_start_fits_once()
+    logger.info("时间序列预测测试全部通过")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+首页数据接口测试脚本
+验证 /getHomeData 合并查询的结果与原来的逐项查询一致，今日新增使用 created_at 索引，
+并兼容缺少 risk_level 等列的旧表结构
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+import contextlib
+import logging
+
+from utils import data_access
+from benchmark_home_data import create_maternal_table, legacy_home_queries
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_home_data")
+
+
+def get_home_data(path):
+    try:
+        data_access.configure(mode='split', files={'system': path})
+        return app.app.test_client().get('/getHomeData').get_json()
+    finally:
+        data_access.configure()
+
+
+def test_combined_queries_match_legacy_queries():
+    """合并查询与原来 7 次查询的统计和最新记录一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'home.db')
+        create_maternal_table(path, 3000, seed=1)
+        conn = sqlite3.connect(path)
+        legacy = legacy_home_queries(conn)
+        app.ensure_home_indexes(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        response = get_home_data(path)
+        assert response['code'] == 200
+        data = response['data']
+        for key in ('maxNum', 'maxAge', 'minAge', 'pieData', 'casesData', 'lastData'):
+            assert data[key] == legacy[key], key
+        assert data['maxType'] == legacy['pieData'][0]['name']
+        assert legacy['newPatients'] > 0
+
+
+def test_today_count_uses_created_at_index():
+    """今日新增的区间条件可以使用 created_at 索引，结果与 DATE() 过滤一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'home.db')
+        create_maternal_table(path, 3000, seed=2)
+        conn = sqlite3.connect(path)
+        app.ensure_home_indexes(conn.cursor())
+        today_start, tomorrow_start = app.day_range()
+        sql = "SELECT COUNT(*) FROM maternal_info WHERE created_at >= ? AND created_at < ?"
+        plan = ' '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, (today_start, tomorrow_start)))
+        assert 'idx_maternal_info_created_at' in plan, plan
+        assert conn.execute(sql, (today_start, tomorrow_start)).fetchone()[0] == conn.execute(
+            "SELECT COUNT(*) FROM maternal_info WHERE DATE(created_at) = ?", (today_start,)).fetchone()[0]
+        conn.close()
+
+
+def test_older_schema_without_risk_columns():
+    """app.py 版本的表结构（没有 risk_level、heart_rate 等列）也能返回数据"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'home.db')
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE maternal_info (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER,
+                                        weight REAL, systolic_pressure INTEGER, diastolic_pressure INTEGER,
+                                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+        ''')
+        conn.executemany('INSERT INTO maternal_info (name, age, weight, systolic_pressure, diastolic_pressure, '
+                         'created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                         [('孕妇A', 30, 60.0, 120, 80, '2024-01-01 08:00:00'),
+                          ('孕妇B', 25, None, 118, 76, '2024-01-02 08:00:00')])
+        app.ensure_home_indexes(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        data = get_home_data(path)['data']
+        assert (data['maxNum'], data['maxAge'], data['minAge'], data['pieData']) == (2, 30, 25, [])
+        assert [case['name'] for case in data['casesData']] == ['孕妇B', '孕妇A']
+        assert data['casesData'][0]['risk_level'] is None
+        assert data['casesData'][0]['blood_pressure'] == '118/76'
+        assert data['lastData'] == {'xData': ['孕妇A'], 'y1Data': [60.0], 'y2Data': [120]}
+
+
+if __name__ == "__main__":
+    test_combined_queries_match_legacy_queries()
+    test_today_count_uses_created_at_index()
+    test_older_schema_without_risk_columns()
+    logger.info("首页数据接口测试全部通过")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台导入任务队列测试脚本
+验证任务在工作线程中执行并推送进度事件、排队中和执行中的任务取消、服务重启后的任务恢复、
+多个进程共用任务表时任务只执行一次且可以跨进程取消，
+以及导入历史和删除记录接口读取任务表
+"""
+
+import io
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+import contextlib
+import logging
+
+import job_queue
+from job_queue import ImportJobQueue, ensure_job_table
+from utils import data_access
+from test_data_import import MEDICAL_HEADER, medical_rows, write_csv, create_tables
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_job_queue")
+
+
+class RecordingSocketIO:
+    """记录推送事件的 SocketIO 替身"""
+
+    def __init__(self, on_emit=None):
+        self.events = []
+        self.on_emit = on_emit
+
+    def emit(self, event, data):
+        self.events.append((event, data))
+        if self.on_emit is not None:
+            self.on_emit(event, data)
+
+
+def wait_finished(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in job_queue.FINISHED_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError('导入任务超时')
+
+
+@contextlib.contextmanager
+def data_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        create_tables(path).close()
+        try:
+            data_access.configure(mode='split', files={'data': path})
+            yield tmp, path
+        finally:
+            data_access.configure()
+
+
+def upload_file(tmp, name='medical.csv', count=40):
+    path = os.path.join(tmp, name)
+    write_csv(path, MEDICAL_HEADER, medical_rows(count))
+    return path
+
+
+def test_job_runs_in_worker_and_emits_progress():
+    """任务在工作线程中执行，结果写入任务表，推送进度和完成事件，上传文件被删除"""
+    with data_database() as (tmp, path):
+        socketio = RecordingSocketIO()
+        queue = ImportJobQueue(socketio=socketio, progress_interval=0, batch_rows=5)
+        try:
+            csv_path = upload_file(tmp)
+            job = queue.submit(csv_path, 'medical', filename='病历.csv')
+            assert job['status'] in ('queued', 'processing') and job['filename'] == '病历.csv'
+            job = wait_finished(queue, job['job_id'])
+        finally:
+            queue.shutdown()
+
+        valid = 40 - len([i for i in range(40) if i % 7 in (3, 5)])
+        assert job['status'] == 'completed' and job['percent'] == 100
+        assert job['success'] == valid and job['errors'] == 40 - valid and job['total_rows'] == 40
+        assert job['error_details'][0] == {'row': 5, 'message': '姓名为空'}
+        assert not os.path.exists(csv_path)
+
+        events = [event for event, _ in socketio.events]
+        assert events[-1] == 'import_finished' and events.count('import_progress') > 2
+        percents = [data['percent'] for event, data in socketio.events if event == 'import_progress']
+        assert percents == sorted(percents)
+        assert all(data['job_id'] == job['job_id'] for _, data in socketio.events)
+
+        conn = sqlite3.connect(path)
+        assert conn.execute('SELECT COUNT(*) FROM medical_data').fetchone()[0] == valid
+        conn.close()
+
+
+def test_cancel_queued_and_running_jobs():
+    """单个工作线程时，排队中的任务立即取消；执行中的任务在批次之间停止"""
+    with data_database() as (tmp, path):
+        started = threading.Event()
+        release = threading.Event()
+
+        def on_emit(event, data):
+            # 第一个任务开始后暂停，保证第二个任务处于排队状态
+            if event == 'import_progress' and not started.is_set():
+                started.set()
+                release.wait(5)
+
+        queue = ImportJobQueue(socketio=RecordingSocketIO(on_emit), max_workers=1, progress_interval=0,
+                               batch_rows=5)
+        try:
+            running = queue.submit(upload_file(tmp, 'a.csv'), 'medical')
+            assert started.wait(5)
+            queued_path = upload_file(tmp, 'b.csv')
+            queued = queue.submit(queued_path, 'medical')
+            assert queue.get(queued['job_id'])['status'] == 'queued'
+
+            cancelled = queue.cancel(queued['job_id'])
+            assert cancelled['status'] == 'cancelled' and cancelled['cancelled']
+            assert queue.cancel(running['job_id'])['status'] == 'processing'
+            release.set()
+
+            running = wait_finished(queue, running['job_id'])
+            assert running['status'] == 'cancelled' and running['success'] < 30
+            queue.shutdown()
+            # 已取消的排队任务不会执行，上传文件同样被清理
+            assert queue.get(queued['job_id'])['started_at'] is None
+            assert not os.path.exists(queued_path)
+            assert queue.cancel('unknown') is None
+        finally:
+            release.set()
+            queue.shutdown()
+
+
+def test_recover_jobs_after_restart():
+    """创建队列不处理遗留任务；recover() 把心跳超时的执行中任务标记为失败，
+    其他进程正在执行（心跳未超时）的任务不受影响，排队任务在文件存在时重新执行"""
+    with data_database() as (tmp, path):
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        ensure_job_table(conn)
+        csv_path = upload_file(tmp, count=10)
+        conn.executemany('''
+            INSERT INTO import_jobs (id, filename, data_type, file_path, status, created_at, heartbeat_at)
+            VALUES (?, ?, 'medical', ?, ?, ?, ?)
+        ''', [('interrupted', 'a.csv', csv_path + '.old', 'processing', '2024-01-01 08:00:00', None),
+              ('pending', 'b.csv', csv_path, 'queued', '2024-01-01 08:01:00', None),
+              ('missing', 'c.csv', csv_path + '.gone', 'queued', '2024-01-01 08:02:00', None),
+              ('elsewhere', 'd.csv', csv_path + '.other', 'processing', '2024-01-01 08:03:00', job_queue._now())])
+        conn.commit()
+        conn.close()
+
+        queue = ImportJobQueue()
+        try:
+            assert queue.get('interrupted')['status'] == 'processing'
+            assert queue.get('pending')['status'] == 'queued'
+            assert queue.recover() == 1
+            assert wait_finished(queue, 'pending')['status'] == 'completed'
+        finally:
+            queue.shutdown()
+        assert queue.get('interrupted')['status'] == 'failed'
+        assert '服务重启' in queue.get('interrupted')['message']
+        assert queue.get('missing')['status'] == 'failed'
+        assert queue.get('elsewhere')['status'] == 'processing'
+        assert [job['job_id'] for job in queue.list()] == ['elsewhere', 'missing', 'pending', 'interrupted']
+
+
+def test_job_claimed_by_one_process_and_cancelled_from_another():
+    """两个队列（模拟两个进程）同时恢复同一个排队任务时只执行一次；取消请求可以由另一个队列发出"""
+    with data_database() as (tmp, path):
+        conn = sqlite3.connect(path)
+        ensure_job_table(conn)
+        conn.execute('''
+            INSERT INTO import_jobs (id, filename, data_type, file_path, status, created_at)
+            VALUES ('shared', 'a.csv', 'medical', ?, 'queued', '2024-01-01 08:00:00')
+        ''', (upload_file(tmp, 'a.csv', count=40),))
+        conn.commit()
+
+        first, second = ImportJobQueue(batch_rows=5), ImportJobQueue(batch_rows=5)
+        try:
+            first.recover()
+            second.recover()
+            job = wait_finished(first, 'shared')
+        finally:
+            first.shutdown()
+            second.shutdown()
+        assert job['status'] == 'completed'
+        assert conn.execute('SELECT COUNT(*) FROM medical_data').fetchone()[0] == job['success']
+        owner = conn.execute("SELECT owner FROM import_jobs WHERE id = 'shared'").fetchone()[0]
+        assert owner in (first.owner, second.owner)
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def on_emit(event, data):
+            if event == 'import_progress' and not started.is_set():
+                started.set()
+                release.wait(5)
+
+        worker = ImportJobQueue(socketio=RecordingSocketIO(on_emit), progress_interval=0, batch_rows=5)
+        other = ImportJobQueue()
+        try:
+            running = worker.submit(upload_file(tmp, 'b.csv'), 'medical')
+            assert started.wait(5)
+            assert other.cancel(running['job_id'])['status'] == 'processing'
+            release.set()
+            running = wait_finished(worker, running['job_id'])
+            assert running['status'] == 'cancelled' and running['success'] < 30
+        finally:
+            release.set()
+            worker.shutdown()
+            other.shutdown()
+        conn.close()
+
+
+def test_history_and_cancel_endpoints():
+    """导入历史接口读取任务表，结束的记录可以删除"""
+    with data_database() as (tmp, path):
+        client = app.app.test_client()
+        with open(upload_file(tmp, count=14), 'rb') as handle:
+            response = client.post('/api/data/import', data={'file': (handle, 'medical.csv'),
+                                                             'data_type': 'medical'})
+        job_id = response.get_json()['data']['job_id']
+        wait_finished(job_queue.get_job_queue(), job_id)
+
+        body = client.get('/api/data/import-history').get_json()
+        assert body['code'] == 200
+        record = next(item for item in body['data'] if item['id'] == job_id)
+        assert record['import_status'] == 'completed' and record['status'] == 'success'
+        assert record['total_records'] == 14 and record['success_records'] == 10 and record['failed_records'] == 4
+        assert record['filename'] == 'medical.csv' and '第5行: 姓名为空' in record['error_details']
+        assert client.get('/api/data/import/jobs').get_json()['data'][0]['job_id'] == job_id
+
+        assert client.post(f'/api/data/import/jobs/{job_id}/cancel').get_json()['data']['status'] == 'completed'
+        assert client.post('/api/data/import/jobs/unknown/cancel').status_code == 404
+        assert client.delete(f'/api/data/import-record/{job_id}').status_code == 200
+        assert client.delete(f'/api/data/import-record/{job_id}').status_code == 404
+
+
+if __name__ == "__main__":
+    test_job_runs_in_worker_and_emits_progress()
+    test_cancel_queued_and_running_jobs()
+    test_recover_jobs_after_restart()
+    test_job_claimed_by_one_process_and_cancelled_from_another()
+    test_history_and_cancel_endpoints()
+    logger.info("后台导入任务队列测试全部通过")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轻量级模型格式测试脚本
+验证各类模型导出为 .npz 后的预测概率与原模型一致，以及预测器优先加载 .npz 模型
+"""
+
+import os
+import json
+import tempfile
+import logging
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+
+from lightweight_models import export_model, LightweightModel
+from maternal_risk_predictor import MaternalRiskPredictor
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_lightweight_models")
+
+
+def make_data(seed=0):
+    """生成子痫前期特征（年龄、收缩压、舒张压）的合成数据"""
+    rng = np.random.RandomState(seed)
+    X = rng.uniform([18, 90, 55], [45, 170, 110], size=(400, 3)).round(1)
+    y = ((X[:, 1] + X[:, 2] * 0.5 + rng.normal(0, 8, 400)) > 170).astype(int)
+    return X, y
+
+
+def check_export(model, with_missing=False):
+    """导出、重新加载并对比预测概率"""
+    X, y = make_data()
+    model.fit(X, y)
+    X_test, _ = make_data(seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.npz')
+        export_model(model, path, X_check=X)
+        loaded = LightweightModel.load(path)
+    np.testing.assert_allclose(loaded.predict_proba(X_test), model.predict_proba(X_test), atol=1e-6)
+    assert (loaded.predict(X_test) == model.predict(X_test)).all()
+    if with_missing:
+        X_test[::5, 1] = np.nan
+        np.testing.assert_allclose(loaded.predict_proba(X_test), model.predict_proba(X_test), atol=1e-6)
+
+
+def test_export_sklearn_models():
+    """线性模型与 sklearn 树模型"""
+    check_export(LogisticRegression(max_iter=2000))
+    check_export(DecisionTreeClassifier(max_depth=6, random_state=0), with_missing=True)
+    check_export(RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0), with_missing=True)
+    check_export(GradientBoostingClassifier(n_estimators=30, random_state=0))
+
+
+def test_export_boosting_libraries():
+    """XGBoost 与 LightGBM（未安装时跳过）"""
+    try:
+        from xgboost import XGBClassifier
+        check_export(XGBClassifier(n_estimators=30, max_depth=4, verbosity=0), with_missing=True)
+    except ImportError:
+        logger.info("未安装 xgboost，跳过")
+    try:
+        from lightgbm import LGBMClassifier
+        check_export(LGBMClassifier(n_estimators=30, verbose=-1), with_missing=True)
+    except ImportError:
+        logger.info("未安装 lightgbm，跳过")
+
+
+def test_unsupported_model_rejected():
+    """不支持的模型类型导出时报错"""
+    from sklearn.neighbors import KNeighborsClassifier
+    X, y = make_data()
+    model = KNeighborsClassifier().fit(X, y)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            export_model(model, os.path.join(tmp, 'model.npz'))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("KNN 模型不应支持导出")
+
+
+def test_predictor_prefers_npz_model():
+    """模型目录中只有 .npz 文件时预测器也能使用机器学习模型，结果与原模型一致"""
+    X, y = make_data()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    with tempfile.TemporaryDirectory() as models_dir:
+        export_model(model, os.path.join(models_dir, 'preeclampsia_model.npz'), X_check=X)
+        with open(os.path.join(models_dir, 'preeclampsia_model_info.json'), 'w', encoding='utf-8') as f:
+            json.dump({'model_type': 'random_forest'}, f)
+
+        predictor = MaternalRiskPredictor(models_dir=models_dir)
+        assert isinstance(predictor.models['preeclampsia'], LightweightModel)
+        patient = {'age': 36, 'systolic_pressure': 150, 'diastolic_pressure': 95}
+        result = predictor.predict_preeclampsia_risk(patient)
+        assert predictor.last_used_ml['preeclampsia']
+        expected = model.predict_proba(np.array([[36, 150, 95]], dtype=float))[0, 1]
+        assert abs(result['risk_probability'] - expected) <= 0.005
+
+
+if __name__ == "__main__":
+    test_export_sklearn_models()
+    test_export_boosting_libraries()
+    test_unsupported_model_rejected()
+    test_predictor_prefers_npz_model()
+    logger.info("轻量级模型测试全部通过")
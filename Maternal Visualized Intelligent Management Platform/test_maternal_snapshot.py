@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+maternal_info 列式快照测试脚本
+验证整表加载、字典编码、按 updated_at 增量刷新以及删除记录后的整表重建
+"""
+
+import os
+import sqlite3
+import tempfile
+import logging
+
+import numpy as np
+
+from utils.maternal_snapshot import MaternalSnapshot, NORMAL_STATUS, ABNORMAL_STATUS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_maternal_snapshot")
+
+
+def create_database(tmp):
+    path = os.path.join(tmp, 'system.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE maternal_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER,
+            gestational_weeks INTEGER, pregnancy_count INTEGER, parity INTEGER, pregnancy_type TEXT,
+            weight REAL, height REAL, systolic_pressure INTEGER, diastolic_pressure INTEGER, notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO maternal_info (name, age, gestational_weeks, pregnancy_type, weight, notes, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        ('孕妇A', 28, 10, '单胎', 60.5, None, '2024-01-01 08:00:00', '2024-01-01 08:00:00'),
+        ('孕妇B', 35, 30, '双胎', None, '血压异常', '2024-01-02 09:00:00', '2024-01-02 09:00:00'),
+        ('孕妇C', None, 20, '单胎', 55.0, '无', '2024-01-03 10:00:00', '2024-01-03 10:00:00')
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def execute(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_full_load_encodes_columns():
+    """整表加载：数值列 NULL 为 NaN，分类列字典编码，计数按首次出现顺序"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = create_database(tmp)
+        data = MaternalSnapshot(path).refresh()
+        assert list(data.ids) == [1, 2, 3]
+        assert np.isnan(data.numeric['age'][2]) and np.isnan(data.numeric['weight'][1])
+        assert data.codes['pregnancy_type'].dtype == np.int32
+        assert data.value_counts('pregnancy_type') == [('单胎', 2), ('双胎', 1)]
+        assert data.value_counts('status') == [(NORMAL_STATUS, 2), (ABNORMAL_STATUS, 1)]
+        assert list(data.column('status')) == [NORMAL_STATUS, ABNORMAL_STATUS, NORMAL_STATUS]
+        assert list(data.histogram('gestational_weeks', [12, 28])) == [1, 1, 1]
+        assert list(data.histogram('age', [30], fill=0)) == [2, 1]
+        assert data.created_at[0] == np.datetime64('2024-01-01T08:00:00')
+
+
+def test_incremental_refresh_merges_changed_rows():
+    """只读取 updated_at 不早于水位线的记录，更新原位合并、新增按 id 插入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = create_database(tmp)
+        snapshot = MaternalSnapshot(path)
+        snapshot.refresh()
+        assert snapshot.refresh() is snapshot.refresh()
+
+        execute(path, "UPDATE maternal_info SET notes = '胎位异常', updated_at = '2024-02-01 00:00:00' WHERE id = 1")
+        execute(path, "INSERT INTO maternal_info (name, age, pregnancy_type, updated_at) "
+                      "VALUES ('孕妇D', 41, '三胎', '2024-02-02 00:00:00')")
+        data = snapshot.refresh()
+        stats = snapshot.stats()
+        # 水位线上的记录（孕妇C）会被重新读取
+        assert (stats['full_loads'], stats['incremental'], stats['rows_merged']) == (1, 1, 3)
+        assert list(data.ids) == [1, 2, 3, 4]
+        assert data.value_counts('status') == [(ABNORMAL_STATUS, 2), (NORMAL_STATUS, 2)]
+        assert data.value_counts('pregnancy_type') == [('单胎', 2), ('双胎', 1), ('三胎', 1)]
+        assert data.numeric['age'][3] == 41
+        assert data.watermark == '2024-02-02 00:00:00'
+
+
+def test_deleted_rows_trigger_full_reload():
+    """行数不一致（有删除）时整表重建，min_interval 内直接返回缓存的快照"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = create_database(tmp)
+        snapshot = MaternalSnapshot(path, min_interval=60)
+        first = snapshot.get()
+        execute(path, 'DELETE FROM maternal_info WHERE id = 2')
+        assert snapshot.get() is first
+
+        data = snapshot.refresh()
+        assert list(data.ids) == [1, 3]
+        assert data.value_counts('status') == [(NORMAL_STATUS, 2)]
+        assert snapshot.stats()['full_loads'] == 2
+
+
+if __name__ == "__main__":
+    test_full_load_encodes_columns()
+    test_incremental_refresh_merges_changed_rows()
+    test_deleted_rows_trigger_full_reload()
+    logger.info("列式快照测试全部通过")
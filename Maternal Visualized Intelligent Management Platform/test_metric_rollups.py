@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指标时间汇总测试脚本
+验证触发器维护的 count / sum / sum of squares 在插入、更新、删除后与全量重建一致，
+时间范围解析，以及趋势、对比、统计、预测接口从汇总表返回的结果与原始记录一致
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+import contextlib
+import logging
+from datetime import datetime, timedelta
+
+import metric_rollups
+from metric_rollups import ROLLUP_TABLE
+from utils import data_access
+from benchmark_data_list import MEDICAL_SCHEMA
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_metric_rollups")
+
+MATERNAL_SCHEMA = '''
+    CREATE TABLE maternal_info (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, age INTEGER, gestational_weeks INTEGER,
+        systolic_pressure INTEGER, diastolic_pressure INTEGER, notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def stamp(days=0, hours=0):
+    return (datetime.utcnow() - timedelta(days=days, hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def rollups_snapshot(conn):
+    return sorted(conn.execute(f'SELECT source, grain, bucket, metric, n, round(total, 6), round(total_sq, 6) '
+                               f'FROM {ROLLUP_TABLE} WHERE grain != ? AND metric != ?',
+                               (metric_rollups.INSTALLED_GRAIN, metric_rollups.VERSION_METRIC)))
+
+
+def assert_matches_rebuild(conn):
+    """增量维护的汇总与全量重建的结果一致"""
+    incremental = rollups_snapshot(conn)
+    for table in metric_rollups.METRICS:
+        metric_rollups.rebuild(conn, table)
+    assert incremental == rollups_snapshot(conn)
+
+
+def create_system_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.execute(MATERNAL_SCHEMA)
+    conn.executemany('INSERT INTO medical_data (name, age, systolic_pressure, diastolic_pressure, created_at) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [(f'患者{i}', 20 + i % 50, 110 + i % 40, 70 + i % 20, stamp(days=i % 200, hours=i % 5))
+                      for i in range(2000)])
+    conn.executemany('INSERT INTO maternal_info (name, age, gestational_weeks, created_at) VALUES (?, ?, ?, ?)',
+                     [(f'孕妇{i}', 25 + i % 10, 8 + i % 30, stamp(days=i % 20)) for i in range(300)])
+    conn.commit()
+    conn.close()
+
+
+def test_triggers_track_insert_update_delete():
+    """插入、更新、删除后汇总与重建一致；清空的桶被删除；非数值不计入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'system.db'))
+        conn.execute(MEDICAL_SCHEMA)
+        conn.execute(MATERNAL_SCHEMA)
+        conn.executemany('INSERT INTO medical_data (name, age, systolic_pressure, created_at) VALUES (?, ?, ?, ?)',
+                         [('甲', 30, 120, stamp(0)), ('乙', 40, None, stamp(40)), ('丙', '未知', 140, stamp(3))])
+        conn.commit()
+        assert metric_rollups.install(conn) == ['medical_data', 'maternal_info']
+        assert metric_rollups.install(conn) == []
+
+        conn.executemany('INSERT INTO maternal_info (name, age, gestational_weeks, created_at) VALUES (?, ?, ?, ?)',
+                         [('孕妇A', 28, 12, stamp(0)), ('孕妇B', 31, 36, stamp(2)), ('孕妇C', None, 20, None)])
+        conn.execute("INSERT INTO medical_data (name, age, systolic_pressure, created_at) VALUES ('丁', 50, 150, ?)",
+                     (stamp(1),))
+        conn.execute("UPDATE medical_data SET age = 35, created_at = ? WHERE name = '甲'", (stamp(5),))
+        conn.execute("UPDATE maternal_info SET notes = '复查' WHERE name = '孕妇B'")
+        conn.execute("DELETE FROM medical_data WHERE name = '乙'")
+        conn.execute("DELETE FROM maternal_info WHERE name = '孕妇C'")
+        conn.commit()
+        assert_matches_rebuild(conn)
+
+        # 删除后没有记录的桶不保留，只留下该天的数据版本
+        day = stamp(40)[:10]
+        assert conn.execute(f'SELECT metric FROM {ROLLUP_TABLE} WHERE bucket = ?', (day,)).fetchall() == [
+            (metric_rollups.VERSION_METRIC,)]
+
+        totals = metric_rollups.read_totals(conn, 'medical_data')
+        assert totals['count'] == 3
+        # 文本 '未知' 不计入 age
+        assert totals['age']['n'] == 2 and totals['age']['avg'] == 42.5
+        assert totals['age']['std'] == 7.5
+        assert metric_rollups.metric_avg(totals, 'blood_sugar') is None
+        conn.close()
+
+
+def test_parse_time_range():
+    """命名范围、数量加单位的范围以及不支持的值"""
+    assert metric_rollups.parse_time_range('quarter') == ('day', ('-90 days',))
+    assert metric_rollups.parse_time_range('year') == ('month', ('start of month', '-11 months'))
+    assert metric_rollups.parse_time_range(None) == metric_rollups.TIME_RANGES['month']
+    assert metric_rollups.parse_time_range('12h') == ('hour', ('-12 hours',))
+    assert metric_rollups.parse_time_range('7d') == ('day', ('-7 days',))
+    assert metric_rollups.parse_time_range('3m') == ('day', ('-3 months',))
+    assert metric_rollups.parse_time_range('6m') == ('month', ('start of month', '-5 months'))
+    assert metric_rollups.parse_time_range('1y') == ('month', ('start of month', '-11 months'))
+    for value in ('0d', '7w', 'forever', '-3d'):
+        try:
+            metric_rollups.parse_time_range(value)
+            assert False, value
+        except ValueError:
+            pass
+
+
+def test_analysis_endpoints_read_rollups():
+    """趋势、对比、统计、预测接口的结果与原始记录的聚合一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            client = app.app.test_client()
+            raw = sqlite3.connect(path)
+
+            response = client.get('/api/analysis/trend', query_string={'data_type': 'medical', 'time_range': '7d'})
+            assert response.status_code == 200
+            trend = response.get_json()['data']
+            expected = raw.execute("SELECT substr(created_at, 1, 10), COUNT(*), AVG(age) FROM medical_data "
+                                   "WHERE created_at >= date('now', '-7 days') GROUP BY 1 ORDER BY 1").fetchall()
+            assert trend['trend_data']['dates'] == [row[0] for row in expected]
+            assert trend['trend_data']['count'] == [row[1] for row in expected]
+            assert trend['trend_data']['avg_age'] == [round(row[2], 2) for row in expected]
+            assert trend['statistics']['granularity'] == 'day'
+
+            response = client.get('/api/analysis/trend', query_string={'data_type': 'medical', 'time_range': 'year'})
+            trend = response.get_json()['data']
+            assert trend['statistics']['granularity'] == 'month'
+            months = raw.execute("SELECT substr(created_at, 1, 7), COUNT(*) FROM medical_data "
+                                 "WHERE created_at >= date('now', 'start of month', '-11 months') "
+                                 "GROUP BY 1 ORDER BY 1").fetchall()
+            assert trend['trend_data']['dates'] == [row[0] for row in months]
+            assert trend['trend_data']['count'] == [row[1] for row in months]
+
+            response = client.get('/api/analysis/trend', query_string={'time_range': '2w'})
+            assert response.status_code == 400
+
+            response = client.get('/api/analysis/comparison', query_string={'data_type': 'maternal'})
+            comparison = response.get_json()['data']
+            current = raw.execute("SELECT COUNT(*) FROM maternal_info "
+                                  "WHERE created_at >= date('now', '-7 days')").fetchone()[0]
+            assert sum(comparison['current_period']['count']) == current
+
+            response = client.get('/api/analysis/statistics', query_string={'data_type': 'medical'})
+            statistics = response.get_json()['data']
+            count, avg_age, min_age, max_age, avg_systolic = raw.execute(
+                'SELECT COUNT(*), AVG(age), MIN(age), MAX(age), AVG(systolic_pressure) FROM medical_data').fetchone()
+            assert statistics['total_count'] == count
+            assert statistics['age_stats']['avg'] == round(avg_age, 2)
+            assert (statistics['age_stats']['min'], statistics['age_stats']['max']) == (min_age, max_age)
+            assert statistics['vital_signs']['avg_systolic'] == round(avg_systolic, 2)
+            assert statistics['vital_signs']['avg_heart_rate'] == 0
+
+            response = client.get('/api/analysis/prediction', query_string={'data_type': 'maternal'})
+            assert response.status_code == 200 and response.get_json()['code'] == 200
+            raw.close()
+        finally:
+            data_access.configure()
+
+
+if __name__ == "__main__":
+    test_triggers_track_insert_update_delete()
+    test_parse_time_range()
+    test_analysis_endpoints_read_rollups()
+    logger.info("指标时间汇总测试全部通过")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+预测缓存测试脚本
+验证 LRU 淘汰、TTL 过期、命中统计以及模型版本变化和热加载后的缓存失效
+"""
+
+import time
+import tempfile
+import logging
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from maternal_risk_predictor import MaternalRiskPredictor, PredictionCache, PredictorRegistry
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_prediction_cache")
+
+PATIENT = {'age': 36, 'systolic_pressure': 150, 'diastolic_pressure': 95}
+
+
+def make_predictor(**kwargs):
+    """创建带临时子痫前期模型的预测器，并统计 predict_proba 调用的行数"""
+    predictor = MaternalRiskPredictor(**kwargs)
+    rng = np.random.RandomState(0)
+    X = rng.uniform([18, 90, 55], [45, 170, 110], size=(200, 3))
+    y = (X[:, 1] > 130).astype(int)
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    predictor.models['preeclampsia'] = model
+    predictor.model_info['preeclampsia'] = {'model_type': 'logistic_regression'}
+
+    predictor.model_rows = []
+    original = model.predict_proba
+
+    def counting_predict_proba(X):
+        predictor.model_rows.append(len(X))
+        return original(X)
+    model.predict_proba = counting_predict_proba
+    return predictor
+
+
+def test_lru_eviction_and_counters():
+    """超过容量时淘汰最久未使用的条目"""
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.put('a', 0.1)
+    cache.put('b', 0.2)
+    assert cache.get('a') == 0.1
+    cache.put('c', 0.3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 0.1 and cache.get('c') == 0.3
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (3, 1, 1, 2)
+
+
+def test_ttl_expiration():
+    """超过有效期的条目不再命中"""
+    cache = PredictionCache(max_size=10, ttl=0.05)
+    cache.put('a', 0.1)
+    assert cache.get('a') == 0.1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_repeat_prediction_hits_cache():
+    """相同特征的重复预测不再调用模型，结果不变"""
+    predictor = make_predictor()
+    first = predictor.predict_preeclampsia_risk(PATIENT)
+    second = predictor.predict_preeclampsia_risk(dict(PATIENT, notes='复诊'))
+    assert first == second
+    assert predictor.model_rows == [1]
+    assert predictor.get_cache_stats()['hits'] == 1
+
+
+def test_batch_only_scores_cache_misses():
+    """批量预测只对未命中的行调用模型"""
+    predictor = make_predictor()
+    records = [dict(PATIENT, age=age) for age in range(20, 30)]
+    expected = predictor.predict_batch(records[:4], 'preeclampsia')
+    results = predictor.predict_batch(records, 'preeclampsia')
+    assert results[:4] == expected
+    assert predictor.model_rows == [4, 6]
+    assert predictor.predict_batch(records, 'preeclampsia') == results
+    assert predictor.model_rows == [4, 6]
+
+
+def test_model_version_change_misses():
+    """模型版本变化后旧条目不再命中"""
+    predictor = make_predictor()
+    predictor.predict_preeclampsia_risk(PATIENT)
+    predictor.model_version = 'preeclampsia:v2.0'
+    predictor.predict_preeclampsia_risk(PATIENT)
+    assert predictor.model_rows == [1, 1]
+
+
+def test_cache_can_be_disabled():
+    """容量为0时不缓存"""
+    predictor = make_predictor(cache_size=0)
+    predictor.predict_preeclampsia_risk(PATIENT)
+    predictor.predict_preeclampsia_risk(PATIENT)
+    assert predictor.model_rows == [1, 1]
+    assert predictor.get_cache_stats()['size'] == 0
+
+
+def test_reload_starts_with_empty_cache():
+    """热加载后的预测器使用新的空缓存"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        registry = PredictorRegistry(models_dir=models_dir, check_interval=0)
+        first = registry.get()
+        first.prediction_cache.put(('preeclampsia', first.model_version, (1.0,)), 0.5)
+        second = registry.reload()
+        assert second.prediction_cache is not first.prediction_cache
+        assert second.get_cache_stats()['size'] == 0
+
+
+if __name__ == "__main__":
+    test_lru_eviction_and_counters()
+    test_ttl_expiration()
+    test_repeat_prediction_hits_cache()
+    test_batch_only_scores_cache_misses()
+    test_model_version_change_misses()
+    test_cache_can_be_disabled()
+    test_reload_starts_with_empty_cache()
+    logger.info("预测缓存测试全部通过")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共享预测器注册表测试脚本
+验证进程级单例、线程安全以及模型文件变化后的热加载
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+import logging
+
+from maternal_risk_predictor import PredictorRegistry, SharedPredictor
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_predictor_registry")
+
+
+def write_version_info(models_dir, version):
+    """写入版本信息文件并推进修改时间"""
+    path = os.path.join(models_dir, 'version_info.json')
+    previous = os.stat(path).st_mtime if os.path.exists(path) else 0
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'preeclampsia': {'active_version': version}}, f)
+    # 文件系统时间戳精度有限，确保修改时间严格递增
+    mtime = max(time.time(), previous + 1)
+    os.utime(path, (mtime, mtime))
+
+
+def test_registry_returns_same_instance():
+    """未发生变化时始终返回同一实例"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        registry = PredictorRegistry(models_dir=models_dir, check_interval=0)
+        first = registry.get()
+        assert registry.get() is first
+        assert registry.reload_count == 0
+
+
+def test_registry_hot_reloads_on_change():
+    """version_info.json 修改后热加载新实例"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        write_version_info(models_dir, 'v1.0')
+        registry = PredictorRegistry(models_dir=models_dir, check_interval=0)
+        first = registry.get()
+
+        write_version_info(models_dir, 'v2.0')
+        second = registry.get()
+        assert second is not first
+        assert registry.reload_count == 1
+        assert registry.get() is second
+
+
+def test_registry_respects_check_interval():
+    """检查间隔内不重复扫描模型目录"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        write_version_info(models_dir, 'v1.0')
+        registry = PredictorRegistry(models_dir=models_dir, check_interval=3600)
+        first = registry.get()
+        write_version_info(models_dir, 'v2.0')
+        assert registry.get() is first
+        assert registry.reload() is not first
+
+
+def test_registry_is_thread_safe():
+    """并发首次获取时只构建一个实例"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        registry = PredictorRegistry(models_dir=models_dir)
+        instances = []
+
+        def worker():
+            instances.append(registry.get())
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(instance) for instance in instances}) == 1
+
+
+def test_shared_predictor_follows_reload():
+    """代理对象在热加载后转发到新实例"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        registry = PredictorRegistry(models_dir=models_dir, check_interval=0)
+        shared = SharedPredictor(registry)
+        first_thresholds = shared.risk_thresholds
+        assert first_thresholds is registry.get().risk_thresholds
+
+        registry.reload()
+        assert shared.risk_thresholds is registry.get().risk_thresholds
+        assert shared.risk_thresholds is not first_thresholds
+        assert shared.predict_preeclampsia_risk({'age': 30})['model_type'] == 'rule_based'
+
+
+def test_using_ml_flag_is_per_request():
+    """是否使用模型随结果返回；兼容的 last_used_ml 标记按线程保存，其他线程的预测不会改写"""
+    with tempfile.TemporaryDirectory() as models_dir:
+        predictor = PredictorRegistry(models_dir=models_dir).get()
+        assert predictor.predict_preeclampsia_risk({'age': 30})['using_ml'] is False
+        predictor.last_used_ml['preeclampsia'] = True
+
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(
+            (predictor.predict_preeclampsia_risk({'age': 30})['using_ml'], dict(predictor.last_used_ml))))
+        thread.start()
+        thread.join()
+        assert seen == [(False, {'preeclampsia': False})]
+        assert predictor.last_used_ml['preeclampsia'] is True
+
+
+if __name__ == "__main__":
+    test_registry_returns_same_instance()
+    test_registry_hot_reloads_on_change()
+    test_registry_respects_check_interval()
+    test_registry_is_thread_safe()
+    test_shared_predictor_follows_reload()
+    test_using_ml_flag_is_per_request()
+    logger.info("预测器注册表测试全部通过")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析报告引擎测试脚本
+验证报告结果与原始记录的聚合一致、按数据版本缓存（范围内数据变化后重新生成）、
+过去日期范围的报告持久保存并可预先生成，以及参数校验
+"""
+
+import io
+import os
+import sqlite3
+import tempfile
+import contextlib
+import logging
+from datetime import datetime, timedelta
+
+import metric_rollups
+import report_engine
+from report_engine import ReportEngine, REPORT_TABLE
+from utils import data_access
+from test_metric_rollups import create_system_database, stamp
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    import analysis_api
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_report_engine")
+
+
+def day(days):
+    return stamp(days=days)[:10]
+
+
+@contextlib.contextmanager
+def report_environment():
+    """独立的主库，接口使用新的报告引擎（空缓存）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        previous = analysis_api.report_engine
+        try:
+            data_access.configure(mode='split', files={'system': path})
+            analysis_api.report_engine = ReportEngine(analysis_api.ANALYSIS_SOURCES, analysis_api.TREND_FIELDS)
+            yield path
+        finally:
+            analysis_api.report_engine = previous
+            data_access.configure()
+
+
+def test_data_version_tracks_range_changes():
+    """范围内的插入、修改、删除使版本增大，范围外的修改不影响"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'system.db')
+        create_system_database(path)
+        conn = sqlite3.connect(path)
+        metric_rollups.install(conn)
+        start, end = day(60), day(50)
+        versions = [metric_rollups.data_version(conn, 'medical_data', start, end)]
+
+        conn.execute("INSERT INTO medical_data (name, age, created_at) VALUES ('新', 30, ?)", (stamp(days=1),))
+        versions.append(metric_rollups.data_version(conn, 'medical_data', start, end))
+        conn.execute("UPDATE medical_data SET age = 99 WHERE created_at >= ? AND created_at < ?", (day(55), day(54)))
+        versions.append(metric_rollups.data_version(conn, 'medical_data', start, end))
+        conn.execute("UPDATE medical_data SET created_at = ? WHERE name = '新'", (stamp(days=52),))
+        versions.append(metric_rollups.data_version(conn, 'medical_data', start, end))
+        conn.execute("DELETE FROM medical_data WHERE name = '新'")
+        versions.append(metric_rollups.data_version(conn, 'medical_data', start, end))
+        conn.commit()
+        assert versions[0] > 0 and versions[1] == versions[0]
+        assert versions[0] < versions[2] < versions[3] < versions[4]
+
+        # 重建后版本同样变化
+        total = metric_rollups.data_version(conn, 'medical_data')
+        metric_rollups.rebuild(conn, 'medical_data')
+        assert metric_rollups.data_version(conn, 'medical_data') == total + 1
+        assert metric_rollups.data_version(conn, 'medical_data', start, end) > versions[4]
+        conn.close()
+
+
+def test_report_cached_by_data_version():
+    """报告与原始聚合一致；重复请求命中缓存；范围内数据变化后重新生成；过去的范围持久保存"""
+    with report_environment() as path:
+        client = app.app.test_client()
+        engine = analysis_api.report_engine
+        start, end = day(40), day(20)
+        body = {'report_type': 'detailed', 'data_type': 'medical', 'date_range': {'start': start, 'end': end}}
+
+        response = client.post('/api/analysis/report', json=body)
+        assert response.status_code == 200
+        report = response.get_json()['data']
+        raw = sqlite3.connect(path)
+        expected = raw.execute('SELECT COUNT(*), AVG(age), AVG(systolic_pressure) FROM medical_data '
+                               'WHERE DATE(created_at) BETWEEN ? AND ?', (start, end)).fetchone()
+        assert report['summary']['total_records'] == expected[0]
+        assert report['summary']['avg_age'] == round(expected[1], 2)
+        assert report['summary']['avg_systolic'] == round(expected[2], 2)
+        assert report['summary']['avg_heart_rate'] == 0
+        chart = report['charts'][0]
+        assert chart['dates'][0] == start and chart['dates'][-1] == end and sum(chart['count']) == expected[0]
+        assert report['recommendations']
+        assert engine.computed == 1
+
+        # 相同参数命中缓存
+        response = client.post('/api/analysis/report', json=body)
+        assert response.get_json()['data']['generated_at'] == report['generated_at']
+        assert engine.computed == 1 and engine.cache.stats()['hits'] == 1
+
+        # 范围外的新数据不影响缓存，范围内的新数据使报告重新生成
+        raw.execute("INSERT INTO medical_data (name, age, created_at) VALUES ('今天', 30, ?)", (stamp(),))
+        raw.commit()
+        client.post('/api/analysis/report', json=body)
+        assert engine.computed == 1
+        raw.execute("INSERT INTO medical_data (name, age, created_at) VALUES ('过去', 30, ?)", (stamp(days=30),))
+        raw.commit()
+        response = client.post('/api/analysis/report', json=body)
+        assert response.get_json()['data']['summary']['total_records'] == expected[0] + 1
+        assert engine.computed == 2
+
+        # 新的引擎实例（进程重启）直接读取已保存的报告
+        saved = raw.execute(f'SELECT start_date, end_date FROM {REPORT_TABLE}').fetchall()
+        assert saved == [(start, end)]
+        analysis_api.report_engine = ReportEngine(analysis_api.ANALYSIS_SOURCES, analysis_api.TREND_FIELDS)
+        response = client.post('/api/analysis/report', json=body)
+        assert response.get_json()['data']['summary']['total_records'] == expected[0] + 1
+        assert analysis_api.report_engine.computed == 0
+
+        # 结束日期为今天或不限的范围不保存
+        client.post('/api/analysis/report', json={'data_type': 'maternal', 'date_range': {'start': day(3)}})
+        client.post('/api/analysis/report', json={'data_type': 'maternal'})
+        assert raw.execute(f'SELECT COUNT(*) FROM {REPORT_TABLE}').fetchone()[0] == 1
+        raw.close()
+
+
+def test_report_parameter_validation():
+    """日期格式、日期顺序和报告类型不正确时返回 400，参数不会拼接到 SQL 中"""
+    with report_environment():
+        client = app.app.test_client()
+        for body in ({'date_range': {'start': "2024-01-01' OR '1'='1"}},
+                     {'date_range': {'start': '2024-03-01', 'end': '2024-02-01'}},
+                     {'report_type': 'unknown'}):
+            response = client.post('/api/analysis/report', json=body)
+            assert response.status_code == 400 and response.get_json()['code'] == 400
+
+
+def test_precompute_past_months():
+    """预先生成最近各完整自然月的报告，已是最新版本时不再生成，某月数据变化后只重新生成该月"""
+    with report_environment() as path:
+        conn = sqlite3.connect(path)
+        engine = ReportEngine(analysis_api.ANALYSIS_SOURCES, analysis_api.TREND_FIELDS)
+        months = 3
+        per_month = len(analysis_api.ANALYSIS_SOURCES) * len(report_engine.REPORT_TYPES)
+        assert engine.precompute(conn, months) == months * per_month
+        assert engine.precompute(conn, months) == 0
+
+        # 新实例从表中读取，不重新生成
+        assert ReportEngine(analysis_api.ANALYSIS_SOURCES, analysis_api.TREND_FIELDS).precompute(conn, months) == 0
+
+        first_of_month = datetime.utcnow().date().replace(day=1)
+        last_month = (first_of_month - timedelta(days=1)).strftime('%Y-%m-%d 12:00:00')
+        conn.execute("INSERT INTO maternal_info (name, age, created_at) VALUES ('上月', 30, ?)", (last_month,))
+        conn.commit()
+        assert engine.precompute(conn, months) == len(report_engine.REPORT_TYPES)
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_data_version_tracks_range_changes()
+    test_report_cached_by_data_version()
+    test_report_parameter_validation()
+    test_precompute_past_months()
+    logger.info("分析报告引擎测试全部通过")
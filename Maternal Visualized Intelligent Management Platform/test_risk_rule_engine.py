@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+风险规则引擎测试脚本
+验证规则表编译、字段别名解析、分组互斥、按列求值以及各调用方结果一致
+"""
+
+import logging
+
+import numpy as np
+
+from risk_rule_engine import RuleTable, get_rule_table
+from maternal_risk_predictor import MaternalRiskPredictor
+from maternal_api import calculate_risk_score
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_risk_rule_engine")
+
+SPEC = {
+    'fields': {
+        'glucose': {'sources': [{'path': 'blood_sugar', 'scale': 18.0}, 'glucose_level'], 'default': 90},
+        'systolic': {'sources': ['vitals.systolic'], 'default': None}
+    },
+    'rule_sets': {
+        'demo': {
+            'base': 0.1, 'min': 0.05, 'max': 0.95, 'round': 2,
+            'levels': [['高风险', '>=', 0.7], ['中风险', '>=', 0.4]],
+            'rules': [
+                {'when': [['glucose', '>', 100]], 'factor': '血糖偏高', 'importance': 0.8, 'weight': 0.3},
+                {'when': [['systolic', '>=', 140]], 'group': 'bp', 'factor': '高血压', 'weight': 0.4},
+                {'any': [['systolic', '>=', 130], ['glucose', '>', 150]], 'group': 'bp', 'factor': '血压偏高', 'weight': 0.1}
+            ]
+        }
+    }
+}
+
+
+def test_field_aliases_and_groups():
+    """字段按来源顺序解析，同组规则只命中第一条"""
+    rule_set = RuleTable(SPEC)['demo']
+    records = [
+        {'blood_sugar': 6.5, 'vitals': {'systolic': 150}},
+        {'glucose_level': 95, 'vitals': {'systolic': 135}},
+        {'blood_sugar': 'abc', 'glucose_level': 120},
+        {}
+    ]
+    evaluation = rule_set.evaluate(records)
+    assert evaluation.scores.tolist() == [0.8, 0.2, 0.4, 0.1]
+    assert [evaluation.level(i) for i in range(4)] == ['高风险', '低风险', '中风险', '低风险']
+    assert evaluation.factor_names(0) == ['血糖偏高', '高血压']
+    assert evaluation.factor_names(1) == ['血压偏高']
+    assert evaluation.factors(2) == [{'name': '血糖偏高', 'importance': 0.8}]
+    assert evaluation.factors(3) == []
+
+
+def test_evaluate_columns_matches_records():
+    """按列求值与按记录求值结果一致"""
+    rule_set = RuleTable(SPEC)['demo']
+    rng = np.random.RandomState(0)
+    sugar = rng.uniform(3, 10, 500)
+    systolic = rng.randint(100, 170, 500)
+    by_columns = rule_set.evaluate_columns({'blood_sugar': sugar, 'vitals.systolic': systolic})
+    by_records = rule_set.evaluate([{'blood_sugar': s, 'vitals': {'systolic': p}} for s, p in zip(sugar, systolic)])
+    assert np.array_equal(by_columns.scores, by_records.scores)
+    assert np.array_equal(by_columns.matches, by_records.matches)
+
+
+def test_invalid_rule_table_rejected():
+    """引用未定义字段或不支持的运算符时编译失败"""
+    for rule in ({'when': [['unknown', '>', 1]]}, {'when': [['glucose', '~', 1]]}):
+        spec = {'fields': SPEC['fields'], 'rule_sets': {'bad': {'rules': [rule]}}}
+        try:
+            RuleTable(spec)
+        except ValueError:
+            continue
+        raise AssertionError('非法规则应当编译失败')
+
+
+def test_predictor_paths_share_rules():
+    """规则回退预测与机器学习风险因素识别使用同一套规则和字段别名"""
+    predictor = MaternalRiskPredictor()
+    predictor.models = {}
+    patient = {'age': 36, 'bmi': 29, 'blood_sugar': 6.8, 'systolic_pressure': 150, 'diastolic_pressure': 95,
+               'gestational_weeks': 22}
+
+    result = predictor.predict_gestational_diabetes_risk(patient)
+    assert [f['name'] for f in result['top_risk_factors']] == ['体重指数过高', '血糖水平偏高', '高龄产妇']
+    assert result['risk_probability'] == 0.95 and result['risk_level'] == '高风险'
+    assert predictor._identify_risk_factors(patient, 'gestational_diabetes') == result['top_risk_factors']
+
+    for risk_type in ('preeclampsia', 'preterm_birth'):
+        result = predictor._predict_with_rules(risk_type, patient)
+        assert '血压偏高' in [f['name'] for f in result['top_risk_factors']]
+        assert predictor._identify_risk_factors(patient, risk_type) == result['top_risk_factors']
+
+
+def test_calculate_risk_score():
+    """孕产妇专项评分使用规则表中的 maternal_assessment 规则集"""
+    data = {
+        'age': 36, 'gestationalWeek': 20, 'height': 160, 'weight': 80,
+        'vitalSigns': {'systolic': 135, 'diastolic': 85},
+        'medicalHistory': {'pregnancyHistory': {'preeclampsia': 1}},
+        'lifestyle': {'stressLevel': 4}
+    }
+    result = calculate_risk_score(data)
+    assert result == {
+        'riskScore': 80,
+        'riskLevel': '高风险',
+        'riskFactors': ['高龄产妇', '肥胖', '血压偏高', '子痫前期史', '高压力水平']
+    }
+    assert calculate_risk_score({'age': 25, 'gestationalWeek': 20}) == {
+        'riskScore': 0, 'riskLevel': '低风险', 'riskFactors': []
+    }
+    assert 'maternal_assessment' in get_rule_table()
+
+
+if __name__ == "__main__":
+    test_field_aliases_and_groups()
+    test_evaluate_columns_matches_records()
+    test_invalid_rule_table_rejected()
+    test_predictor_paths_share_rules()
+    test_calculate_risk_score()
+    logger.info("风险规则引擎测试全部通过")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+风险评分预计算服务测试脚本
+验证首次全量评分、按 updated_at 和模型版本的增量重评分以及已删除记录的清理
+"""
+
+import io
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import contextlib
+import logging
+
+from maternal_risk_predictor import MaternalRiskPredictor
+import risk_rule_engine
+from risk_rule_engine import RuleTable, get_rule_table
+import risk_scoring_service
+from risk_scoring_service import (rescore_stale, load_risk_predictions, score_records, build_patient_data,
+                                  to_risk_prediction, RiskScoringService)
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_risk_scoring_service")
+
+
+def create_database(path, count=5):
+    """创建与 app.py 结构一致的 maternal_info 表并写入测试数据"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE maternal_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER,
+            gestational_weeks INTEGER,
+            pregnancy_count INTEGER,
+            parity INTEGER,
+            pregnancy_type TEXT,
+            weight REAL,
+            height REAL,
+            systolic_pressure INTEGER,
+            diastolic_pressure INTEGER,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO maternal_info (name, age, gestational_weeks, systolic_pressure, diastolic_pressure, notes, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(f'孕妇{i}', 24 + i * 4, 20 + i, 110 + i * 10, 70 + i * 5, '剖宫产史' if i % 2 else None,
+          '2024-01-01 00:00:00') for i in range(count)]
+    )
+    conn.commit()
+    return conn
+
+
+def make_predictor():
+    """创建仅使用规则引擎的预测器"""
+    predictor = MaternalRiskPredictor(models_dir=os.path.join(tempfile.gettempdir(), 'no-models-here'))
+    rules = predictor.rule_table.tag
+    assert predictor.model_version == f'gestational_diabetes:{rules};preeclampsia:{rules};preterm_birth:{rules}'
+    return predictor
+
+
+def test_initial_scoring_matches_predictor():
+    """首次运行为所有记录评分，结果与直接预测一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        predictor = make_predictor()
+        assert rescore_stale(conn, predictor, batch_size=2) == 5
+
+        stored = load_risk_predictions(conn)
+        assert sorted(stored) == [1, 2, 3, 4, 5]
+        conn.row_factory = sqlite3.Row
+        case = dict(conn.execute('SELECT * FROM maternal_info WHERE id = 4').fetchone())
+        expected = to_risk_prediction(predictor.predict_comprehensive_risk(build_patient_data(case)))
+        assert stored[4] == expected
+        conn.close()
+
+
+def test_only_changed_rows_are_rescored():
+    """只有 updated_at 变化的记录会被重新评分"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        predictor = make_predictor()
+        rescore_stale(conn, predictor)
+        assert rescore_stale(conn, predictor) == 0
+
+        conn.execute("UPDATE maternal_info SET systolic_pressure = 175, updated_at = '2024-02-01 08:00:00' WHERE id = 2")
+        conn.execute("INSERT INTO maternal_info (name, age) VALUES ('新孕妇', 30)")
+        conn.commit()
+        assert rescore_stale(conn, predictor) == 2
+        assert rescore_stale(conn, predictor) == 0
+        conn.close()
+
+
+def test_stale_model_version_triggers_rescore():
+    """模型版本变化后全部记录重新评分"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        predictor = make_predictor()
+        rescore_stale(conn, predictor)
+
+        predictor.model_version = 'preeclampsia:v2.0'
+        assert rescore_stale(conn, predictor) == 5
+        versions = {row[0] for row in conn.execute('SELECT model_version FROM maternal_risk_scores')}
+        assert versions == {f'preeclampsia:v2.0;inputs:{risk_scoring_service.PATIENT_DATA_VERSION}'}
+        conn.close()
+
+
+def test_scores_use_gestational_weeks_and_bmi():
+    """评分输入包含孕周和由体重、身高计算的 BMI；输入转换版本较旧的评分重新计算"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        conn.execute('UPDATE maternal_info SET weight = 80, height = 160 WHERE id = 5')
+        conn.commit()
+        predictor = make_predictor()
+        rescore_stale(conn, predictor)
+
+        stored = load_risk_predictions(conn)
+        # 孕周 20-23 周命中"孕周较小"规则，24 周不命中（最后一条只命中收缩压 150 的"血压偏高"）
+        assert [stored[i]['preterm_birth_risk'] for i in range(1, 6)] == [0.4] * 4 + [0.3]
+        assert '孕周较小' in stored[1]['risk_factors']
+        conn.row_factory = sqlite3.Row
+        case = dict(conn.execute('SELECT * FROM maternal_info WHERE id = 5').fetchone())
+        conn.row_factory = None
+        assert build_patient_data(case)['bmi'] == 31.2
+        assert stored[5]['gestational_diabetes_risk'] > stored[4]['gestational_diabetes_risk']
+
+        conn.execute("UPDATE maternal_risk_scores SET model_version = ?", (predictor.model_version,))
+        conn.commit()
+        assert rescore_stale(conn, predictor) == 5
+        conn.close()
+
+
+def test_rule_table_change_triggers_rescore():
+    """修改规则表（即使未更新 version）后模型版本变化，按规则评分的记录全部重新评分"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        predictor = make_predictor()
+        rescore_stale(conn, predictor)
+
+        with open(risk_rule_engine.RULES_PATH, 'r', encoding='utf-8') as f:
+            spec = json.load(f)
+        spec['rule_sets']['preeclampsia']['rules'][0]['weight'] = 0.5
+        predictor.rule_table = RuleTable(spec)
+        assert predictor.rule_table.version == get_rule_table().version
+        previous = predictor.model_version
+        predictor.model_version = predictor._resolve_model_version()
+        assert predictor.model_version != previous
+        assert rescore_stale(conn, predictor) == 5
+        assert rescore_stale(conn, predictor) == 0
+        conn.close()
+
+
+def test_deleted_rows_are_removed():
+    """源记录删除后对应评分被清理"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        predictor = make_predictor()
+        rescore_stale(conn, predictor)
+        conn.execute('DELETE FROM maternal_info WHERE id = 3')
+        conn.commit()
+        rescore_stale(conn, predictor)
+        assert 3 not in load_risk_predictions(conn)
+        conn.close()
+
+
+def test_service_start_and_stop():
+    """服务执行一轮评分，后台线程能正常启动和停止"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'test.db')
+        create_database(path).close()
+        service = RiskScoringService(db_path=path, interval=3600)
+        assert service.run_once() == 5
+        assert service.run_once() == 0
+
+        service.start()
+        service.trigger()
+        service.stop()
+        assert not service.scoring_thread.is_alive()
+
+
+def test_score_records_persists_and_load_filters():
+    """请求线程补评分的结果写入评分表，后台线程不再重复评分；按ID读取只返回这些记录"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_database(os.path.join(tmp, 'test.db'))
+        predictor = make_predictor()
+        assert load_risk_predictions(conn, [1]) == {}
+        scored = score_records(conn, [2, 4, 99], predictor)
+        assert sorted(scored) == [2, 4]
+        assert load_risk_predictions(conn, [2, 3]) == {2: scored[2]}
+        assert load_risk_predictions(conn, []) == {}
+        assert rescore_stale(conn, predictor) == 3
+        conn.close()
+
+
+def test_background_services_start_once():
+    """后台服务（风险评分、导入任务恢复、分析报告预生成、预测模型拟合）在第一个请求时启动一次，之后的请求不再启动"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    import analysis_api
+
+    class FakeService:
+        starts = 0
+        recovered = 0
+
+        def start(self):
+            self.starts += 1
+
+        def recover(self):
+            self.recovered += 1
+
+    fake = FakeService()
+    forecast = FakeService()
+    precomputed = []
+    previous = (risk_scoring_service.risk_scoring_service, app.import_job_queue, app._background_started,
+                app.app.config['BACKGROUND_SERVICES'], analysis_api.precompute_reports,
+                analysis_api.forecast_service)
+    try:
+        risk_scoring_service.risk_scoring_service = fake
+        analysis_api.precompute_reports = lambda: precomputed.append(threading.current_thread().name)
+        analysis_api.forecast_service = forecast
+        app.import_job_queue = fake
+        app._background_started = False
+        app.app.config['BACKGROUND_SERVICES'] = True
+        client = app.app.test_client()
+        client.get('/api/dashboard/overview')
+        client.get('/api/dashboard/overview')
+        assert fake.starts == 1 and fake.recovered == 1 and forecast.starts == 1
+        assert app.start_background_services() is False
+        deadline = time.time() + 5
+        while not precomputed and time.time() < deadline:
+            time.sleep(0.01)
+        assert precomputed == ['precompute-reports']
+    finally:
+        (risk_scoring_service.risk_scoring_service, app.import_job_queue, app._background_started,
+         app.app.config['BACKGROUND_SERVICES'], analysis_api.precompute_reports,
+         analysis_api.forecast_service) = previous
+
+
+if __name__ == "__main__":
+    test_initial_scoring_matches_predictor()
+    test_only_changed_rows_are_rescored()
+    test_stale_model_version_triggers_rescore()
+    test_scores_use_gestational_weeks_and_bmi()
+    test_rule_table_change_triggers_rescore()
+    test_deleted_rows_are_removed()
+    test_service_start_and_stop()
+    test_score_records_persists_and_load_filters()
+    test_background_services_start_once()
+    logger.info("风险评分服务测试全部通过")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+应用启动导入测试脚本
+验证导入 app 时不加载 pandas / sklearn / openai 等重量级依赖，且各蓝图路由均已注册
+"""
+
+import os
+import sys
+import json
+import subprocess
+import logging
+
+from benchmark_startup_import import HEAVY_MODULES
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_startup_imports")
+
+CHECK_SCRIPT = r'''
+import sys, io, json, contextlib
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+print(json.dumps({
+    'modules': sorted(name for name in sys.modules if '.' not in name),
+    'rules': sorted(rule.rule for rule in app.app.url_map.iter_rules())
+}))
+'''
+
+
+def import_app():
+    """在新进程中导入 app，返回已加载的顶层模块和路由列表"""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, '-c', CHECK_SCRIPT], cwd=project_dir,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_heavy_modules_not_loaded_at_startup():
+    """启动时不加载重量级依赖，路由仍全部注册"""
+    result = import_app()
+    loaded = [name for name in HEAVY_MODULES if name in result['modules']]
+    assert loaded == [], f"启动时加载了重量级依赖: {loaded}"
+
+    for rule in ('/api/analysis/trend', '/api/analysis/prediction', '/api/data/import',
+                 '/api/data/export', '/api/maternal_risk/predict/batch'):
+        assert rule in result['rules'], rule
+
+
+if __name__ == "__main__":
+    test_heavy_modules_not_loaded_at_startup()
+    logger.info("应用启动导入测试全部通过")
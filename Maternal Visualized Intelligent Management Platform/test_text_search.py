@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+关键字全文检索测试脚本
+验证 FTS5 trigram 条件与 LIKE 条件的匹配结果一致、触发器在增删改后保持索引同步，
+以及列表接口切换到共享检索条件后的结果
+"""
+
+import os
+import sqlite3
+import tempfile
+import logging
+
+from utils import text_search
+from utils.text_search import keyword_condition, ensure_search_index
+from benchmark_data_list import MEDICAL_SCHEMA
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("test_text_search")
+
+KEYWORDS = ('王秀英', '秀英', '王', '高血压', '妊娠期高血压', 'ABC', 'abc', '"引号"', '不存在的关键字')
+
+
+def create_medical(path):
+    conn = sqlite3.connect(path)
+    conn.execute(MEDICAL_SCHEMA)
+    conn.executemany('INSERT INTO medical_data (name, disease_type) VALUES (?, ?)', [
+        ('王秀英', '高血压'), ('李秀英', '妊娠期高血压'), ('张王秀英', None), ('王强', '糖尿病'),
+        ('Abc测试', '正常'), ('"引号"患者', '贫血')
+    ])
+    conn.commit()
+    return conn
+
+
+def matched(conn, condition, params):
+    return [row[0] for row in conn.execute(f'SELECT id FROM medical_data WHERE {condition} ORDER BY id', params)]
+
+
+def like_matched(conn, keyword, columns=('name', 'disease_type')):
+    condition = ' OR '.join(f'{column} LIKE ?' for column in columns)
+    return matched(conn, f'({condition})', [f'%{keyword}%'] * len(columns))
+
+
+def assert_same_as_like(conn):
+    for keyword in KEYWORDS:
+        condition, params = keyword_condition(conn, 'medical_data', keyword)
+        assert ('MATCH' in condition) == (len(keyword) >= text_search.MIN_INDEXED_LENGTH)
+        assert matched(conn, condition, params) == like_matched(conn, keyword), keyword
+        condition, params = keyword_condition(conn, 'medical_data', keyword, columns=('name',))
+        assert matched(conn, condition, params) == like_matched(conn, keyword, ('name',)), keyword
+
+
+def test_fts_matches_like_and_stays_in_sync():
+    """已有数据回填索引，插入、更新、删除后 FTS5 条件与 LIKE 条件结果一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = create_medical(os.path.join(tmp, 'data.db'))
+        assert ensure_search_index(conn, 'medical_data')
+        assert_same_as_like(conn)
+
+        conn.execute("INSERT INTO medical_data (name, disease_type) VALUES ('赵秀英', '妊娠期高血压')")
+        conn.execute("UPDATE medical_data SET disease_type = '高血压' WHERE name = '王强'")
+        conn.execute("UPDATE medical_data SET name = '王秀' WHERE name = '张王秀英'")
+        conn.execute("UPDATE medical_data SET created_at = '2024-01-01' WHERE name = '王秀英'")
+        conn.execute("DELETE FROM medical_data WHERE name = '李秀英'")
+        conn.commit()
+        assert_same_as_like(conn)
+        conn.execute("INSERT INTO medical_data_fts (medical_data_fts) VALUES ('integrity-check')")
+        conn.close()
+
+
+def test_fallback_to_like_without_index():
+    """缺少检索列时不建索引，退回 LIKE 条件"""
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'data.db'))
+        conn.execute('CREATE TABLE hospitals (id INTEGER PRIMARY KEY, name TEXT, address TEXT)')
+        conn.execute("INSERT INTO hospitals (name, address) VALUES ('市妇幼保健院', '人民路')")
+        assert not ensure_search_index(conn, 'hospitals')
+        condition, params = keyword_condition(conn, 'hospitals', '妇幼保健', columns=('name', 'address'))
+        assert 'LIKE' in condition
+        assert conn.execute(f'SELECT COUNT(*) FROM hospitals WHERE {condition}', params).fetchone()[0] == 1
+        conn.close()
+
+
+def test_data_list_keyword_uses_search_index():
+    """/api/data/list 的关键字筛选使用 FTS5 索引，结果与 LIKE 一致"""
+    import io
+    import contextlib
+    from utils import data_access
+    from benchmark_home_data import MATERNAL_SCHEMA
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.db')
+        conn = create_medical(path)
+        conn.execute(MATERNAL_SCHEMA)
+        conn.executemany('INSERT INTO maternal_info (name) VALUES (?)', [('王秀英',), ('孙秀英',), ('高血压史',)])
+        conn.commit()
+        conn.close()
+        try:
+            data_access.configure(mode='split', files={'data': path})
+            client = app.app.test_client()
+            for keyword in ('高血压', '秀英'):
+                body = client.get('/api/data/list', query_string={'keyword': keyword, 'size': 50}).get_json()
+                conn = sqlite3.connect(path)
+                expected = len(like_matched(conn, keyword)) + conn.execute(
+                    'SELECT COUNT(*) FROM maternal_info WHERE name LIKE ?', (f'%{keyword}%',)).fetchone()[0]
+                conn.close()
+                assert body['total'] == len(body['data']) == expected, keyword
+            conn = sqlite3.connect(path)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.close()
+            assert {'medical_data_fts', 'maternal_info_fts'} <= tables
+        finally:
+            data_access.configure()
+
+
+if __name__ == "__main__":
+    test_fts_matches_like_and_stays_in_sync()
+    test_fallback_to_like_without_index()
+    test_data_list_keyword_uses_search_index()
+    logger.info("关键字全文检索测试全部通过")
@@ -11,6 +11,7 @@ import pandas as pd
 import joblib
 from datetime import datetime
 from model_training import MaternalRiskModelTrainer
+from lightweight_models import export_model
 from data_preprocessing import MaternalDataPreprocessor
 
 def train_risk_models():
@@ -167,6 +168,17 @@ def train_risk_models():
         model_filename = os.path.join(models_dir, f'{risk["name"]}_model.joblib')
         joblib.dump(best_model, model_filename)
         
+        # 导出仅依赖 NumPy 的轻量级模型，预测服务优先加载该格式以加快冷启动
+        lightweight_filename = os.path.join(models_dir, f'{risk["name"]}_model.npz')
+        try:
+            export_model(best_model, lightweight_filename, X_check=X.values.astype(float))
+            print(f"轻量级模型: {lightweight_filename}")
+        except Exception as e:
+            print(f"导出轻量级模型失败，将使用 joblib 模型: {e}")
+            # 删除旧的轻量级模型，避免预测服务加载过期模型
+            if os.path.exists(lightweight_filename):
+                os.remove(lightweight_filename)
+        
         # 保存模型信息
         info_filename = os.path.join(models_dir, f'{risk["name"]}_model_info.json')
         with open(info_filename, 'w', encoding='utf-8') as f:
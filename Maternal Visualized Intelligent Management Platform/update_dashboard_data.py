@@ -1,10 +1,18 @@
+"""
+将触发器维护的仪表盘计数写入dashboard_medical / dashboard_overview表
+计数本身由dashboard_materializer在每次写入时实时更新，本脚本不再需要定时执行，仅用于兼容直接读取这两张表的场景
+"""
+
 import sqlite3
 import json
 import os
+
+from utils.data_access import database_path
+import dashboard_materializer
 from datetime import datetime, timedelta
 
-# 数据库路径
-DB_PATH = os.path.join(os.path.dirname(__file__), 'medical_data.db')
+# 数据库路径（由数据访问层按路由模式解析）
+DB_PATH = database_path('data')
 
 def get_db_connection():
     """获取数据库连接"""
@@ -18,58 +26,17 @@ def update_dashboard_medical():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 1. 从medical_data表获取统计数据
-        # 总记录数
-        cursor.execute("SELECT COUNT(*) as total FROM medical_data")
-        total = cursor.fetchone()['total']
-        
-        # 今日记录数（使用日期模糊匹配，因为可能没有DATE函数）
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) as today FROM medical_data WHERE created_at LIKE ?", (f"{today}%",))
-        today_count = cursor.fetchone()['today']
-        
-        # 2. 获取疾病分布数据
-        cursor.execute("""
-            SELECT disease_type, COUNT(*) as count 
-            FROM medical_data 
-            GROUP BY disease_type 
-            ORDER BY count DESC 
-            LIMIT 10
-        """)
-        disease_distribution = [{'name': row['disease_type'], 'value': row['count']} for row in cursor.fetchall()]
-        
-        # 3. 由于medical_data表没有department列，我们模拟科室分布数据
-        department_distribution = [
-            {'name': '妇产科', 'value': total // 4},
-            {'name': '内科', 'value': total // 5},
-            {'name': '外科', 'value': total // 6},
-            {'name': '儿科', 'value': total // 7},
-            {'name': '急诊科', 'value': total // 8}
-        ]
-        
-        # 4. 生成月度趋势数据（模拟过去6个月）
-        monthly_trend = []
-        for i in range(6):
-            month_date = datetime.now() - timedelta(days=i*30)
-            month_str = month_date.strftime('%Y-%m')
-            monthly_trend.append({'name': month_str, 'value': total // 6 + i*10})
-        monthly_trend.reverse()
-        
-        # 5. 生成科室详情数据
-        department_details = []
-        for dept in department_distribution:
-            department_details.append({
-                'name': dept['name'],
-                'todayPatients': today_count // len(department_distribution) + 1,
-                'weekPatients': dept['value'] // 4,
-                'monthPatients': dept['value'],
-                'doctorCount': 3 + (hash(dept['name']) % 5),
-                'bedCount': 10 + (hash(dept['name']) % 15),
-                'occupancyRate': 60 + (hash(dept['name']) % 30),
-                'avgWaitTime': str(15 + (hash(dept['name']) % 25)) + '分钟'
-            })
-        
-        # 6. 检查dashboard_medical表是否已有数据
+        # 1. 计数由触发器实时维护，这里只把当前计数写入dashboard_medical表（兼容读取该表的旧接口）
+        dashboard_materializer.install(conn)
+        snapshot = dashboard_materializer.build_medical_snapshot(conn)
+        total = snapshot['total']
+        today_count = snapshot['today']
+        disease_distribution = snapshot['disease_distribution']
+        department_distribution = snapshot['department_distribution']
+        monthly_trend = snapshot['monthly_trend']
+        department_details = snapshot['department_details']
+        
+        # 2. 检查dashboard_medical表是否已有数据
         cursor.execute("SELECT COUNT(*) FROM dashboard_medical")
         has_data = cursor.fetchone()[0] > 0
         
@@ -134,50 +101,17 @@ def update_dashboard_overview():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # 1. 获取基本统计数据
-        cursor.execute("SELECT COUNT(*) as total FROM medical_data")
-        total_patients = cursor.fetchone()['total']
-        
-        # 今日新增病例（使用日期模糊匹配）
-        today = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute("SELECT COUNT(*) as today FROM medical_data WHERE created_at LIKE ?", (f"{today}%",))
-        today_new_cases = cursor.fetchone()['today']
-        
-        # 由于没有patients表，我们从medical_data表中统计女性患者数作为孕产妇数
-        cursor.execute("SELECT COUNT(*) as total FROM medical_data WHERE gender = '女'")
-        total_maternal = cursor.fetchone()['total']
-        
-        # 2. 生成趋势数据
-        daily_cases = []
-        for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            day_name = ['周日', '周一', '周二', '周三', '周四', '周五', '周六'][i]
-            daily_cases.append({'name': day_name, 'value': today_new_cases + i*5})
-        daily_cases.reverse()
-        
-        trends = {'daily_cases': daily_cases}
-        
-        # 3. 生成统计数据（风险等级分布）
-        statistics = {
-            'risk_level_distribution': [
-                {'name': '低风险', 'value': total_patients // 3},
-                {'name': '中风险', 'value': total_patients // 3},
-                {'name': '高风险', 'value': total_patients // 3}
-            ]
-        }
-        
-        # 4. 生成最近预警数据
-        recent_alerts = []
-        for i in range(5):
-            recent_alerts.append({
-                'time': (datetime.now() - timedelta(hours=i)).strftime('%H:%M'),
-                'department': '妇产科',
-                'patientCount': 10 + i,
-                'avgWaitTime': f'{20 + i}分钟',
-                'status': '正常'
-            })
-        
-        # 5. 更新或插入数据
+        # 1. 计数由触发器实时维护
+        dashboard_materializer.install(conn)
+        snapshot = dashboard_materializer.build_overview_snapshot(conn)
+        total_patients = snapshot['total_patients']
+        today_new_cases = snapshot['today_new_cases']
+        total_maternal = snapshot['total_maternal']
+        trends = snapshot['trends']
+        statistics = snapshot['statistics']
+        recent_alerts = snapshot['recent_alerts']
+        
+        # 2. 更新或插入数据
         cursor.execute("SELECT COUNT(*) FROM dashboard_overview")
         has_data = cursor.fetchone()[0] > 0
         
@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime
 import sqlite3
+from utils.data_access import get_db, database_path
 import hashlib
 import uuid
 from functools import wraps
@@ -11,12 +12,11 @@ from werkzeug.security import generate_password_hash, check_password_hash
 user_bp = Blueprint('user', __name__)
 
 # 数据库配置
-DB_PATH = 'medical_data.db'
+DB_PATH = database_path('data')
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db('data')
     return conn
 
 def hash_password(password):
@@ -0,0 +1,152 @@
+"""
+数据访问层
+各模块按逻辑库名获取数据库连接，由这里决定实际使用的数据库文件：
+
+- system:    medical_system.db（app.py、utils、预警、监控、分析）
+- data:      medical_data.db（孕产妇、医院、用户、权限、日志、数据管理）
+- nutrition: maternal_health.db（营养建议）
+
+路由模式（环境变量 MEDICAL_DB_MODE）：
+- split:  每个逻辑库使用各自的文件（原有行为）
+- attach: 每个逻辑库仍以自己的文件为主库，其余文件按逻辑库名 ATTACH，可用 system.maternal_info 这样的限定名跨文件联表
+- single: 所有逻辑库路由到主库（migrate_databases.py 合并之后），可直接单条 SQL 联表
+- auto:   默认值；主库已记录合并了所有现存的其他库文件时使用 single，否则使用 split
+
+所有路径按项目目录解析，不再依赖当前工作目录；主库路径可用环境变量 MEDICAL_DB_PATH 覆盖。
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from utils.db_pool import get_connection, PooledConnection
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 主库（合并后的目标库）
+PRIMARY = 'system'
+
+# 逻辑库名 -> 默认文件名
+DEFAULT_FILES = {
+    'system': 'medical_system.db',
+    'data': 'medical_data.db',
+    'nutrition': 'maternal_health.db'
+}
+
+MODES = ('auto', 'split', 'attach', 'single')
+
+# 记录已合并的源库文件
+MIGRATIONS_TABLE = 'db_migrations'
+
+_lock = threading.Lock()
+_config = {}
+_resolved_mode: Optional[str] = None
+
+
+def _default_files() -> Dict[str, str]:
+    files = {name: os.path.join(PROJECT_DIR, filename) for name, filename in DEFAULT_FILES.items()}
+    if os.environ.get('MEDICAL_DB_PATH'):
+        files[PRIMARY] = os.path.abspath(os.environ['MEDICAL_DB_PATH'])
+    return files
+
+
+def configure(mode: str = None, files: Dict[str, str] = None):
+    """
+    修改路由配置（未指定的项使用环境变量或默认值）
+
+    Args:
+        mode: 路由模式，见 MODES
+        files: 逻辑库名到数据库文件的映射，只需给出需要覆盖的项
+    """
+    global _resolved_mode
+    mode = mode or os.environ.get('MEDICAL_DB_MODE', 'auto')
+    if mode not in MODES:
+        raise ValueError(f"不支持的数据库路由模式: {mode}")
+
+    resolved_files = _default_files()
+    for name, path in (files or {}).items():
+        if name not in resolved_files:
+            raise ValueError(f"未知的逻辑库: {name}")
+        resolved_files[name] = os.path.abspath(path)
+
+    with _lock:
+        _config['mode'] = mode
+        _config['files'] = resolved_files
+        _resolved_mode = None
+
+
+def refresh():
+    """清除缓存的路由模式（合并数据库后调用，配置保持不变）"""
+    global _resolved_mode
+    with _lock:
+        _resolved_mode = None
+
+
+def database_files() -> Dict[str, str]:
+    """各逻辑库对应的源数据库文件（不考虑路由模式）"""
+    if not _config:
+        configure()
+    return dict(_config['files'])
+
+
+def merged_sources(conn) -> set:
+    """主库中记录的已合并源库文件名"""
+    try:
+        rows = conn.execute(f'SELECT source FROM {MIGRATIONS_TABLE}').fetchall()
+    except sqlite3.OperationalError:
+        return set()
+    return {row[0] for row in rows}
+
+
+def _detect_mode() -> str:
+    """auto 模式：所有现存的其他库文件都已合并进主库时使用 single"""
+    files = database_files()
+    pending = [path for name, path in files.items() if name != PRIMARY and os.path.exists(path)]
+    if not pending:
+        return 'single'
+    if not os.path.exists(files[PRIMARY]):
+        return 'split'
+    conn = sqlite3.connect(files[PRIMARY])
+    try:
+        merged = merged_sources(conn)
+    finally:
+        conn.close()
+    return 'single' if all(os.path.basename(path) in merged for path in pending) else 'split'
+
+
+def routing_mode() -> str:
+    """当前生效的路由模式（auto 模式的检测结果在进程内缓存，合并后调用 refresh() 刷新）"""
+    global _resolved_mode
+    if not _config:
+        configure()
+    if _resolved_mode is None:
+        mode = _config['mode']
+        resolved = _detect_mode() if mode == 'auto' else mode
+        with _lock:
+            _resolved_mode = resolved
+    return _resolved_mode
+
+
+def database_path(name: str = PRIMARY) -> str:
+    """逻辑库在当前路由模式下实际使用的数据库文件"""
+    files = database_files()
+    if name not in files:
+        raise ValueError(f"未知的逻辑库: {name}")
+    if routing_mode() == 'single':
+        return files[PRIMARY]
+    return files[name]
+
+
+def get_db(name: str = PRIMARY) -> PooledConnection:
+    """
+    获取逻辑库的连接（来自连接池，row_factory 为 sqlite3.Row，使用完毕调用 close() 归还）
+
+    attach 模式下其他逻辑库以库名附加，可通过 "库名.表名" 访问
+    """
+    path = database_path(name)
+    if routing_mode() == 'attach':
+        attach = {other: other_path for other, other_path in database_files().items()
+                  if other != name and os.path.abspath(other_path) != os.path.abspath(path)}
+        return get_connection(path, attach=attach)
+    return get_connection(path)
@@ -0,0 +1,297 @@
+"""
+SQLite 连接管理器
+按数据库文件维护连接池：同一线程在一次使用期间独占一个连接，释放后归还空闲队列供其他线程复用。
+新连接统一设置 WAL 模式及 synchronous / cache_size / mmap_size 等参数，
+请求结束时自动回收未关闭的连接，并提供连接池统计信息。
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Dict, Any, List
+
+# 新连接的 PRAGMA 设置
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'WAL'),       # 读写并发，读不阻塞写
+    ('synchronous', 'NORMAL'),     # WAL 模式下安全且减少 fsync
+    ('cache_size', -20000),        # 页缓存约 20MB（负数单位为 KB）
+    ('mmap_size', 268435456),      # 256MB 内存映射读取
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000)         # 写锁冲突时最多等待 5 秒
+)
+
+# 每个数据库保留的最大空闲连接数
+DEFAULT_MAX_IDLE = 8
+
+
+class PooledCursor(sqlite3.Cursor):
+    """持有连接包装对象引用的游标，游标存活期间连接不会被自动归还"""
+
+    pooled_connection = None
+
+
+class PooledConnection:
+    """
+    连接池中连接的包装对象
+
+    用法与 sqlite3.Connection 一致；close() 将连接归还连接池而不是真正关闭，
+    未提交的事务在归还时回滚。包装对象被回收时若仍未关闭，会自动归还连接。
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection, owner: int, checkout: int):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_release', weakref.finalize(self, pool._release, owner, checkout))
+
+    @property
+    def closed(self) -> bool:
+        return not self._release.alive
+
+    @property
+    def raw_connection(self) -> sqlite3.Connection:
+        """底层 sqlite3.Connection（供 pandas.read_sql_query 等要求原生连接的接口使用，仅在归还前有效）"""
+        if self.closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return self._conn
+
+    def close(self):
+        """归还连接（可重复调用）"""
+        self._release()
+
+    def cursor(self, factory=PooledCursor):
+        if self.closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        cursor = self._conn.cursor(factory)
+        if isinstance(cursor, PooledCursor):
+            cursor.pooled_connection = self
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def __getattr__(self, name):
+        if self.closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 与 sqlite3.Connection 一致：正常退出提交，异常退出回滚，不关闭连接
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+
+class ConnectionPool:
+    """单个数据库文件的连接池"""
+
+    def __init__(self, db_path: str, max_idle: int = DEFAULT_MAX_IDLE, pragmas=DEFAULT_PRAGMAS,
+                 timeout: float = 30.0, attach: Dict[str, str] = None):
+        self.db_path = db_path
+        # 附加数据库 {模式名: 文件路径}，新连接创建时 ATTACH
+        self.attach = dict(attach or {})
+        self.max_idle = max_idle
+        self.pragmas = tuple(pragmas)
+        self.timeout = timeout
+
+        # 可重入锁：连接包装对象的回收回调可能在持锁期间由垃圾回收触发
+        self._lock = threading.RLock()
+        self._idle: List[sqlite3.Connection] = []
+        # 线程ID -> [连接, 嵌套获取次数, 取出序号]
+        self._owners: Dict[int, list] = {}
+        self._checkouts = 0
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'nested': 0,
+            'closed': 0,
+            'reclaimed': 0,
+            'rolled_back': 0,
+            'max_in_use': 0
+        }
+
+    def _create(self) -> sqlite3.Connection:
+        """创建新连接并应用 PRAGMA 设置"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            try:
+                conn.execute(f'PRAGMA {name} = {value}')
+            except sqlite3.Error as e:
+                # 只读文件系统等情况下部分设置不可用，不影响正常使用
+                print(f"设置 PRAGMA {name} 失败: {e}")
+        for schema, path in self.attach.items():
+            conn.execute(f'ATTACH DATABASE ? AS "{schema}"', (path,))
+            try:
+                conn.execute(f'PRAGMA "{schema}".journal_mode = WAL')
+            except sqlite3.Error as e:
+                print(f"设置 {schema} 的 WAL 模式失败: {e}")
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """获取连接：当前线程已持有连接时复用同一连接，否则从空闲队列取出或新建"""
+        owner = threading.get_ident()
+        with self._lock:
+            entry = self._owners.get(owner)
+            if entry is not None:
+                entry[1] += 1
+                self._stats['nested'] += 1
+                return PooledConnection(self, entry[0], owner, entry[2])
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self._stats['reused'] += 1
+
+        if conn is None:
+            conn = self._create()
+            with self._lock:
+                self._stats['created'] += 1
+
+        with self._lock:
+            self._checkouts += 1
+            checkout = self._checkouts
+            self._owners[owner] = [conn, 1, checkout]
+            self._stats['max_in_use'] = max(self._stats['max_in_use'], len(self._owners))
+        return PooledConnection(self, conn, owner, checkout)
+
+    def _release(self, owner: int, checkout: int, force: bool = False) -> bool:
+        """
+        释放一次获取；嵌套获取全部释放（或强制回收）后归还连接
+        
+        取出序号用于忽略已被强制回收的旧包装对象，避免误释放同一线程之后取出的连接
+        """
+        with self._lock:
+            entry = self._owners.get(owner)
+            if entry is None or entry[2] != checkout:
+                return False
+            entry[1] -= 1
+            if entry[1] > 0 and not force:
+                return False
+            del self._owners[owner]
+
+        self._return(entry[0])
+        return True
+
+    def _return(self, conn: sqlite3.Connection):
+        """回滚未提交的事务并放回空闲队列，超出上限时关闭"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+                with self._lock:
+                    self._stats['rolled_back'] += 1
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._stats['closed'] += 1
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._stats['closed'] += 1
+        conn.close()
+
+    def release_thread(self, owner: int = None) -> bool:
+        """强制回收指定线程（默认当前线程）仍持有的连接，返回是否有连接被回收"""
+        owner = threading.get_ident() if owner is None else owner
+        with self._lock:
+            entry = self._owners.get(owner)
+        if entry is None:
+            return False
+        if self._release(owner, entry[2], force=True):
+            with self._lock:
+                self._stats['reclaimed'] += 1
+            return True
+        return False
+
+    def close_idle(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._stats['closed'] += len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'db_path': self.db_path,
+                'attached': sorted(self.attach),
+                'in_use': len(self._owners),
+                'idle': len(self._idle),
+                'max_idle': self.max_idle
+            })
+        checkouts = stats['created'] + stats['reused']
+        stats['reuse_rate'] = round(stats['reused'] / checkouts, 4) if checkouts else 0.0
+        return stats
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, attach: Dict[str, str] = None) -> ConnectionPool:
+    """
+    获取数据库文件对应的连接池（相对路径按当前工作目录解析，与 sqlite3.connect 一致）
+    
+    Args:
+        db_path: 主数据库文件
+        attach: 需要附加的数据库 {模式名: 文件路径}，不同的附加组合使用不同的连接池
+    """
+    db_path = os.path.abspath(db_path)
+    attach = {schema: os.path.abspath(path) for schema, path in (attach or {}).items()}
+    key = db_path
+    if attach:
+        key += ' +' + ','.join(f'{schema}={path}' for schema, path in sorted(attach.items()))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(db_path, attach=attach)
+    return pool
+
+
+def get_connection(db_path: str, attach: Dict[str, str] = None) -> PooledConnection:
+    """从连接池获取连接，row_factory 默认为 sqlite3.Row，使用完毕调用 close() 归还"""
+    return get_pool(db_path, attach).acquire()
+
+
+def release_thread_connections() -> int:
+    """回收当前线程在所有连接池中未关闭的连接，返回回收数量"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return sum(pool.release_thread() for pool in pools)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """所有连接池的统计信息，按连接池标识（数据库文件及附加库）索引"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {key: pool.stats() for key, pool in pools.items()}
+
+
+def close_all():
+    """关闭所有空闲连接（进程退出或测试清理时使用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
+
+
+def init_app(app):
+    """注册请求结束时的连接回收：请求中未关闭的连接（如异常路径）归还连接池"""
+    @app.teardown_appcontext
+    def release_db_connections(exception=None):
+        release_thread_connections()
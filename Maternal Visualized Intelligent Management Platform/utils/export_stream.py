@@ -0,0 +1,332 @@
+"""
+流式导出
+查询在独立的只读连接上执行，按 fetchmany 分块读取游标，内存占用与表大小无关：
+
+- CSV:  生成器逐块写出，响应头发出后即开始传输（带 UTF-8 BOM，Excel 可直接打开中文内容）
+- XLSX: openpyxl write_only 工作簿逐行写入临时文件，生成后分块发送，响应结束时删除
+- Parquet / Arrow IPC: 游标分块转换为列式 RecordBatch，攒够一个行组后直接写入响应（需要 pyarrow）。
+  列类型在开始写出前按整个结果中每列实际存放的值类型（typeof）确定，不会截断或丢弃任何值
+
+不使用连接池中的连接：请求结束时 teardown 会回收当前线程的连接，而响应体在此之后才被读取。
+"""
+
+import io
+import os
+import csv
+import sqlite3
+import logging
+import tempfile
+from typing import Iterator, List, Optional
+
+from flask import Response
+
+from utils.data_access import database_path
+
+logger = logging.getLogger(__name__)
+
+# 每次从游标读取的行数
+FETCH_ROWS = 2000
+
+# 发送 XLSX 文件时每块的字节数
+FILE_BLOCK_SIZE = 1 << 16
+
+CSV_MIMETYPE = 'text/csv; charset=utf-8'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+PARQUET_MIMETYPE = 'application/vnd.apache.parquet'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.file'
+
+# Parquet / Arrow 每个行组（记录批）的行数
+ROW_GROUP_ROWS = 65536
+
+
+class RowStream:
+    """分块读取的查询结果，迭代结束或调用 close() 后关闭连接"""
+
+    def __init__(self, connection: sqlite3.Connection, cursor: sqlite3.Cursor, first: List[tuple],
+                 fetch_rows: int, query: str, params=()):
+        self.connection = connection
+        self.cursor = cursor
+        self.query = query
+        self.params = params
+        self.columns = [description[0] for description in cursor.description]
+        self._first = first
+        self.fetch_rows = fetch_rows
+
+    def chunks(self) -> Iterator[List[tuple]]:
+        try:
+            batch, self._first = self._first, None
+            while batch:
+                yield batch
+                batch = self.cursor.fetchmany(self.fetch_rows)
+        finally:
+            self.close()
+
+    def __iter__(self):
+        for batch in self.chunks():
+            yield from batch
+
+    def close(self):
+        self.connection.close()
+
+
+def query_rows(database: str, query: str, params=(), fetch_rows: int = FETCH_ROWS) -> Optional[RowStream]:
+    """
+    在逻辑库的只读连接上执行查询
+
+    查询在一个读事务中执行，之后在同一连接上的统计查询（column_types）与读取的数据是同一快照。
+
+    Returns:
+        RowStream: 查询结果；没有数据时返回 None（连接已关闭）
+    """
+    path = database_path(database)
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    try:
+        connection.execute('BEGIN')
+        cursor = connection.execute(query, params)
+        first = cursor.fetchmany(fetch_rows)
+    except Exception:
+        connection.close()
+        raise
+    if not first:
+        connection.close()
+        return None
+    return RowStream(connection, cursor, first, fetch_rows, query, params)
+
+
+def _attachment(body, filename: str, mimetype: str, on_close) -> Response:
+    response = Response(body, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # 客户端中途断开或响应体未被读取时同样释放连接和临时文件
+    response.call_on_close(on_close)
+    return response
+
+
+def csv_response(rows: RowStream, filename: str) -> Response:
+    """以 CSV 流式返回查询结果"""
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(rows.columns)
+        for batch in rows.chunks():
+            writer.writerows(batch)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    return _attachment(generate(), filename, CSV_MIMETYPE, rows.close)
+
+
+def xlsx_response(rows: RowStream, filename: str) -> Response:
+    """以 XLSX 返回查询结果（write_only 工作簿写入临时文件后分块发送）"""
+    from openpyxl import Workbook
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
+    temp_file.close()
+
+    def cleanup():
+        rows.close()
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+
+    def generate():
+        try:
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet()
+            sheet.append(rows.columns)
+            for row in rows:
+                sheet.append(row)
+            workbook.save(temp_file.name)
+            with open(temp_file.name, 'rb') as handle:
+                for block in iter(lambda: handle.read(FILE_BLOCK_SIZE), b''):
+                    yield block
+        finally:
+            cleanup()
+
+    return _attachment(generate(), filename, XLSX_MIMETYPE, cleanup)
+
+
+class _ChunkSink:
+    """只追加写入的输出流，已写入的字节由生成器取走后发送"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+# 超过该绝对值的整数转换为 double 会丢失精度
+MAX_EXACT_INTEGER = 2 ** 53
+
+
+def column_types(rows: RowStream) -> list:
+    """
+    按整个查询结果中每列实际存放的值类型确定 Arrow 列类型
+
+    SQLite 的列可以存放与声明类型不符的值，只看第一块数据确定的类型可能容不下后面的值，
+    因此先在同一读事务中统计每列出现过的 typeof：
+    只有整数为 int64；只有浮点数，或整数与浮点数混合（整数都能被 double 精确表示）为 double；
+    含有文本、超出 double 精确范围的整数与浮点数混合，或全为空时为 string；只有二进制时为 binary。
+
+    Raises:
+        ValueError: 某列同时包含二进制与其他类型的值，无法无损地放入一种列类型
+    """
+    import pyarrow as pa
+
+    names = [f'c{index}' for index in range(len(rows.columns))]
+    flags = []
+    for name in names:
+        flags.extend([
+            f"MAX(typeof({name}) = 'integer')",
+            f"MAX(typeof({name}) = 'real')",
+            f"MAX(typeof({name}) = 'text')",
+            f"MAX(typeof({name}) = 'blob')",
+            f"MAX(typeof({name}) = 'integer' AND ({name} > {MAX_EXACT_INTEGER} OR {name} < -{MAX_EXACT_INTEGER}))"
+        ])
+    result = rows.connection.execute(
+        f"WITH q({', '.join(names)}) AS ({rows.query}) SELECT {', '.join(flags)} FROM q", rows.params).fetchone()
+
+    types = []
+    for index, column in enumerate(rows.columns):
+        integer, real, text, blob, large = (bool(flag) for flag in result[index * 5:index * 5 + 5])
+        if blob:
+            if integer or real or text:
+                raise ValueError(f'列 {column} 同时包含二进制和其他类型的值，无法导出为列式格式')
+            types.append(pa.binary())
+        elif text or (integer and real and large) or not (integer or real):
+            types.append(pa.string())
+        elif real:
+            types.append(pa.float64())
+        else:
+            types.append(pa.int64())
+    return types
+
+
+def _column_array(values, data_type):
+    """
+    一列值转换为给定类型的 Arrow 数组
+
+    字符串列中的数值按 str() 转换为文本（浮点数的 str() 可以无损还原）；
+    其他情况下值不符合类型时直接抛出异常使导出失败，不写为空值。
+    """
+    import pyarrow as pa
+
+    if pa.types.is_string(data_type):
+        values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+    return pa.array(values, type=data_type)
+
+
+def iter_record_batches(rows: RowStream, schema=None):
+    """每次读取的一块数据转换为一个 RecordBatch（未给出 schema 时由 column_types 确定）"""
+    import pyarrow as pa
+
+    if schema is None:
+        schema = pa.schema([pa.field(name, data_type)
+                            for name, data_type in zip(rows.columns, column_types(rows))])
+    for batch in rows.chunks():
+        columns = [list(values) for values in zip(*batch)]
+        arrays = [_column_array(values, field.type) for values, field in zip(columns, schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _columnar_response(rows: RowStream, filename: str, mimetype: str, open_writer) -> Response:
+    import pyarrow as pa
+
+    # 列类型在发出响应头之前确定，无法确定时由调用方返回错误，而不是写出不完整的文件
+    try:
+        schema = pa.schema([pa.field(name, data_type)
+                            for name, data_type in zip(rows.columns, column_types(rows))])
+    except Exception:
+        rows.close()
+        raise
+
+    def write_group(writer, batches):
+        table = pa.Table.from_batches(batches).combine_chunks()
+        # 第二个参数为 Parquet 行组 / Arrow 记录批的最大行数，整张表写为一组
+        writer.write_table(table, table.num_rows)
+
+    def generate():
+        sink = _ChunkSink()
+        pending, pending_rows = [], 0
+        try:
+            writer = open_writer(pa.PythonFile(sink, mode='w'), schema)
+            # 已转换为列式的小批次攒够 ROW_GROUP_ROWS 行后作为一个行组写出，内存中不保留 Python 行对象
+            for record_batch in iter_record_batches(rows, schema):
+                pending.append(record_batch)
+                pending_rows += record_batch.num_rows
+                if pending_rows >= ROW_GROUP_ROWS:
+                    write_group(writer, pending)
+                    pending, pending_rows = [], 0
+                    yield sink.take()
+            if pending:
+                write_group(writer, pending)
+            writer.close()
+            yield sink.take()
+        finally:
+            rows.close()
+
+    return _attachment(generate(), filename, mimetype, rows.close)
+
+
+def parquet_response(rows: RowStream, filename: str) -> Response:
+    """以 Parquet 流式返回查询结果（zstd 压缩，每 ROW_GROUP_ROWS 行一个行组）"""
+    import pyarrow.parquet as pq
+
+    return _columnar_response(rows, filename, PARQUET_MIMETYPE,
+                              lambda sink, schema: pq.ParquetWriter(sink, schema, compression='zstd'))
+
+
+def arrow_response(rows: RowStream, filename: str) -> Response:
+    """以 Arrow IPC 文件格式（Feather v2）流式返回查询结果"""
+    import pyarrow as pa
+
+    return _columnar_response(rows, filename, ARROW_MIMETYPE,
+                              lambda sink, schema: pa.ipc.new_file(
+                                  sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd')))
+
+
+# 导出格式 -> (响应构造函数, 扩展名)
+FORMATS = {
+    'csv': (csv_response, 'csv'),
+    'excel': (xlsx_response, 'xlsx'),
+    'xlsx': (xlsx_response, 'xlsx'),
+    'parquet': (parquet_response, 'parquet'),
+    'arrow': (arrow_response, 'arrow')
+}
+
+# 需要 pyarrow 的格式
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+
+def columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_response(rows: RowStream, format_type: str, basename: str) -> Response:
+    """按导出格式返回响应，文件名为 basename 加对应扩展名"""
+    build, extension = FORMATS[format_type]
+    return build(rows, f'{basename}.{extension}')
@@ -1,163 +1,242 @@
+from flask import g, has_app_context
+
 from utils.getPublicData import getAllCasesData
+from utils.query import querys
 
+# 年龄分组（上限不含），与原逐条统计的分组一致
+AGE_BUCKETS = [
+    ('0-10岁', 10),
+    ('10-20岁', 20),
+    ('20-30岁', 30),
+    ('30-40岁', 40),
+    ('40-50岁', 50),
+    ('50-60岁', 60),
+    ('60岁以上', None)
+]
 
-def getPieData():
-    casesList = getAllCasesData()
-    ageDic = {'0-10岁':0,'10-20岁':0,'10-20岁':0,'20-30岁':0,'30-40岁':0,'40-50岁':0,'50-60岁':0,'60岁以上':0}
+# 孕产妇数据中固定的科室、医院和性别（与 getAllCasesData 的字段补全一致）
+MATERNAL_DEPARTMENT = '产科'
+MATERNAL_HOSPITAL = '妇产科医院'
+MATERNAL_GENDER = '女'
+
+
+def _ageBucket(age):
+    for name, upper in AGE_BUCKETS:
+        if upper is None or age < upper:
+            return name
+
+
+def _emptyAggregates():
+    """
+    汇总结构：各分布为按首次出现顺序排列的 [(名称, 数量)] 列表
+    """
+    return {
+        'total': 0,
+        'ageBuckets': {name: 0 for name, _ in AGE_BUCKETS},
+        'maxAge': 0,
+        'minAge': 100,
+        'disease': [],
+        'department': [],
+        'hospital': [],
+        'genderCount': {'男': 0, '女': 0},
+        'genderDisease': {'男': [], '女': []}
+    }
+
+
+def _aggregateMaternalInfo():
+    """
+    孕产妇表的 GROUP BY 下推：一次扫描得到妊娠状态分布、年龄分组和年龄极值
+    返回 None 表示没有孕产妇数据，需要回退到其他数据源
+    """
+    check_maternal = querys("SELECT name FROM sqlite_master WHERE type='table' AND name='maternal_info'")
+    if not check_maternal:
+        return None
+    age_sums = ', '.join(
+        f"SUM(age_value < {upper})" if upper is not None else f"SUM(age_value >= {AGE_BUCKETS[-2][1]})"
+        for _, upper in AGE_BUCKETS
+    )
+    # MIN(rowid) 保留全表扫描时的首次出现顺序
+    rows = querys(f"""
+        SELECT status, COUNT(*), MIN(rowid) AS first_row, MAX(age_value), MIN(age_value), {age_sums}
+        FROM (
+            SELECT rowid,
+                   CASE WHEN instr(notes, '异常') > 0 THEN '异常妊娠' ELSE '正常妊娠' END AS status,
+                   CAST(COALESCE(age, 0) AS INTEGER) AS age_value
+            FROM maternal_info
+        )
+        GROUP BY status
+        ORDER BY first_row
+    """)
+    if not rows:
+        return None
+
+    result = _emptyAggregates()
+    for row in rows:
+        status, count = row[0], row[1]
+        result['total'] += count
+        result['maxAge'] = max(result['maxAge'], row[3])
+        result['minAge'] = min(result['minAge'], row[4])
+        # 各分组的 SUM 是累计的“小于上限”计数，相减得到区间计数
+        below = 0
+        for (name, upper), value in zip(AGE_BUCKETS, row[5:]):
+            if upper is None:
+                result['ageBuckets'][name] += value
+            else:
+                result['ageBuckets'][name] += value - below
+                below = value
+        result['disease'].append((status, count))
+    result['department'] = [(MATERNAL_DEPARTMENT, result['total'])]
+    result['hospital'] = [(MATERNAL_HOSPITAL, result['total'])]
+    result['genderCount'][MATERNAL_GENDER] = result['total']
+    result['genderDisease'][MATERNAL_GENDER] = list(result['disease'])
+    return result
+
+
+def _aggregateSnapshot():
+    """
+    列式快照上的向量化统计（与 _aggregateMaternalInfo 结果一致）
+    返回 None 表示快照未开启或没有孕产妇数据
+    """
+    from utils.maternal_snapshot import get_maternal_snapshot
+    import numpy as np
+
+    data = get_maternal_snapshot()
+    if data is None or not len(data):
+        return None
+
+    result = _emptyAggregates()
+    total = len(data)
+    # 与 CAST(COALESCE(age, 0) AS INTEGER) 一致：空值为 0，向零取整
+    ages = np.trunc(np.nan_to_num(data.numeric['age'], nan=0.0))
+    counts = data.histogram('age', [upper for _, upper in AGE_BUCKETS[:-1]], fill=0)
+    result['ageBuckets'] = {name: int(count) for (name, _), count in zip(AGE_BUCKETS, counts)}
+    result['total'] = total
+    result['maxAge'] = max(0, int(ages.max()))
+    result['minAge'] = min(100, int(ages.min()))
+    result['disease'] = data.value_counts('status')
+    result['department'] = [(MATERNAL_DEPARTMENT, total)]
+    result['hospital'] = [(MATERNAL_HOSPITAL, total)]
+    result['genderCount'][MATERNAL_GENDER] = total
+    result['genderDisease'][MATERNAL_GENDER] = list(result['disease'])
+    return result
+
+
+def _aggregateCases(casesList):
+    """普通病例 / 医疗数据：对 getAllCasesData 的结果单次遍历统计所有分布"""
+    result = _emptyAggregates()
+    disease, department, hospital = {}, {}, {}
+    genderDisease = {'男': {}, '女': {}}
     for caseItem in casesList:
-        if int(caseItem['age']) < 10:
-            ageDic['0-10岁'] += 1
-        elif int(caseItem['age']) < 20:
-            ageDic['10-20岁'] += 1
-        elif int(caseItem['age']) < 30:
-            ageDic['20-30岁'] += 1
-        elif int(caseItem['age']) < 40:
-            ageDic['30-40岁'] += 1
-        elif int(caseItem['age']) < 50:
-            ageDic['40-50岁'] += 1
-        elif int(caseItem['age']) < 60:
-            ageDic['50-60岁'] += 1
-        else:
-            ageDic['60岁以上'] += 1
-    # print(ageDic)
+        # 兼容孕产妇数据和普通病例数据
+        disease_field = caseItem.get('disease') or caseItem.get('pregnancy_status', '未知')
+        department_field = caseItem.get('department', '未知')
+        hospital_field = caseItem.get('hospital', '未知')
+        gender_field = caseItem.get('gender', '女')  # 孕产妇默认为女性
+        age_field = int(caseItem.get('age') or 0)
+
+        result['total'] += 1
+        disease[disease_field] = disease.get(disease_field, 0) + 1
+        department[department_field] = department.get(department_field, 0) + 1
+        hospital[hospital_field] = hospital.get(hospital_field, 0) + 1
+        if gender_field in genderDisease:
+            result['genderCount'][gender_field] += 1
+            counts = genderDisease[gender_field]
+            counts[disease_field] = counts.get(disease_field, 0) + 1
+        result['ageBuckets'][_ageBucket(age_field)] += 1
+        result['maxAge'] = max(result['maxAge'], age_field)
+        result['minAge'] = min(result['minAge'], age_field)
+
+    result['disease'] = list(disease.items())
+    result['department'] = list(department.items())
+    result['hospital'] = list(hospital.items())
+    result['genderDisease'] = {gender: list(counts.items()) for gender, counts in genderDisease.items()}
+    return result
+
+
+def computeCaseAggregates():
+    """计算首页所有分布（孕产妇表优先使用列式快照，其次 SQL 聚合，其他数据源单次遍历）"""
+    result = _aggregateSnapshot()
+    if result is None:
+        result = _aggregateMaternalInfo()
+    if result is None:
+        result = _aggregateCases(getAllCasesData())
+    return result
+
+
+def getCaseAggregates():
+    """
+    获取首页分布汇总
+    在请求上下文中结果缓存在 flask.g 上，同一请求内的各 get*Data 函数共享一次扫描
+    """
+    if not has_app_context():
+        return computeCaseAggregates()
+    if '_case_aggregates' not in g:
+        g._case_aggregates = computeCaseAggregates()
+    return g._case_aggregates
+
+
+def _sortedByCount(items):
+    # sorted 是稳定排序，数量相同的按首次出现顺序排列
+    return sorted(items, key=lambda data: data[1], reverse=True)
+
+
+def getPieData():
+    aggregates = getCaseAggregates()
     listResult = []
-    for k,v in ageDic.items():
+    for k, v in aggregates['ageBuckets'].items():
         listResult.append({
-            'name':k,
-            'value':v
+            'name': k,
+            'value': v
         })
-    print(listResult)
     return listResult
 
 def getConfigOne():
-    casesList = getAllCasesData()
-    caseDic = {}
-    for caseItem in casesList:
-        # 兼容孕产妇数据和普通病例数据
-        disease_field = caseItem.get('disease') or caseItem.get('pregnancy_status', '未知')
-        if caseDic.get(disease_field, -1) == -1:
-            caseDic[disease_field] = 1
-        else:
-            caseDic[disease_field] += 1
+    aggregates = getCaseAggregates()
     listResult = []
-    for k, v in caseDic.items():
+    for k, v in aggregates['disease']:
         listResult.append({
             'name': k,
             'value': v
         })
-    print(1, listResult)
     return listResult[:6], listResult
 
 def getFoundData():
-    casesList = getAllCasesData()
-    maxNum = len(list(casesList))
-    typeDic = {}
-    depDic = {}
-    hosDic = {}
-    maxAge = 0
-    minAge = 100
-    for caseItem in casesList:
-        # 兼容孕产妇数据和普通病例数据
-        disease_field = caseItem.get('disease') or caseItem.get('pregnancy_status', '未知')
-        department_field = caseItem.get('department', '未知')
-        hospital_field = caseItem.get('hospital', '未知')
-        age_field = int(caseItem.get('age', 0))
-        
-        #类型
-        if typeDic.get(disease_field, -1) == -1:
-            typeDic[disease_field] = 1
-        else:
-            typeDic[disease_field] += 1
-        #科室
-        if depDic.get(department_field, -1) == -1:
-            depDic[department_field] = 1
-        else:
-            depDic[department_field] += 1
-        #医院
-        if hosDic.get(hospital_field, -1) == -1:
-            hosDic[hospital_field] = 1
-        else:
-            hosDic[hospital_field] += 1
-        #年龄
-        if age_field > maxAge:
-            maxAge = age_field
-        if age_field < minAge:
-            minAge = age_field
-
-    typeSort = sorted(typeDic.items(), key=lambda data: data[1], reverse=True)
-    depSort = sorted(depDic.items(), key=lambda data: data[1], reverse=True)
-    hosSort = sorted(hosDic.items(), key=lambda data: data[1], reverse=True)
-    
+    aggregates = getCaseAggregates()
+    typeSort = _sortedByCount(aggregates['disease'])
+    depSort = _sortedByCount(aggregates['department'])
+    hosSort = _sortedByCount(aggregates['hospital'])
+
     # 添加错误处理，确保即使列表为空也能正常运行
     maxType = typeSort[0][0] if typeSort else "未知"
     maxDep = depSort[0][0] if depSort else "未知"
     maxHos = hosSort[0][0] if hosSort else "未知"
-    
-    return maxNum, maxType, maxDep, maxHos, maxAge, minAge
+
+    return aggregates['total'], maxType, maxDep, maxHos, aggregates['maxAge'], aggregates['minAge']
 
 def getGenderData():
-    casesList = getAllCasesData()
-    boyDic = {}
-    girlDic = {}
-    boyNum = 0
-    girlNum = 0
-    for caseItem in casesList:
-        gender_field = caseItem.get('gender', '女')  # 孕产妇默认为女性
-        # 兼容孕产妇数据和普通病例数据
-        disease_field = caseItem.get('disease') or caseItem.get('pregnancy_status', '未知')
-        
-        if gender_field == '男':
-            boyNum += 1
-            if boyDic.get(disease_field, -1) == -1:
-                boyDic[disease_field] = 1
-            else:
-                boyDic[disease_field] += 1
-        elif gender_field == '女':
-            girlNum += 1
-            if girlDic.get(disease_field, -1) == -1:
-                girlDic[disease_field] = 1
-            else:
-                girlDic[disease_field] += 1
+    aggregates = getCaseAggregates()
+    boyNum = aggregates['genderCount']['男']
+    girlNum = aggregates['genderCount']['女']
 
     ratioData = []
-    # 添加除以零检查，确保即使casesList为空也能正常运行
-    totalCases = len(casesList)
+    # 添加除以零检查，确保即使没有数据也能正常运行
+    totalCases = aggregates['total']
     if totalCases == 0:
         boyRatio = 0
         girlRatio = 0
     else:
         boyRatio = int(round(boyNum / totalCases * 100, 0))
         girlRatio = int(round(girlNum / totalCases * 100, 0))
-    print(boyRatio, girlRatio)
     ratioData.append(girlRatio)
     ratioData.append(boyRatio)
-    boyList = []
-    girlList = []
-    for k, v in boyDic.items():
-        boyList.append({
-            'name': k,
-            'value': v
-        })
-    for k, v in girlDic.items():
-        girlList.append({
-            'name': k,
-            'value': v
-        })
+    boyList = [{'name': k, 'value': v} for k, v in aggregates['genderDisease']['男']]
+    girlList = [{'name': k, 'value': v} for k, v in aggregates['genderDisease']['女']]
     return boyList, girlList, ratioData
 
 def getCircleData():
-    casesList = getAllCasesData()
-    depDic = {}
-    for caseItem in casesList:
-        department_field = caseItem.get('department', '未知')
-        if depDic.get(department_field, -1) == -1:
-            depDic[department_field] = 1
-        else:
-            depDic[department_field] += 1
-    # print(depDic)
-    dataSort = sorted(depDic.items(), key=lambda data: data[1], reverse=True)
+    aggregates = getCaseAggregates()
     dataResultList = []
-    for i in dataSort:
+    for i in _sortedByCount(aggregates['department']):
         dataResultList.append({
             'name': i[0],
             'value': i[1]
@@ -167,22 +246,8 @@ def getCircleData():
 
 def getBodyData():
     # 由于数据库表结构中没有字段10和11，暂时返回空数据以避免错误
-    # 修复disease字段的访问
-    casesList = getAllCasesData()
-    dataDic = {}
-    xData = []
-    sumData = []
-    for caseItem in casesList:
-        # 兼容孕产妇数据和普通病例数据
-        disease_field = caseItem.get('disease') or caseItem.get('pregnancy_status', '未知')
-        if dataDic.get(disease_field, -1) == -1:
-            dataDic[disease_field] = 1
-        else:
-            dataDic[disease_field] += 1
-    dataSort = sorted(dataDic.items(), key=lambda data: data[1], reverse=True)
-    for i in dataSort:
-        xData.append(i[0])
-        sumData.append(i[1])
+    aggregates = getCaseAggregates()
+    xData = [i[0] for i in _sortedByCount(aggregates['disease'])]
     # 暂时返回空数据，因为数据库中没有字段10和11
     y1Data = [0 for x in range(len(xData))]
     y2Data = [0 for x in range(len(xData))]
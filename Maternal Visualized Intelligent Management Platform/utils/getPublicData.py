@@ -1,8 +1,14 @@
-import pandas as pd
-import numpy as np
 from datetime import datetime
 from utils.query import querys
 
+def getStoredRiskLevels():
+    """读取后台预计算的综合风险等级，返回 {孕产妇ID: 风险等级}"""
+    check_scores = querys("SELECT name FROM sqlite_master WHERE type='table' AND name='maternal_risk_scores'")
+    if not check_scores:
+        return {}
+    rows = querys('select maternal_id, overall_risk_level from maternal_risk_scores')
+    return {row[0]: row[1] for row in rows} if rows else {}
+
 def getAllCasesData():
     """获取所有病例数据（优先使用孕产妇数据）"""
     try:
@@ -13,6 +19,7 @@ def getAllCasesData():
             maternal_data = querys('select * from maternal_info')
             if maternal_data and len(maternal_data) > 0:
                 print("从数据库获取真实孕产妇数据")
+                risk_levels = getStoredRiskLevels()
                 # 将sqlite3.Row对象转换为字典列表
                 result = []
                 for row in maternal_data:
@@ -25,7 +32,7 @@ def getAllCasesData():
                         row_dict = {columns[i]: row[i] for i in range(min(len(columns), len(row)))} if len(row) > 0 else {}
                         # 添加必要的字段以兼容前端
                         row_dict['pregnancy_status'] = '正常妊娠' if 'notes' not in row_dict or '异常' not in row_dict['notes'] else '异常妊娠'
-                        row_dict['risk_level'] = '低风险'
+                        row_dict['risk_level'] = risk_levels.get(row_dict.get('id'), '低风险')
                         row_dict['blood_pressure'] = f"{row_dict.get('systolic_pressure', '0')}/{row_dict.get('diastolic_pressure', '0')}"
                         row_dict['hospital'] = '妇产科医院'
                         row_dict['department'] = '产科'
@@ -36,7 +43,7 @@ def getAllCasesData():
                         row_dict = dict(row)
                         # 添加必要的字段以兼容前端
                         row_dict['pregnancy_status'] = '正常妊娠' if 'notes' not in row_dict or '异常' not in row_dict['notes'] else '异常妊娠'
-                        row_dict['risk_level'] = '低风险'
+                        row_dict['risk_level'] = risk_levels.get(row_dict.get('id'), '低风险')
                         row_dict['blood_pressure'] = f"{row_dict.get('systolic_pressure', '0')}/{row_dict.get('diastolic_pressure', '0')}"
                         row_dict['hospital'] = '妇产科医院'
                         row_dict['department'] = '产科'
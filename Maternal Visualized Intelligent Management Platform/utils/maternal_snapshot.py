@@ -0,0 +1,316 @@
+"""
+maternal_info 列式内存快照
+每列保存为一个 NumPy 数组（按 id 排序）：数值列为 float64（NULL 为 NaN），分类列做字典编码
+（int32 编码 + 类别列表），created_at 为 datetime64[s]。统计接口直接对数组做直方图和分组计数，
+不再为每行构造 Python 字典。
+
+快照按 updated_at 增量刷新：只读取 updated_at 不早于上次水位线的记录并按 id 合并；
+合并后的行数与表不一致（如有记录被删除）时整表重新加载。
+未修改 updated_at 的更新不会被增量刷新发现，可调用 refresh(full=True) 强制重建。
+
+环境变量 MEDICAL_COLUMNAR_SNAPSHOT=0 关闭快照，调用方回退到 SQL 统计。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.data_access import database_path
+from utils.db_pool import get_connection
+
+TABLE = 'maternal_info'
+
+NUMERIC_COLUMNS = ('age', 'gestational_weeks', 'pregnancy_count', 'parity', 'weight', 'height',
+                   'systolic_pressure', 'diastolic_pressure')
+
+# status 由 notes 派生：包含“异常”为异常妊娠（与 getAllCasesData 一致）
+CATEGORICAL_COLUMNS = ('pregnancy_type', 'status')
+
+NORMAL_STATUS = '正常妊娠'
+ABNORMAL_STATUS = '异常妊娠'
+
+# 整表加载时每次读取的行数
+LOAD_CHUNK_ROWS = 50000
+
+# 两次刷新检查之间的最小间隔（秒），避免每次请求都查询表的行数和水位线
+DEFAULT_MIN_INTERVAL = 1.0
+
+
+def snapshot_enabled() -> bool:
+    return os.environ.get('MEDICAL_COLUMNAR_SNAPSHOT', '1') not in ('0', 'false', 'False', 'no')
+
+
+def _to_float(values) -> np.ndarray:
+    """数值列转 float64，NULL 和无法转换的值为 NaN"""
+    try:
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        result = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return result
+
+
+class SnapshotData:
+    """
+    某一时刻的只读快照，刷新时整体替换，读取方持有的引用不受并发刷新影响
+
+    Attributes:
+        ids: 记录 id（升序，即全表扫描的行顺序）
+        numeric: 数值列 {列名: float64 数组}
+        codes: 分类列编码 {列名: int32 数组}
+        categories: 分类列类别 {列名: [类别值]}，编码即类别在列表中的下标
+        created_at: datetime64[s] 数组
+        watermark: 已加载记录中最大的 updated_at
+    """
+
+    def __init__(self, ids, numeric, codes, categories, created_at, watermark):
+        self.ids = ids
+        self.numeric = numeric
+        self.codes = codes
+        self.categories = categories
+        self.created_at = created_at
+        self.watermark = watermark
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, name: str) -> np.ndarray:
+        """数值列；分类列返回解码后的对象数组"""
+        if name in self.numeric:
+            return self.numeric[name]
+        return np.array(self.categories[name], dtype=object)[self.codes[name]]
+
+    def value_counts(self, name: str) -> List[Tuple[str, int]]:
+        """分类列计数，按类别首次出现的行顺序排列（与逐行统计字典的顺序一致）"""
+        codes = self.codes[name]
+        if not len(codes):
+            return []
+        counts = np.bincount(codes, minlength=len(self.categories[name]))
+        present, first_rows = np.unique(codes, return_index=True)
+        order = present[np.argsort(first_rows, kind='stable')]
+        return [(self.categories[name][code], int(counts[code])) for code in order]
+
+    def histogram(self, name: str, edges, fill: float = None) -> np.ndarray:
+        """
+        按左闭右开区间统计：edges=[a, b] 得到 (<a, [a,b), >=b) 三个区间的数量
+        NaN 用 fill 代替，fill 为 None 时不计入任何区间
+        """
+        values = self.numeric[name]
+        nan = np.isnan(values)
+        if fill is not None:
+            values = np.where(nan, fill, values)
+        elif nan.any():
+            values = values[~nan]
+        return np.bincount(np.searchsorted(np.asarray(edges), values, side='right'),
+                           minlength=len(edges) + 1)
+
+
+class MaternalSnapshot:
+    """单个数据库文件中 maternal_info 表的列式快照"""
+
+    def __init__(self, db_path: str, min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._data: Optional[SnapshotData] = None
+        self._checked_at = 0.0
+        self._stats = {'full_loads': 0, 'incremental': 0, 'rows_merged': 0}
+
+    def _connect(self):
+        return get_connection(self.db_path)
+
+    @staticmethod
+    def _ensure_index(conn):
+        """updated_at 索引：水位线检查和增量读取不必全表扫描"""
+        try:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{TABLE}_updated_at ON {TABLE} (updated_at)')
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"创建 updated_at 索引失败: {e}")
+
+    @staticmethod
+    def _select_columns(conn) -> Optional[List[str]]:
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({TABLE})')}
+        if not existing:
+            return None
+        wanted = ('id',) + NUMERIC_COLUMNS + ('pregnancy_type',)
+        select = [name if name in existing else f'NULL AS {name}' for name in wanted]
+        # 异常妊娠标记和创建时间（Unix 秒）在 SQL 中计算，不把备注和时间文本读入 Python
+        select.append("instr(notes, '异常') > 0" if 'notes' in existing else '0')
+        select.append("strftime('%s', created_at)" if 'created_at' in existing else 'NULL')
+        return select
+
+    @staticmethod
+    def _load(conn, sql, params, categories: Dict[str, list]):
+        """
+        分块读取查询结果并转换为列数组，峰值内存只有一个分块的 Python 对象
+        categories 为已有类别列表，新类别追加在末尾
+        """
+        # 普通元组比 sqlite3.Row 构造更快
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        lookups = {name: {value: code for code, value in enumerate(categories[name])}
+                   for name in CATEGORICAL_COLUMNS}
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(LOAD_CHUNK_ROWS)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            offset = 1 + len(NUMERIC_COLUMNS)
+            raw = {
+                'pregnancy_type': ['' if value is None else str(value) for value in columns[offset]],
+                'status': [ABNORMAL_STATUS if abnormal else NORMAL_STATUS for abnormal in columns[offset + 1]]
+            }
+            codes = {}
+            for name in CATEGORICAL_COLUMNS:
+                lookup = lookups[name]
+                encoded = np.empty(len(rows), dtype=np.int32)
+                for i, value in enumerate(raw[name]):
+                    code = lookup.get(value)
+                    if code is None:
+                        code = lookup[value] = len(categories[name])
+                        categories[name].append(value)
+                    encoded[i] = code
+                codes[name] = encoded
+            seconds = _to_float(columns[offset + 2])
+            created_at = np.full(len(rows), np.datetime64('NaT'), dtype='datetime64[s]')
+            valid = ~np.isnan(seconds)
+            created_at[valid] = seconds[valid].astype(np.int64).astype('datetime64[s]')
+            chunks.append((np.array(columns[0], dtype=np.int64),
+                           {name: _to_float(columns[1 + i]) for i, name in enumerate(NUMERIC_COLUMNS)},
+                           codes, created_at))
+
+        if not chunks:
+            return (np.empty(0, dtype=np.int64), {name: np.empty(0) for name in NUMERIC_COLUMNS},
+                    {name: np.empty(0, dtype=np.int32) for name in CATEGORICAL_COLUMNS},
+                    np.empty(0, dtype='datetime64[s]'))
+        return (np.concatenate([chunk[0] for chunk in chunks]),
+                {name: np.concatenate([chunk[1][name] for chunk in chunks]) for name in NUMERIC_COLUMNS},
+                {name: np.concatenate([chunk[2][name] for chunk in chunks]) for name in CATEGORICAL_COLUMNS},
+                np.concatenate([chunk[3] for chunk in chunks]))
+
+    @staticmethod
+    def _merge(base: SnapshotData, ids, numeric, codes, categories, created_at, watermark) -> SnapshotData:
+        """按 id 合并变化的记录：已存在的 id 原位更新，新 id 追加后重新排序"""
+        if len(base.ids):
+            positions = np.minimum(np.searchsorted(base.ids, ids), len(base.ids) - 1)
+            existing = base.ids[positions] == ids
+        else:
+            positions = np.zeros(len(ids), dtype=np.int64)
+            existing = np.zeros(len(ids), dtype=bool)
+        merged_ids = np.concatenate([base.ids, ids[~existing]])
+        order = np.argsort(merged_ids, kind='stable')
+
+        def merge(old, new):
+            result = old.copy()
+            result[positions[existing]] = new[existing]
+            return np.concatenate([result, new[~existing]])[order]
+
+        return SnapshotData(merged_ids[order],
+                            {name: merge(base.numeric[name], numeric[name]) for name in NUMERIC_COLUMNS},
+                            {name: merge(base.codes[name], codes[name]) for name in CATEGORICAL_COLUMNS},
+                            categories, merge(base.created_at, created_at), watermark)
+
+    def refresh(self, full: bool = False) -> Optional[SnapshotData]:
+        """
+        检查并刷新快照
+
+        Args:
+            full: 强制整表重新加载
+
+        Returns:
+            SnapshotData，表不存在时为 None
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                select = self._select_columns(conn)
+                if select is None:
+                    self._data = None
+                    return None
+                # 先取水位线再读数据：读取期间修改的记录下次刷新时会再次读取
+                # 分开查询：单独的 MAX 可以直接读 updated_at 索引
+                watermark = conn.execute(f'SELECT MAX(updated_at) FROM {TABLE}').fetchone()[0]
+                total = conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0]
+                data = self._data
+                column_list = ', '.join(select)
+
+                if data is not None and not full:
+                    if watermark == data.watermark and total == len(data):
+                        self._checked_at = time.monotonic()
+                        return data
+                    if data.watermark is not None:
+                        # >=：同一秒内的后续修改也会被重新读取
+                        categories = {name: list(data.categories[name]) for name in CATEGORICAL_COLUMNS}
+                        ids, numeric, codes, created_at = self._load(
+                            conn, f'SELECT {column_list} FROM {TABLE} WHERE updated_at >= ?',
+                            (data.watermark,), categories)
+                        merged = self._merge(data, ids, numeric, codes, categories, created_at, watermark)
+                        if len(merged) == total:
+                            self._stats['incremental'] += 1
+                            self._stats['rows_merged'] += len(ids)
+                            self._data = merged
+                            self._checked_at = time.monotonic()
+                            return merged
+
+                if data is None:
+                    self._ensure_index(conn)
+                categories = {name: [] for name in CATEGORICAL_COLUMNS}
+                ids, numeric, codes, created_at = self._load(
+                    conn, f'SELECT {column_list} FROM {TABLE} ORDER BY id', (), categories)
+                self._data = SnapshotData(ids, numeric, codes, categories, created_at, watermark)
+                self._stats['full_loads'] += 1
+                self._checked_at = time.monotonic()
+                return self._data
+            finally:
+                conn.close()
+
+    def get(self) -> Optional[SnapshotData]:
+        """获取快照，距上次检查超过 min_interval 时先增量刷新"""
+        data = self._data
+        if data is not None and time.monotonic() - self._checked_at < self.min_interval:
+            return data
+        return self.refresh()
+
+    def stats(self) -> Dict[str, int]:
+        data = self._data
+        stats = dict(self._stats)
+        stats['rows'] = len(data) if data is not None else 0
+        stats['nbytes'] = 0 if data is None else int(
+            data.ids.nbytes + data.created_at.nbytes
+            + sum(array.nbytes for array in data.numeric.values())
+            + sum(array.nbytes for array in data.codes.values()))
+        return stats
+
+
+_snapshots: Dict[str, MaternalSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot() -> MaternalSnapshot:
+    """当前主库对应的快照（路由到不同文件时各自维护）"""
+    path = database_path('system')
+    snapshot = _snapshots.get(path)
+    if snapshot is None:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(path)
+            if snapshot is None:
+                snapshot = _snapshots[path] = MaternalSnapshot(path)
+    return snapshot
+
+
+def get_maternal_snapshot() -> Optional[SnapshotData]:
+    """获取 maternal_info 的最新快照；快照被关闭或表不存在时返回 None"""
+    if not snapshot_enabled():
+        return None
+    return get_snapshot().get()
@@ -1,24 +1,22 @@
-import sqlite3
-import os
+from utils.data_access import get_db
 
 def querys(sql):
     """执行SQL查询"""
     try:
-        # 连接到SQLite数据库（与app.py保持一致）
-        db_path = os.path.join(os.path.dirname(__file__), '..', 'medical_system.db')
-        conn = sqlite3.connect(db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute(sql)
-        
-        if sql.strip().upper().startswith('SELECT'):
-            result = cursor.fetchall()
-        else:
-            conn.commit()
-            result = '执行成功'
-        
-        conn.close()
+        # 连接到主库（与app.py保持一致）
+        conn = get_db('system')
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute(sql)
+            
+            if sql.strip().upper().startswith('SELECT'):
+                result = cursor.fetchall()
+            else:
+                conn.commit()
+                result = '执行成功'
+        finally:
+            conn.close()
         return result
         
     except Exception as e:
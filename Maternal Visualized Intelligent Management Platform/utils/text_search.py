@@ -0,0 +1,125 @@
+"""
+关键字全文检索
+为列表接口的关键字筛选建立 FTS5 影子表（trigram 分词，支持中文姓名的任意子串匹配），
+影子表为外部内容表（只存索引，不重复存储数据），由触发器与原表保持同步。
+
+keyword_condition() 返回可直接拼入 WHERE 的条件：关键字不少于 3 个字符时走 FTS5 索引，
+否则（trigram 无法索引 1~2 个字符）或当前 SQLite 不支持 FTS5 时退回原来的 LIKE 条件，结果一致。
+"""
+
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# 各表参与关键字检索的列
+SEARCH_COLUMNS = {
+    'medical_data': ('name', 'disease_type'),
+    'maternal_info': ('name',),
+    'operation_logs': ('username', 'action', 'module'),
+    'hospitals': ('name', 'address', 'contact_phone'),
+    'nutrition_advice': ('patient_name',)
+}
+
+# trigram 分词的最短可索引长度
+MIN_INDEXED_LENGTH = 3
+
+# 已检查过的 (数据库文件, 表名) -> 是否可用 FTS5
+_checked: Dict[Tuple[str, str], bool] = {}
+_lock = threading.Lock()
+
+
+def fts_table(table: str) -> str:
+    return f'{table}_fts'
+
+
+def _database_file(conn) -> str:
+    return conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def _trigger_sql(table: str, columns: Sequence[str]) -> List[str]:
+    fts = fts_table(table)
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old_values});"
+    insert_new = f"INSERT INTO {fts} (rowid, {names}) VALUES (new.rowid, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END"
+    ]
+
+
+def ensure_search_index(conn, table: str) -> bool:
+    """
+    创建表的 FTS5 影子表和同步触发器（已存在时不做修改），新建时从原表回填索引
+
+    Returns:
+        bool: FTS5 索引是否可用（表不存在、缺少列或 SQLite 未编译 FTS5 时为 False）
+    """
+    key = (_database_file(conn), table)
+    if key in _checked:
+        return _checked[key]
+    with _lock:
+        if key in _checked:
+            return _checked[key]
+        columns = SEARCH_COLUMNS[table]
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if not existing:
+            # 表尚未创建，下次调用时重新检查
+            return False
+        available = all(column in existing for column in columns)
+        if available:
+            fts = fts_table(table)
+            created = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (fts,)).fetchone() is None
+            try:
+                conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                             f"{', '.join(columns)}, content='{table}', tokenize='trigram')")
+                for statement in _trigger_sql(table, columns):
+                    conn.execute(statement)
+                if created:
+                    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+                conn.commit()
+            except Exception:
+                # SQLite 版本过低（trigram 需要 3.34+）或未编译 FTS5
+                conn.rollback()
+                available = False
+        _checked[key] = available
+        return available
+
+
+def rebuild_search_index(conn, table: str):
+    """从原表重建 FTS5 索引（触发器安装之前写入的数据或批量导入后使用）"""
+    fts = fts_table(table)
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+
+def _quote(keyword: str) -> str:
+    """FTS5 短语查询：trigram 分词下短语匹配等价于子串匹配"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def keyword_condition(conn, table: str, keyword: str, columns: Sequence[str] = None) -> Tuple[str, list]:
+    """
+    生成关键字子串匹配条件（与 col1 LIKE '%kw%' OR col2 LIKE '%kw%' ... 结果一致）
+
+    Args:
+        conn: 数据库连接
+        table: 表名，须在 SEARCH_COLUMNS 中
+        keyword: 关键字
+        columns: 参与匹配的列，默认为 SEARCH_COLUMNS 中的全部列
+
+    Returns:
+        tuple: (条件SQL, 参数列表)
+    """
+    columns = tuple(columns or SEARCH_COLUMNS[table])
+    if len(keyword) >= MIN_INDEXED_LENGTH and ensure_search_index(conn, table):
+        fts = fts_table(table)
+        match = _quote(keyword)
+        if columns != SEARCH_COLUMNS[table]:
+            match = '{' + ' '.join(columns) + '} : ' + match
+        return f"rowid IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)", [match]
+    condition = ' OR '.join(f'{column} LIKE ?' for column in columns)
+    return f"({condition})", [f'%{keyword}%'] * len(columns)
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 import sqlite3
+from utils.data_access import get_db
 import json
 import os
 from datetime import datetime, timedelta
@@ -9,8 +10,7 @@ warning_bp = Blueprint('warning', __name__, url_prefix='/api/warning')
 
 def get_db_connection():
     """获取数据库连接"""
-    conn = sqlite3.connect('medical_system.db')
-    conn.row_factory = sqlite3.Row
+    conn = get_db('system')
     return conn
 
 @warning_bp.route('/records', methods=['GET'])